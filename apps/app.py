@@ -1,4 +1,6 @@
 import streamlit as st
+from lib.bq import cost_ledger, executor_status, invalidate_query_cache, query_cache_stats
+from lib.cost_guard import format_bytes
 
 
 st.set_page_config(
@@ -15,4 +17,18 @@ st.markdown(
 """
 Este tablero contiene varias pantallas de monitoreo. Usa la barra lateral para navegar.
 """
-)
\ No newline at end of file
+)
+
+with st.expander("Caché de consultas"):
+    st.json(query_cache_stats())
+    if st.button("Vaciar caché"):
+        st.write(f"{invalidate_query_cache()} entradas descartadas.")
+
+with st.expander("Coste de consultas"):
+    rows, totals = cost_ledger()
+    st.write(
+        f"{totals['queries']} consultas · estimado {format_bytes(totals['estimated_bytes'])} · "
+        f"facturado {format_bytes(totals['bytes_billed'])}"
+    )
+    st.dataframe(rows, width="stretch")
+    st.json(executor_status())
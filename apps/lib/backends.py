@@ -0,0 +1,403 @@
+"""Query backends for the dashboard: BigQuery or DuckDB over curated Parquet.
+
+``bq.py`` talks to one ``QueryBackend`` chosen with ``QUERY_BACKEND``:
+
+- ``BigQueryBackend`` runs the queries as BigQuery jobs through the shared
+  clients of ``bq_client``.
+- ``DuckDBBackend`` runs the same SQL in-process against local or mounted
+  curated Parquet (``ym=YYYY-MM/`` or ``date=YYYY-MM-DD/`` hive layout), so
+  the app works offline, in tests, and with sub-second latency on a
+  laptop-sized slice.  Table ids are mapped to Parquet roots; only the
+  partitions overlapping the ``@start_date``/``@end_date`` parameters are
+  read.  A dialect shim rewrites the BigQuery constructs the builders use
+  (``IN UNNEST``, ``APPROX_QUANTILES(...)[OFFSET(...)]``,
+  ``TIMESTAMP_TRUNC``/``DATE_TRUNC``, ``FORMAT_DATE``, ``EXTRACT(DAYOFWEEK
+  ...)``, ``SAFE_DIVIDE``, ``RAND``, ``FLOAT64``...); ``QUALIFY``, ``MAX_BY`` and
+  window functions run as is.  BigQuery ML (``ML.*``) is not available.
+
+Every backend takes BigQuery query parameters (``ScalarQueryParameter``/
+``ArrayQueryParameter``, as produced by ``sql_templates.bind``) and exposes
+``run_query_df`` (a compact frame, see ``frames``; optionally filling ``job_stats`` with the job id as soon
+as the job exists, and the bytes processed/billed when it finishes), ``dry_run`` (bytes the query would read),
+``cancel``, ``table_version`` (data watermark of a table) and
+``open_cursor`` (run a query but leave the result on the backend, fetched
+page by page through a ``result_cursor.ResultCursor``).
+
+No Streamlit imports: ``bq.py`` builds the backend from ``st.secrets``.
+"""
+
+from __future__ import annotations
+
+import glob
+import itertools
+import os
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import date
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from . import bq_client
+from .frames import to_frame
+from .lazy import lazy_import
+from .result_cursor import BigQueryResultCursor, DuckDBResultCursor, ResultCursor
+
+pd = lazy_import("pandas")
+bigquery = lazy_import("google.cloud.bigquery")
+duckdb = lazy_import("duckdb", optional=True)  # optional: only needed for QUERY_BACKEND = "duckdb"
+
+
+class QueryBackend:
+    """Interface shared by the backends."""
+
+    name = "base"
+
+    def run_query_df(self, sql: str, params: Sequence = (), job_stats: Optional[Dict] = None) -> pd.DataFrame:
+        raise NotImplementedError
+
+    def dry_run(self, sql: str, params: Sequence = ()) -> int:
+        """Bytes the query would read (validates the SQL without running it)."""
+        raise NotImplementedError
+
+    def cancel(self, job_id: Optional[str] = None) -> int:
+        """Cancel one running query (or all of them); returns how many were cancelled."""
+        raise NotImplementedError
+
+    def table_version(self, table: str) -> str:
+        """Opaque string that changes whenever ``table`` changes."""
+        raise NotImplementedError
+
+    def open_cursor(self, sql: str, params: Sequence = (), job_stats: Optional[Dict] = None) -> ResultCursor:
+        """Run the query and leave its result on the backend (see ``result_cursor``)."""
+        raise NotImplementedError
+
+
+# -- BigQuery -------------------------------------------------------------------------
+
+
+class BigQueryBackend(QueryBackend):
+    name = "bigquery"
+
+    def __init__(self, project: Optional[str] = None):
+        self.project = project
+        self._jobs: Dict[str, bigquery.QueryJob] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _job_config(params: Sequence, **kwargs) -> Optional[bigquery.QueryJobConfig]:
+        if not params and not kwargs:
+            return None
+        return bigquery.QueryJobConfig(query_parameters=list(params), **kwargs)
+
+    def _run_job(self, sql: str, params: Sequence, job_stats: Optional[Dict]):
+        """Run ``sql`` to completion; returns the job and its ``RowIterator`` (nothing downloaded)."""
+        client = bq_client.get_client(self.project)
+        job = client.query(sql, job_config=self._job_config(params))
+        with self._lock:
+            self._jobs[job.job_id] = job
+        try:
+            if job_stats is not None:
+                job_stats["job_id"] = job.job_id
+                if job_stats.get("cancel_requested"):
+                    self.cancel(job.job_id)
+            rows = job.result()
+            if job_stats is not None:
+                job_stats.update(
+                    bytes_processed=job.total_bytes_processed,
+                    bytes_billed=job.total_bytes_billed,
+                    cache_hit=bool(job.cache_hit),
+                    slot_ms=job.slot_millis,
+                    job_ms=(job.ended - job.started).total_seconds() * 1000.0
+                    if job.started and job.ended else None,
+                )
+            return job, rows
+        finally:
+            with self._lock:
+                self._jobs.pop(job.job_id, None)
+
+    def run_query_df(self, sql: str, params: Sequence = (), job_stats: Optional[Dict] = None) -> pd.DataFrame:
+        job, rows = self._run_job(sql, params, job_stats)
+        return bq_client.rows_to_dataframe(rows, job.destination, sql)
+
+    def open_cursor(self, sql: str, params: Sequence = (), job_stats: Optional[Dict] = None) -> ResultCursor:
+        job, rows = self._run_job(sql, params, job_stats)
+        if job.destination is None:
+            raise ValueError("La consulta no produce una tabla de resultados (¿DDL o script?).")
+        return BigQueryResultCursor(self, job.destination, rows.schema, rows.total_rows, job.job_id)
+
+    def dry_run(self, sql: str, params: Sequence = ()) -> int:
+        client = bq_client.get_client(self.project)
+        job = client.query(sql, job_config=self._job_config(params, dry_run=True, use_query_cache=False))
+        return int(job.total_bytes_processed or 0)
+
+    def cancel(self, job_id: Optional[str] = None) -> int:
+        with self._lock:
+            jobs = [j for k, j in self._jobs.items() if job_id is None or k == job_id]
+        client = bq_client.get_client(self.project)
+        for job in jobs:
+            client.cancel_job(job.job_id, location=job.location)
+        return len(jobs)
+
+    def table_version(self, table: str) -> str:
+        return str(bq_client.get_client(self.project).get_table(table).modified)
+
+
+# -- DuckDB ---------------------------------------------------------------------------
+
+_DUCK_TYPES = {
+    "STRING": "VARCHAR",
+    "INT64": "BIGINT",
+    "FLOAT64": "DOUBLE",
+    "NUMERIC": "DOUBLE",
+    "BOOL": "BOOLEAN",
+    "DATE": "DATE",
+    "DATETIME": "TIMESTAMP",
+    "TIMESTAMP": "TIMESTAMPTZ",
+}
+_MACROS = [
+    "CREATE OR REPLACE MACRO safe_divide(a, b) AS CASE WHEN b = 0 THEN NULL ELSE a / b END",
+    "CREATE OR REPLACE MACRO format_date(f, d) AS strftime(d, f)",
+    "CREATE OR REPLACE MACRO format_timestamp(f, t) AS strftime(t, f)",
+    "CREATE OR REPLACE MACRO bq_dayofweek(d) AS dayofweek(d) + 1",
+]
+# BigQuery-only syntax rewritten to DuckDB (applied in order, before binding parameters)
+_DIALECT_REWRITES: List[Tuple[re.Pattern, str]] = [
+    (re.compile(r"\bIN\s+UNNEST\s*\(([^()]+)\)", re.I), r"IN (SELECT UNNEST(\1))"),
+    (
+        re.compile(r"\bAPPROX_QUANTILES\s*\(\s*(.+?)\s*,\s*(\d+)\s*\)\s*\[\s*OFFSET\s*\(\s*([^()\]]+?)\s*\)\s*\]", re.I),
+        r"approx_quantile(CAST(\1 AS DOUBLE), CAST((\3) / \2 AS FLOAT))",
+    ),
+    (re.compile(r"\b(?:TIMESTAMP|DATETIME|DATE)_TRUNC\s*\(\s*(.+?)\s*,\s*(\w+)\s*\)", re.I), r"date_trunc('\2', \1)"),
+    (
+        re.compile(r"\bTIMESTAMP_DIFF\s*\(\s*([^(),]+?)\s*,\s*([^(),]+?)\s*,\s*(\w+)\s*\)", re.I),
+        r"date_diff('\3', \2, \1)",
+    ),
+    (re.compile(r"\bEXTRACT\s*\(\s*DAYOFWEEK\s+FROM\s+", re.I), "bq_dayofweek("),
+    (re.compile(r"\bEXTRACT\s*\(\s*ISOWEEK\s+FROM\s+", re.I), "EXTRACT(week FROM "),
+    (re.compile(r"\bEXTRACT\s*\(\s*ISOYEAR\s+FROM\s+", re.I), "EXTRACT(isoyear FROM "),
+    (re.compile(r"\bRAND\s*\(\s*\)", re.I), "random()"),
+    (
+        re.compile(r"\bARRAY_AGG\s*\(\s*(DISTINCT\s+)?([^()]+?)\s+IGNORE\s+NULLS\s*\)", re.I),
+        r"array_agg(\1\2) FILTER (WHERE \2 IS NOT NULL)",
+    ),
+    (re.compile(r"\bFLOAT64\b", re.I), "DOUBLE"),
+    (re.compile(r"\bINT64\b", re.I), "BIGINT"),
+]
+_TABLE_RE = re.compile(r"`([^`]+)`")
+_PARAM_RE = re.compile(r"@(\w+)")
+_ML_RE = re.compile(r"\bML\.\w+", re.I)
+_HIVE_RE = re.compile(r"(?:^|/)(\w+)=([^/]+)(?=/)")
+
+
+def _param_value(p) -> Tuple[str, object]:
+    """``(duckdb type, python value)`` of a BigQuery query parameter."""
+    if isinstance(p, bigquery.ArrayQueryParameter):
+        return f"{_DUCK_TYPES.get(p.array_type, 'VARCHAR')}[]", list(p.values)
+    return _DUCK_TYPES.get(p.type_, "VARCHAR"), p.value
+
+
+def _partition_in_range(rel_path: str, start: Optional[date], end: Optional[date]) -> bool:
+    """Hive partition pruning on ``date=YYYY-MM-DD`` / ``ym=YYYY-MM`` directories."""
+    for key, value in _HIVE_RE.findall(rel_path):
+        try:
+            if key in ("date", "dt", "day"):
+                lo = hi = date.fromisoformat(value[:10])
+            elif key == "ym":
+                lo = date.fromisoformat(f"{value[:7]}-01")
+                hi = date(lo.year + lo.month // 12, lo.month % 12 + 1, 1)
+                hi = date.fromordinal(hi.toordinal() - 1)
+            else:
+                continue
+        except ValueError:
+            continue
+        if (start and hi < start) or (end and lo > end):
+            return False
+    return True
+
+
+class DuckDBBackend(QueryBackend):
+    """In-process DuckDB over curated Parquet.
+
+    Parameters
+    ----------
+    tables : dict
+        Table id (``project.dataset.table``, or just ``table``) to a Parquet
+        root directory, a single file or a glob.
+    database : str
+        DuckDB database (``:memory:`` by default; holds the macros and the
+        result tables of ``open_cursor``).
+    threads : int, optional
+        DuckDB worker threads (default: all cores).
+    max_results : int
+        Result tables of ``open_cursor`` kept in the database (oldest dropped first).
+    """
+
+    name = "duckdb"
+
+    def __init__(self, tables: Dict[str, str], database: str = ":memory:", threads: Optional[int] = None,
+                 max_results: int = 16):
+        if duckdb is None:
+            raise RuntimeError("QUERY_BACKEND = 'duckdb' requiere el paquete duckdb (pip install duckdb).")
+        self.tables = dict(tables)
+        self._con = duckdb.connect(database)
+        if threads:
+            self._con.execute(f"SET threads = {int(threads)}")
+        for macro in _MACROS:
+            self._con.execute(macro)
+        self._running: Dict[str, "duckdb.DuckDBPyConnection"] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.max_results = int(max_results)
+        self._results: "deque[str]" = deque()
+
+    # -- tables ------------------------------------------------------------------------
+
+    def _root(self, table: str) -> str:
+        for key in (table, table.split(".")[-1]):
+            if key in self.tables:
+                return self.tables[key]
+        raise ValueError(f"Tabla sin Parquet local para el backend DuckDB: {table} (configura DUCKDB_TABLES).")
+
+    def _files(self, table: str) -> List[str]:
+        root = self._root(table)
+        if os.path.isdir(root):
+            return sorted(glob.glob(os.path.join(root, "**", "*.parquet"), recursive=True))
+        return sorted(glob.glob(root, recursive=True))
+
+    def _pruned_files(self, table: str, start: Optional[date], end: Optional[date]) -> List[str]:
+        root = self._root(table)
+        base = root if os.path.isdir(root) else os.path.dirname(root.split("*", 1)[0])
+        return [f for f in self._files(table) if _partition_in_range(os.path.relpath(f, base), start, end)]
+
+    def table_version(self, table: str) -> str:
+        files = self._files(table)
+        return f"{len(files)}:{max((os.path.getmtime(f) for f in files), default=0):.0f}"
+
+    # -- SQL ---------------------------------------------------------------------------
+
+    def translate(self, sql: str, params: Sequence = ()) -> Tuple[str, Dict[str, object], List[str]]:
+        """DuckDB SQL, parameter values and Parquet files read for a BigQuery query."""
+        ml = _ML_RE.search(sql)
+        if ml:
+            raise NotImplementedError(
+                f"El backend DuckDB no soporta BigQuery ML ({ml.group(0)}); usa QUERY_BACKEND = 'bigquery'."
+            )
+        types, values = {}, {}
+        for p in params:
+            types[p.name], values[p.name] = _param_value(p)
+        start, end = values.get("start_date"), values.get("end_date")
+        start = start if isinstance(start, date) else None
+        end = end if isinstance(end, date) else None
+
+        read: List[str] = []
+
+        def relation(m: re.Match) -> str:
+            files = self._pruned_files(m.group(1), start, end)
+            read.extend(files)
+            if not files:
+                # No partition in range: keep the schema, return no rows
+                files = self._files(m.group(1))[:1]
+                if not files:
+                    raise ValueError(f"No hay ficheros Parquet para {m.group(1)}.")
+                return f"(SELECT * FROM read_parquet({files!r}, hive_partitioning = true) LIMIT 0)"
+            return f"read_parquet({files!r}, hive_partitioning = true, union_by_name = true)"
+
+        sql = _TABLE_RE.sub(relation, sql)
+        for pattern, repl in _DIALECT_REWRITES:
+            sql = pattern.sub(repl, sql)
+
+        used = {}
+
+        def bind(m: re.Match) -> str:
+            name = m.group(1)
+            if name not in types:
+                raise ValueError(f"Parámetro sin valor: @{name}")
+            used[name] = values[name]
+            return f"CAST(${name} AS {types[name]})"
+
+        sql = _PARAM_RE.sub(bind, sql)
+        return sql, used, read
+
+    @property
+    def connection(self) -> "duckdb.DuckDBPyConnection":
+        return self._con
+
+    @contextmanager
+    def _job(self, job_stats: Optional[Dict]) -> Iterator[Tuple[str, "duckdb.DuckDBPyConnection"]]:
+        """Job id and cursor, registered for ``cancel`` while the query runs."""
+        cursor = self._con.cursor()
+        job_id = f"duckdb_{next(self._ids)}"
+        with self._lock:
+            self._running[job_id] = cursor
+        try:
+            if job_stats is not None:
+                job_stats["job_id"] = job_id
+                if job_stats.get("cancel_requested"):
+                    raise RuntimeError("Consulta cancelada.")
+            started = time.perf_counter()
+            yield job_id, cursor
+            if job_stats is not None:
+                job_stats["job_ms"] = (time.perf_counter() - started) * 1000.0
+        except duckdb.InterruptException as e:
+            raise RuntimeError("Consulta cancelada.") from e
+        finally:
+            with self._lock:
+                self._running.pop(job_id, None)
+            cursor.close()
+
+    @staticmethod
+    def _record(job_stats: Optional[Dict], files: Sequence[str]) -> None:
+        if job_stats is not None:
+            job_stats.update(bytes_processed=sum(os.path.getsize(f) for f in set(files)),
+                             bytes_billed=0, cache_hit=False)
+
+    def run_query_df(self, sql: str, params: Sequence = (), job_stats: Optional[Dict] = None) -> pd.DataFrame:
+        duck_sql, values, files = self.translate(sql, params)
+        with self._job(job_stats) as (_, cursor):
+            table = cursor.execute(duck_sql, values or None).fetch_arrow_table()
+        self._record(job_stats, files)
+        return to_frame(table)
+
+    def open_cursor(self, sql: str, params: Sequence = (), job_stats: Optional[Dict] = None) -> ResultCursor:
+        duck_sql, values, files = self.translate(sql, params)
+        with self._job(job_stats) as (job_id, cursor):
+            table = f"_result_{job_id}"
+            cursor.execute(f'CREATE OR REPLACE TABLE "{table}" AS {duck_sql}', values or None)
+            total = cursor.execute(f'SELECT count(*) FROM "{table}"').fetchone()[0]
+            columns = [row[0] for row in cursor.execute(f'DESCRIBE "{table}"').fetchall()]
+        self._record(job_stats, files)
+        with self._lock:
+            self._results.append(table)
+            expired = [self._results.popleft() for _ in range(len(self._results) - self.max_results)]
+        for old in expired:
+            self._con.execute(f'DROP TABLE IF EXISTS "{old}"')
+        return DuckDBResultCursor(self, table, total, columns, job_id)
+
+    def dry_run(self, sql: str, params: Sequence = ()) -> int:
+        duck_sql, values, files = self.translate(sql, params)
+        cursor = self._con.cursor()
+        try:
+            cursor.execute(f"EXPLAIN {duck_sql}", values or None)
+        finally:
+            cursor.close()
+        return sum(os.path.getsize(f) for f in set(files))
+
+    def cancel(self, job_id: Optional[str] = None) -> int:
+        with self._lock:
+            cursors = [c for k, c in self._running.items() if job_id is None or k == job_id]
+        for cursor in cursors:
+            cursor.interrupt()
+        return len(cursors)
+
+
+BACKENDS = {"bigquery": BigQueryBackend, "duckdb": DuckDBBackend}
+
+
+def make_backend(name: str, **kwargs) -> QueryBackend:
+    try:
+        cls = BACKENDS[name.lower()]
+    except KeyError:
+        raise ValueError(f"QUERY_BACKEND desconocido: {name!r} (opciones: {sorted(BACKENDS)})") from None
+    return cls(**kwargs)
@@ -1,18 +1,110 @@
-import pandas as pd
-from google.cloud import bigquery
 import os
 import streamlit as st
 from datetime import datetime, timedelta
 import pytz
-import warnings
+import re
+import time
+import logging
 
-warnings.filterwarnings("ignore", message="BigQuery Storage module not found")
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 
-if "GCP_KEYFILE_PATH" in st.secrets:
-    os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = st.secrets["GCP_KEYFILE_PATH"]
+from . import bq_client
+from .backends import make_backend
+from .cost_guard import DEFAULT_BUDGET_GB, DEFAULT_WARN_RATIO, CostGuard, CostLedger
+from .density_tiles import DensityTiles
+from .dim_catalog import DimensionCatalog
+from .lazy import lazy_import, lazy_object
+from .partial_aggregates import IncrementalQuery, date_runs, split_days
+from .query_executor import QueryExecutor
+from .query_cache import DEFAULT_DISK_BUDGET_MB, DEFAULT_MEMORY_BUDGET_MB, QueryCache, cache_key, is_cacheable
+from .sql_templates import BoundQuery
+from .telemetry import DEFAULT_MAX_MB, QueryTelemetry
 
+bigquery = lazy_import("google.cloud.bigquery")
+api_exceptions = lazy_import("google.api_core.exceptions")
+auth_exceptions = lazy_import("google.auth.exceptions")
+duckdb = lazy_import("duckdb", optional=True)
+
+# Nada se lee de st.secrets ni se construye al importar: la página pinta su
+# cabecera y sus filtros antes de la primera consulta (ver lib.lazy).
 DEFAULT_TABLE = "river-treat-468823.ais_data.ais_messages"
-TABLE_NAME = st.secrets.get("BQ_TABLE", os.getenv("BQ_TABLE", DEFAULT_TABLE))
+
+
+def _table_name():
+    return st.secrets.get("BQ_TABLE", os.getenv("BQ_TABLE", DEFAULT_TABLE))
+
+
+def _watermark_check_s():
+    return float(st.secrets.get("QUERY_CACHE_WATERMARK_CHECK_S", 60))
+
+
+def _configure_bigquery():
+    """Credenciales y descarga de resultados: Storage Read API (Arrow) a partir de BQ_STORAGE_THRESHOLD_ROWS filas."""
+    if "GCP_KEYFILE_PATH" in st.secrets:
+        os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = st.secrets["GCP_KEYFILE_PATH"]
+    bq_client.configure(
+        pool_size=int(st.secrets.get("BQ_HTTP_POOL_SIZE", bq_client.settings["pool_size"])),
+        storage_threshold_rows=int(st.secrets.get("BQ_STORAGE_THRESHOLD_ROWS", bq_client.settings["storage_threshold_rows"])),
+        max_streams=int(st.secrets.get("BQ_STORAGE_MAX_STREAMS", bq_client.settings["max_streams"])),
+        use_storage_api=bool(st.secrets.get("BQ_USE_STORAGE_API", True)),
+    )
+
+
+bq_client.configure_lazily(_configure_bigquery)
+
+
+def _make_backend():
+    """Motor de consultas: "bigquery" (por defecto) o "duckdb" sobre Parquet curado local.
+
+    DUCKDB_TABLES = {tabla = ruta}; por defecto la tabla de BQ_TABLE -> DUCKDB_PARQUET_ROOT.
+    """
+    name = st.secrets.get("QUERY_BACKEND", os.getenv("QUERY_BACKEND", "bigquery"))
+    if name != "duckdb":
+        return make_backend(name)
+    tables = dict(st.secrets.get("DUCKDB_TABLES", {}))
+    parquet_root = st.secrets.get("DUCKDB_PARQUET_ROOT", os.getenv("DUCKDB_PARQUET_ROOT"))
+    if parquet_root:
+        tables.setdefault(_table_name().split(".")[-1], parquet_root)
+    return make_backend("duckdb", tables=tables, threads=st.secrets.get("DUCKDB_THREADS"))
+
+
+BACKEND = lazy_object("BACKEND", _make_backend)
+# Caché de resultados compartida por todas las sesiones del proceso (y entre
+# procesos/reinicios vía QUERY_CACHE_DIR).  QUERY_CACHE_TTLS = {familia = segundos}.
+QUERY_CACHE = lazy_object("QUERY_CACHE", lambda: QueryCache(
+    cache_dir=st.secrets.get("QUERY_CACHE_DIR", os.getenv("QUERY_CACHE_DIR", "/tmp/ais_dashboard_cache")) or None,
+    memory_budget_bytes=int(st.secrets.get("QUERY_CACHE_MEMORY_MB", DEFAULT_MEMORY_BUDGET_MB)) * 2**20,
+    disk_budget_bytes=int(st.secrets.get("QUERY_CACHE_DISK_MB", DEFAULT_DISK_BUDGET_MB)) * 2**20,
+    ttls_s={k: float(v) for k, v in dict(st.secrets.get("QUERY_CACHE_TTLS", {})).items()},
+))
+# Control de coste: presupuesto de bytes por página (QUERY_BUDGETS_GB = {página = GB}).
+COST_GUARD = lazy_object("COST_GUARD", lambda: CostGuard(
+    default_budget_gb=float(st.secrets.get("QUERY_BUDGET_GB", DEFAULT_BUDGET_GB)),
+    budgets_gb=dict(st.secrets.get("QUERY_BUDGETS_GB", {})),
+    warn_ratio=float(st.secrets.get("QUERY_BUDGET_WARN_RATIO", DEFAULT_WARN_RATIO)),
+))
+COST_LEDGER = CostLedger()
+# Telemetría por consulta (duración, bytes, slots, caché) en un JSONL compartido; vacío = sólo memoria.
+TELEMETRY = lazy_object("TELEMETRY", lambda: QueryTelemetry(
+    st.secrets.get("QUERY_TELEMETRY_PATH",
+                   os.getenv("QUERY_TELEMETRY_PATH", "/tmp/ais_dashboard_cache/query_telemetry.jsonl")),
+    max_bytes=int(st.secrets.get("QUERY_TELEMETRY_MAX_MB", DEFAULT_MAX_MB)) * 2**20,
+))
+# Consultas de página en paralelo; las de entradas obsoletas se cancelan.
+QUERY_EXECUTOR = lazy_object("QUERY_EXECUTOR", lambda: QueryExecutor(
+    cancel=BACKEND.cancel, max_workers=int(st.secrets.get("QUERY_MAX_WORKERS", 8))
+))
+logger = logging.getLogger(__name__)
+_last_watermark_check = 0.0
+# Catálogo de dimensiones (BQ_CATALOG_TABLE): opciones de los filtros sin escanear BQ_TABLE.
+DIM_CATALOG = lazy_object("DIM_CATALOG", lambda: DimensionCatalog(
+    st.secrets.get("DIM_CATALOG_PATH", os.getenv("DIM_CATALOG_PATH", "/tmp/ais_dashboard_cache/dim_catalog.arrow"))
+))
+_last_catalog_check = 0.0
+# Pirámide de teselas de densidad (src/pipeline/tiles/density_tiles.py): mapas sin leer mensajes.
+DENSITY_TILES = lazy_object("DENSITY_TILES", lambda: DensityTiles(
+    st.secrets.get("DENSITY_TILES_PATH", os.getenv("DENSITY_TILES_PATH", ""))
+))
 
 
 def get_default_dates():
@@ -24,14 +116,377 @@ def get_default_dates():
     return start_date, end_date
 
 
-def run_query_df(query, params=None):
-    client = bigquery.Client()
-    return client.query(query).to_dataframe()
+def _query_family(query):
+    return "ml" if re.search(r"\bML\.", query, re.IGNORECASE) else "default"
+
+
+def refresh_data_watermark(force=False):
+    """Invalida los resultados cacheados cuando cambian las tablas de origen.
+
+    La marca de agua es el ``modified`` de ``BQ_TABLE`` (y de
+    ``BQ_SUMMARY_TABLE`` si está definida), comprobado como mucho cada
+    ``QUERY_CACHE_WATERMARK_CHECK_S``.  Devuelve True si cambió (hay datos
+    nuevos desde la última comprobación).  Sin permisos de metadatos la caché
+    sólo caduca por TTL.
+    """
+    global _last_watermark_check
+    now = time.monotonic()
+    if not force and now - _last_watermark_check < _watermark_check_s():
+        return False
+    _last_watermark_check = now
+    from .query_utils import _qualify, get_summary_table_name
+
+    tables = [_qualify(_table_name())] + [t for t in [get_summary_table_name()] if t]
+    try:
+        watermark = "|".join(BACKEND.table_version(t) for t in tables)
+    except (api_exceptions.Forbidden, api_exceptions.NotFound):
+        return False  # sin permisos de metadatos: sólo TTL
+    except _catalog_errors() as e:
+        logger.warning("No se pudo leer la marca de agua de %s: %s", ", ".join(tables), e)
+        return False
+    return QUERY_CACHE.set_watermark(watermark)
+
+
+def invalidate_query_cache(family=None):
+    """Descarta resultados cacheados (todos o de una familia: default/distinct/ml/result/partial)."""
+    return QUERY_CACHE.invalidate(family=family)
+
+
+def query_cache_stats():
+    return QUERY_CACHE.info()
+
+
+def _result_keys(query, params=None):
+    """Claves de caché (y familia) del resultado de ``query``: una, o un parcial por día de un ``IncrementalQuery``."""
+    if isinstance(query, IncrementalQuery):
+        return [(_partial_key(query, d), "partial") for d in query.days()]
+    sql, params = _unpack(query, params)
+    return [(cache_key(sql, _cache_params(params)), _query_family(sql))] if is_cacheable(sql) else []
+
+
+def expire_cached_result(query, within_s=0.0, params=None):
+    """Descarta lo que ``query`` tiene en caché y caduca en menos de ``within_s`` segundos.
+
+    Devuelve ``True`` si su resultado sigue entero en caché (no hace falta
+    ejecutarla).  Lo usa ``lib.cache_warmer`` para renovar los resultados
+    antes de que caduquen entre dos pasadas.
+    """
+    fresh = True
+    for key, family in _result_keys(query, params):
+        left = QUERY_CACHE.expires_in(key, family)
+        if left is None or left < within_s:
+            fresh = False
+            if left is not None:
+                QUERY_CACHE.invalidate(key=key)
+    return fresh
+
+
+def run_query_df(query, params=None, family=None, use_cache=True, page=None, estimated_bytes=None,
+                 job_stats=None, session=None):
+    """Ejecuta ``query`` (SQL o ``BoundQuery`` de ``lib.sql_templates``) con ``params``.
+
+    ``params`` es una lista de ``ScalarQueryParameter``/``ArrayQueryParameter``;
+    un ``BoundQuery`` ya trae los suyos.  Se ejecuta en ``BACKEND`` y queda
+    registrada en ``COST_LEDGER`` y ``TELEMETRY`` (con ``page``, ``session``
+    y la estimación previa); ``job_stats`` (dict) recibe los bytes
+    procesados/facturados del job.  Un ``IncrementalQuery`` sólo consulta los
+    días que faltan en la caché (ver ``lib.partial_aggregates``).
+    """
+    job_stats = {} if job_stats is None else job_stats
+    if isinstance(query, IncrementalQuery):
+        return _recorded(
+            lambda: _run_incremental(query, use_cache, job_stats), query.name, page, _incremental_params(query),
+            job_stats, estimated_bytes, session,
+        )
+    name = getattr(query, "name", "sql")
+    query, params = _unpack(query, params)
+
+    def run():
+        return BACKEND.run_query_df(query, params, job_stats=job_stats)
+
+    def cached():
+        refresh_data_watermark()
+        return QUERY_CACHE.get_or_run(query, run, params=_cache_params(params), family=family or _query_family(query))
+
+    return _recorded(cached if use_cache else run, name, page, _cache_params(params)["params"], job_stats,
+                     estimated_bytes, session)
+
+
+def _recorded(run, name, page=None, params=None, job_stats=None, estimated_bytes=None, session=None, ledger=True):
+    """``run()`` anotado en ``COST_LEDGER`` y ``TELEMETRY`` (duración, bytes, slots, filas o error).
+
+    ``params`` sólo se guarda como huella (``telemetry.fingerprint``).  Sin
+    ``session`` se toma la de la ejecución de Streamlit en curso, si la hay.
+    """
+    job_stats = {} if job_stats is None else job_stats
+    session = session or _current_session()
+    started = time.perf_counter()
+    try:
+        result = run()
+    except Exception as e:
+        TELEMETRY.record(name, page, session, params, job_stats, time.perf_counter() - started, error=e)
+        raise
+    if ledger:
+        COST_LEDGER.record(name, page=page, estimated_bytes=estimated_bytes, job_stats=job_stats)
+    TELEMETRY.record(name, page, session, params, job_stats, time.perf_counter() - started, rows=len(result))
+    return result
+
+
+def _current_session():
+    ctx = get_script_run_ctx(suppress_warning=True)  # fuera de una sesión (lib.cache_warmer) no hay contexto
+    return ctx.session_id if ctx is not None else None
+
+
+def _partial_key(query, day):
+    bound = query.partial(day, day)
+    return cache_key(bound.sql, _cache_params(bound.params))
+
+
+def _missing_days(query):
+    """Días de ``query`` cuyos parciales no están en la caché."""
+    return [d for d in query.days() if not QUERY_CACHE.contains(_partial_key(query, d), "partial")]
+
+
+def _incremental_params(query):
+    full = query.partial(query.start_date, query.end_date)
+    return {**_cache_params(full.params), "options": query.options}
+
+
+def _run_incremental(query, use_cache, job_stats):
+    """Resultado de un ``IncrementalQuery``: parciales diarios de la caché + los días que faltan.
+
+    Los días que faltan se consultan en tramos de días consecutivos (un job
+    por tramo, que comparte ``job_stats`` para poder cancelarlo) y sus
+    parciales se guardan día a día (familia ``partial``, salvo sin
+    ``use_cache``).  En el registro de coste queda una sola entrada con los
+    bytes y slots de todos los tramos.
+    """
+    if use_cache:
+        refresh_data_watermark()
+    parts, missing = {}, []
+    for day in query.days():
+        df = QUERY_CACHE.get(_partial_key(query, day), "partial") if use_cache else None
+        if df is None:
+            missing.append(day)
+        else:
+            parts[day] = df
+    totals = {"bytes_processed": 0, "bytes_billed": 0, "slot_ms": 0, "job_ms": 0}
+    for start, end in date_runs(missing):
+        bound = query.partial(start, end)
+        df = BACKEND.run_query_df(bound.sql, list(bound.params), job_stats=job_stats)
+        for k in totals:
+            totals[k] += job_stats.get(k) or 0
+        run_days = [d for d in missing if start <= d <= end]
+        for day, part in split_days(df, run_days).items():
+            parts[day] = part
+            if use_cache:
+                QUERY_CACHE.put(_partial_key(query, day), part, family="partial", sql=bound.sql)
+    job_stats.update({k: v for k, v in totals.items() if k in job_stats})
+    return query.finalize([parts[d] for d in query.days()])
+
+
+def _cache_params(params):
+    return {"backend": BACKEND.name, "params": [p.to_api_repr() for p in params]}
+
+
+def _unpack(query, params):
+    if isinstance(query, BoundQuery):
+        return query.sql, list(query.params) + list(params or [])
+    return query, list(params or [])
+
+
+def dry_run_query(query, params=None):
+    """Bytes que leería ``query`` en ``BACKEND`` (valida la consulta sin ejecutarla)."""
+    query, params = _unpack(query, params)
+    return BACKEND.dry_run(query, params)
+
+
+def submit_query(session, slot, query, page=None, estimated_bytes=None):
+    """Lanza ``query`` en ``QUERY_EXECUTOR`` para ``slot`` = (página, consulta) de ``session``.
+
+    Devuelve un ``QueryTask`` (``future``, ``job_stats``).  Si el mismo slot
+    sigue en curso con otras entradas, su job se cancela.
+    """
+    if isinstance(query, IncrementalQuery):
+        key = cache_key(query.partial(query.start_date, query.end_date).sql, _incremental_params(query))
+    else:
+        sql, params = _unpack(query, None)
+        key = cache_key(sql, _cache_params(params))
+    return QUERY_EXECUTOR.submit(
+        session, slot, key,
+        lambda job_stats: run_query_df(query, page=page, estimated_bytes=estimated_bytes, job_stats=job_stats,
+                                       session=session),
+    )
+
+
+def executor_status():
+    """Contadores del ejecutor y consultas de página en curso (con su job)."""
+    return {**QUERY_EXECUTOR.stats.__dict__, "pending": QUERY_EXECUTOR.pending()}
+
+
+def _date_param(params, name):
+    for p in params:
+        if p.name == name and isinstance(p, bigquery.ScalarQueryParameter) and p.type_ == "DATE":
+            return p.value
+    return None
+
+
+def estimate_query_cost(query, params=None, page="default"):
+    """Dry-run de ``query`` evaluado contra el presupuesto de ``page`` (``CostEstimate``).
+
+    Devuelve ``None`` si el resultado ya está en la caché (no cuesta nada)
+    o si el dry-run no está disponible.  Con ``@start_date``/``@end_date``
+    y un coste por encima del umbral de aviso, un segundo dry-run de un solo
+    día comprueba que el filtro de fechas poda particiones.
+    """
+    if isinstance(query, IncrementalQuery):
+        return _estimate_incremental(query, page)
+    sql, params = _unpack(query, params)
+    if is_cacheable(sql) and QUERY_CACHE.contains(cache_key(sql, _cache_params(params)), _query_family(sql)):
+        return None
+    try:
+        total = BACKEND.dry_run(sql, params)
+        start, end = _date_param(params, "start_date"), _date_param(params, "end_date")
+        days = one_day = None
+        if start and end and end >= start:
+            days = (end - start).days + 1
+            if days > 1 and total > COST_GUARD.warn_ratio * COST_GUARD.budget_bytes(page):
+                one_day_params = [
+                    bigquery.ScalarQueryParameter("end_date", "DATE", start) if p.name == "end_date" else p
+                    for p in params
+                ]
+                one_day = BACKEND.dry_run(sql, one_day_params)
+    except Exception as e:  # noqa: BLE001 - sin dry-run la página se ejecuta sin control
+        logger.warning("Dry-run no disponible (%s); se ejecuta sin control de coste.", e)
+        return None
+    return COST_GUARD.evaluate(page, total, days, one_day)
+
+
+def _estimate_incremental(query, page):
+    """Dry-run de los días que faltan de ``query`` (``None`` si están todos en la caché)."""
+    missing = _missing_days(query)
+    if not missing:
+        return None
+    try:
+        total = 0
+        for start, end in date_runs(missing):
+            bound = query.partial(start, end)
+            total += BACKEND.dry_run(bound.sql, list(bound.params))
+        one_day = None
+        if len(missing) > 1 and total > COST_GUARD.warn_ratio * COST_GUARD.budget_bytes(page):
+            bound = query.partial(missing[0], missing[0])
+            one_day = BACKEND.dry_run(bound.sql, list(bound.params))
+    except Exception as e:  # noqa: BLE001 - sin dry-run la página se ejecuta sin control
+        logger.warning("Dry-run no disponible (%s); se ejecuta sin control de coste.", e)
+        return None
+    return COST_GUARD.evaluate(page, total, len(missing), one_day)
+
+
+def cost_ledger():
+    """Consultas ejecutadas: bytes estimados vs. procesados/facturados, y totales."""
+    return COST_LEDGER.rows(), COST_LEDGER.totals()
+
+
+def recent_queries(session=None, limit=20):
+    """Últimas consultas del proceso (o de ``session``), de la más reciente a la más antigua."""
+    return TELEMETRY.recent(session=session, limit=limit)
+
+
+def query_telemetry(since=None):
+    """Eventos de telemetría del log compartido (desde ``since``, epoch en segundos)."""
+    return TELEMETRY.load(since=since)
+
+
+def cancel_queries(job_id=None):
+    """Cancela las consultas en curso del proceso (o sólo ``job_id``)."""
+    return BACKEND.cancel(job_id)
+
+
+def open_result_cursor(query, params=None, page=None, estimated_bytes=None):
+    """Ejecuta ``query`` dejando el resultado en el backend (``ResultCursor``).
+
+    Para resultados grandes: la página pide sólo las filas que muestra
+    (``cursor.page``), ordena con ``sort_result`` y agrega con
+    ``query_result``.  No pasa por la caché de resultados; el cursor se
+    guarda en ``st.session_state`` y sobrevive a los reruns.
+    """
+    name = getattr(query, "name", "sql")
+    query, params = _unpack(query, params)
+    job_stats = {}
+    return _recorded(lambda: BACKEND.open_cursor(query, params, job_stats=job_stats), name, page,
+                     _cache_params(params)["params"], job_stats, estimated_bytes)
+
+
+def sort_result(cursor, column, ascending=True, page=None):
+    """Cursor ordenado por ``column``: una consulta sobre el resultado, reutilizada después."""
+    job_stats = {}
+    sorted_cursor = _recorded(lambda: cursor.sort_by(column, ascending, job_stats=job_stats),
+                              f"sort_result:{column}", page, [cursor.result_id, ascending], job_stats, ledger=False)
+    if job_stats:
+        COST_LEDGER.record(f"sort_result:{column}", page=page, job_stats=job_stats)
+    return sorted_cursor
+
+
+def query_result(cursor, query, params=None, page=None):
+    """Consulta de seguimiento sobre el resultado de ``cursor`` (``{result}`` en el SQL).
+
+    El resultado de un cursor no cambia: se cachea por ``cursor.result_id``
+    (familia ``result``) y los reruns de la página no vuelven a ejecutarla.
+    """
+    job_stats = {}
+    query, params = _unpack(query, params)
+    cache_params = {**_cache_params(params), "result": cursor.result_id}
+    return _recorded(
+        lambda: QUERY_CACHE.get_or_run(
+            query, lambda: cursor.query(query, params, job_stats=job_stats), params=cache_params, family="result"
+        ),
+        "query_result", page, cache_params, job_stats,
+    )
+
+
+def _catalog_errors():
+    """Errores esperables al leer metadatos (catálogo, marca de agua): sin credenciales, permisos, red o ficheros."""
+    errors = (OSError, ValueError, api_exceptions.GoogleAPICallError, auth_exceptions.GoogleAuthError)
+    return errors + ((duckdb.Error,) if duckdb is not None else ())
+
+
+def get_dim_catalog(force=False):
+    """Catálogo de dimensiones local, sincronizado con ``BQ_CATALOG_TABLE``.
+
+    Sólo vuelve a descargar el catálogo (``sql/dim_catalog.sql``) cuando
+    cambia el ``modified`` de la tabla; comprobado como mucho cada
+    ``QUERY_CACHE_WATERMARK_CHECK_S``.  Devuelve ``None`` si no hay catálogo disponible.
+    """
+    global _last_catalog_check
+    from .queries import dim_catalog_query
+    from .query_utils import get_catalog_table_name
+
+    table = get_catalog_table_name()
+    if not table:
+        return None
+    now = time.monotonic()
+    if force or now - _last_catalog_check >= _watermark_check_s():
+        _last_catalog_check = now
+        try:
+            modified = BACKEND.table_version(table)
+            if force or modified != DIM_CATALOG.watermark:
+                DIM_CATALOG.save(run_query_df(dim_catalog_query(table), use_cache=False), modified)
+        except _catalog_errors() as e:
+            # Sin acceso: se sirve la última copia local, si la hay
+            logger.warning("No se pudo sincronizar el catálogo de dimensiones %s (%s)", table, e)
+    return DIM_CATALOG if DIM_CATALOG.load() else None
+
+
+def get_density_tiles():
+    """Pirámide de densidad de ``DENSITY_TILES_PATH`` o ``None`` si no hay ninguna construida."""
+    return DENSITY_TILES if DENSITY_TILES.load() else None
 
 
 def distinct_values(column, table=None):
     if table is None:
-        table = TABLE_NAME
-    client = bigquery.Client()
-    query = f"SELECT DISTINCT {column} FROM `{table}` ORDER BY {column}"
-    return client.query(query).to_dataframe()[column].tolist()
+        catalog = get_dim_catalog()
+        if catalog is not None and catalog.has(column):
+            return catalog.values(column)["value"].tolist()
+        table = _table_name()
+    query = f"SELECT DISTINCT {column} FROM `{table}` WHERE {column} IS NOT NULL ORDER BY {column}"
+    return run_query_df(query, family="distinct")[column].tolist()
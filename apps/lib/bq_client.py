@@ -0,0 +1,158 @@
+"""Process-wide BigQuery clients and the result download path.
+
+Every Streamlit session shares one ``bigquery.Client`` per project, built
+over an ``AuthorizedSession`` whose connection pool is sized for concurrent
+sessions (``pool_size``), instead of creating a client (and new TLS
+connections) per query.
+
+Query results of at least ``storage_threshold_rows`` rows are downloaded
+with the BigQuery Storage Read API as Arrow record batches, reading up to
+``max_streams`` streams in parallel (a single stream when the query has a
+final ``ORDER BY``, to keep the order).  Smaller results, or any failure of
+the Storage path (package not installed, missing
+``bigquery.readsessions.create`` permission...), use the REST pages.  Both
+paths decode to Arrow and return compact frames (``frames.to_frame``).
+
+No Streamlit imports: ``bq.py`` registers with ``configure_lazily`` a
+callback that reads the settings (and credentials) from ``st.secrets``; it
+runs right before the first client is built, not when the page imports.
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from .frames import to_frame
+from .lazy import lazy_import
+
+google_auth = lazy_import("google.auth")
+auth_requests = lazy_import("google.auth.transport.requests")
+adapters = lazy_import("requests.adapters")
+pd = lazy_import("pandas")
+pa = lazy_import("pyarrow")
+bigquery = lazy_import("google.cloud.bigquery")
+bigquery_storage_v1 = lazy_import("google.cloud.bigquery_storage_v1", optional=True)  # google-cloud-bigquery-storage
+
+logger = logging.getLogger(__name__)
+
+_SCOPES = ["https://www.googleapis.com/auth/cloud-platform"]
+_ORDER_BY_RE = re.compile(r"\bORDER\s+BY\b[^)]*$", re.IGNORECASE)
+
+settings = {
+    "pool_size": 32,
+    "storage_threshold_rows": 100_000,
+    "max_streams": 4,
+    "use_storage_api": True,
+}
+
+_lock = threading.Lock()
+_clients: Dict[Optional[str], bigquery.Client] = {}
+_read_client = None
+_pending_setup: List[Callable[[], None]] = []
+
+
+def configure(**kwargs) -> None:
+    """Update ``settings`` (``pool_size`` only affects clients created afterwards)."""
+    unknown = set(kwargs) - set(settings)
+    if unknown:
+        raise ValueError(f"Opciones desconocidas: {sorted(unknown)}")
+    settings.update(kwargs)
+
+
+def configure_lazily(setup: Callable[[], None]) -> None:
+    """Run ``setup()`` (settings, credentials...) right before the first client is built."""
+    with _lock:
+        _pending_setup.append(setup)
+
+
+def _pooled_session(credentials) -> auth_requests.AuthorizedSession:
+    session = auth_requests.AuthorizedSession(credentials)
+    adapter = adapters.HTTPAdapter(pool_connections=settings["pool_size"], pool_maxsize=settings["pool_size"])
+    session.mount("https://", adapter)
+    return session
+
+
+def get_client(project: Optional[str] = None) -> bigquery.Client:
+    """Shared client for ``project`` (``None`` = project of the credentials)."""
+    client = _clients.get(project)
+    if client is not None:
+        return client
+    with _lock:
+        client = _clients.get(project)
+        if client is None:
+            while _pending_setup:
+                _pending_setup[0]()
+                _pending_setup.pop(0)
+            credentials, default_project = google_auth.default(scopes=_SCOPES)
+            client = bigquery.Client(
+                project=project or default_project,
+                credentials=credentials,
+                _http=_pooled_session(credentials),
+            )
+            _clients[project] = client
+        return client
+
+
+def get_read_client():
+    """Shared ``BigQueryReadClient`` or ``None`` if the Storage package is missing."""
+    global _read_client
+    if bigquery_storage_v1 is None:
+        return None
+    if _read_client is None:
+        with _lock:
+            if _read_client is None:
+                _read_client = bigquery_storage_v1.BigQueryReadClient(credentials=get_client()._credentials)
+    return _read_client
+
+
+def read_table_arrow(read_client, table: bigquery.TableReference, max_streams: int = 1) -> pa.Table:
+    """Read a whole table through the Storage Read API as Arrow.
+
+    Streams are read in parallel threads and concatenated in stream order.
+    """
+    session = read_client.create_read_session(
+        parent=f"projects/{table.project}",
+        read_session={
+            "table": f"projects/{table.project}/datasets/{table.dataset_id}/tables/{table.table_id}",
+            "data_format": "ARROW",
+        },
+        max_stream_count=max_streams,
+    )
+    schema = pa.ipc.read_schema(pa.py_buffer(session.arrow_schema.serialized_schema))
+    if not session.streams:
+        return schema.empty_table()
+
+    def read_stream(name: str) -> List[pa.RecordBatch]:
+        return [
+            pa.ipc.read_record_batch(pa.py_buffer(resp.arrow_record_batch.serialized_record_batch), schema)
+            for resp in read_client.read_rows(name)
+        ]
+
+    names = [s.name for s in session.streams]
+    if len(names) == 1:
+        batches = read_stream(names[0])
+    else:
+        with ThreadPoolExecutor(max_workers=len(names)) as pool:
+            batches = [b for part in pool.map(read_stream, names) for b in part]
+    return pa.Table.from_batches(batches, schema=schema)
+
+
+def rows_to_dataframe(rows, destination: Optional[bigquery.TableReference], query: str = "",
+                      read_client=None) -> pd.DataFrame:
+    """Compact DataFrame (``frames.to_frame``) of a finished query's ``RowIterator`` via Storage or REST."""
+    total = rows.total_rows or 0
+    read_client = read_client if read_client is not None else (
+        get_read_client() if settings["use_storage_api"] else None
+    )
+    if read_client is not None and destination is not None and total >= settings["storage_threshold_rows"]:
+        streams = 1 if _ORDER_BY_RE.search(query) else settings["max_streams"]
+        try:
+            return to_frame(read_table_arrow(read_client, destination, streams))
+        except Exception as e:  # noqa: BLE001 - any Storage failure falls back to REST
+            logger.warning("Storage Read API no disponible (%s); usando REST.", e)
+    return to_frame(rows.to_arrow(create_bqstorage_client=False))
+
@@ -0,0 +1,323 @@
+"""Precalentado de la caché de resultados con las vistas por defecto de las páginas.
+
+Cada página abre con ``get_default_dates()`` (±2 días) y los filtros de
+buque vacíos, así que la primera sesión del día pagaba la latencia completa
+de todas las páginas.  ``warm_query_cache`` ejecuta esas consultas (los
+constructores de ``lib.queries`` con ``PAGE_DEFAULTS``) y las combinaciones
+de filtros habituales, con paralelismo acotado, y deja los resultados en
+``QUERY_CACHE``: en la memoria de este proceso y en ``QUERY_CACHE_DIR``, que
+comparten todos los procesos de la app.
+
+- Combinaciones de filtros: sin filtro, cada uno de los ``top_values``
+  valores con más mensajes según el catálogo de dimensiones
+  (``BQ_CATALOG_TABLE``; sin catálogo, sólo sin filtro) y las de
+  ``CACHE_WARM_FILTERS = {dimensión = [[valor, ...], ...]}``.
+- Un resultado que sigue en caché al menos ``refresh_within_s`` segundos no
+  se repite; los que caducan antes se vuelven a consultar, para que una
+  pasada periódica no deje huecos entre una y otra.
+- Las consultas que superan el presupuesto de su página (``block``) se
+  omiten: la página pide confirmación antes de gastar ese coste.
+- Se registran en la telemetría con la página ``cache_warmer``;
+  ``telemetry.warm_hit_rates`` mide qué parte de lo que abren las páginas
+  estaba precalentado y se sirvió de la caché.  Cada pasada se anota en
+  ``CACHE_WARM_LOG_PATH`` (JSONL).
+
+Desde ``apps/`` (con los mismos ``.streamlit/secrets.toml`` que la app)::
+
+    python -m lib.cache_warmer                   # una pasada, p. ej. al terminar la carga de datos
+    python -m lib.cache_warmer --every-min 30    # periódica
+    python -m lib.cache_warmer --on-refresh      # cuando cambia BQ_TABLE (o BQ_SUMMARY_TABLE)
+    python -m lib.cache_warmer --report          # tasas de acierto del precalentado
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+import streamlit as st
+
+from .bq import (
+    distinct_values,
+    estimate_query_cost,
+    expire_cached_result,
+    get_default_dates,
+    get_dim_catalog,
+    query_telemetry,
+    refresh_data_watermark,
+    run_query_df,
+)
+from .cost_guard import format_bytes
+from .queries import (
+    PAGE_DEFAULTS,
+    calado_anomalo_query,
+    cambios_direccion_query,
+    correlation_query,
+    eslora_manga_query,
+    estado_frecuente_semanal_query,
+    incoherencias_estado_query,
+    resumen_estado_query,
+    variabilidad_query,
+    velocidad_dia_semana_query,
+    velocidades_inusuales_query,
+)
+from .telemetry import WARM_PAGE, warm_hit_rates
+
+DEFAULT_TOP_VALUES = 3
+DEFAULT_MAX_WORKERS = 4
+# Opciones de los filtros de las páginas (distinct_values)
+FILTER_COLUMNS = ("VesselTypeName", "VesselTypeClass", "NavStatusName", "MMSI")
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class WarmView:
+    """Consulta con la que abre una página: ``build(start, end, selección)``."""
+
+    page: str  # página de run_page_query
+    name: str  # consulta dentro de la página ("main" si sólo hay una)
+    dimension: Optional[str]  # filtro multiselección de la página, o None
+    build: Callable
+
+
+def _d(page, option):
+    return PAGE_DEFAULTS[page][option]
+
+
+VIEWS = [
+    WarmView("calado_anomalo", "main", "VesselTypeName", lambda s, e, f: calado_anomalo_query(
+        s, e, f, _d("calado_anomalo", "z_min"), _d("calado_anomalo", "limit"))),
+    # Sin MMSI ni bounding box
+    WarmView("cambios_direccion", "main", None, lambda s, e, f: cambios_direccion_query(
+        s, e, [], _d("cambios_direccion", "max_dt"), _d("cambios_direccion", "min_delta"), "",
+        _d("cambios_direccion", "limit"))),
+    WarmView("correlacion", "main", "VesselTypeName", lambda s, e, f: correlation_query(
+        s, e, f, "SOG", "Draft", _d("correlacion", "min_n"))),
+    WarmView("eslora_manga", "main", "VesselTypeClass", lambda s, e, f: eslora_manga_query(
+        s, e, f, _d("eslora_manga", "min_n"))),
+    WarmView("resumen_estado", "resumen", "NavStatusName", lambda s, e, f: resumen_estado_query(s, e, f)),
+    WarmView("resumen_estado", "incoherencias", None, lambda s, e, f: incoherencias_estado_query(
+        s, e, _d("resumen_estado", "sog_thr"), _d("resumen_estado", "limit"))),
+    WarmView("variabilidad", "main", "VesselTypeName", lambda s, e, f: variabilidad_query(
+        s, e, f, _d("variabilidad", "min_n"))),
+    WarmView("velocidades_inusuales", "main", "VesselTypeName", lambda s, e, f: velocidades_inusuales_query(
+        s, e, f, _d("velocidades_inusuales", "percentile"), _d("velocidades_inusuales", "limit"))),
+    # Sin fechas: todo el histórico
+    WarmView("velocidad_dia_semana", "main", "VesselTypeName", lambda s, e, f: velocidad_dia_semana_query(f)),
+    WarmView("estado_semanal", "main", "VesselTypeName", lambda s, e, f: estado_frecuente_semanal_query(f)),
+]
+
+
+def _log_path():
+    return st.secrets.get("CACHE_WARM_LOG_PATH",
+                          os.getenv("CACHE_WARM_LOG_PATH", "/tmp/ais_dashboard_cache/cache_warm.jsonl"))
+
+
+def filter_selections(dimension, top_values=DEFAULT_TOP_VALUES, filters=None):
+    """Selecciones habituales de ``dimension``: ninguna, sus valores más frecuentes y las configuradas."""
+    selections = [[]]
+    catalog = get_dim_catalog()
+    if top_values and catalog is not None and catalog.has(dimension):
+        top = catalog.values(dimension).nlargest(top_values, "n")["value"].tolist()
+        selections += [[v] for v in top]
+    for selection in (filters or {}).get(dimension, []):
+        if list(selection) not in selections:
+            selections.append(list(selection))
+    return selections
+
+
+def plan_views(start, end, top_values=DEFAULT_TOP_VALUES, filters=None):
+    """Consultas a precalentar: ``[(vista, selección, consulta)]``."""
+    selections = {None: [[]]}
+    plan = []
+    for view in VIEWS:
+        if view.dimension not in selections:
+            selections[view.dimension] = filter_selections(view.dimension, top_values, filters)
+        for selection in selections[view.dimension]:
+            plan.append((view, selection, view.build(start, end, selection)))
+    return plan
+
+
+def _warm_one(view, selection, query, refresh_within_s):
+    """Deja en caché una vista; devuelve su entrada del informe (``status`` warmed/cached/skipped/error)."""
+    entry = {"page": view.page, "query": view.name, "filters": selection}
+    started = time.perf_counter()
+    try:
+        # Lo que ya está en caché también pasa por run_query_df (sin coste): queda en la telemetría
+        # como precalentado y se sube a la memoria de este proceso
+        fresh = expire_cached_result(query, refresh_within_s)
+        estimate = None if fresh else estimate_query_cost(query, page=view.page)
+        if estimate is not None and estimate.status == "block":
+            return {**entry, "status": "skipped", "detail": estimate.message()}
+        job_stats = {}
+        df = run_query_df(query, page=WARM_PAGE, session=WARM_PAGE, job_stats=job_stats,
+                          estimated_bytes=estimate.bytes if estimate else None)
+    except Exception as e:  # noqa: BLE001 - una vista fallida no detiene la pasada
+        logger.warning("No se pudo precalentar %s/%s %s: %s", view.page, view.name, selection, e)
+        return {**entry, "status": "error", "detail": f"{type(e).__name__}: {e}"[:300]}
+    return {
+        **entry,
+        "status": "cached" if fresh else "warmed",
+        "ms": round((time.perf_counter() - started) * 1000, 1),
+        "rows": len(df),
+        "bytes_processed": job_stats.get("bytes_processed"),
+    }
+
+
+def warm_query_cache(start=None, end=None, top_values=DEFAULT_TOP_VALUES, filters=None,
+                     max_workers=DEFAULT_MAX_WORKERS, refresh_within_s=0.0, trigger="manual"):
+    """Una pasada de precalentado (ver el docstring del módulo); devuelve su informe.
+
+    Sin ``start``/``end``, el periodo por defecto de las páginas.  Como
+    mucho ``max_workers`` consultas a la vez.  El informe también se añade a
+    ``CACHE_WARM_LOG_PATH``.
+    """
+    started = time.time()
+    data_changed = refresh_data_watermark(force=True)
+    if start is None or end is None:
+        start, end = get_default_dates()
+    options = {}
+    for column in FILTER_COLUMNS:
+        try:
+            options[column] = len(distinct_values(column))
+        except Exception as e:  # noqa: BLE001
+            logger.warning("No se pudieron precalentar las opciones de %s: %s", column, e)
+            options[column] = None
+    plan = plan_views(start, end, top_values, filters)
+    with ThreadPoolExecutor(max_workers=max(1, int(max_workers)), thread_name_prefix="cache_warmer") as pool:
+        views = list(pool.map(lambda item: _warm_one(*item, refresh_within_s), plan))
+    counts = {s: sum(v["status"] == s for v in views) for s in ("warmed", "cached", "skipped", "error")}
+    report = {
+        "started": started,
+        "seconds": round(time.time() - started, 1),
+        "trigger": trigger,
+        "data_changed": data_changed,
+        "start_date": str(start),
+        "end_date": str(end),
+        "views": len(views),
+        **counts,
+        "bytes_processed": sum(v.get("bytes_processed") or 0 for v in views),
+        "filter_options": options,
+        "detail": views,
+    }
+    _append_log(report)
+    return report
+
+
+def _append_log(report):
+    path = _log_path()
+    if not path:
+        return
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(report, ensure_ascii=False, default=str) + "\n")
+    except OSError as e:
+        logger.warning("No se pudo escribir el informe de precalentado en %s (%s)", path, e)
+
+
+def last_warm_report():
+    """Informe de la última pasada (de cualquier proceso), o ``None``."""
+    path = _log_path()
+    try:
+        with open(path, encoding="utf-8") as f:
+            lines = [line for line in f if line.strip()]
+    except (OSError, TypeError):
+        return None
+    for line in reversed(lines):
+        try:
+            return json.loads(line)
+        except ValueError:
+            continue  # línea a medio escribir
+    return None
+
+
+def describe(report):
+    """Resumen de una línea de un informe de ``warm_query_cache``."""
+    return (
+        f"{report['start_date']}..{report['end_date']} · {report['views']} vistas: "
+        f"{report['warmed']} precalentadas, {report['cached']} ya en caché, "
+        f"{report['skipped']} omitidas por presupuesto, {report['error']} con error · "
+        f"procesado {format_bytes(report['bytes_processed'])} · {report['seconds']} s"
+    )
+
+
+def run_scheduled(every_s=None, on_refresh=False, check_s=300.0, **warm_kwargs):
+    """Una pasada ahora y luego cada ``every_s`` y/o cuando cambian los datos (comprobado cada ``check_s``)."""
+    report = warm_query_cache(trigger="start", **warm_kwargs)
+    print(f"[cache_warmer] {describe(report)}", flush=True)
+    last = time.monotonic()
+    sleep_s = min(check_s, every_s) if on_refresh and every_s else every_s or check_s
+    while True:
+        time.sleep(sleep_s)
+        trigger = "schedule" if every_s and time.monotonic() - last >= every_s else None
+        if trigger is None and on_refresh and refresh_data_watermark(force=True):
+            trigger = "refresh"
+        if trigger is None:
+            continue
+        report = warm_query_cache(trigger=trigger, **warm_kwargs)
+        last = time.monotonic()
+        print(f"[cache_warmer] ({trigger}) {describe(report)}", flush=True)
+
+
+def print_hit_rates(since):
+    rates = warm_hit_rates(query_telemetry(since=since))
+    if rates.empty:
+        print("Sin consultas de páginas en el periodo.")
+        return
+    print(f"{'página':<24}{'abiertas':>9}{'precal.':>9}{'aciertos':>9}{'cobertura':>10}{'acierto':>9}")
+    for r in rates.itertuples():
+        rate = f"{r.warm_hit_rate:.0%}" if r.warmed else "—"
+        print(f"{r.page[:23]:<24}{r.opened:>9}{r.warmed:>9}{r.warm_hits:>9}{r.coverage:>10.0%}{rate:>9}")
+    opened, warmed, hits = rates["opened"].sum(), rates["warmed"].sum(), rates["warm_hits"].sum()
+    print(f"Total: {warmed}/{opened} vistas precalentadas ({warmed / opened:.0%}), "
+          f"{hits} servidas desde la caché ({hits / warmed if warmed else 0:.0%}).")
+
+
+def main():
+    p = argparse.ArgumentParser(description="Precalienta la caché de resultados con las vistas por defecto de las páginas.")
+    p.add_argument("--every-min", type=float, default=None, help="Repetir cada N minutos.")
+    p.add_argument("--on-refresh", action="store_true", help="Repetir cuando cambian las tablas de datos.")
+    p.add_argument("--check-min", type=float, default=5.0, help="Cada cuánto se comprueban las tablas (--on-refresh).")
+    p.add_argument("--refresh-within-min", type=float, default=None,
+                   help="Renovar resultados que caducan antes de N minutos (por defecto, el intervalo entre pasadas).")
+    p.add_argument("--top-values", type=int, default=int(st.secrets.get("CACHE_WARM_TOP_VALUES", DEFAULT_TOP_VALUES)),
+                   help="Valores más frecuentes de cada filtro que se precalientan por separado.")
+    p.add_argument("--max-workers", type=int, default=int(st.secrets.get("CACHE_WARM_MAX_WORKERS", DEFAULT_MAX_WORKERS)),
+                   help="Consultas simultáneas como máximo.")
+    p.add_argument("--report", action="store_true", help="Sólo mostrar las tasas de acierto del precalentado.")
+    p.add_argument("--since-h", type=float, default=24.0, help="Periodo de telemetría de --report (horas).")
+    a = p.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    if a.report:
+        last = last_warm_report()
+        if last:
+            print(f"Última pasada ({time.strftime('%Y-%m-%d %H:%M', time.localtime(last['started']))}): {describe(last)}")
+        print_hit_rates(time.time() - a.since_h * 3600)
+        return
+
+    every_s = a.every_min * 60 if a.every_min else None
+    check_s = a.check_min * 60
+    if a.refresh_within_min is not None:
+        refresh_within_s = a.refresh_within_min * 60
+    else:
+        refresh_within_s = every_s or (check_s if a.on_refresh else 0.0)
+    warm_kwargs = {
+        "top_values": a.top_values,
+        "filters": {k: list(v) for k, v in dict(st.secrets.get("CACHE_WARM_FILTERS", {})).items()},
+        "max_workers": a.max_workers,
+        "refresh_within_s": refresh_within_s,
+    }
+    if every_s or a.on_refresh:
+        run_scheduled(every_s, a.on_refresh, check_s, **warm_kwargs)
+    else:
+        print(f"[cache_warmer] {describe(warm_query_cache(**warm_kwargs))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""Pre-execution cost guard for the dashboard queries.
+
+Before a page query runs, ``bq.estimate_query_cost`` dry-runs it (free in
+BigQuery) and ``CostGuard.evaluate`` compares the bytes it would process
+against the page's budget:
+
+- ``ok``: below ``warn_ratio`` of the budget.
+- ``warn``: between ``warn_ratio`` and the budget; the page runs and shows
+  a warning.
+- ``block``: over the budget; the page asks for confirmation and suggests
+  how many days fit in the budget.
+
+When the query has ``@start_date``/``@end_date``, a second dry-run over a
+single day checks that the date filter actually prunes partitions (if one
+day costs as much as the whole range, narrowing it will not help); the two
+dry-runs give the fixed and per-day cost used to suggest a range that fits.
+
+``CostLedger`` keeps the estimate of every executed query next to the bytes
+actually processed and billed, for the cost panel on the home page.
+
+No Streamlit/BigQuery imports: ``bq.py`` and ``ui.py`` wire it.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional
+
+DEFAULT_BUDGET_GB = 20.0
+DEFAULT_WARN_RATIO = 0.5
+# One day scanning at least this share of the whole range means no pruning
+_NO_PRUNING_RATIO = 0.9
+
+
+def format_bytes(n: Optional[float]) -> str:
+    if n is None:
+        return "—"
+    for unit in ("B", "KB", "MB", "GB", "TB"):
+        if abs(n) < 1024 or unit == "TB":
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024.0
+    return f"{n:.1f} TB"
+
+
+@dataclass
+class CostEstimate:
+    page: str
+    bytes: int
+    budget_bytes: int
+    status: str = "ok"
+    days: Optional[int] = None
+    one_day_bytes: Optional[int] = None
+
+    @property
+    def prunes(self) -> Optional[bool]:
+        """Whether narrowing the date range reduces the bytes (``None`` if unknown)."""
+        if self.one_day_bytes is None or not self.days or self.days < 2:
+            return None
+        return self.one_day_bytes < _NO_PRUNING_RATIO * self.bytes
+
+    @property
+    def suggested_days(self) -> Optional[int]:
+        """Days that fit in the budget, from a fixed + per-day cost fitted on the two dry-runs."""
+        if not self.prunes or self.one_day_bytes > self.budget_bytes:
+            return None
+        per_day = (self.bytes - self.one_day_bytes) / (self.days - 1)
+        return min(self.days, 1 + int((self.budget_bytes - self.one_day_bytes) // per_day))
+
+    def message(self) -> str:
+        text = (
+            f"La consulta procesaría {format_bytes(self.bytes)} "
+            f"(presupuesto de la página: {format_bytes(self.budget_bytes)})."
+        )
+        if self.status == "ok":
+            return text
+        if self.days is None:
+            return text + " La consulta no filtra por fechas: usa la tabla resumen (BQ_SUMMARY_TABLE)."
+        if self.prunes is False:
+            return text + (
+                " Con un solo día se leerían casi los mismos bytes: acotar el rango no ayuda (la tabla no está"
+                " particionada por fecha o sus particiones son más gruesas); usa la tabla resumen"
+                " (BQ_SUMMARY_TABLE) o reduce otros filtros."
+            )
+        if self.one_day_bytes is not None and self.one_day_bytes > self.budget_bytes:
+            return text + f" Un solo día ya procesaría {format_bytes(self.one_day_bytes)}."
+        if self.suggested_days is not None and self.suggested_days < self.days:
+            return text + f" Reduce el rango de {self.days} a unos {self.suggested_days} días."
+        return text
+
+
+class CostGuard:
+    """Per-page byte budgets (``budgets_gb`` overrides ``default_budget_gb``)."""
+
+    def __init__(
+        self,
+        default_budget_gb: float = DEFAULT_BUDGET_GB,
+        budgets_gb: Optional[Dict[str, float]] = None,
+        warn_ratio: float = DEFAULT_WARN_RATIO,
+    ):
+        self.default_budget_gb = float(default_budget_gb)
+        self.budgets_gb = {k: float(v) for k, v in (budgets_gb or {}).items()}
+        self.warn_ratio = float(warn_ratio)
+
+    def budget_bytes(self, page: str) -> int:
+        return int(self.budgets_gb.get(page, self.default_budget_gb) * 2**30)
+
+    def evaluate(
+        self,
+        page: str,
+        total_bytes: int,
+        days: Optional[int] = None,
+        one_day_bytes: Optional[int] = None,
+    ) -> CostEstimate:
+        budget = self.budget_bytes(page)
+        est = CostEstimate(page=page, bytes=int(total_bytes), budget_bytes=budget, days=days,
+                           one_day_bytes=None if one_day_bytes is None else int(one_day_bytes))
+        if total_bytes > budget:
+            est.status = "block"
+        elif total_bytes > self.warn_ratio * budget:
+            est.status = "warn"
+        return est
+
+
+@dataclass
+class LedgerEntry:
+    ts: float
+    page: Optional[str]
+    query: str
+    estimated_bytes: Optional[int]
+    bytes_processed: Optional[int]
+    bytes_billed: Optional[int]
+    source: str  # backend | bq_cache | app_cache
+
+
+class CostLedger:
+    """Last ``maxlen`` executed queries with estimated vs. actual bytes."""
+
+    def __init__(self, maxlen: int = 500):
+        self._entries: "deque[LedgerEntry]" = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def record(self, query: str, page: Optional[str] = None, estimated_bytes: Optional[int] = None,
+               job_stats: Optional[Dict[str, Any]] = None) -> LedgerEntry:
+        stats = job_stats or {}
+        if not stats:
+            source = "app_cache"
+        elif stats.get("cache_hit"):
+            source = "bq_cache"
+        else:
+            source = "backend"
+        entry = LedgerEntry(
+            ts=time.time(),
+            page=page,
+            query=query,
+            estimated_bytes=estimated_bytes,
+            bytes_processed=stats.get("bytes_processed", 0 if source == "app_cache" else None),
+            bytes_billed=stats.get("bytes_billed", 0 if source == "app_cache" else None),
+            source=source,
+        )
+        with self._lock:
+            self._entries.append(entry)
+        return entry
+
+    def rows(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [asdict(e) for e in reversed(self._entries)]
+
+    def totals(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "queries": len(self._entries),
+                "estimated_bytes": sum(e.estimated_bytes or 0 for e in self._entries),
+                "bytes_billed": sum(e.bytes_billed or 0 for e in self._entries),
+            }
@@ -0,0 +1,217 @@
+"""Viewport reads over the density tile pyramid.
+
+``src/pipeline/tiles/density_tiles.py`` writes message counts per Web
+Mercator cell, zoom level, time bucket and ``VesselTypeClass`` to
+``<root>/z<z>/<YYYY-MM>.parquet`` plus a ``_manifest.json``.
+``DensityTiles`` answers "counts in this bounding box" from it:
+
+1. ``zoom_for_bbox`` picks the finest level at which the box spans at most
+   ``max_tiles`` tiles, so a whole coast and a single port both read a
+   bounded number of cells (``max_tiles * bins**2`` at most).
+2. ``load_cells`` opens only the month files that overlap the date range and
+   filters on the tile ranges of the box: the files are sorted by tile
+   (Z-order) in small row groups, so the Parquet reader skips the row groups
+   of other tiles using their min/max statistics.
+3. The matching rows are summed per cell over the buckets (and classes,
+   unless ``by_class``) and returned with the cell centre.
+
+No message-level data is read and no query is billed.  A box crossing the
+antimeridian (``lon_min > lon_max``) reads both sides.
+
+No Streamlit/BigQuery imports: ``bq.py`` builds it from ``DENSITY_TILES_PATH``.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import os
+import threading
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .lazy import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+pa = lazy_import("pyarrow")
+pc = lazy_import("pyarrow.compute")
+ds = lazy_import("pyarrow.dataset")
+
+DEFAULT_MAX_TILES = 16
+MANIFEST = "_manifest.json"
+# Web Mercator latitude limit and equatorial circumference (m)
+MAX_LAT = 85.0511287798066
+EARTH_CIRCUMFERENCE_M = 40_075_016.686
+
+BBox = Tuple[float, float, float, float]  # lon_min, lat_min, lon_max, lat_max
+
+
+def _tile_x(lon: float, zoom: int) -> int:
+    side = 2 ** zoom
+    return min(max(int(math.floor((lon + 180.0) / 360.0 * side)), 0), side - 1)
+
+
+def _tile_y(lat: float, zoom: int) -> int:
+    side = 2 ** zoom
+    phi = math.radians(min(max(lat, -MAX_LAT), MAX_LAT))
+    y = (1.0 - math.log(math.tan(phi) + 1.0 / math.cos(phi)) / math.pi) / 2.0 * side
+    return min(max(int(math.floor(y)), 0), side - 1)
+
+
+def tile_ranges(bbox: BBox, zoom: int) -> List[Tuple[int, int, int, int]]:
+    """``(x0, x1, y0, y1)`` tile ranges (inclusive) covering ``bbox`` at ``zoom``."""
+    lon_min, lat_min, lon_max, lat_max = bbox
+    y0, y1 = _tile_y(max(lat_min, lat_max), zoom), _tile_y(min(lat_min, lat_max), zoom)
+    if lon_min <= lon_max:
+        return [(_tile_x(lon_min, zoom), _tile_x(lon_max, zoom), y0, y1)]
+    return [(_tile_x(lon_min, zoom), 2 ** zoom - 1, y0, y1), (0, _tile_x(lon_max, zoom), y0, y1)]
+
+
+def tile_count(bbox: BBox, zoom: int) -> int:
+    return sum((x1 - x0 + 1) * (y1 - y0 + 1) for x0, x1, y0, y1 in tile_ranges(bbox, zoom))
+
+
+def cell_size_m(lat, zoom: int, bins: int):
+    """Width in metres of a cell of level ``zoom`` at latitude ``lat``."""
+    return EARTH_CIRCUMFERENCE_M * np.cos(np.radians(lat)) / (2 ** zoom * bins)
+
+
+class DensityTiles:
+    """Tile pyramid under ``root`` (reloads the manifest when it changes).
+
+    Parameters
+    ----------
+    root : str
+        Output directory of ``density_tiles.py``.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self._lock = threading.Lock()
+        self._mtime: Optional[float] = None
+        self._manifest: Dict = {}
+
+    @property
+    def manifest(self) -> Dict:
+        self.load()
+        return self._manifest
+
+    def load(self) -> bool:
+        """(Re)read the manifest if it changed; returns True if a pyramid is available."""
+        if not self.root:
+            return False
+        path = os.path.join(self.root, MANIFEST)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return False
+        with self._lock:
+            if mtime != self._mtime:
+                try:
+                    with open(path) as f:
+                        self._manifest = json.load(f)
+                except (OSError, ValueError):
+                    return False
+                self._mtime = mtime
+            return bool(self._manifest.get("months"))
+
+    @property
+    def classes(self) -> List[str]:
+        return list(self.manifest.get("classes", []))
+
+    def date_range(self) -> Tuple[Optional[date], Optional[date]]:
+        m = self.manifest
+        first, last = m.get("first_bucket"), m.get("last_bucket")
+        return (datetime.fromisoformat(first).date() if first else None,
+                datetime.fromisoformat(last).date() if last else None)
+
+    def zoom_for_bbox(self, bbox: BBox, max_tiles: int = DEFAULT_MAX_TILES) -> int:
+        """Finest available level at which ``bbox`` spans at most ``max_tiles`` tiles."""
+        m = self.manifest
+        zoom = m.get("min_zoom", 0)
+        for z in range(m.get("min_zoom", 0), m.get("max_zoom", 0) + 1):
+            if tile_count(bbox, z) > max_tiles:
+                break
+            zoom = z
+        return zoom
+
+    def _files(self, zoom: int, start: Optional[date], end: Optional[date]) -> List[str]:
+        first = start.strftime("%Y-%m") if start else ""
+        last = end.strftime("%Y-%m") if end else "9999-99"
+        months = [ym for ym in self.manifest.get("months", []) if first <= ym <= last]
+        paths = [os.path.join(self.root, f"z{zoom}", f"{ym}.parquet") for ym in months]
+        return [p for p in paths if os.path.exists(p)]
+
+    def load_cells(self, bbox: BBox, zoom: Optional[int] = None, start: Optional[date] = None,
+                   end: Optional[date] = None, classes: Optional[Sequence[str]] = None,
+                   by_class: bool = False, max_tiles: int = DEFAULT_MAX_TILES) -> pd.DataFrame:
+        """Message counts per cell inside ``bbox``.
+
+        Parameters
+        ----------
+        bbox : tuple of float
+            ``(lon_min, lat_min, lon_max, lat_max)`` of the viewport.
+        zoom : int, optional
+            Pyramid level; by default ``zoom_for_bbox(bbox, max_tiles)``.
+        start, end : datetime.date, optional
+            Buckets to add up (both days included).
+        classes : sequence of str, optional
+            ``VesselTypeClass`` values to count (all by default).
+        by_class : bool, optional
+            Keep one row per cell and class instead of adding the classes.
+
+        Returns
+        -------
+        pandas.DataFrame
+            ``lat``, ``lon`` (cell centre), ``n`` (+ ``VesselTypeClass``),
+            with ``zoom`` and ``bins`` in ``attrs``.
+        """
+        if not self.load():
+            raise FileNotFoundError(f"No hay pirámide de densidad en {self.root!r}")
+        m = self._manifest
+        bins = int(m["bins"])
+        if zoom is None:
+            zoom = self.zoom_for_bbox(bbox, max_tiles)
+        zoom = min(max(int(zoom), m["min_zoom"]), m["max_zoom"])
+        keys = ["tile_x", "tile_y", "cell_x", "cell_y"] + (["VesselTypeClass"] if by_class else [])
+        df = pd.DataFrame({"lat": np.empty(0), "lon": np.empty(0), "n": np.empty(0, np.int64)})
+        files = self._files(zoom, start, end)
+        if files:
+            table = ds.dataset(files, format="parquet").to_table(
+                columns=keys + ["n"], filter=self._filter(bbox, zoom, start, end, classes)
+            )
+            # Same cell in several buckets/months (and classes): one row
+            cells = table.group_by(keys, use_threads=False).aggregate([("n", "sum")])
+            side = float(2 ** zoom * bins)
+            gx = cells["tile_x"].to_numpy().astype(np.int64) * bins + cells["cell_x"].to_numpy()
+            gy = cells["tile_y"].to_numpy().astype(np.int64) * bins + cells["cell_y"].to_numpy()
+            df = pd.DataFrame({
+                "lat": np.degrees(np.arctan(np.sinh(np.pi * (1.0 - 2.0 * (gy + 0.5) / side)))),
+                "lon": (gx + 0.5) / side * 360.0 - 180.0,
+                "n": cells["n_sum"].to_numpy().astype(np.int64),
+            })
+            if by_class:
+                df["VesselTypeClass"] = cells["VesselTypeClass"].to_pandas().astype("category")
+        elif by_class:
+            df["VesselTypeClass"] = pd.Categorical([])
+        df.attrs.update(zoom=zoom, bins=bins, tiles=tile_count(bbox, zoom))
+        return df
+
+    @staticmethod
+    def _filter(bbox: BBox, zoom: int, start: Optional[date], end: Optional[date],
+                classes: Optional[Sequence[str]]) -> pc.Expression:
+        x, y = pc.field("tile_x"), pc.field("tile_y")
+        spatial = None
+        for x0, x1, y0, y1 in tile_ranges(bbox, zoom):
+            term = (x >= x0) & (x <= x1) & (y >= y0) & (y <= y1)
+            spatial = term if spatial is None else spatial | term
+        expr = spatial
+        if start is not None:
+            expr &= pc.field("bucket") >= pa.scalar(datetime.combine(start, datetime.min.time()), pa.timestamp("us"))
+        if end is not None:
+            expr &= pc.field("bucket") < pa.scalar(datetime.combine(end + timedelta(days=1), datetime.min.time()),
+                                                   pa.timestamp("us"))
+        if classes is not None:
+            expr &= pc.field("VesselTypeClass").isin(pa.array(list(classes), pa.string()))
+        return expr
@@ -0,0 +1,216 @@
+"""Local snapshot of the dimension catalog and search index for the filters.
+
+The table manager keeps ``ais_dim_catalog_daily`` (distinct values of MMSI,
+VesselName, CallSign, IMO, VesselTypeName, VesselTypeClass and NavStatusName
+per day, refreshed incrementally).  ``apps/sql/dim_catalog.sql`` folds it to
+one row per ``(dimension, value)`` with its message count, first/last day
+seen and, for MMSI, the latest vessel attributes.
+
+``DimensionCatalog`` stores that result as an Arrow file tagged with the
+``modified`` time of the catalog table, so every session and process loads
+the filter options from disk instead of scanning the message table; it is
+only re-downloaded when the table changes.  ``SearchIndex`` answers
+typeahead queries over one dimension: prefix search by binary search over
+sorted keys and substring search through a trigram index, ranked by prefix
+match first and then by message count.
+
+No Streamlit/BigQuery imports: ``bq.py`` syncs it via ``run_query_df``.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import unicodedata
+from typing import Dict, Optional, Sequence
+
+from .lazy import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+pa = lazy_import("pyarrow")
+feather = lazy_import("pyarrow.feather")
+
+CATALOG_DIMENSIONS = ("MMSI", "VesselName", "CallSign", "IMO", "VesselTypeName", "VesselTypeClass", "NavStatusName")
+ENTITY_ATTRIBUTES = ("VesselName", "CallSign", "IMO", "VesselTypeName")
+MAX_KEY_CHARS = 64
+_WATERMARK_KEY = b"catalog_watermark"
+
+
+def normalize_key(text) -> str:
+    """Search key: accents stripped, lowercase, single spaces, ASCII only."""
+    decomposed = unicodedata.normalize("NFKD", str(text))
+    ascii_text = decomposed.encode("ascii", "ignore").decode("ascii")
+    return " ".join(ascii_text.lower().split())[:MAX_KEY_CHARS]
+
+
+class SearchIndex:
+    """Prefix + trigram search over the values of one dimension.
+
+    Parameters
+    ----------
+    values : sequence of str
+        Values as stored in the catalog (what the filter binds).
+    counts : sequence of int
+        Message count of each value, used for ranking.
+    aliases : sequence of str, optional
+        Extra text searched along with the value (e.g. the vessel name of an
+        MMSI), so "maersk" finds the MMSI of a Maersk vessel.
+    """
+
+    def __init__(self, values: Sequence[str], counts: Sequence[int], aliases: Optional[Sequence[str]] = None):
+        self.values = np.asarray(values, dtype=object)
+        self.counts = np.asarray(counts, dtype=np.int64)
+        texts = [normalize_key(v) for v in self.values]
+        if aliases is not None:
+            texts = [t if not a or a != a else f"{t} {normalize_key(a)}"[:MAX_KEY_CHARS]
+                     for t, a in zip(texts, aliases)]
+        self.keys = np.array(texts, dtype=f"S{max([len(t) for t in texts] + [1])}")
+        # Ranking order without query: most frequent first
+        self._by_count = np.argsort(-self.counts, kind="stable")
+        # Prefix search over the value keys only (not the aliases)
+        value_keys = np.array([normalize_key(v) for v in self.values], dtype=self.keys.dtype)
+        self._prefix_order = np.argsort(value_keys, kind="stable")
+        self._prefix_sorted = value_keys[self._prefix_order]
+        self._build_trigrams()
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def _build_trigrams(self) -> None:
+        n = len(self.keys)
+        width = self.keys.dtype.itemsize
+        if n == 0 or width < 3:
+            self._tri_codes = np.empty(0, dtype=np.int64)
+            self._tri_rows = np.empty(0, dtype=np.int64)
+            return
+        m = self.keys.view(np.uint8).reshape(n, width).astype(np.int64)
+        codes = (m[:, :-2] << 16) | (m[:, 1:-1] << 8) | m[:, 2:]
+        valid = (m[:, :-2] > 0) & (m[:, 1:-1] > 0) & (m[:, 2:] > 0)
+        rows = np.broadcast_to(np.arange(n, dtype=np.int64)[:, None], codes.shape)
+        # One posting per (trigram, row), sorted by trigram then row
+        packed = np.unique((codes[valid] << 32) | rows[valid])
+        self._tri_codes = packed >> 32
+        self._tri_rows = packed & 0xFFFFFFFF
+
+    def _postings(self, gram: bytes) -> np.ndarray:
+        code = (gram[0] << 16) | (gram[1] << 8) | gram[2]
+        lo, hi = np.searchsorted(self._tri_codes, [code, code + 1])
+        return self._tri_rows[lo:hi]
+
+    def _prefix_rows(self, q: bytes) -> np.ndarray:
+        lo = np.searchsorted(self._prefix_sorted, q, side="left")
+        hi = np.searchsorted(self._prefix_sorted, q + b"\x7f", side="right")
+        return self._prefix_order[lo:hi]
+
+    def _substring_rows(self, q: bytes) -> np.ndarray:
+        if len(q) < 3:
+            return np.empty(0, dtype=np.int64)
+        grams = sorted({q[i:i + 3] for i in range(len(q) - 2)}, key=lambda g: len(self._postings(g)))
+        rows = self._postings(grams[0])
+        for gram in grams[1:]:
+            if not len(rows):
+                break
+            rows = np.intersect1d(rows, self._postings(gram), assume_unique=True)
+        if len(grams) > 1 and len(rows):
+            # Trigrams in any order: confirm the full substring
+            rows = rows[np.char.find(self.keys[rows], q) >= 0]
+        return rows
+
+    def search(self, query: str, limit: int = 50) -> np.ndarray:
+        """Row positions matching ``query``, best first (prefix, then count)."""
+        q = normalize_key(query).encode("ascii")
+        if not q:
+            return self._by_count[:limit]
+        prefix = self._prefix_rows(q)
+        substring = np.setdiff1d(self._substring_rows(q), prefix, assume_unique=True)
+        ranked = []
+        for rows in (prefix, substring):
+            if len(rows):
+                ranked.append(rows[np.argsort(-self.counts[rows], kind="stable")])
+        if not ranked:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(ranked)[:limit]
+
+
+class DimensionCatalog:
+    """Arrow snapshot of ``dim_catalog.sql`` shared by every session of the process."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.RLock()
+        self._mtime: Optional[float] = None
+        self._watermark = ""
+        self._frames: Dict[str, pd.DataFrame] = {}
+        self._indexes: Dict[str, SearchIndex] = {}
+
+    @property
+    def watermark(self) -> str:
+        self.load()
+        return self._watermark
+
+    def load(self) -> bool:
+        """(Re)load the snapshot if the file changed; returns True if one is available."""
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return False
+        with self._lock:
+            if mtime == self._mtime:
+                return True
+            try:
+                table = feather.read_table(self.path, memory_map=False)
+            except (OSError, pa.ArrowInvalid):
+                return False
+            meta = table.schema.metadata or {}
+            df = table.to_pandas()
+            self._frames = {
+                dim: part.drop(columns="dimension").sort_values("value", kind="stable").reset_index(drop=True)
+                for dim, part in df.groupby("dimension", sort=False)
+            }
+            self._indexes = {}
+            self._watermark = meta.get(_WATERMARK_KEY, b"").decode()
+            self._mtime = mtime
+            return True
+
+    def save(self, df: pd.DataFrame, watermark: str) -> None:
+        """Replace the snapshot atomically (other processes pick it up on ``load``)."""
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), _WATERMARK_KEY: str(watermark)})
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        feather.write_feather(table, tmp, compression="lz4")
+        os.replace(tmp, self.path)
+        self.load()
+
+    def has(self, dimension: str) -> bool:
+        return self.load() and dimension in self._frames
+
+    def values(self, dimension: str) -> pd.DataFrame:
+        """``value, n, first_seen, last_seen`` (+ attributes) sorted by value."""
+        self.load()
+        return self._frames.get(dimension, pd.DataFrame(columns=["value", "n", "first_seen", "last_seen"]))
+
+    def index(self, dimension: str) -> SearchIndex:
+        self.load()
+        with self._lock:
+            idx = self._indexes.get(dimension)
+            if idx is None:
+                frame = self.values(dimension)
+                aliases = frame["VesselName"].tolist() if dimension == "MMSI" and "VesselName" in frame else None
+                idx = SearchIndex(frame["value"].tolist(), frame["n"].fillna(0).astype("int64").tolist(), aliases)
+                self._indexes[dimension] = idx
+            return idx
+
+    def search(self, dimension: str, query: str, limit: int = 50) -> pd.DataFrame:
+        rows = self.index(dimension).search(query, limit)
+        return self.values(dimension).iloc[rows].reset_index(drop=True)
+
+    def describe(self, dimension: str, values: Sequence[str]) -> Dict[str, str]:
+        """Display label per value (``MMSI · VesselName`` for vessels)."""
+        frame = self.values(dimension)
+        if dimension != "MMSI" or "VesselName" not in frame or not len(values):
+            return {v: str(v) for v in values}
+        names = frame.set_index("value")["VesselName"].reindex(list(values))
+        return {v: (f"{v} · {name}" if isinstance(name, str) and name else str(v)) for v, name in names.items()}
+
@@ -0,0 +1,93 @@
+"""Compact pandas frames for query results.
+
+Query results used to reach the pages with default pandas dtypes: one Python
+``str`` object per cell for MMSI, ``geohash9``, VesselTypeName,
+NavStatusName, ``dow``... and float64 metrics.  With tens of analysts on one
+Streamlit server, those frames (held by the result cache, by every session
+and by ``st.dataframe``'s Arrow serialization) are what grows the RSS.
+
+``to_frame`` converts an Arrow result (what both backends produce) to
+pandas compactly:
+
+- String columns with few distinct values (at most ``category_ratio`` of
+  the rows) are dictionary-encoded and arrive as ``category``.  The rest
+  stay Arrow-backed strings (``pd.StringDtype("pyarrow")``): no Python
+  object per cell.
+- float64 metrics become float32; coordinates (``FLOAT64_COLUMNS``) keep
+  float64.  INT64 and BOOL arrive as nullable ``Int64``/``boolean``.
+- Blocks are not consolidated and the Arrow buffers are released while
+  converting, so the peak is about one copy of the result.
+
+Both string dtypes go back to Arrow without copying the text
+(``to_arrow``, used by the disk cache; ``st.dataframe`` serializes the same
+way) and plotly takes them as is.
+
+No Streamlit/BigQuery imports.
+"""
+
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import Dict, Iterable, Optional
+
+from .lazy import lazy_import
+
+pd = lazy_import("pandas")
+pa = lazy_import("pyarrow")
+pc = lazy_import("pyarrow.compute")
+
+DEFAULT_CATEGORY_RATIO = 0.5
+# Coordinates lose ~1 m in float32: keep them in float64
+FLOAT64_COLUMNS = frozenset({"LAT", "LON", "lat", "lon", "latitude", "longitude", "min_lat", "max_lat",
+                             "min_lon", "max_lon"})
+
+
+@lru_cache(maxsize=None)
+def _pandas_types() -> Dict:
+    """Nullable INT64/BOOL as masked arrays (as the BigQuery REST path returned them), not float64/object."""
+    return {
+        pa.string(): pd.StringDtype("pyarrow"),
+        pa.large_string(): pd.StringDtype("pyarrow"),
+        pa.int64(): pd.Int64Dtype(),
+        pa.bool_(): pd.BooleanDtype(),
+    }
+
+
+def compact_arrow(table: pa.Table, category_ratio: float = DEFAULT_CATEGORY_RATIO,
+                  float64_columns: Iterable[str] = FLOAT64_COLUMNS) -> pa.Table:
+    """Dictionary-encode low-cardinality strings and narrow float64 metrics."""
+    keep = set(float64_columns)
+    columns = []
+    for field, column in zip(table.schema, table.columns):
+        t = field.type
+        if (pa.types.is_string(t) or pa.types.is_large_string(t)) and len(column):
+            if pc.count_distinct(column).as_py() <= category_ratio * len(column):
+                column = column.dictionary_encode()
+        elif pa.types.is_float64(t) and field.name not in keep:
+            column = column.cast(pa.float32())
+        columns.append(column)
+    return pa.table(columns, names=table.column_names)
+
+
+def arrow_to_pandas(table: pa.Table) -> pd.DataFrame:
+    """pandas view of an Arrow table keeping its compact types (strings stay in Arrow)."""
+    return table.to_pandas(types_mapper=_pandas_types().get, split_blocks=True, self_destruct=True)
+
+
+def to_frame(table: pa.Table, category_ratio: float = DEFAULT_CATEGORY_RATIO) -> pd.DataFrame:
+    """Compact DataFrame of a query result (see the module docstring)."""
+    df = arrow_to_pandas(compact_arrow(table, category_ratio))
+    for name in df.columns[df.dtypes == "category"]:
+        # Categories in value order (dictionaries come in order of appearance), so sorting stays alphabetical
+        df[name] = df[name].cat.reorder_categories(df[name].cat.categories.sort_values())
+    return df
+
+
+def to_arrow(df: pd.DataFrame) -> pa.Table:
+    """Arrow table of a frame (Arrow-backed strings and categories are not copied)."""
+    return pa.Table.from_pandas(df)
+
+
+def memory_bytes(df: Optional[pd.DataFrame]) -> int:
+    """Bytes held by a frame, strings included."""
+    return 0 if df is None else int(df.memory_usage(index=True, deep=True).sum())
@@ -0,0 +1,140 @@
+"""Geohash prefix covers for bounding boxes.
+
+A bounding box is covered by a small set of geohash cells; the cells become
+range predicates on the clustered ``geohash9`` column, which BigQuery can use
+to prune blocks (``LAT``/``LON`` ranges cannot).  Pure Python, no Streamlit or
+BigQuery imports, so the pipeline benchmarks can reuse it.
+"""
+
+from __future__ import annotations
+
+import math
+from typing import List, Optional, Tuple
+
+from .lazy import lazy_import
+
+geohash = lazy_import("geohash")
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+MAX_PRECISION = 9
+DEFAULT_MAX_CELLS = 32
+
+
+def cell_size(precision: int) -> Tuple[float, float]:
+    """Return ``(lat_degrees, lon_degrees)`` of a geohash cell."""
+    bits = 5 * precision
+    return 180.0 / 2 ** (bits // 2), 360.0 / 2 ** ((bits + 1) // 2)
+
+
+def _index_range(lo: float, hi: float, origin: float, step: float, n: int) -> range:
+    first = max(0, int(math.floor((lo - origin) / step)))
+    last = min(n - 1, int(math.floor((hi - origin) / step)))
+    return range(first, last + 1)
+
+
+def _grid(lat_min, lat_max, lon_min, lon_max, precision):
+    dlat, dlon = cell_size(precision)
+    rows = _index_range(lat_min, lat_max, -90.0, dlat, round(180.0 / dlat))
+    cols = _index_range(lon_min, lon_max, -180.0, dlon, round(360.0 / dlon))
+    return rows, cols, dlat, dlon
+
+
+def _merge_siblings(cells: set) -> set:
+    """Replace every complete set of 32 siblings by their parent, repeatedly."""
+    while True:
+        parents = {}
+        for c in cells:
+            if len(c) > 1:
+                parents.setdefault(c[:-1], []).append(c)
+        full = [p for p, kids in parents.items() if len(kids) == 32]
+        if not full:
+            return cells
+        for p in full:
+            cells.difference_update(parents[p])
+            cells.add(p)
+
+
+def _cover(lat_min, lat_max, lon_min, lon_max, max_cells, max_precision) -> List[str]:
+    precision = 1
+    for p in range(1, max_precision + 1):
+        rows, cols, _, _ = _grid(lat_min, lat_max, lon_min, lon_max, p)
+        if len(rows) * len(cols) > max_cells:
+            break
+        precision = p
+    rows, cols, dlat, dlon = _grid(lat_min, lat_max, lon_min, lon_max, precision)
+    cells = {
+        geohash.encode(-90.0 + (r + 0.5) * dlat, -180.0 + (c + 0.5) * dlon, precision)
+        for r in rows
+        for c in cols
+    }
+    return sorted(_merge_siblings(cells))
+
+
+def bbox_geohash_cover(
+    lat_min: float,
+    lat_max: float,
+    lon_min: float,
+    lon_max: float,
+    max_cells: int = DEFAULT_MAX_CELLS,
+    max_precision: int = MAX_PRECISION,
+) -> List[str]:
+    """Compute geohash prefixes whose union covers a bounding box.
+
+    The precision is chosen adaptively: the finest precision (up to
+    ``max_precision``) at which the box needs at most ``max_cells`` cells.
+    Complete sibling groups are then collapsed into their parent.  A box with
+    ``lon_min > lon_max`` is treated as crossing the antimeridian.
+
+    Returns
+    -------
+    list[str]
+        Sorted prefixes; every point inside the box has a geohash that starts
+        with one of them.
+    """
+    lat_min, lat_max = sorted((max(-90.0, lat_min), min(90.0, lat_max)))
+    if lon_min > lon_max:
+        half = max(1, max_cells // 2)
+        return sorted(
+            set(_cover(lat_min, lat_max, lon_min, 180.0, half, max_precision))
+            | set(_cover(lat_min, lat_max, -180.0, lon_max, half, max_precision))
+        )
+    return _cover(lat_min, lat_max, lon_min, lon_max, max_cells, max_precision)
+
+
+def prefix_successor(prefix: str) -> Optional[str]:
+    """Smallest string greater than every string starting with ``prefix``.
+
+    Returns ``None`` when there is none (``prefix`` is all ``z``).
+    """
+    chars = list(prefix)
+    while chars:
+        i = BASE32.index(chars[-1])
+        if i < len(BASE32) - 1:
+            chars[-1] = BASE32[i + 1]
+            return "".join(chars)
+        chars.pop()
+    return None
+
+
+def prefix_ranges(prefixes: List[str]) -> List[Tuple[str, Optional[str]]]:
+    """Turn prefixes into half-open ``[lo, hi)`` ranges, merging adjacent ones."""
+    ranges: List[Tuple[str, Optional[str]]] = []
+    for p in sorted(prefixes):
+        hi = prefix_successor(p)
+        if ranges and ranges[-1][1] is not None and ranges[-1][1] >= p:
+            lo, prev_hi = ranges[-1]
+            ranges[-1] = (lo, None if hi is None else max(prev_hi, hi))
+        else:
+            ranges.append((p, hi))
+    return ranges
+
+
+def geohash_range_predicate(prefixes: List[str], column: str = "geohash9") -> str:
+    """SQL predicate ``(col >= lo AND col < hi OR ...)`` for a prefix cover."""
+    terms = []
+    for lo, hi in prefix_ranges(prefixes):
+        if hi is None:
+            terms.append(f"{column} >= '{lo}'")
+        else:
+            terms.append(f"({column} >= '{lo}' AND {column} < '{hi}')")
+    return "(" + " OR ".join(terms) + ")" if terms else "FALSE"
@@ -0,0 +1,103 @@
+"""Deferred imports and process-wide objects, for a faster cold start.
+
+Every page imports ``lib.bq``/``lib.ui`` before drawing anything, so the
+heavy dependencies of ``apps/lib`` (pandas, numpy, pyarrow, plotly, pydeck,
+google-cloud-bigquery, duckdb...) and the objects ``bq.py`` builds (result
+cache, backend, catalog...) used to delay the first render of a fresh
+process by several seconds.
+
+- ``lazy_import(name)`` returns a stand-in for module ``name`` that imports
+  it on first attribute access (``pd.DataFrame``): a page draws its header
+  and widgets before its first query pulls in pandas or the BigQuery client.
+  Only ``import x as y``-style bindings can be deferred; annotations stay
+  unevaluated thanks to ``from __future__ import annotations``.
+- ``lazy_object(name, factory)`` does the same for a process-wide object:
+  ``factory()`` runs on first use (method call or attribute read).
+
+Both are thread-safe (Streamlit sessions are threads) and record how long
+each deferred load took (``load_times``), for the startup profile of
+``src/pipeline/benchmarks/bench_app_startup.py``.
+
+No Streamlit/BigQuery imports: used by every module of ``apps/lib``.
+"""
+
+from __future__ import annotations
+
+import importlib
+import importlib.util
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+_UNSET = object()
+_loads: List[Dict[str, Any]] = []
+_loads_lock = threading.Lock()
+
+
+class _Deferred:
+    """Forwards attribute access to the target, built by ``factory`` on first use."""
+
+    __slots__ = ("_name", "_kind", "_factory", "_target", "_lock")
+
+    def __init__(self, name: str, kind: str, factory: Callable[[], Any]):
+        self._name = name
+        self._kind = kind
+        self._factory = factory
+        self._target = _UNSET
+        self._lock = threading.RLock()
+
+    def _load(self) -> Any:
+        target = self._target
+        if target is _UNSET:
+            with self._lock:
+                if self._target is _UNSET:
+                    # Several modules defer the same import: only the first one pays (and is recorded)
+                    fresh = self._kind == "object" or self._name not in sys.modules
+                    started = time.perf_counter()
+                    self._target = self._factory()
+                    if fresh:
+                        _record(self._name, self._kind, time.perf_counter() - started)
+                target = self._target
+        return target
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._load(), attr)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self._target is not _UNSET else "deferred"
+        return f"<{self._kind} {self._name!r} ({state})>"
+
+
+def _record(name: str, kind: str, seconds: float) -> None:
+    with _loads_lock:
+        _loads.append({"name": name, "kind": kind, "seconds": seconds, "ts": time.time()})
+
+
+def lazy_import(name: str, optional: bool = False) -> Any:
+    """Module ``name``, imported on first attribute access.
+
+    An already imported module is returned as is.  With ``optional``,
+    ``None`` if the module is not installed (checked without importing it).
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    if optional:
+        try:
+            if importlib.util.find_spec(name) is None:
+                return None
+        except ImportError:  # parent package missing
+            return None
+    return _Deferred(name, "module", lambda: importlib.import_module(name))
+
+
+def lazy_object(name: str, factory: Callable[[], Any]) -> Any:
+    """Process-wide object built by ``factory()`` on first use."""
+    return _Deferred(name, "object", factory)
+
+
+def load_times(since: Optional[float] = None) -> List[Dict[str, Any]]:
+    """Deferred loads (``name``, ``kind`` module/object, ``seconds``, ``ts``), oldest first."""
+    with _loads_lock:
+        return [dict(e) for e in _loads if since is None or e["ts"] >= since]
@@ -0,0 +1,259 @@
+"""Incremental date ranges from mergeable per-day partial aggregates.
+
+The correlation, variability, nav-status summary and draft z-score pages
+used to recompute the whole range whenever it moved by a day.  Their SQL
+(``apps/sql``) now returns *partial* statistics per ``day`` and group
+instead of the final answer: counts, sums, centred second moments (sums of
+squared deviations and co-deviations from the day's mean), min/max and, for
+distinct counts, the distinct values of the day.  Those merge exactly across
+days, so:
+
+1. ``bq.py`` caches the partials of every day separately (family
+   ``partial`` of the query cache, keyed by the query, its filters and the
+   day) and queries only the days that are missing, one query per run of
+   consecutive missing days (``date_runs``).  Widening a range by a day
+   scans one day.
+2. ``merge_partials`` combines the cached days per group (``sum``, ``min``,
+   ``max`` or ``distinct``; second moments with the pairwise update of Chan
+   et al., which avoids the cancellation of raw sums of squares).
+3. The ``finalize`` step of each ``PartialAggregate`` computes the means,
+   sample standard deviations, Pearson correlation and z-scores locally,
+   and applies the options that do not change the partials (``min_n``,
+   ``z_min``, ``limit``) without any query.
+
+No Streamlit/BigQuery imports: ``queries.py`` builds the ``IncrementalQuery``
+objects and ``bq.py`` runs them.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+from .lazy import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+DAY_COLUMN = "day"
+MERGE_OPS = ("sum", "min", "max", "distinct")
+
+
+@dataclass(frozen=True)
+class PartialAggregate:
+    """How the per-day partials of one query family merge and finalize.
+
+    Attributes
+    ----------
+    name : str
+        Family name (part of the cache key and of the cost ledger entry).
+    keys : tuple of str
+        Group columns of the partials (besides ``day``).
+    merge : dict
+        ``{column: "sum" | "min" | "max" | "distinct"}``; ``distinct``
+        columns hold the distinct values of the day and merge to the number
+        of distinct values over the range.
+    finalize : callable
+        ``finalize(merged, options)`` -> result frame.
+    moments : dict, optional
+        ``{column: (count, sum_a, sum_b)}`` for ``sum`` columns holding the
+        day's centred second moment of ``a`` and ``b`` (``b == a`` for a
+        variance); merging adds the spread between the day means.
+    """
+
+    name: str
+    keys: Tuple[str, ...]
+    merge: Dict[str, str]
+    finalize: Callable[[pd.DataFrame, Dict[str, Any]], pd.DataFrame]
+    moments: Dict[str, Tuple[str, str, str]] = field(default_factory=dict)
+
+
+@dataclass
+class IncrementalQuery:
+    """A page query answered from per-day partials.
+
+    Attributes
+    ----------
+    aggregate : PartialAggregate
+        Merge/finalize rules.
+    partial : callable
+        ``partial(start, end)`` -> ``BoundQuery`` of the partials of those days.
+    start_date, end_date : datetime.date
+        Range of the page (both included).
+    options : dict
+        Finalize options (``min_n``, ``z_min``, ``limit``...).
+    """
+
+    aggregate: PartialAggregate
+    partial: Callable[[date, date], Any]
+    start_date: date
+    end_date: date
+    options: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def name(self) -> str:
+        return self.aggregate.name
+
+    def days(self) -> List[date]:
+        n = (self.end_date - self.start_date).days + 1
+        return [self.start_date + timedelta(days=i) for i in range(max(n, 0))]
+
+    def finalize(self, parts: Sequence[pd.DataFrame]) -> pd.DataFrame:
+        """Result for the whole range from the partials of its days."""
+        return self.aggregate.finalize(merge_partials(parts, self.aggregate), self.options)
+
+
+def date_runs(days: Sequence[date]) -> List[Tuple[date, date]]:
+    """Runs of consecutive days as ``(first, last)`` pairs."""
+    runs: List[Tuple[date, date]] = []
+    for d in sorted(set(days)):
+        if runs and d - runs[-1][1] == timedelta(days=1):
+            runs[-1] = (runs[-1][0], d)
+        else:
+            runs.append((d, d))
+    return runs
+
+
+def split_days(df: pd.DataFrame, days: Sequence[date]) -> Dict[date, pd.DataFrame]:
+    """Partials of each of ``days`` (empty frames for days without rows)."""
+    day_values = pd.to_datetime(df[DAY_COLUMN]).dt.date if len(df) else pd.Series([], dtype=object)
+    out = {d: df.iloc[0:0] for d in days}
+    for d, idx in day_values.groupby(day_values, sort=False).groups.items():
+        out[d] = df.loc[idx].reset_index(drop=True)
+    return out
+
+
+def merge_partials(parts: Sequence[pd.DataFrame], aggregate: PartialAggregate) -> pd.DataFrame:
+    """One row per group of ``aggregate.keys`` with the partials merged over all days."""
+    keys = list(aggregate.keys)
+    columns = keys + list(aggregate.merge)
+    parts = [p for p in parts if len(p)]
+    if not parts:
+        return pd.DataFrame({c: pd.Series(dtype=object if c in keys else "float64") for c in columns})
+    # Per-day frames may carry different categories: merge on plain values
+    df = pd.concat([p[columns].astype({k: object for k in keys}) for p in parts], ignore_index=True)
+    if aggregate.moments:
+        df = _shift_moments(df, keys, aggregate.moments)
+    simple = {c: op for c, op in aggregate.merge.items() if op != "distinct"}
+    grouped = df.groupby(keys, dropna=False, sort=False)
+    merged = grouped.agg(simple) if simple else grouped.size().to_frame("_rows").drop(columns="_rows")
+    for column in (c for c, op in aggregate.merge.items() if op == "distinct"):
+        exploded = df[keys + [column]].explode(column)
+        merged[column] = exploded.groupby(keys, dropna=False, sort=False)[column].nunique()
+    return merged.reset_index()[columns]
+
+
+def _shift_moments(df: pd.DataFrame, keys: List[str], moments: Dict[str, Tuple[str, str, str]]) -> pd.DataFrame:
+    """Add ``n_i * (mean_a_i - mean_a) * (mean_b_i - mean_b)`` to each day's moment (Chan et al.).
+
+    Summing the shifted moments of a group gives its moment about the mean of
+    the whole range.
+    """
+    df = df.copy()
+    grouped = df.groupby(keys, dropna=False, sort=False)
+    for column, (count, a, b) in moments.items():
+        n = df[count].to_numpy(dtype="float64")
+        total_n = grouped[count].transform("sum").to_numpy(dtype="float64")
+        da = _ratio(df[a], n) - _ratio(grouped[a].transform("sum"), total_n)
+        db = _ratio(df[b], n) - _ratio(grouped[b].transform("sum"), total_n)
+        df[column] = df[column].to_numpy(dtype="float64") + np.nan_to_num(n * da * db)
+    return df
+
+
+def _ratio(num, den):
+    num = np.asarray(num, dtype="float64")
+    den = np.asarray(den, dtype="float64")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(den > 0, num / den, np.nan)
+
+
+def _sample_sd(n, m2):
+    """Sample standard deviation from count and centred second moment (NaN below 2 values)."""
+    var = _ratio(m2, np.asarray(n, dtype="float64") - 1)
+    return np.sqrt(np.clip(var, 0.0, None))
+
+
+def finalize_correlation(m: pd.DataFrame, options: Dict[str, Any]) -> pd.DataFrame:
+    """``VesselTypeName, n, corr_pearson`` (``n >= min_n``), by ``|corr|`` descending."""
+    n = m["n"].to_numpy(dtype="float64")
+    vx = np.clip(m["m2_x"].to_numpy(dtype="float64"), 0, None)
+    vy = np.clip(m["m2_y"].to_numpy(dtype="float64"), 0, None)
+    corr = np.clip(_ratio(m["c_xy"], np.sqrt(vx * vy)), -1.0, 1.0)
+    out = pd.DataFrame({"VesselTypeName": m["VesselTypeName"], "n": n.astype("int64"), "corr_pearson": corr})
+    out = out[out["n"] >= int(options.get("min_n") or 0)]
+    return out.sort_values("corr_pearson", key=np.abs, ascending=False, na_position="last").reset_index(drop=True)
+
+
+def finalize_variability(m: pd.DataFrame, options: Dict[str, Any]) -> pd.DataFrame:
+    """``VesselTypeName, n, sd_sog, sd_cog, avg_sog, avg_cog`` (``n >= min_n``), by ``sd_sog`` descending."""
+    n = m["n"].to_numpy(dtype="float64")
+    out = pd.DataFrame({
+        "VesselTypeName": m["VesselTypeName"],
+        "n": n.astype("int64"),
+        "sd_sog": _sample_sd(n, m["m2_sog"]),
+        "sd_cog": _sample_sd(n, m["m2_cog"]),
+        "avg_sog": _ratio(m["sum_sog"], n),
+        "avg_cog": _ratio(m["sum_cog"], n),
+    })
+    out = out[out["n"] >= int(options.get("min_n") or 0)]
+    return out.sort_values("sd_sog", ascending=False, na_position="last").reset_index(drop=True)
+
+
+def finalize_nav_status(m: pd.DataFrame, options: Dict[str, Any]) -> pd.DataFrame:
+    """``NavStatusName, total_messages, unique_vessels, avg_sog, avg_draft`` by messages descending."""
+    out = pd.DataFrame({
+        "NavStatusName": m["NavStatusName"],
+        "total_messages": m["total_messages"].to_numpy(dtype="float64").astype("int64"),
+        "unique_vessels": m["mmsis"].to_numpy(dtype="float64").astype("int64"),
+        "avg_sog": _ratio(m["sum_sog"], m["n_sog"]),
+        "avg_draft": _ratio(m["sum_draft"], m["n_draft"]),
+    })
+    return out.sort_values("total_messages", ascending=False).reset_index(drop=True)
+
+
+def finalize_draft_zscore(m: pd.DataFrame, options: Dict[str, Any]) -> pd.DataFrame:
+    """Vessels whose average draft is ``z_min`` or more sample deviations from their type's mean."""
+    per_vessel = pd.DataFrame({
+        "VesselTypeName": m["VesselTypeName"],
+        "MMSI": m["MMSI"],
+        "avg_draft": _ratio(m["sum_draft"], m["n_draft"]),
+        "min_draft": m["min_draft"].to_numpy(dtype="float64"),
+        "max_draft": m["max_draft"].to_numpy(dtype="float64"),
+    })
+    # Vessels without type do not join any type's statistics (as NULL keys in SQL)
+    per_vessel = per_vessel[per_vessel["VesselTypeName"].notna()]
+    stats = per_vessel.groupby("VesselTypeName")["avg_draft"].agg(mu="mean", sd="std")
+    out = per_vessel.join(stats, on="VesselTypeName")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out["z"] = (out["avg_draft"] - out["mu"]).abs() / out["sd"]
+    out = out[(out["sd"] > 0) & (out["z"] >= float(options.get("z_min") or 0.0))]
+    out = out.sort_values("z", ascending=False)
+    if options.get("limit") is not None:
+        out = out.head(int(options["limit"]))
+    return out.reset_index(drop=True)
+
+
+CORRELATION = PartialAggregate(
+    "corr_sog_draft", ("VesselTypeName",),
+    {"n": "sum", "sum_x": "sum", "sum_y": "sum", "m2_x": "sum", "m2_y": "sum", "c_xy": "sum"},
+    finalize_correlation,
+    moments={"m2_x": ("n", "sum_x", "sum_x"), "m2_y": ("n", "sum_y", "sum_y"), "c_xy": ("n", "sum_x", "sum_y")},
+)
+VARIABILITY = PartialAggregate(
+    "variabilidad_vel_rumbo", ("VesselTypeName",),
+    {"n": "sum", "sum_sog": "sum", "m2_sog": "sum", "sum_cog": "sum", "m2_cog": "sum"},
+    finalize_variability,
+    moments={"m2_sog": ("n", "sum_sog", "sum_sog"), "m2_cog": ("n", "sum_cog", "sum_cog")},
+)
+NAV_STATUS = PartialAggregate(
+    "resumen_estado", ("NavStatusName",),
+    {"total_messages": "sum", "mmsis": "distinct", "n_sog": "sum", "sum_sog": "sum", "n_draft": "sum",
+     "sum_draft": "sum"},
+    finalize_nav_status,
+)
+DRAFT_ZSCORE = PartialAggregate(
+    "calado_anomalo", ("VesselTypeName", "MMSI"),
+    {"n_draft": "sum", "sum_draft": "sum", "min_draft": "min", "max_draft": "max"},
+    finalize_draft_zscore,
+)
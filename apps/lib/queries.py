@@ -2,321 +2,169 @@ from .query_utils import (
     get_table_name,
     build_date_filter,
     build_vessel_filter,
-    build_mmsi_filter,
-    get_model_dataset
+    get_model_dataset,
+    get_summary_table_name,
 )
+from .partial_aggregates import CORRELATION, DRAFT_ZSCORE, NAV_STATUS, VARIABILITY, IncrementalQuery
+from .sql_templates import BoundQuery, bind
 
+DEFAULT_LIMIT = 100
+# Valores iniciales de los controles de cada página (clave = página de
+# run_page_query).  Los comparten las páginas y lib.cache_warmer, que
+# precalienta exactamente la vista con la que se abre cada una.
+PAGE_DEFAULTS = {
+    "calado_anomalo": {"z_min": 2.0, "limit": DEFAULT_LIMIT},
+    "cambios_direccion": {"max_dt": 10, "min_delta": 45.0, "limit": DEFAULT_LIMIT},
+    "correlacion": {"min_n": 100},
+    "eslora_manga": {"min_n": 100},
+    "resumen_estado": {"sog_thr": 2.0, "limit": DEFAULT_LIMIT},
+    "variabilidad": {"min_n": 100},
+    "velocidades_inusuales": {"percentile": 95, "limit": DEFAULT_LIMIT},
+}
 
-def calado_anomalo_query(start_date, end_date, vessel_types, z_min, limit):
-    table = get_table_name()
-    date_filter = build_date_filter(start_date, end_date)
-    vessel_filter = build_vessel_filter(vessel_types)
 
-    return f"""
-    WITH per_vessel AS (
-    SELECT
-    VesselTypeName AS vt,
-    MMSI,
-    AVG(CAST(Draft AS FLOAT64)) AS avg_draft
-    FROM `{table}`
-    WHERE Draft IS NOT NULL
-    {date_filter}
-    {vessel_filter}
-    GROUP BY vt, MMSI
-    ),
-    stats AS (
-    SELECT
-    vt,
-    AVG(avg_draft) AS mu,
-    STDDEV_SAMP(avg_draft) AS sd
-    FROM per_vessel
-    GROUP BY vt
+def _incremental(aggregate, start_date, end_date, identifiers, filters, **options):
+    """``IncrementalQuery`` over the per-day partials of ``aggregate`` (template of the same name)."""
+    def partial(start, end):
+        return bind(aggregate.name, identifiers=identifiers, start_date=start, end_date=end, **filters)
+
+    values = {p.name: getattr(p, "value", None) for p in partial(start_date, end_date).params}  # coerced dates
+    return IncrementalQuery(aggregate, partial, values["start_date"], values["end_date"], options)
+
+
+def calado_anomalo_query(start_date, end_date, vessel_types, z_min, limit):
+    """Generate calado anómalo query (per-day partials per vessel; ``z_min`` and ``limit`` are applied locally)"""
+    return _incremental(
+        DRAFT_ZSCORE, start_date, end_date, {"TABLE": get_table_name()}, {"vessel_types": vessel_types},
+        z_min=z_min, limit=limit,
     )
-    SELECT
-    p.vt AS VesselTypeName,
-    p.MMSI,
-    p.avg_draft,
-    s.mu,
-    s.sd,
-    ABS(p.avg_draft - s.mu) / NULLIF(s.sd, 0) AS z
-    FROM per_vessel p
-    JOIN stats s USING (vt)
-    WHERE s.sd > 0
-    AND ABS(p.avg_draft - s.mu) / s.sd >= {z_min}
-    ORDER BY z DESC
-    LIMIT {limit}
-    """
 
 
 def cambios_direccion_query(
-    start_date, end_date, mmsi_list, min_delta, bbox_filter, limit
+    start_date, end_date, mmsi_list, max_dt, min_delta, bbox_filter, limit
 ):
-    """Generate cambios de dirección query using geohash"""
-    table = get_table_name()
-    date_filter = build_date_filter(start_date, end_date)
-    mmsi_filter = build_mmsi_filter(mmsi_list)
+    """Generate cambios de dirección query using geohash.
 
-    return f"""
-    SELECT 
-      MMSI,
-      BaseDateTime,
-      geohash9,
-      COG,
-      LAG(COG) OVER (PARTITION BY MMSI ORDER BY BaseDateTime) AS prev_cog,
-      ABS(COG - LAG(COG) OVER (PARTITION BY MMSI ORDER BY BaseDateTime)) AS delta_cog
-    FROM `{table}`
-    WHERE COG IS NOT NULL
-      AND geohash9 IS NOT NULL
-    {date_filter}
-    {mmsi_filter}
-    {bbox_filter}
-    QUALIFY ABS(COG - LAG(COG) OVER (PARTITION BY MMSI ORDER BY BaseDateTime)) >= {min_delta}
-    ORDER BY delta_cog DESC
-    LIMIT {limit}
+    Only consecutive messages at most ``max_dt`` minutes apart are compared;
+    ``min_delta`` is the smallest heading change in degrees (wrapped, so
+    350° -> 10° is 20°).  ``bbox_filter`` is an ``AND ...`` fragment; use
+    ``build_geohash_bbox_filter`` so the clustered ``geohash9`` column prunes
+    the scan.
     """
+    return bind(
+        "cambios_direccion",
+        identifiers={"TABLE": get_table_name()},
+        fragments={"BBOX_FILTER": bbox_filter},
+        start_date=start_date, end_date=end_date, mmsi=mmsi_list, max_dt_min=max_dt, min_delta=min_delta,
+        limit=limit,
+    )
 
 
 def correlation_query(start_date, end_date, vessel_types, col1, col2, min_n):
-    """Generate correlation query"""
-    table = get_table_name()
-    date_filter = build_date_filter(start_date, end_date)
-    vessel_filter = build_vessel_filter(vessel_types)
-
-    return f"""
-    WITH data AS (
-    SELECT 
-      VesselTypeName,
-      CAST({col1} AS FLOAT64) AS x,
-      CAST({col2} AS FLOAT64) AS y
-    FROM `{table}`
-    WHERE {col1} IS NOT NULL 
-      AND {col2} IS NOT NULL
-    {date_filter}
-    {vessel_filter}
+    """Generate correlation query (per-day partials; ``min_n`` is applied locally)"""
+    return _incremental(
+        CORRELATION, start_date, end_date, {"TABLE": get_table_name(), "COL1": col1, "COL2": col2},
+        {"vessel_types": vessel_types}, min_n=min_n,
     )
-    SELECT 
-      VesselTypeName,
-      COUNT(*) AS n,
-      CORR(x, y) AS corr_pearson
-    FROM data
-    GROUP BY VesselTypeName
-    HAVING COUNT(*) >= {min_n}
-    ORDER BY ABS(corr_pearson) DESC
-    """
 
 
 def location_query(
-    start_date, end_date, vessel_types, mmsi_list, limit, additional_columns=""
+    start_date, end_date, vessel_types, mmsi_list, limit, additional_columns="",
+    bbox_filter=""
 ):
-    """Generate generic location query with geohash"""
-    table = get_table_name()
-    date_filter = build_date_filter(start_date, end_date)
-    vessel_filter = build_vessel_filter(vessel_types)
-    mmsi_filter = build_mmsi_filter(mmsi_list)
+    """Generate generic location query with geohash.
 
-    return f"""
-    SELECT 
-      MMSI,
-      BaseDateTime,
-      geohash9,
-      VesselTypeName
-      {additional_columns}
-    FROM `{table}`
-    WHERE geohash9 IS NOT NULL
-    {date_filter}
-    {vessel_filter}
-    {mmsi_filter}
-    ORDER BY BaseDateTime DESC
-    LIMIT {limit}
+    ``bbox_filter`` is an ``AND ...`` fragment, normally from
+    ``build_geohash_bbox_filter`` so the clustered ``geohash9`` column prunes
+    the scan.
     """
+    return bind(
+        "ubicaciones",
+        identifiers={"TABLE": get_table_name()},
+        fragments={"ADDITIONAL_COLUMNS": additional_columns, "BBOX_FILTER": bbox_filter},
+        start_date=start_date, end_date=end_date, vessel_types=vessel_types, mmsi=mmsi_list, limit=limit,
+    )
+
+
 def eslora_manga_query(start_date, end_date, classes, min_n):
     """Generate eslora-manga correlation query"""
-    table = get_table_name()
-    date_filter = build_date_filter(start_date, end_date)
-    
-    class_filter = ""
-    if classes:
-        class_list = "', '".join(classes)
-        class_filter = f"AND VesselTypeClass IN ('{class_list}')"
-    
-    return f"""
-    WITH data AS (
-    SELECT 
-      VesselTypeClass,
-      CAST(Length AS FLOAT64) AS length,
-      CAST(Width AS FLOAT64) AS width
-    FROM `{table}`
-    WHERE Length IS NOT NULL 
-      AND Width IS NOT NULL
-    {date_filter}
-    {class_filter}
+    return bind(
+        "eslora_manga",
+        identifiers={"TABLE": get_table_name()},
+        start_date=start_date, end_date=end_date, classes=classes, min_n=min_n,
     )
-    SELECT 
-      VesselTypeClass,
-      COUNT(*) AS n,
-      CORR(length, width) AS corr_len_width
-    FROM data
-    GROUP BY VesselTypeClass
-    HAVING COUNT(*) >= {min_n}
-    ORDER BY ABS(corr_len_width) DESC
-    """
+
 
 def resumen_estado_query(start_date, end_date, nav_status):
-    """Generate resumen estado query"""
-    table = get_table_name()
-    date_filter = build_date_filter(start_date, end_date)
-    
-    status_filter = ""
-    if nav_status:
-        status_list = "', '".join(nav_status)
-        status_filter = f"AND NavStatusName IN ('{status_list}')"
-    
-    return f"""
-    SELECT 
-      NavStatusName,
-      COUNT(*) AS total_messages,
-      COUNT(DISTINCT MMSI) AS unique_vessels,
-      AVG(CAST(SOG AS FLOAT64)) AS avg_sog,
-      AVG(CAST(Draft AS FLOAT64)) AS avg_draft
-    FROM `{table}`
-    WHERE NavStatusName IS NOT NULL
-    {date_filter}
-    {status_filter}
-    GROUP BY NavStatusName
-    ORDER BY total_messages DESC
-    """
+    """Generate resumen estado query (summary table, or per-day partials of the message table)"""
+    summary = get_summary_table_name()
+    if summary:
+        return bind(
+            "resumen_estado_summary",
+            identifiers={"SUMMARY_TABLE": summary},
+            start_date=start_date, end_date=end_date, nav_status=nav_status,
+        )
+    return _incremental(NAV_STATUS, start_date, end_date, {"TABLE": get_table_name()}, {"nav_status": nav_status})
+
+
+def incoherencias_estado_query(start_date, end_date, sog_thr, limit):
+    """Generate incoherencias (Moored/At Anchor con SOG > umbral) query"""
+    return bind(
+        "incoherencias_estado",
+        identifiers={"TABLE": get_table_name()},
+        start_date=start_date, end_date=end_date, sog_thr=sog_thr, limit=limit,
+    )
+
 
 def variabilidad_query(start_date, end_date, vessel_types, min_n):
-    """Generate variabilidad velocidad y rumbo query"""
-    table = get_table_name()
-    date_filter = build_date_filter(start_date, end_date)
-    vessel_filter = build_vessel_filter(vessel_types)
-    
-    return f"""
-    SELECT 
-      VesselTypeName,
-      COUNT(*) AS n,
-      STDDEV(CAST(SOG AS FLOAT64)) AS sd_sog,
-      STDDEV(CAST(COG AS FLOAT64)) AS sd_cog,
-      AVG(CAST(SOG AS FLOAT64)) AS avg_sog,
-      AVG(CAST(COG AS FLOAT64)) AS avg_cog
-    FROM `{table}`
-    WHERE SOG IS NOT NULL 
-      AND COG IS NOT NULL
-    {date_filter}
-    {vessel_filter}
-    GROUP BY VesselTypeName
-    HAVING COUNT(*) >= {min_n}
-    ORDER BY sd_sog DESC
-    """
+    """Generate variabilidad velocidad y rumbo query (summary table, or per-day partials of the message table)"""
+    summary = get_summary_table_name()
+    if summary:
+        return bind(
+            "variabilidad_vel_rumbo_summary", identifiers={"SUMMARY_TABLE": summary},
+            start_date=start_date, end_date=end_date, vessel_types=vessel_types, min_n=min_n,
+        )
+    return _incremental(
+        VARIABILITY, start_date, end_date, {"TABLE": get_table_name()}, {"vessel_types": vessel_types}, min_n=min_n,
+    )
+
 
 def velocidades_inusuales_query(start_date, end_date, vessel_types, percentile, limit):
     """Generate velocidades inusuales query"""
-    table = get_table_name()
-    date_filter = build_date_filter(start_date, end_date)
-    vessel_filter = build_vessel_filter(vessel_types)
-    
-    return f"""
-    WITH vessel_stats AS (
-    SELECT 
-      MMSI,
-      VesselTypeName,
-      MAX(CAST(SOG AS FLOAT64)) AS sog_max,
-      APPROX_QUANTILES(CAST(SOG AS FLOAT64), 100)[OFFSET({percentile})] AS sog_p
-    FROM `{table}`
-    WHERE SOG IS NOT NULL
-    {date_filter}
-    {vessel_filter}
-    GROUP BY MMSI, VesselTypeName
+    return bind(
+        "velocidades_inusuales",
+        identifiers={"TABLE": get_table_name()},
+        start_date=start_date, end_date=end_date, vessel_types=vessel_types, percentile=percentile, limit=limit,
     )
-    SELECT 
-      MMSI,
-      VesselTypeName,
-      sog_max,
-      sog_p,
-      sog_max - sog_p AS exceso
-    FROM vessel_stats
-    WHERE sog_max > sog_p
-    ORDER BY exceso DESC
-    LIMIT {limit}
-    """
+
 
 def velocidad_dia_semana_query(vessel_types):
     """Generate velocidad por día de la semana query"""
-    table = get_table_name()
-    vessel_filter = build_vessel_filter(vessel_types)
-    
-    return f"""
-    WITH t AS (
-      SELECT
-        VesselTypeName,
-        FORMAT_DATE('%A', DATE(BaseDateTime)) AS dow,
-        EXTRACT(DAYOFWEEK FROM DATE(BaseDateTime)) AS dow_sun1,
-        SOG
-      FROM `{table}`
-      WHERE VesselTypeName IS NOT NULL
-      {vessel_filter}
+    summary = get_summary_table_name()
+    if summary:
+        return bind(
+            "avg_speed_deviation_day_week_vesseltypename_summary",
+            identifiers={"SUMMARY_TABLE": summary},
+            vessel_types=vessel_types,
+        )
+    return bind(
+        "avg_speed_deviation_day_week_vesseltypename",
+        identifiers={"TABLE": get_table_name()},
+        vessel_types=vessel_types,
     )
-    SELECT
-      VesselTypeName,
-      dow,
-      AVG(SOG) AS avg_sog,
-      STDDEV_SAMP(SOG) AS sd_sog,
-      COUNT(*) AS n
-    FROM t
-    GROUP BY VesselTypeName, dow, dow_sun1
-    ORDER BY
-      VesselTypeName,
-      (MOD(dow_sun1 + 5, 7) + 1)
-    """
+
 
 def estado_frecuente_semanal_query(vessel_types):
     """Generate estado más frecuente por día de la semana query"""
-    table = get_table_name()
-    vessel_filter = build_vessel_filter(vessel_types)
-    
-    return f"""
-    WITH t AS (
-      SELECT
-        VesselTypeName,
-        NavStatusName,
-        FORMAT_DATE('%A', DATE(BaseDateTime)) AS dow,
-        EXTRACT(DAYOFWEEK FROM DATE(BaseDateTime)) AS dow_sun1
-      FROM `{table}`
-      WHERE VesselTypeName IS NOT NULL AND NavStatusName IS NOT NULL
-      {vessel_filter}
-    ),
-    counts AS (
-      SELECT
-        VesselTypeName,
-        dow,
-        dow_sun1,
-        NavStatusName,
-        COUNT(*) AS c
-      FROM t
-      GROUP BY VesselTypeName, dow, dow_sun1, NavStatusName
-    ),
-    ranked AS (
-      SELECT
-        VesselTypeName,
-        dow,
-        dow_sun1,
-        NavStatusName,
-        c,
-        ROW_NUMBER() OVER (PARTITION BY VesselTypeName, dow ORDER BY c DESC) AS rn
-      FROM counts
+    # Con tabla resumen, cada fila ya trae su conteo diario (n_rows)
+    summary = get_summary_table_name()
+    source, day, weight = (summary, "date", "n_rows") if summary else (get_table_name(), "DATE(BaseDateTime)", "1")
+    return bind(
+        "most_frequent_state_by_week",
+        identifiers={"SOURCE": source},
+        fragments={"DAY": day, "WEIGHT": weight},
+        vessel_types=vessel_types,
     )
-    SELECT
-      VesselTypeName,
-      dow,
-      NavStatusName AS most_common_status,
-      c AS count
-    FROM ranked
-    WHERE rn = 1
-    ORDER BY
-      VesselTypeName,
-      (MOD(dow_sun1 + 5, 7) + 1)
-    """
 
 
 # --- Anomaly detection builders ------------------------------------------------
@@ -419,7 +267,7 @@ def anomaly_predict_query(
     freq,
     id_col,
     threshold,
-) -> str:
+) -> BoundQuery:
     """Build a query to detect anomalies using a trained model.
 
     The query constructs an evaluation dataset with the same schema as
@@ -447,12 +295,10 @@ def anomaly_predict_query(
 
     Returns
     -------
-    str
-        A SQL string that detects anomalies for the specified period.
+    BoundQuery
+        The ``anomaly_predict`` template with the dates, vessel types and
+        threshold bound as query parameters.
     """
-    table = get_table_name()
-    date_filter = build_date_filter(start_date, end_date)
-    vessel_filter = build_vessel_filter(vessel_types)
     freq_upper = freq.upper()
     if freq_upper == "HOURLY":
         ts_expr = "TIMESTAMP_TRUNC(BaseDateTime, HOUR)"
@@ -467,30 +313,18 @@ def anomaly_predict_query(
         metric_expr = "AVG(CAST(SOG AS FLOAT64))"
     else:
         raise ValueError("metric must be 'count' or 'speed'")
-    model_name = _get_model_name(metric_lower, id_col, freq_upper)
-    return f"""
-    SELECT
-      series_id,
-      ts_col,
-      value,
-      is_anomaly,
-      anomaly_probability,
-      lower_bound,
-      upper_bound
-    FROM ML.DETECT_ANOMALIES(
-      MODEL `{model_name}`,
-      STRUCT({threshold} AS anomaly_prob_threshold),
-      (
-        SELECT
-          {id_col} AS series_id,
-          {ts_expr} AS ts_col,
-          {metric_expr} AS value
-        FROM `{table}`
-        WHERE {ts_expr} IS NOT NULL
-          {date_filter}
-          {vessel_filter}
-        GROUP BY series_id, ts_col
-      )
+    return bind(
+        "anomaly_predict",
+        identifiers={
+            "MODEL": _get_model_name(metric_lower, id_col, freq_upper),
+            "TABLE": get_table_name(),
+            "ID_COL": id_col,
+        },
+        fragments={"TS_EXPR": ts_expr, "METRIC_EXPR": metric_expr},
+        start_date=start_date, end_date=end_date, vessel_types=vessel_types, threshold=threshold,
     )
-    ORDER BY anomaly_probability DESC
-    """
\ No newline at end of file
+
+
+def dim_catalog_query(catalog_table):
+    """Catálogo de valores de los filtros desde la tabla diaria del catálogo."""
+    return bind("dim_catalog", identifiers={"CATALOG_TABLE": catalog_table})
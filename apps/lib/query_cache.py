@@ -0,0 +1,393 @@
+"""Two-tier cache for query results (memory LRU + Arrow files on disk).
+
+Entries are keyed by the normalized SQL text plus its parameters and carry
+the *family* they belong to (``default``, ``distinct``, ``ml``...), which
+sets their TTL.  The memory tier holds DataFrames up to ``memory_budget_bytes``
+and evicts least-recently-used entries; the disk tier stores Arrow IPC files
+(plus a small JSON sidecar) in ``cache_dir`` so results survive app restarts
+and are shared between Streamlit sessions and processes.
+
+Each entry also records the *data watermark* current when it was written
+(e.g. the ``modified`` time of the source tables).  When the data is
+refreshed, ``set_watermark`` bumps it and every older entry becomes stale in
+both tiers; ``invalidate`` drops entries explicitly.
+
+No Streamlit/BigQuery imports: ``bq.py`` wires it to ``run_query_df``.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+from .frames import arrow_to_pandas, to_arrow
+from .lazy import lazy_import
+
+pd = lazy_import("pandas")
+pa = lazy_import("pyarrow")
+feather = lazy_import("pyarrow.feather")
+
+DEFAULT_TTLS_S: Dict[str, float] = {
+    "default": 3600.0,
+    "distinct": 6 * 3600.0,
+    "ml": 600.0,
+    "partial": 24 * 3600.0,
+}
+DEFAULT_MEMORY_BUDGET_MB = 256
+DEFAULT_DISK_BUDGET_MB = 2048
+
+_TOKEN_RE = re.compile(r"('(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|`[^`]*`)|((?:\s|--[^\n]*)+)")
+_CACHEABLE_RE = re.compile(r"^\s*(\(\s*)*(SELECT|WITH)\b", re.IGNORECASE)
+_WATERMARK_FILE = "_watermark.json"
+
+
+def normalize_sql(sql: str) -> str:
+    """Collapse whitespace and drop ``--`` comments outside quoted literals."""
+
+    def repl(m):
+        if m.group(1):
+            return m.group(1)
+        return " "
+
+    return _TOKEN_RE.sub(repl, sql).strip().rstrip(";").strip()
+
+
+def is_cacheable(sql: str) -> bool:
+    """Only plain queries are cached (never DDL/DML such as ``CREATE MODEL``)."""
+    return bool(_CACHEABLE_RE.match(normalize_sql(sql)))
+
+
+def cache_key(sql: str, params: Any = None) -> str:
+    payload = json.dumps([normalize_sql(sql), params], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _frame_bytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+@dataclass
+class _Entry:
+    df: pd.DataFrame
+    family: str
+    created: float
+    watermark: str
+    nbytes: int
+
+
+@dataclass
+class CacheStats:
+    memory_hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    expired: int = 0
+    memory_evictions: int = 0
+    disk_evictions: int = 0
+    invalidations: int = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        d = dict(self.__dict__)
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        d["hit_ratio"] = round((self.memory_hits + self.disk_hits) / lookups, 3) if lookups else None
+        return d
+
+
+class QueryCache:
+    """Process-wide result cache; safe to share between Streamlit sessions (threads)."""
+
+    def __init__(
+        self,
+        cache_dir: Optional[str] = None,
+        memory_budget_bytes: int = DEFAULT_MEMORY_BUDGET_MB * 2**20,
+        disk_budget_bytes: int = DEFAULT_DISK_BUDGET_MB * 2**20,
+        ttls_s: Optional[Dict[str, float]] = None,
+    ):
+        self.cache_dir = cache_dir
+        self.memory_budget_bytes = memory_budget_bytes
+        self.disk_budget_bytes = disk_budget_bytes
+        self.ttls_s = {**DEFAULT_TTLS_S, **(ttls_s or {})}
+        self.stats = CacheStats()
+        self._mem: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._mem_bytes = 0
+        self._lock = threading.RLock()
+        self._watermark = ""
+        self._watermark_stamp = None  # (inode, mtime, size) of the watermark file last read
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            self._watermark = self._read_disk_watermark()
+
+    # -- watermark -------------------------------------------------------------------
+
+    def _read_disk_watermark(self) -> str:
+        """Watermark in ``cache_dir``, re-read only when its file changes (written by ``os.replace``)."""
+        path = os.path.join(self.cache_dir, _WATERMARK_FILE)
+        try:
+            st = os.stat(path)
+            stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+            if stamp == self._watermark_stamp:
+                return self._watermark
+            with open(path) as f:
+                watermark = json.load(f).get("watermark", "")
+        except (OSError, ValueError):
+            self._watermark_stamp = None
+            return ""
+        self._watermark_stamp = stamp
+        return watermark
+
+    @property
+    def watermark(self) -> str:
+        if self.cache_dir:
+            with self._lock:  # the stamp and the value change together
+                self._watermark = self._read_disk_watermark()
+        return self._watermark
+
+    def set_watermark(self, watermark: str) -> bool:
+        """Record the current data version; returns True if it changed.
+
+        Entries written under a different watermark are treated as stale
+        from now on (in every process sharing ``cache_dir``).
+        """
+        watermark = str(watermark)
+        with self._lock:
+            if watermark == self.watermark:
+                return False
+            self._watermark = watermark
+            if self.cache_dir:
+                self._atomic_write_json(os.path.join(self.cache_dir, _WATERMARK_FILE), {"watermark": watermark})
+            stale = [k for k, e in self._mem.items() if e.watermark != watermark]
+            for k in stale:
+                self._drop_memory(k)
+            self.stats.invalidations += len(stale)
+            return True
+
+    # -- public API ----------------------------------------------------------------------
+
+    def ttl_for(self, family: str) -> float:
+        return self.ttls_s.get(family, self.ttls_s["default"])
+
+    def get(self, key: str, family: str = "default") -> Optional[pd.DataFrame]:
+        now = time.time()
+        ttl = self.ttl_for(family)
+        watermark = self.watermark
+        stale = False
+        with self._lock:
+            entry = self._mem.get(key)
+            if entry is not None:
+                if now - entry.created <= ttl and entry.watermark == watermark:
+                    self._mem.move_to_end(key)
+                    self.stats.memory_hits += 1
+                    # Shallow copy: callers may add/replace columns without touching the cached frame
+                    return entry.df.copy(deep=False)
+                self._drop_memory(key)
+                stale = True
+
+        # The sidecar decides freshness before the Arrow file is read
+        meta = self._read_meta(key) if self.cache_dir else None
+        if meta is not None:
+            if now - meta["created"] <= ttl and meta.get("watermark", "") == watermark:
+                entry = self._read_disk(key, meta)
+                if entry is not None:
+                    with self._lock:
+                        self._put_memory(key, entry)
+                        self.stats.disk_hits += 1
+                    return entry.df.copy(deep=False)
+            else:
+                self._remove_disk(key)
+                stale = True
+        with self._lock:
+            self.stats.expired += int(stale)
+            self.stats.misses += 1
+        return None
+
+    def contains(self, key: str, family: str = "default") -> bool:
+        """Whether ``get`` would hit, without loading the frame or counting stats."""
+        return self.expires_in(key, family) is not None
+
+    def expires_in(self, key: str, family: str = "default") -> Optional[float]:
+        """Seconds until ``key`` expires, or ``None`` if ``get`` would miss (frame not loaded)."""
+        now = time.time()
+        ttl = self.ttl_for(family)
+        watermark = self.watermark
+        with self._lock:
+            entry = self._mem.get(key)
+            if entry is not None and now - entry.created <= ttl and entry.watermark == watermark:
+                return ttl - (now - entry.created)
+        meta = self._read_meta(key) if self.cache_dir else None
+        if bool(meta) and now - meta["created"] <= ttl and meta.get("watermark", "") == watermark \
+                and os.path.exists(self._paths(key)[0]):
+            return ttl - (now - meta["created"])
+        return None
+
+    def put(self, key: str, df: pd.DataFrame, family: str = "default", sql: str = "") -> None:
+        entry = _Entry(df=df, family=family, created=time.time(), watermark=self.watermark, nbytes=_frame_bytes(df))
+        with self._lock:
+            self._put_memory(key, entry)
+        self._write_disk(key, entry, sql)
+
+    def get_or_run(
+        self, sql: str, run: Callable[[], pd.DataFrame], params: Any = None, family: str = "default"
+    ) -> pd.DataFrame:
+        """Return the cached result of ``sql``/``params`` or run and store it.
+
+        Like a hit, a miss returns a shallow copy: callers may add or replace
+        columns without touching the stored frame.
+        """
+        if not is_cacheable(sql):
+            return run()
+        key = cache_key(sql, params)
+        df = self.get(key, family)
+        if df is None:
+            df = run()
+            self.put(key, df, family, sql)
+            return df.copy(deep=False)
+        return df
+
+    def invalidate(self, family: Optional[str] = None, key: Optional[str] = None) -> int:
+        """Drop one entry, a family, or (no arguments) everything; returns entries dropped."""
+        dropped = 0
+        with self._lock:
+            for k in list(self._mem):
+                if (key is None or k == key) and (family is None or self._mem[k].family == family):
+                    self._drop_memory(k)
+                    dropped += 1
+        if self.cache_dir:
+            for name in os.listdir(self.cache_dir):
+                if not name.endswith(".json") or name == _WATERMARK_FILE:
+                    continue
+                k = name[: -len(".json")]
+                if key is not None and k != key:
+                    continue
+                if family is not None:
+                    meta = self._read_meta(k)
+                    if not meta or meta.get("family") != family:
+                        continue
+                if self._remove_disk(k):
+                    dropped += 1
+        with self._lock:
+            self.stats.invalidations += dropped
+        return dropped
+
+    def info(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self.stats.as_dict(),
+                "memory_entries": len(self._mem),
+                "memory_bytes": self._mem_bytes,
+                "disk_bytes": self._disk_usage()[0] if self.cache_dir else 0,
+                "watermark": self._watermark,
+            }
+
+    # -- memory tier ---------------------------------------------------------------------
+
+    def _put_memory(self, key: str, entry: _Entry) -> None:
+        if key in self._mem:
+            self._drop_memory(key)
+        if entry.nbytes > self.memory_budget_bytes:
+            return
+        self._mem[key] = entry
+        self._mem_bytes += entry.nbytes
+        while self._mem_bytes > self.memory_budget_bytes:
+            oldest = next(iter(self._mem))
+            self._drop_memory(oldest)
+            self.stats.memory_evictions += 1
+
+    def _drop_memory(self, key: str) -> None:
+        entry = self._mem.pop(key, None)
+        if entry is not None:
+            self._mem_bytes -= entry.nbytes
+
+    # -- disk tier -----------------------------------------------------------------------
+
+    def _paths(self, key: str):
+        return os.path.join(self.cache_dir, f"{key}.arrow"), os.path.join(self.cache_dir, f"{key}.json")
+
+    @staticmethod
+    def _atomic_write_json(path: str, payload: Dict[str, Any]) -> None:
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(payload, f)
+        os.replace(tmp, path)
+
+    def _read_meta(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._paths(key)[1]) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _read_disk(self, key: str, meta: Dict[str, Any]) -> Optional[_Entry]:
+        """Load the Arrow file of ``key``, whose sidecar ``meta`` was already checked."""
+        data_path = self._paths(key)[0]
+        try:
+            df = arrow_to_pandas(feather.read_table(data_path, memory_map=True))
+            os.utime(data_path)  # LRU order for the disk budget
+        except (OSError, pa.ArrowInvalid):
+            return None
+        return _Entry(df=df, family=meta["family"], created=meta["created"],
+                      watermark=meta.get("watermark", ""), nbytes=_frame_bytes(df))
+
+    def _write_disk(self, key: str, entry: _Entry, sql: str) -> None:
+        if not self.cache_dir:
+            return
+        data_path, meta_path = self._paths(key)
+        tmp = f"{data_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            feather.write_feather(to_arrow(entry.df), tmp, compression="lz4")
+            os.replace(tmp, data_path)
+            self._atomic_write_json(meta_path, {
+                "family": entry.family,
+                "created": entry.created,
+                "watermark": entry.watermark,
+                "rows": len(entry.df),
+                "sql": normalize_sql(sql)[:2000],
+            })
+        except (OSError, pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            # Not representable in Arrow (object columns with mixed types...): memory only
+            for p in (tmp, data_path):
+                if os.path.exists(p):
+                    os.remove(p)
+            return
+        self._enforce_disk_budget()
+
+    def _remove_disk(self, key: str) -> bool:
+        removed = False
+        for p in self._paths(key):
+            try:
+                os.remove(p)
+                removed = True
+            except FileNotFoundError:
+                pass
+        return removed
+
+    def _disk_usage(self):
+        files = []
+        total = 0
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".arrow"):
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                files.append((st.st_mtime, st.st_size, name[: -len(".arrow")]))
+                total += st.st_size
+        return total, files
+
+    def _enforce_disk_budget(self) -> None:
+        total, files = self._disk_usage()
+        if total <= self.disk_budget_bytes:
+            return
+        for _, size, key in sorted(files):
+            if total <= self.disk_budget_bytes:
+                break
+            if self._remove_disk(key):
+                total -= size
+                with self._lock:
+                    self.stats.disk_evictions += 1
@@ -0,0 +1,118 @@
+"""Concurrent page queries with cancellation of superseded jobs.
+
+Streamlit reruns the whole page script on every widget change.  With
+synchronous queries, each rerun starts a new job while the previous one
+keeps running (and billing) until it finishes.  ``QueryExecutor`` runs the
+queries in a process-wide thread pool and tracks them per session and
+*slot* (one slot per query of a page, e.g. ``("resumen_estado", "inc")``):
+
+- Submitting a slot with the same inputs (``key``) while it is still
+  running reuses the in-flight task instead of starting another job.
+- Submitting it with different inputs supersedes the previous task: it is
+  dropped if it has not started, otherwise its backend job is cancelled.
+- Submitting any slot of a different page supersedes the session's pending
+  tasks of other pages (the user navigated away).
+
+The task function receives a ``job_stats`` dict that the backend fills with
+the ``job_id`` as soon as the job exists; setting ``cancel_requested`` in it
+before that makes the backend cancel the job right after creating it.
+
+No Streamlit/BigQuery imports: ``bq.py`` builds it and ``ui.py`` waits on
+the tasks' futures.
+"""
+
+from __future__ import annotations
+
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional, Tuple
+
+Slot = Tuple[str, str]
+
+
+@dataclass
+class QueryTask:
+    key: str
+    future: Future
+    job_stats: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class ExecutorStats:
+    submitted: int = 0
+    reused: int = 0
+    superseded: int = 0
+    cancelled_jobs: int = 0
+
+
+class QueryExecutor:
+    """Process-wide pool for page queries.
+
+    Parameters
+    ----------
+    cancel : callable
+        ``cancel(job_id)`` of the active backend.
+    max_workers : int
+        Queries running at the same time across all sessions.
+    """
+
+    def __init__(self, cancel: Callable[[str], int], max_workers: int = 8):
+        self._cancel = cancel
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="query")
+        self._tasks: Dict[str, Dict[Slot, QueryTask]] = {}
+        self._lock = threading.Lock()
+        self.stats = ExecutorStats()
+
+    def submit(self, session: str, slot: Slot, key: str, fn: Callable[[Dict[str, Any]], Any]) -> QueryTask:
+        """Run ``fn(job_stats)`` for ``slot`` of ``session``, superseding stale tasks."""
+        with self._lock:
+            tasks = self._tasks.setdefault(session, {})
+            current = tasks.get(slot)
+            if current is not None and current.key == key and not current.future.done():
+                self.stats.reused += 1
+                return current
+            stale = [
+                tasks.pop(s) for s, t in list(tasks.items())
+                if not t.future.done() and (s == slot or s[0] != slot[0])
+            ]
+            job_stats: Dict[str, Any] = {}
+            future = self._pool.submit(fn, job_stats)
+            task = QueryTask(key=key, future=future, job_stats=job_stats)
+            tasks[slot] = task
+            self.stats.submitted += 1
+        for old in stale:
+            self._supersede(old)
+        future.add_done_callback(lambda f, session=session, slot=slot, task=task: self._forget(session, slot, task))
+        return task
+
+    def pending(self, session: Optional[str] = None) -> Dict[str, Any]:
+        """Running/queued slots and their job ids (for one session or all)."""
+        with self._lock:
+            sessions = [session] if session is not None else list(self._tasks)
+            return {
+                f"{s}:{slot[0]}/{slot[1]}": t.job_stats.get("job_id")
+                for s in sessions
+                for slot, t in self._tasks.get(s, {}).items()
+                if not t.future.done()
+            }
+
+    def _supersede(self, task: QueryTask) -> None:
+        with self._lock:
+            self.stats.superseded += 1
+        if task.future.cancel():
+            return
+        task.job_stats["cancel_requested"] = True
+        job_id = task.job_stats.get("job_id")
+        if job_id is not None and self._cancel(job_id):
+            with self._lock:
+                self.stats.cancelled_jobs += 1
+
+    def _forget(self, session: str, slot: Slot, task: QueryTask) -> None:
+        # Done futures are not kept: a later identical submit hits the result cache
+        with self._lock:
+            tasks = self._tasks.get(session)
+            if tasks is not None and tasks.get(slot) is task:
+                del tasks[slot]
+                if not tasks:
+                    del self._tasks[session]
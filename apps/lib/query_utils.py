@@ -2,7 +2,8 @@ from __future__ import annotations
 import streamlit as st
 import os
 import streamlit as st
-from google.cloud import bigquery
+from .bq_client import get_client
+from .geohash_cover import DEFAULT_MAX_CELLS, bbox_geohash_cover, geohash_range_predicate
 
 def _qualify(name: str) -> str:
     """
@@ -18,8 +19,7 @@ def _qualify(name: str) -> str:
         project = st.secrets.get("BQ_PROJECT") or os.getenv("BQ_PROJECT")
         if not project:
             # Toma el proyecto por defecto del cliente si no viene en secrets/env
-            client = bigquery.Client()
-            project = client.project
+            project = get_client().project
         return f"{project}.{name}"
     raise ValueError(f"Nombre inválido '{name}'. Esperado 'project.dataset.object'.")
 
@@ -35,8 +35,7 @@ def get_project_id() -> str:
     project = st.secrets.get("BQ_PROJECT") or os.getenv("BQ_PROJECT")
     if project:
         return project
-    client = bigquery.Client()
-    return client.project
+    return get_client().project
 
 def get_model_dataset() -> str:
     """Dataset donde se crearán los modelos de BQML."""
@@ -57,6 +56,21 @@ def get_results_table_name() -> str:
     project, dataset, _ = get_table_name().split(".")
     return f"{project}.{dataset}.anomaly_results"
 
+def get_summary_table_name() -> str | None:
+    """Tabla resumen diaria (acción ``summaries`` del table manager), si está configurada.
+
+    Con ``BQ_SUMMARY_TABLE`` definido, las páginas de resumen leen esa tabla
+    (KB) en lugar de agregar la tabla de mensajes completa.
+    """
+    raw = st.secrets.get("BQ_SUMMARY_TABLE") or os.getenv("BQ_SUMMARY_TABLE")
+    return _qualify(raw) if raw else None
+
+
+def get_catalog_table_name() -> str | None:
+    """Tabla diaria del catálogo de dimensiones (``ais_dim_catalog_daily``), si está configurada."""
+    raw = st.secrets.get("BQ_CATALOG_TABLE") or os.getenv("BQ_CATALOG_TABLE")
+    return _qualify(raw) if raw else None
+
 
 def build_date_filter(start_date, end_date, date_column="BaseDateTime"):
     return f"AND DATE({date_column}) >= '{start_date}' AND DATE({date_column}) <= '{end_date}'"
@@ -102,4 +116,52 @@ def build_bbox_filter(lat_min: float, lat_max: float, lon_min: float, lon_max: f
     """
     if not use_bbox:
         return ""
-    return f" AND LAT BETWEEN {lat_min} AND {lat_max} AND LON BETWEEN {lon_min} AND {lon_max}"
\ No newline at end of file
+    return f" AND LAT BETWEEN {lat_min} AND {lat_max} AND LON BETWEEN {lon_min} AND {lon_max}"
+
+def build_geohash_bbox_filter(
+    lat_min: float,
+    lat_max: float,
+    lon_min: float,
+    lon_max: float,
+    use_bbox: bool = True,
+    column: str = "geohash9",
+    max_cells: int = DEFAULT_MAX_CELLS,
+) -> str:
+    """Create a bounding box filter that BigQuery can prune on ``geohash9``.
+
+    The box is covered by geohash prefixes at adaptive precision
+    (:func:`lib.geohash_cover.bbox_geohash_cover`), emitted as range
+    predicates on the clustered ``column``, followed by the exact
+    ``LAT``/``LON`` recheck of :func:`build_bbox_filter`.
+
+    Parameters
+    ----------
+    lat_min, lat_max, lon_min, lon_max : float
+        Bounds of the box; ``lon_min > lon_max`` crosses the antimeridian.
+    use_bbox : bool, optional
+        When ``False``, returns an empty string, by default ``True``.
+    column : str, optional
+        Geohash column the table is clustered on, by default ``"geohash9"``.
+    max_cells : int, optional
+        Upper bound on the number of cells of the cover, by default 32.
+
+    Returns
+    -------
+    str
+        A fragment of SQL beginning with ``AND``, or an empty string if
+        ``use_bbox`` is ``False``.
+    """
+    if not use_bbox:
+        return ""
+    cover = bbox_geohash_cover(lat_min, lat_max, lon_min, lon_max, max_cells=max_cells)
+    prefix_filter = geohash_range_predicate(cover, column)
+    if lon_min > lon_max:
+        exact = (
+            f" AND LAT BETWEEN {min(lat_min, lat_max)} AND {max(lat_min, lat_max)}"
+            f" AND (LON >= {lon_min} OR LON <= {lon_max})"
+        )
+    else:
+        exact = build_bbox_filter(
+            min(lat_min, lat_max), max(lat_min, lat_max), lon_min, lon_max
+        )
+    return f" AND {prefix_filter}{exact}"
@@ -0,0 +1,222 @@
+"""Paged access to query results that stay on the backend.
+
+``run_query_df`` downloads the whole result before a page can show a single
+row; for ``ML.DETECT_ANOMALIES`` over weeks of hourly series that is
+millions of rows for a table that shows a few thousand at a time.  A
+``ResultCursor`` (``backend.open_cursor``) instead keeps a reference to
+where the finished query left its result and fetches only what is shown:
+
+- BigQuery: the job's (anonymous) destination table.  ``page`` is one
+  ``tabledata.list`` call with ``startIndex``/``maxResults`` and the
+  selected columns (no query, nothing billed), ``iter_batches`` streams the
+  table as Arrow record batches (Storage Read API when available, REST pages
+  otherwise).  Anonymous tables live about 24 h.
+- DuckDB: a table in the backend's database (the last ``max_results`` are
+  kept).
+
+``sort_by`` orders the result with one follow-up ``SELECT * ... ORDER BY``
+over the result table (it reads the result, not the source table) and
+returns a cursor over the sorted copy, reused for every page in that order.
+``query`` runs any follow-up aggregate over the result (``{result}`` in the
+SQL) for charts.  A cursor is a table reference plus schema, small enough to
+keep in ``st.session_state`` across reruns.
+
+No Streamlit imports: ``bq.py`` opens the cursors and records their cost.
+"""
+
+from __future__ import annotations
+
+import threading
+import uuid
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from . import bq_client
+from .frames import to_frame
+from .lazy import lazy_import
+
+pd = lazy_import("pandas")
+pa = lazy_import("pyarrow")
+bigquery = lazy_import("google.cloud.bigquery")
+
+RESULT_PLACEHOLDER = "{result}"
+DEFAULT_BATCH_ROWS = 100_000
+
+
+class ResultCursor:
+    """Result of a finished query, fetched page by page.
+
+    Attributes
+    ----------
+    job_id : str
+        Job that produced the result.
+    total_rows : int
+        Rows in the result.
+    columns : list of str
+        Result columns, in order.
+    result_id : str
+        Identity of the stored result (key for caching follow-up queries).
+    """
+
+    def __init__(self, job_id: str, total_rows: int, columns: Sequence[str], result_id: Optional[str] = None):
+        self.job_id = job_id
+        self.result_id = result_id or uuid.uuid4().hex
+        self.total_rows = int(total_rows or 0)
+        self.columns = list(columns)
+        self._sorted: Dict[Tuple[str, bool], "ResultCursor"] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self.total_rows
+
+    def _check_columns(self, columns: Optional[Sequence[str]]) -> List[str]:
+        if columns is None:
+            return list(self.columns)
+        unknown = [c for c in columns if c not in self.columns]
+        if unknown:
+            raise ValueError(f"Columnas que no están en el resultado: {unknown}")
+        return list(columns)
+
+    def page(self, offset: int = 0, limit: int = 1000, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """Rows ``[offset, offset + limit)`` of ``columns`` (all by default)."""
+        raise NotImplementedError
+
+    def iter_batches(self, columns: Optional[Sequence[str]] = None,
+                     batch_rows: int = DEFAULT_BATCH_ROWS) -> Iterator[pa.RecordBatch]:
+        """The whole result as Arrow record batches, in order."""
+        raise NotImplementedError
+
+    def query(self, sql: str, params: Sequence = (), job_stats: Optional[Dict] = None) -> pd.DataFrame:
+        """Follow-up query over the result: ``{result}`` in ``sql`` is the result table."""
+        raise NotImplementedError
+
+    def sort_by(self, column: str, ascending: bool = True, job_stats: Optional[Dict] = None) -> "ResultCursor":
+        """Cursor over the result ordered by ``column`` (one follow-up query, then cached)."""
+        self._check_columns([column])
+        key = (column, bool(ascending))
+        with self._lock:
+            cursor = self._sorted.get(key)
+        if cursor is None:
+            direction = "ASC" if ascending else "DESC"
+            cursor = self._open_sorted(f"SELECT * FROM {RESULT_PLACEHOLDER} ORDER BY {self._quote(column)} {direction}",
+                                       job_stats)
+            with self._lock:
+                cursor = self._sorted.setdefault(key, cursor)
+        return cursor
+
+    @staticmethod
+    def _quote(column: str) -> str:
+        raise NotImplementedError
+
+    def _open_sorted(self, sql: str, job_stats: Optional[Dict]) -> "ResultCursor":
+        raise NotImplementedError
+
+
+class BigQueryResultCursor(ResultCursor):
+    """Cursor over the destination table of a BigQuery job.
+
+    Parameters
+    ----------
+    backend : BigQueryBackend
+        Backend that ran the job (follow-up queries go through it).
+    destination : bigquery.TableReference
+        Destination table of the job.
+    schema : list of bigquery.SchemaField
+        Result schema (passed to ``list_rows`` so it needs no ``tables.get``).
+    total_rows : int
+        Rows in the destination table.
+    job_id : str
+        Job that produced the result.
+    client : bigquery.Client, optional
+        Client for ``list_rows`` (default: the backend's shared client).
+    """
+
+    def __init__(self, backend, destination: bigquery.TableReference, schema: Sequence[bigquery.SchemaField],
+                 total_rows: int, job_id: str, client=None):
+        super().__init__(job_id, total_rows, [f.name for f in schema],
+                         result_id=f"{destination.project}.{destination.dataset_id}.{destination.table_id}")
+        self.backend = backend
+        self.destination = destination
+        self.schema = list(schema)
+        self._client = client
+        self._ordered = False  # copy made by sort_by
+
+    @property
+    def client(self):
+        return self._client if self._client is not None else bq_client.get_client(self.backend.project)
+
+    def _fields(self, columns: Optional[Sequence[str]]) -> List[bigquery.SchemaField]:
+        wanted = set(self._check_columns(columns))
+        return [f for f in self.schema if f.name in wanted]
+
+    def page(self, offset: int = 0, limit: int = 1000, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        rows = self.client.list_rows(
+            self.destination,
+            selected_fields=self._fields(columns),
+            start_index=max(0, int(offset)),
+            max_results=max(0, int(limit)),
+        )
+        return to_frame(rows.to_arrow(create_bqstorage_client=False))
+
+    def iter_batches(self, columns: Optional[Sequence[str]] = None,
+                     batch_rows: int = DEFAULT_BATCH_ROWS) -> Iterator[pa.RecordBatch]:
+        # batch_rows is a hint: the transports decide the batch size (~10 MB REST pages, Storage batches)
+        rows = self.client.list_rows(self.destination, selected_fields=self._fields(columns), page_size=batch_rows)
+        read_client = bq_client.get_read_client() if bq_client.settings["use_storage_api"] else None
+        # Several Storage streams would interleave a sorted result
+        streams = 1 if self._ordered else bq_client.settings["max_streams"]
+        yield from rows.to_arrow_iterable(bqstorage_client=read_client, max_stream_count=streams)
+
+    def query(self, sql: str, params: Sequence = (), job_stats: Optional[Dict] = None) -> pd.DataFrame:
+        return self.backend.run_query_df(self._bind(sql), params, job_stats=job_stats)
+
+    def _bind(self, sql: str) -> str:
+        return sql.replace(RESULT_PLACEHOLDER, f"`{self.result_id}`")
+
+    @staticmethod
+    def _quote(column: str) -> str:
+        return f"`{column}`"
+
+    def _open_sorted(self, sql: str, job_stats: Optional[Dict]) -> ResultCursor:
+        cursor = self.backend.open_cursor(self._bind(sql), job_stats=job_stats)
+        cursor._ordered = True
+        return cursor
+
+
+class DuckDBResultCursor(ResultCursor):
+    """Cursor over a result table in the database of a ``DuckDBBackend``."""
+
+    def __init__(self, backend, table: str, total_rows: int, columns: Sequence[str], job_id: str):
+        super().__init__(job_id, total_rows, columns)
+        self.backend = backend
+        self.table = table
+
+    def _select(self, columns: Optional[Sequence[str]]) -> str:
+        cols = ", ".join(self._quote(c) for c in self._check_columns(columns))
+        return f"SELECT {cols} FROM {self._quote(self.table)}"
+
+    def page(self, offset: int = 0, limit: int = 1000, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        sql = f"{self._select(columns)} LIMIT {max(0, int(limit))} OFFSET {max(0, int(offset))}"
+        cursor = self.backend.connection.cursor()
+        try:
+            return to_frame(cursor.execute(sql).fetch_arrow_table())
+        finally:
+            cursor.close()
+
+    def iter_batches(self, columns: Optional[Sequence[str]] = None,
+                     batch_rows: int = DEFAULT_BATCH_ROWS) -> Iterator[pa.RecordBatch]:
+        cursor = self.backend.connection.cursor()
+        try:
+            yield from cursor.execute(self._select(columns)).fetch_record_batch(batch_rows)
+        finally:
+            cursor.close()
+
+    def query(self, sql: str, params: Sequence = (), job_stats: Optional[Dict] = None) -> pd.DataFrame:
+        return self.backend.run_query_df(sql.replace(RESULT_PLACEHOLDER, self._quote(self.table)), params,
+                                         job_stats=job_stats)
+
+    @staticmethod
+    def _quote(column: str) -> str:
+        return '"' + column.replace('"', '""') + '"'
+
+    def _open_sorted(self, sql: str, job_stats: Optional[Dict]) -> ResultCursor:
+        return self.backend.open_cursor(sql.replace(RESULT_PLACEHOLDER, self._quote(self.table)), job_stats=job_stats)
@@ -0,0 +1,172 @@
+"""Loader/binder for the parameterized queries in ``apps/sql``.
+
+Templates use BigQuery named parameters (``@start_date``) declared in their
+header comment (``-- Parámetros: @start_date DATE, @mmsi ARRAY<STRING>``) and
+``{{NAME}}`` placeholders for what parameters cannot express: table names,
+column names and trusted SQL fragments built by ``query_utils`` (the geohash
+cover must stay literal so clustering prunes blocks).
+
+``bind`` returns a ``BoundQuery`` whose SQL text depends only on the
+template and the placeholders, never on the user's filter values, so
+BigQuery's result cache hits across users and the text stays small however
+many MMSIs are selected.  Parsed templates are cached per file mtime.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+from dataclasses import dataclass
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from .lazy import lazy_import
+
+bigquery = lazy_import("google.cloud.bigquery")
+
+SQL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sql")
+
+_DECL_RE = re.compile(r"@(\w+)\s+(ARRAY<\s*\w+\s*>|\w+)", re.IGNORECASE)
+_PARAM_RE = re.compile(r"@(\w+)")
+_PLACEHOLDER_RE = re.compile(r"\{\{(\w+)\}\}")
+_IDENTIFIER_RE = re.compile(r"^[A-Za-z0-9_.\-]+$")
+_SCALAR_TYPES = {"DATE", "TIMESTAMP", "DATETIME", "INT64", "FLOAT64", "NUMERIC", "STRING", "BOOL"}
+
+
+@dataclass(frozen=True)
+class Template:
+    name: str
+    text: str
+    params: Dict[str, str]
+    placeholders: Tuple[str, ...]
+
+
+@dataclass(frozen=True)
+class BoundQuery:
+    """SQL text plus its typed query parameters."""
+
+    name: str
+    sql: str
+    params: Tuple[Any, ...]
+
+    def job_config(self, **kwargs) -> bigquery.QueryJobConfig:
+        return bigquery.QueryJobConfig(query_parameters=list(self.params), **kwargs)
+
+    def params_repr(self) -> List[Dict[str, Any]]:
+        """API representation of the parameters (stable, JSON-serializable)."""
+        return [p.to_api_repr() for p in self.params]
+
+    def __str__(self) -> str:
+        return self.sql
+
+
+def _strip_comment(line: str) -> str:
+    """``line`` without its trailing ``--`` comment (``--`` inside quotes is kept)."""
+    quote = None
+    i = 0
+    while i < len(line):
+        ch = line[i]
+        if quote:
+            if ch == "\\":
+                i += 1
+            elif ch == quote:
+                quote = None
+        elif ch in "'\"`":
+            quote = ch
+        elif line.startswith("--", i):
+            return line[:i].rstrip()
+        i += 1
+    return line.rstrip()
+
+
+def _parse(name: str, raw: str) -> Template:
+    header = []
+    for line in raw.lstrip().splitlines():
+        if not line.lstrip().startswith("--"):
+            break
+        header.append(line)
+    params = {m.group(1): re.sub(r"\s+", "", m.group(2)).upper() for m in _DECL_RE.finditer("\n".join(header))}
+    body_lines = [ln for ln in raw.splitlines() if not ln.lstrip().startswith("--")]
+    body = "\n".join(_strip_comment(ln) for ln in body_lines).strip().rstrip(";").strip()
+    used = set(_PARAM_RE.findall(body))
+    undeclared = used - set(params)
+    if undeclared:
+        raise ValueError(f"{name}.sql usa parámetros no declarados: {sorted(undeclared)}")
+    for p_type in params.values():
+        base = p_type[6:-1] if p_type.startswith("ARRAY<") else p_type
+        if base not in _SCALAR_TYPES:
+            raise ValueError(f"{name}.sql: tipo de parámetro no soportado {p_type}")
+    return Template(name, body, {k: v for k, v in params.items() if k in used},
+                    tuple(sorted(set(_PLACEHOLDER_RE.findall(body)))))
+
+
+@lru_cache(maxsize=64)
+def _load(path: str, mtime: float) -> Template:
+    with open(path, encoding="utf-8") as f:
+        return _parse(os.path.splitext(os.path.basename(path))[0], f.read())
+
+
+def load_template(name: str) -> Template:
+    path = os.path.join(SQL_DIR, f"{name}.sql")
+    return _load(path, os.path.getmtime(path))
+
+
+def _coerce(value: Any, bq_type: str) -> Any:
+    if value is None:
+        return None
+    if bq_type == "DATE":
+        if isinstance(value, datetime):
+            return value.date()
+        return value if isinstance(value, date) else date.fromisoformat(str(value)[:10])
+    if bq_type in ("TIMESTAMP", "DATETIME"):
+        return value if isinstance(value, datetime) else datetime.fromisoformat(str(value))
+    if bq_type == "INT64":
+        return int(value)
+    if bq_type in ("FLOAT64", "NUMERIC"):
+        return float(value)
+    if bq_type == "BOOL":
+        return bool(value)
+    return str(value)
+
+
+def _query_parameter(name: str, bq_type: str, value: Any):
+    if bq_type.startswith("ARRAY<"):
+        item_type = bq_type[6:-1]
+        items = list(value or [])
+        if any(v is None for v in items):
+            raise ValueError(f"@{name} no admite NULL dentro del array")
+        return bigquery.ArrayQueryParameter(name, item_type, [_coerce(v, item_type) for v in items])
+    return bigquery.ScalarQueryParameter(name, bq_type, _coerce(value, bq_type))
+
+
+def bind(
+    name: str,
+    identifiers: Optional[Dict[str, str]] = None,
+    fragments: Optional[Dict[str, str]] = None,
+    **values: Any,
+) -> BoundQuery:
+    """Fill ``{{...}}`` placeholders and bind ``values`` to the declared parameters.
+
+    ``identifiers`` must be table/column names; ``fragments`` are inserted
+    verbatim and must come from trusted builders, never from user input.
+    Missing scalar parameters bind as typed ``NULL`` and missing arrays as
+    empty arrays; ``None`` inside an array raises ``ValueError`` (BigQuery
+    arrays cannot hold ``NULL``).
+    """
+    tpl = load_template(name)
+    unknown = set(values) - set(tpl.params)
+    if unknown:
+        raise ValueError(f"{name}.sql no declara los parámetros {sorted(unknown)}")
+    subs: Dict[str, str] = {}
+    for key, ident in (identifiers or {}).items():
+        if not _IDENTIFIER_RE.match(str(ident)):
+            raise ValueError(f"Identificador inválido para {{{{{key}}}}}: {ident!r}")
+        subs[key] = str(ident)
+    subs.update({k: v or "" for k, v in (fragments or {}).items()})
+    missing = set(tpl.placeholders) - set(subs)
+    if missing:
+        raise ValueError(f"{name}.sql requiere {sorted(missing)}")
+    sql = _PLACEHOLDER_RE.sub(lambda m: subs[m.group(1)], tpl.text)
+    params = tuple(_query_parameter(p, t, values.get(p)) for p, t in tpl.params.items())
+    return BoundQuery(name, sql, params)
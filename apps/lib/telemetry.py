@@ -0,0 +1,226 @@
+"""Per-query telemetry: latency, bytes, slots and cache hits.
+
+``bq.py`` records one ``QueryEvent`` for every query it runs or serves from
+a cache (page queries, incremental partials, result cursors and their
+follow-ups), tagged with the page, the query (template name) and a
+fingerprint of its parameters, so two runs with the same filters share the
+fingerprint without the values being stored.
+
+- The last ``maxlen`` events stay in memory for the sidebar panel
+  (``recent(session=...)`` gives the ones of a Streamlit session).
+- Every event is also appended as one JSON line to ``path``; the file is
+  shared by processes and survives restarts.  When it grows beyond
+  ``max_bytes`` it is rotated to ``<path>.1`` (one generation kept).
+- ``summarize`` turns events into p50/p95 latency and bytes per page (or per
+  page and query) for the telemetry page, to find the views worth
+  pre-aggregating.
+- ``warm_hit_rates`` measures how many of the views the pages opened had
+  been warmed by ``lib.cache_warmer`` and came from the app cache.
+
+No Streamlit/BigQuery imports: ``bq.py`` records and ``ui.py`` shows it.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional, Sequence
+
+from .lazy import lazy_import
+
+pd = lazy_import("pandas")
+
+DEFAULT_MAX_MB = 50
+# Page recorded by lib.cache_warmer for the queries it runs
+WARM_PAGE = "cache_warmer"
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class QueryEvent:
+    ts: float
+    session: Optional[str]
+    page: Optional[str]
+    query: str
+    fingerprint: str
+    source: str  # backend | bq_cache | app_cache | error
+    duration_ms: float
+    job_ms: Optional[float] = None
+    bytes_processed: Optional[int] = None
+    bytes_billed: Optional[int] = None
+    slot_ms: Optional[int] = None
+    rows: Optional[int] = None
+    job_id: Optional[str] = None
+    error: Optional[str] = None
+
+
+def fingerprint(params: Any) -> str:
+    """Short stable hash of query parameters (any JSON-serializable value)."""
+    text = json.dumps(params, sort_keys=True, default=str)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:12]
+
+
+class QueryTelemetry:
+    """Recent events in memory plus an append-only JSONL log.
+
+    Parameters
+    ----------
+    path : str, optional
+        JSONL file; ``None``/empty keeps the events in memory only.
+    maxlen : int
+        Events kept in memory.
+    max_bytes : int
+        Size at which the log is rotated to ``<path>.1``.
+    """
+
+    def __init__(self, path: Optional[str] = None, maxlen: int = 1000, max_bytes: int = DEFAULT_MAX_MB * 2**20):
+        self.path = path or None
+        self.max_bytes = int(max_bytes)
+        self._events: "deque[QueryEvent]" = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+        if self.path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+
+    def record(self, query: str, page: Optional[str] = None, session: Optional[str] = None,
+               params: Any = None, job_stats: Optional[Dict[str, Any]] = None, duration_s: float = 0.0,
+               rows: Optional[int] = None, error: Optional[BaseException] = None) -> QueryEvent:
+        """Record one query; ``job_stats`` as filled by the backends (empty = served from the app cache)."""
+        stats = job_stats or {}
+        if error is not None:
+            source = "error"
+        elif "job_id" not in stats:
+            source = "app_cache"
+        elif stats.get("cache_hit"):
+            source = "bq_cache"
+        else:
+            source = "backend"
+        event = QueryEvent(
+            ts=time.time(),
+            session=session,
+            page=page,
+            query=query,
+            fingerprint=fingerprint(params),
+            source=source,
+            duration_ms=round(duration_s * 1000.0, 1),
+            job_ms=stats.get("job_ms"),
+            bytes_processed=stats.get("bytes_processed", 0 if source == "app_cache" else None),
+            bytes_billed=stats.get("bytes_billed", 0 if source == "app_cache" else None),
+            slot_ms=stats.get("slot_ms"),
+            rows=rows,
+            job_id=stats.get("job_id"),
+            error=f"{type(error).__name__}: {error}"[:300] if error is not None else None,
+        )
+        with self._lock:
+            self._events.append(event)
+            if self.path:
+                self._append(event)
+        return event
+
+    def _append(self, event: QueryEvent) -> None:
+        try:
+            if os.path.exists(self.path) and os.path.getsize(self.path) >= self.max_bytes:
+                os.replace(self.path, self.path + ".1")
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(asdict(event), ensure_ascii=False) + "\n")
+        except OSError as e:
+            logger.warning("No se pudo escribir la telemetría en %s (%s)", self.path, e)
+
+    def recent(self, session: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        """Newest first; only ``session``'s events when given."""
+        with self._lock:
+            events = [e for e in reversed(self._events) if session is None or e.session == session]
+        return [asdict(e) for e in events[:limit]]
+
+    def load(self, since: Optional[float] = None) -> pd.DataFrame:
+        """Events of the log (and its rotated generation), or of memory without a log."""
+        if not self.path:
+            with self._lock:
+                rows = [asdict(e) for e in self._events]
+        else:
+            rows = []
+            for path in (self.path + ".1", self.path):
+                try:
+                    with open(path, encoding="utf-8") as f:
+                        for line in f:
+                            try:
+                                rows.append(json.loads(line))
+                            except ValueError:
+                                continue  # line still being written by another process
+                except FileNotFoundError:
+                    continue
+        df = pd.DataFrame(rows, columns=list(QueryEvent.__dataclass_fields__))
+        if since is not None:
+            df = df[df["ts"] >= since]
+        return df.reset_index(drop=True)
+
+
+def summarize(events: pd.DataFrame, by: Sequence[str] = ("page",)) -> pd.DataFrame:
+    """Latency and bytes percentiles per group of ``by``, slowest p95 first.
+
+    Returns ``queries``, ``app_cache_ratio``, ``errors``, ``p50_ms``/``p95_ms``
+    (wall time seen by the page), ``p50_bytes``/``p95_bytes``/``total_bytes``
+    (processed, over the queries that reached the backend) and
+    ``total_slot_ms``.
+    """
+    by = list(by)
+    columns = by + ["queries", "app_cache_ratio", "errors", "p50_ms", "p95_ms", "p50_bytes", "p95_bytes",
+                    "total_bytes", "total_slot_ms"]
+    if events.empty:
+        return pd.DataFrame(columns=columns)
+    df = events.copy()
+    df[by] = df[by].fillna("—")
+    df["bytes"] = pd.to_numeric(df["bytes_processed"], errors="coerce").where(df["source"] != "app_cache")
+    df["slots"] = pd.to_numeric(df["slot_ms"], errors="coerce")
+    grouped = df.groupby(by, sort=False)
+    out = pd.DataFrame({
+        "queries": grouped.size(),
+        "app_cache_ratio": grouped["source"].agg(lambda s: float((s == "app_cache").mean())),
+        "errors": grouped["source"].agg(lambda s: int((s == "error").sum())),
+        "p50_ms": grouped["duration_ms"].quantile(0.5),
+        "p95_ms": grouped["duration_ms"].quantile(0.95),
+        "p50_bytes": grouped["bytes"].quantile(0.5),
+        "p95_bytes": grouped["bytes"].quantile(0.95),
+        "total_bytes": grouped["bytes"].sum(min_count=1),
+        "total_slot_ms": grouped["slots"].sum(min_count=1),
+    })
+    return out.reset_index().sort_values("p95_ms", ascending=False).reset_index(drop=True)[columns]
+
+
+def warm_hit_rates(events: pd.DataFrame, warm_page: str = WARM_PAGE) -> pd.DataFrame:
+    """Per page, how many of the views opened by its sessions had been warmed.
+
+    A view is a ``(query, fingerprint)`` pair; only the first request of each
+    session counts (its reruns hit the cache anyway).  It was ``warmed`` if
+    ``warm_page`` had run the same pair before; ``warm_hits`` are the warmed
+    ones served from the app cache.  Returns ``opened``, ``warmed``,
+    ``warm_hits``, ``coverage`` (warmed / opened) and ``warm_hit_rate``
+    (warm_hits / warmed), busiest page first.  Plain SQL (``sql``: filter
+    options) is left out: it all shares one fingerprint.
+    """
+    columns = ["page", "opened", "warmed", "warm_hits", "coverage", "warm_hit_rate"]
+    key = ["query", "fingerprint"]
+    named = events[events["query"] != "sql"]
+    warm = named[(named["page"] == warm_page) & (named["source"] != "error")]
+    opened = named[named["page"].notna() & (named["page"] != warm_page)]
+    if opened.empty:
+        return pd.DataFrame(columns=columns)
+    opened = opened.sort_values("ts").drop_duplicates(["session", "page"] + key)
+    warmed_at = warm.groupby(key)["ts"].min().rename("warmed_at").reset_index()
+    df = opened.merge(warmed_at, on=key, how="left")
+    df["warmed"] = df["warmed_at"].notna() & (df["ts"] >= df["warmed_at"])
+    df["warm_hit"] = df["warmed"] & (df["source"] == "app_cache")
+    grouped = df.groupby("page", sort=False)
+    out = pd.DataFrame({
+        "opened": grouped.size(),
+        "warmed": grouped["warmed"].sum(),
+        "warm_hits": grouped["warm_hit"].sum(),
+    }).reset_index()
+    out["coverage"] = out["warmed"] / out["opened"]
+    out["warm_hit_rate"] = (out["warm_hits"] / out["warmed"]).where(out["warmed"] > 0)
+    return out.sort_values("opened", ascending=False).reset_index(drop=True)[columns]
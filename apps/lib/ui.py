@@ -1,9 +1,22 @@
+import math
+from concurrent.futures import FIRST_COMPLETED, wait
+
 import streamlit as st
-import plotly.express as px
-import geohash
-from lib.bq import distinct_values
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from lib.bq import distinct_values, estimate_query_cost, get_dim_catalog, recent_queries, submit_query
+from lib.cost_guard import format_bytes
+from lib.lazy import lazy_import
+
+# Se importan al pintar el primer gráfico o mapa, no al abrir la página
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+pdk = lazy_import("pydeck")
+px = lazy_import("plotly.express")
+density_tiles = lazy_import("lib.density_tiles")
+geohash_decode = lazy_import("lib.geohash_decode")
 
-DEFAULT_LIMIT = 100
+# Escala de color de densidad (amarillo → rojo oscuro), RGB
+DENSITY_COLORS = [[255, 255, 178], [254, 204, 92], [253, 141, 60], [240, 59, 32], [189, 0, 38]]
 
 
 def chart_bar(df, x, y, title="Bar Chart", color=None):
@@ -11,8 +24,102 @@ def chart_bar(df, x, y, title="Bar Chart", color=None):
     st.plotly_chart(fig, config={"responsive": True})
 
 
-def mmsi_multiselect(label="MMSI", key=None):
-    return st.multiselect(label, options=distinct_values("MMSI"), key=key)
+def _session_id():
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx is not None else "bare"
+
+
+def _check_cost(query, page, name):
+    """Control de coste (dry-run): aviso, o detiene la página hasta que el usuario confirme."""
+    estimate = estimate_query_cost(query, page=page)
+    if estimate is not None and estimate.status == "block":
+        st.error(estimate.message())
+        if not st.checkbox("Ejecutar de todos modos", key=f"cost_override_{page}_{name}"):
+            st.stop()
+    elif estimate is not None and estimate.status == "warn":
+        st.warning(estimate.message())
+    return estimate
+
+
+def run_page_queries(queries, page):
+    """Ejecuta en paralelo las consultas independientes de ``page`` y las devuelve según terminan.
+
+    ``queries`` es ``{nombre: consulta}``; genera ``(nombre, DataFrame,
+    texto de coste)`` en orden de llegada para pintar cada resultado en
+    cuanto está listo.  Si la página se vuelve a ejecutar con otras entradas
+    antes de terminar, los jobs anteriores se cancelan (``lib.query_executor``).
+    """
+    session = _session_id()
+    tasks = {}
+    for name, query in queries.items():
+        estimate = _check_cost(query, page, name)
+        est_bytes = estimate.bytes if estimate else None
+        task = submit_query(session, (page, name), query, page=page, estimated_bytes=est_bytes)
+        tasks[task.future] = (name, task, est_bytes)
+    status = st.empty()
+    pending = set(tasks)
+    while pending:
+        # Cada actualización es un punto en el que Streamlit puede interrumpir el rerun obsoleto
+        status.caption(f"Consultando… ({len(pending)} pendiente(s))")
+        done, pending = wait(pending, timeout=0.25, return_when=FIRST_COMPLETED)
+        for future in done:
+            name, task, est_bytes = tasks[future]
+            stats = task.job_stats
+            cost = (
+                f"Estimado {format_bytes(est_bytes)} · "
+                f"procesado {format_bytes(stats.get('bytes_processed'))} · "
+                f"facturado {format_bytes(stats.get('bytes_billed'))}"
+            ) if "bytes_processed" in stats else ""
+            yield name, future.result(), cost
+    status.empty()
+    query_telemetry_sidebar()
+
+
+def run_page_query(query, page):
+    """Una sola consulta de ``page`` con control de coste (ver ``run_page_queries``)."""
+    [(_, df, cost)] = list(run_page_queries({"main": query}, page))
+    if cost:
+        st.caption(cost)
+    return df
+
+
+def query_telemetry_sidebar(limit=10):
+    """Panel lateral con las últimas consultas de la sesión (duración, bytes, origen)."""
+    events = recent_queries(session=_session_id(), limit=limit)
+    with st.sidebar.expander(f"Consultas de esta sesión ({len(events)})"):
+        if not events:
+            st.caption("Sin consultas todavía.")
+            return
+        st.dataframe(
+            pd.DataFrame({
+                "hora": pd.to_datetime([e["ts"] for e in events], unit="s").strftime("%H:%M:%S"),
+                "consulta": [e["query"] for e in events],
+                "origen": [e["source"] for e in events],
+                "ms": [e["duration_ms"] for e in events],
+                "procesado": [format_bytes(e["bytes_processed"]) for e in events],
+                "filas": [e["rows"] for e in events],
+            }),
+            hide_index=True,
+            width="stretch",
+        )
+
+
+def mmsi_multiselect(label="MMSI", key=None, max_suggestions=50):
+    """Selector de MMSI con búsqueda (MMSI, prefijo o parte del nombre del buque).
+
+    Con catálogo de dimensiones sólo se cargan las sugerencias de la búsqueda
+    más lo ya seleccionado; sin catálogo, todas las opciones como antes.
+    """
+    catalog = get_dim_catalog()
+    if catalog is None or not catalog.has("MMSI"):
+        return st.multiselect(label, options=distinct_values("MMSI"), key=key)
+    key = key or f"mmsi_multiselect_{label}"
+    query = st.text_input(f"Buscar {label}", key=f"{key}_search", placeholder="MMSI o nombre del buque")
+    selected = list(st.session_state.get(key, []))
+    suggestions = catalog.search("MMSI", query, limit=max_suggestions)["value"].tolist()
+    options = selected + [v for v in suggestions if v not in selected]
+    labels = catalog.describe("MMSI", options)
+    return st.multiselect(label, options=options, key=key, format_func=lambda v: labels.get(v, str(v)))
 
 
 def show_geohash_map(df, geohash_column="geohash9", title="Mapa de eventos"):
@@ -21,19 +128,57 @@ def show_geohash_map(df, geohash_column="geohash9", title="Mapa de eventos"):
 
     st.subheader(title)
 
-    def decode_geohash(gh):
-        try:
-            return geohash.decode(gh)
-        except:
-            return None, None
-
-    coords = df[geohash_column].apply(decode_geohash)
-    df["lat"] = [coord[0] for coord in coords]
-    df["lon"] = [coord[1] for coord in coords]
-
-    map_df = df.dropna(subset=["lat", "lon"])
+    # Vectorizado, cada celda distinta una vez y sin añadir columnas al resultado (compartido con la caché)
+    lat, lon = geohash_decode.decode_geohashes(df[geohash_column])
+    map_df = pd.DataFrame({"lat": lat, "lon": lon}).dropna()
 
     if not map_df.empty:
         st.map(map_df[["lat", "lon"]])
     else:
         st.warning("No se pudieron decodificar las coordenadas geohash")
+
+
+def show_density_map(cells, bbox, title="Densidad de tráfico", width_px=900):
+    """Pinta las celdas de ``DensityTiles.load_cells`` (color y tooltip según ``n``).
+
+    ``bbox`` es ``(lon_min, lat_min, lon_max, lat_max)``: centra y encuadra
+    la vista inicial.  El color sigue ``log(n)`` para que las rutas poco
+    transitadas no desaparezcan junto a los puertos.
+    """
+    st.subheader(title)
+    if cells.empty:
+        st.info("No hay tráfico en esta zona y periodo.")
+        return
+    lon_min, lat_min, lon_max, lat_max = bbox
+    span = (lon_max - lon_min) % 360 or 360
+    level = np.log1p(cells["n"].to_numpy(dtype=np.float64))
+    t = (level - level.min()) / (np.ptp(level) or 1.0) * (len(DENSITY_COLORS) - 1)
+    stops = np.arange(len(DENSITY_COLORS))
+    colors = np.array(DENSITY_COLORS)
+    layer_df = pd.DataFrame({
+        "lon": cells["lon"],
+        "lat": cells["lat"],
+        "n": cells["n"],
+        # Radio = media celda, a la latitud de cada una
+        "radius": density_tiles.cell_size_m(cells["lat"].to_numpy(), cells.attrs["zoom"], cells.attrs["bins"]) / 2,
+        **{c: np.interp(t, stops, colors[:, i]).astype(np.uint8) for i, c in enumerate("rgb")},
+    })
+    layer = pdk.Layer(
+        "ScatterplotLayer",
+        data=layer_df,
+        get_position="[lon, lat]",
+        get_radius="radius",
+        radius_units="meters",
+        get_fill_color="[r, g, b, 190]",
+        pickable=True,
+    )
+    view = pdk.ViewState(
+        longitude=lon_min + span / 2,
+        latitude=(lat_min + lat_max) / 2,
+        zoom=max(0.0, math.log2(width_px * 360 / (512 * span))),
+    )
+    st.pydeck_chart(pdk.Deck(layers=[layer], initial_view_state=view, tooltip={"text": "{n} mensajes"}))
+    st.caption(
+        f"Nivel {cells.attrs['zoom']} · {cells.attrs['tiles']} tesela(s) · {len(cells):,} celdas · "
+        f"{int(cells['n'].sum()):,} mensajes"
+    )
@@ -6,22 +6,41 @@ can select the time range, vessel types, aggregation frequency, metric and
 series identifier.  After training, they can run anomaly detection on
 arbitrary date ranges.  Results are displayed as a table and visualised
 through bar and scatter plots.
+
+The detection result stays on the backend (``open_result_cursor``): the
+cursor lives in ``st.session_state``, the table fetches only the page shown
+(sorted through a follow-up query) and the charts come from small
+aggregate/sample queries over the result.
 """
 
 from __future__ import annotations
 
-import pandas as pd  # type: ignore
 import streamlit as st  # type: ignore
-import plotly.express as px  # type: ignore
+import io
 import math
-import pandas as pd
-import numpy as np
-from lib.bq import run_query_df, distinct_values, get_default_dates
+from lib.lazy import lazy_import
+from lib.bq import (
+    distinct_values,
+    get_default_dates,
+    invalidate_query_cache,
+    open_result_cursor,
+    query_result,
+    run_query_df,
+    sort_result,
+)
 from lib.queries import anomaly_train_query, anomaly_predict_query
+from lib.ui import query_telemetry_sidebar
 
+# Se importan al pintar resultados: la página se muestra antes
+pd = lazy_import("pandas")
+np = lazy_import("numpy")
+px = lazy_import("plotly.express")
+pa_csv = lazy_import("pyarrow.csv")
 
-
-"""Render the anomaly detection page."""
+CURSOR_KEY = "anomaly_cursor"
+PAGE_KEY = "anomalias"
+RESULT_ORDER = "Probabilidad de anomalía (orden del resultado)"
+MAX_DOWNLOAD_ROWS = 3_000_000
 st.header("Detección de anomalías en tráfico marítimo")
 
 # Obtain default dates based on the user's timezone (America/Mexico_City)
@@ -87,7 +106,10 @@ if st.button("Entrenar modelo"):
             )
             # Running the query will create or replace the model.  The result
             # set is empty but the call blocks until training completes.
-            run_query_df(train_sql)
+            run_query_df(train_sql, page=PAGE_KEY)
+            # Las predicciones cacheadas corresponden al modelo anterior
+            invalidate_query_cache(family="ml")
+            st.session_state.pop(CURSOR_KEY, None)
             st.success("Modelo entrenado correctamente.")
         except Exception as e:
             st.error(f"Error al entrenar el modelo: {e}")
@@ -105,93 +127,140 @@ if st.button("Detectar anomalías"):
                 id_col=id_col,
                 threshold=threshold,
             )
-            df = run_query_df(predict_sql)
-            if df.empty:
-                st.info("No se encontraron resultados para el periodo seleccionado.")
-            else:
-                # --- 1) Reducir datos que viajan al frontend ---
-                # Qué columnas realmente necesitas para UI/plots:
-                ui_cols = [c for c in ["series_id", "ts_col", "value", "is_anomaly"] if c in df.columns]
-                df_ui = df[ui_cols].copy()
-                # Asegurar tipos compactos
-                if "is_anomaly" in df_ui.columns:
-                    df_ui["is_anomaly"] = df_ui["is_anomaly"].fillna(False).astype(bool)
-                if "series_id" in df_ui.columns:
-                    # Opcional: esto reduce bytes al serializar
-                    df_ui["series_id"] = df_ui["series_id"].astype("category")
-
-                st.subheader("Resultados de la detección de anomalías")
-
-                # --- 2) Tabla paginada (evita enviar todo el DF) ---
-                with st.expander("Ver tabla de resultados (paginada)", expanded=False):
-                    page_size = st.number_input("Filas por página", min_value=500, max_value=50_000, value=5_000, step=500)
-                    total_pages = max(1, math.ceil(len(df_ui) / page_size))
-                    page = st.number_input("Página", min_value=1, max_value=total_pages, value=1, step=1)
-                    start = (page - 1) * page_size
-                    end = start + page_size
-                    st.caption(f"Mostrando {start+1:,}–{min(end, len(df_ui)):,} de {len(df_ui):,} filas")
-                    st.dataframe(df_ui.iloc[start:end], use_container_width=True)
-                    # Descarga: evita adjuntar CSV enorme al estado si pesa mucho
-                    approx_bytes = int(df_ui.memory_usage(deep=True).sum())
-                    if approx_bytes < 150 * 1024 * 1024:  # ~150MB umbral de seguridad
-                        st.download_button(
-                            "Descargar CSV (completo)",
-                            df_ui.to_csv(index=False).encode("utf-8"),
-                            "anomaly_results.csv",
-                            "text/csv",
-                        )
-                    else:
-                        st.info("El resultado es muy grande para descargar aquí. Exporta a un almacenamiento externo (S3, GCS, etc.) y comparte el link.")
-
-                # --- 3) Gráfico de anomalías por serie (pequeño) ---
-                if "is_anomaly" in df_ui.columns and "series_id" in df_ui.columns:
-                    anomalies = df_ui[df_ui["is_anomaly"]]
-                    if not anomalies.empty:
-                        count_by_series = (
-                            anomalies.groupby("series_id", dropna=False)
-                            .size()
-                            .reset_index(name="anomaly_count")
-                            .sort_values("anomaly_count", ascending=False)
-                        )
-                        # limitar categorías visibles para no generar figuras gigantes
-                        top_n = st.slider("Series a mostrar en la barra", 10, 200, 50, step=10)
-                        fig = px.bar(
-                            count_by_series.head(top_n),
-                            x="series_id",
-                            y="anomaly_count",
-                            title="Número de anomalías por serie",
-                            labels={"series_id": "Serie", "anomaly_count": "Anomalías"},
-                        )
-                        fig.update_layout(xaxis_tickangle=-45)
-                        st.plotly_chart(fig, use_container_width=True)
-
-                # --- 4) Scatter con muestreo y WebGL (muy importante) ---
-                # Muestra SIEMPRE todos los puntos anómalos y SOLO una muestra de los normales
-                if {"ts_col", "value"}.issubset(df_ui.columns):
-                    df_sorted = df_ui.sort_values("ts_col")
-                    mask = df_sorted["is_anomaly"].fillna(False) if "is_anomaly" in df_sorted.columns else pd.Series(False, index=df_sorted.index)
-                    anomalies = df_sorted[mask]
-                    normals = df_sorted[~mask]
-
-                    max_normals = st.slider("Puntos normales máximos en el gráfico", 5_000, 200_000, 50_000, step=5_000)
-                    if len(normals) > max_normals:
-                        normals = normals.sample(max_normals, random_state=42)
-
-                    plot_df = pd.concat([normals, anomalies], ignore_index=True)
-                    # Etiquetas legibles para color
-                    estado = plot_df["is_anomaly"].fillna(False) if "is_anomaly" in plot_df.columns else pd.Series(False, index=plot_df.index)
-                    plot_df["Estado"] = np.where(estado, "Anomalía", "Normal")
-
-                    fig2 = px.scatter(
-                        plot_df,
-                        x="ts_col",
-                        y="value",
-                        color="Estado",
-                        title="Serie temporal con anomalías destacadas",
-                        labels={"ts_col": "Fecha", "value": "Valor"},
-                        render_mode="webgl",  # WebGL -> más eficiente para muchos puntos
-                    )
-                    fig2.update_traces(marker=dict(size=6))
-                    st.plotly_chart(fig2, use_container_width=True) 
+            # El resultado se queda en el backend; sólo viajan las filas que se muestran
+            st.session_state[CURSOR_KEY] = open_result_cursor(predict_sql, page=PAGE_KEY)
         except Exception as e:
+            st.session_state.pop(CURSOR_KEY, None)
             st.error(f"Error al detectar anomalías: {e}")
+
+
+def _compact(df: pd.DataFrame) -> pd.DataFrame:
+    # series_id ya llega como category y los valores en float32 (lib.frames)
+    if "is_anomaly" in df.columns:
+        df["is_anomaly"] = df["is_anomaly"].fillna(False).astype(bool)
+    return df
+
+
+def _csv_bytes(cursor, columns) -> bytes:
+    # Se genera al pulsar "Descargar", por lotes Arrow desde el backend
+    buf = io.BytesIO()
+    writer = None
+    for batch in cursor.iter_batches(columns):
+        if writer is None:
+            writer = pa_csv.CSVWriter(buf, batch.schema)
+        writer.write_batch(batch)
+    if writer is not None:
+        writer.close()
+    return buf.getvalue()
+
+
+cursor = st.session_state.get(CURSOR_KEY)
+if cursor is not None:
+    try:
+        if cursor.total_rows == 0:
+            st.info("No se encontraron resultados para el periodo seleccionado.")
+        else:
+            # --- 1) Reducir datos que viajan al frontend ---
+            # Qué columnas realmente necesitas para UI/plots:
+            ui_cols = [c for c in ["series_id", "ts_col", "value", "is_anomaly", "anomaly_probability"]
+                       if c in cursor.columns]
+
+            st.subheader("Resultados de la detección de anomalías")
+
+            # --- 2) Tabla paginada en el servidor (sólo se descarga la página visible) ---
+            with st.expander("Ver tabla de resultados (paginada)", expanded=False):
+                c1, c2, c3 = st.columns(3)
+                page_size = c1.number_input("Filas por página", min_value=500, max_value=50_000, value=5_000, step=500)
+                sort_col = c2.selectbox("Ordenar por", [RESULT_ORDER] + ui_cols)
+                descending = c3.checkbox("Descendente", value=False, disabled=sort_col == RESULT_ORDER)
+                total_pages = max(1, math.ceil(cursor.total_rows / page_size))
+                page = st.number_input("Página", min_value=1, max_value=total_pages, value=1, step=1)
+                view = cursor if sort_col == RESULT_ORDER else sort_result(
+                    cursor, sort_col, ascending=not descending, page=PAGE_KEY
+                )
+                start = (page - 1) * page_size
+                end = start + page_size
+                st.caption(f"Mostrando {start+1:,}–{min(end, cursor.total_rows):,} de {cursor.total_rows:,} filas")
+                st.dataframe(_compact(view.page(start, page_size, ui_cols)), width="stretch")
+                if cursor.total_rows <= MAX_DOWNLOAD_ROWS:
+                    st.download_button(
+                        "Descargar CSV (completo)",
+                        lambda: _csv_bytes(view, ui_cols),
+                        "anomaly_results.csv",
+                        "text/csv",
+                    )
+                else:
+                    st.info("El resultado es muy grande para descargar aquí. Exporta a un almacenamiento externo (S3, GCS, etc.) y comparte el link.")
+
+            # --- 3) Gráfico de anomalías por serie (agregado en el backend) ---
+            if "is_anomaly" in cursor.columns and "series_id" in cursor.columns:
+                # limitar categorías visibles para no generar figuras gigantes
+                top_n = st.slider("Series a mostrar en la barra", 10, 200, 50, step=10)
+                count_by_series = query_result(
+                    cursor,
+                    f"""
+                    SELECT series_id, COUNTIF(is_anomaly) AS anomaly_count
+                    FROM {{result}}
+                    GROUP BY series_id
+                    HAVING COUNTIF(is_anomaly) > 0
+                    ORDER BY anomaly_count DESC
+                    LIMIT {int(top_n)}
+                    """,
+                    page=PAGE_KEY,
+                )
+                if not count_by_series.empty:
+                    count_by_series["series_id"] = count_by_series["series_id"].astype(str)
+                    fig = px.bar(
+                        count_by_series,
+                        x="series_id",
+                        y="anomaly_count",
+                        title="Número de anomalías por serie",
+                        labels={"series_id": "Serie", "anomaly_count": "Anomalías"},
+                    )
+                    fig.update_layout(xaxis_tickangle=-45)
+                    st.plotly_chart(fig, width="stretch")
+
+            # --- 4) Scatter con muestreo y WebGL (muy importante) ---
+            # Muestra SIEMPRE todos los puntos anómalos y SOLO una muestra de los normales,
+            # muestreada en el backend
+            if {"ts_col", "value"}.issubset(cursor.columns):
+                max_normals = st.slider("Puntos normales máximos en el gráfico", 5_000, 200_000, 50_000, step=5_000)
+                has_flag = "is_anomaly" in cursor.columns
+                anomaly_expr = "IFNULL(is_anomaly, FALSE)" if has_flag else "FALSE"
+                if has_flag:
+                    n_anomalies = int(query_result(
+                        cursor, f"SELECT COUNTIF({anomaly_expr}) AS n FROM {{result}}", page=PAGE_KEY
+                    )["n"].iloc[0])
+                else:
+                    n_anomalies = 0
+                n_normals = cursor.total_rows - n_anomalies
+                fraction = min(1.0, max_normals / n_normals) if n_normals else 1.0
+                plot_df = query_result(
+                    cursor,
+                    f"""
+                    SELECT ts_col, value, {anomaly_expr} AS is_anomaly
+                    FROM {{result}}
+                    WHERE {anomaly_expr} OR RAND() < {fraction!r}
+                    ORDER BY ts_col
+                    """,
+                    page=PAGE_KEY,
+                )
+                # Etiquetas legibles para color
+                plot_df["Estado"] = np.where(plot_df["is_anomaly"].fillna(False), "Anomalía", "Normal")
+
+                fig2 = px.scatter(
+                    plot_df,
+                    x="ts_col",
+                    y="value",
+                    color="Estado",
+                    title="Serie temporal con anomalías destacadas",
+                    labels={"ts_col": "Fecha", "value": "Valor"},
+                    render_mode="webgl",  # WebGL -> más eficiente para muchos puntos
+                )
+                fig2.update_traces(marker=dict(size=6))
+                st.plotly_chart(fig2, width="stretch")
+    except Exception as e:
+        # p. ej. la tabla de resultados de BigQuery caducó (~24 h): hay que volver a detectar
+        st.error(f"Error al leer los resultados de la detección: {e}")
+
+query_telemetry_sidebar()
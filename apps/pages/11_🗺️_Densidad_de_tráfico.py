@@ -0,0 +1,61 @@
+import streamlit as st
+from lib.bq import get_density_tiles
+from lib.density_tiles import DEFAULT_MAX_TILES
+from lib.ui import show_density_map
+
+st.header("Densidad de tráfico")
+
+# (lon_min, lat_min, lon_max, lat_max)
+REGIONS = {
+    "EE. UU. (todas las costas)": (-171.0, 17.0, -64.0, 62.0),
+    "Costa Este": (-82.0, 24.0, -66.0, 45.5),
+    "Golfo de México": (-98.0, 18.0, -80.0, 31.0),
+    "Costa Oeste": (-126.0, 32.0, -116.0, 49.0),
+    "Grandes Lagos": (-93.0, 41.0, -75.0, 49.5),
+    "Alaska": (-171.0, 51.0, -129.0, 72.0),
+    "Hawái": (-161.0, 18.5, -154.0, 22.5),
+    "Puerto de Houston": (-95.4, 29.3, -94.6, 29.9),
+    "Nueva York / Nueva Jersey": (-74.3, 40.4, -73.7, 40.9),
+    "Los Ángeles / Long Beach": (-118.5, 33.5, -118.0, 33.85),
+}
+
+tiles = get_density_tiles()
+if tiles is None:
+    st.info(
+        "No hay pirámide de densidad. Constrúyela con `src/pipeline/tiles/density_tiles.py` "
+        "y apunta `DENSITY_TILES_PATH` a su directorio de salida."
+    )
+    st.stop()
+
+first, last = tiles.date_range()
+start_date = st.date_input("Desde", value=first, min_value=first, max_value=last)
+end_date = st.date_input("Hasta", value=last, min_value=first, max_value=last)
+classes = st.multiselect("Clases de buque", options=tiles.classes, placeholder="Todas")
+
+region = st.selectbox("Zona", list(REGIONS) + ["Personalizada"])
+if region == "Personalizada":
+    c1, c2, c3, c4 = st.columns(4)
+    lon_min = c1.number_input("Lon mín", -180.0, 180.0, -98.0)
+    lat_min = c2.number_input("Lat mín", -85.0, 85.0, 18.0)
+    lon_max = c3.number_input("Lon máx", -180.0, 180.0, -80.0)
+    lat_max = c4.number_input("Lat máx", -85.0, 85.0, 31.0)
+    bbox = (lon_min, min(lat_min, lat_max), lon_max, max(lat_min, lat_max))
+else:
+    bbox = REGIONS[region]
+
+# Niveles más finos que el automático, hasta 4 veces sus teselas (nunca la pirámide entera)
+min_zoom = tiles.manifest["min_zoom"]
+auto_zoom = tiles.zoom_for_bbox(bbox)
+finest_zoom = tiles.zoom_for_bbox(bbox, max_tiles=4 * DEFAULT_MAX_TILES)
+with st.expander("Nivel de detalle"):
+    zoom = st.slider(
+        "Nivel de la pirámide",
+        min_zoom,
+        max(finest_zoom, min_zoom + 1),
+        auto_zoom,
+        help="Por defecto, el más fino que cubre la zona con pocas teselas. "
+        "Niveles más finos leen más teselas.",
+    )
+
+cells = tiles.load_cells(bbox, zoom=zoom, start=start_date, end=end_date, classes=classes or None)
+show_density_map(cells, bbox)
@@ -0,0 +1,78 @@
+import time
+
+import streamlit as st
+from lib.bq import query_telemetry
+from lib.cache_warmer import describe, last_warm_report
+from lib.cost_guard import format_bytes
+from lib.lazy import lazy_import
+from lib.telemetry import summarize, warm_hit_rates
+from lib.ui import chart_bar
+
+pd = lazy_import("pandas")
+
+st.header("Telemetría de consultas")
+
+PERIODS = {"Última hora": 3600, "Últimas 24 h": 86400, "Últimos 7 días": 7 * 86400, "Todo": None}
+
+period = st.selectbox("Periodo", list(PERIODS), index=1)
+window = PERIODS[period]
+events = query_telemetry(since=time.time() - window if window else None)
+if events.empty:
+    st.info("No hay consultas registradas en el periodo.")
+    st.stop()
+
+# Antes de quitar los aciertos de caché: son los que mide el precalentado
+st.subheader("Precalentado de caché")
+warm_rates = warm_hit_rates(events)
+last_warm = last_warm_report()
+if last_warm:
+    st.caption(f"Última pasada {pd.to_datetime(last_warm['started'], unit='s'):%Y-%m-%d %H:%M} · {describe(last_warm)}")
+if warm_rates.empty or not warm_rates["warmed"].any():
+    st.info("Ninguna vista abierta en el periodo estaba precalentada (python -m lib.cache_warmer).")
+else:
+    opened, warmed, hits = warm_rates["opened"].sum(), warm_rates["warmed"].sum(), warm_rates["warm_hits"].sum()
+    st.caption(
+        f"{warmed} de {opened} vistas abiertas estaban precalentadas ({warmed / opened:.0%}); "
+        f"{hits} se sirvieron desde la caché ({hits / warmed:.0%})."
+    )
+    st.dataframe(warm_rates, width="stretch", hide_index=True)
+
+include_cache = st.checkbox(
+    "Incluir resultados servidos desde la caché de la app", value=False,
+    help="Sin ellos, las latencias son las de las consultas que llegaron al motor.",
+)
+if not include_cache:
+    events = events[events["source"] != "app_cache"]
+    if events.empty:
+        st.info("Todas las consultas del periodo se sirvieron desde la caché.")
+        st.stop()
+
+st.caption(
+    f"{len(events)} consultas · procesado {format_bytes(events['bytes_processed'].fillna(0).sum())} · "
+    f"facturado {format_bytes(events['bytes_billed'].fillna(0).sum())}"
+)
+
+by_page = summarize(events, by=["page"])
+st.subheader("Por página")
+st.dataframe(by_page, width="stretch", hide_index=True)
+chart_bar(by_page, x="page", y="p95_ms", title="Latencia p95 por página (ms)")
+
+st.subheader("Por página y consulta")
+st.dataframe(summarize(events, by=["page", "query"]), width="stretch", hide_index=True)
+
+# Mismos filtros repetidos (misma huella): candidatos a preagregar o precalcular
+st.subheader("Consultas repetidas")
+repeated = (
+    events.groupby(["page", "query", "fingerprint"], dropna=False)
+    .agg(runs=("ts", "size"), p50_ms=("duration_ms", "median"), bytes=("bytes_processed", "sum"))
+    .reset_index()
+    .query("runs > 1")
+    .sort_values("bytes", ascending=False)
+)
+st.dataframe(repeated, width="stretch", hide_index=True)
+
+errors = events[events["source"] == "error"]
+if not errors.empty:
+    st.subheader("Errores")
+    errors = errors.assign(hora=pd.to_datetime(errors["ts"], unit="s"))
+    st.dataframe(errors[["hora", "page", "query", "duration_ms", "error"]], width="stretch", hide_index=True)
@@ -1,17 +1,19 @@
 import streamlit as st
-from lib.bq import run_query_df, get_default_dates
-from lib.queries import cambios_direccion_query
-from lib.query_utils import build_bbox_filter
-from lib.ui import mmsi_multiselect, DEFAULT_LIMIT, show_geohash_map
+from lib.bq import get_default_dates
+from lib.queries import PAGE_DEFAULTS, cambios_direccion_query
+from lib.query_utils import build_geohash_bbox_filter
+from lib.ui import mmsi_multiselect, show_geohash_map, run_page_query
 
 st.header("Cambios de dirección ≥ Δ (grados)")
 
+defaults = PAGE_DEFAULTS["cambios_direccion"]
+
 default_start, default_end = get_default_dates()
 
 start_date = st.date_input("Desde", value=default_start)
 end_date = st.date_input("Hasta", value=default_end)
-max_dt = st.number_input("Máx. separación entre mensajes (min)", 1, 120, 10)
-min_delta = st.slider("Δ rumbo mínimo (°)", 10.0, 180.0, 45.0, 1.0)
+max_dt = st.number_input("Máx. separación entre mensajes (min)", 1, 120, defaults["max_dt"])
+min_delta = st.slider("Δ rumbo mínimo (°)", 10.0, 180.0, defaults["min_delta"], 1.0)
 
 mmsi = mmsi_multiselect()
 with st.expander("Filtro geográfico (opcional)"):
@@ -21,11 +23,11 @@ with st.expander("Filtro geográfico (opcional)"):
     lon_max = st.number_input("Lon máx", -180.0, 180.0, format="%f")
     use_bbox = st.checkbox("Usar bounding box")
 
-limit = st.number_input("Límite", 50, 5000, DEFAULT_LIMIT, step=50)
+limit = st.number_input("Límite", 50, 5000, defaults["limit"], step=50)
 
-bbox_filter = build_bbox_filter(lat_min, lat_max, lon_min, lon_max, use_bbox)
-sql = cambios_direccion_query(start_date, end_date, mmsi, min_delta, bbox_filter, limit)
-df = run_query_df(sql)
+bbox_filter = build_geohash_bbox_filter(lat_min, lat_max, lon_min, lon_max, use_bbox)
+sql = cambios_direccion_query(start_date, end_date, mmsi, max_dt, min_delta, bbox_filter, limit)
+df = run_page_query(sql, "cambios_direccion")
 
 st.dataframe(df, width="stretch")
 show_geohash_map(df)
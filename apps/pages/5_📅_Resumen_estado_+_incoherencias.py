@@ -1,10 +1,12 @@
 import streamlit as st
-from lib.bq import run_query_df, distinct_values, get_default_dates
-from lib.queries import resumen_estado_query
-from lib.ui import chart_bar, DEFAULT_LIMIT
+from lib.bq import distinct_values, get_default_dates
+from lib.queries import PAGE_DEFAULTS, incoherencias_estado_query, resumen_estado_query
+from lib.ui import chart_bar, run_page_queries
 
 st.header("Resumen por estado + incoherencias")
 
+defaults = PAGE_DEFAULTS["resumen_estado"]
+
 default_start, default_end = get_default_dates()
 
 col1, col2 = st.columns(2)
@@ -16,11 +18,23 @@ with col2:
 statuses = st.multiselect(
     "Estados de navegación", options=distinct_values("NavStatusName")
 )
-sog_thr = st.slider("Umbral SOG para incoherencias", 0.0, 10.0, 2.0, 0.1)
-limit = st.number_input("Límite (incoherencias)", 50, 5000, DEFAULT_LIMIT, step=50)
-
-sql = resumen_estado_query(start, end, statuses)
-df = run_query_df(sql)
+sog_thr = st.slider("Umbral SOG para incoherencias", 0.0, 10.0, defaults["sog_thr"], 0.1)
+limit = st.number_input("Límite (incoherencias)", 50, 5000, defaults["limit"], step=50)
 
 st.subheader("Resumen por estado")
-st.dataframe(df, width="stretch")
+resumen_box = st.container()
+st.subheader("Incoherencias (Moored / At Anchor con SOG > umbral)")
+inc_box = st.container()
+
+# Las dos consultas son independientes: se lanzan a la vez y cada tabla se
+# pinta en cuanto llega su resultado.
+boxes = {"resumen": resumen_box, "incoherencias": inc_box}
+queries = {
+    "resumen": resumen_estado_query(start, end, statuses),
+    "incoherencias": incoherencias_estado_query(start, end, sog_thr, limit),
+}
+for name, df, cost in run_page_queries(queries, "resumen_estado"):
+    with boxes[name]:
+        st.dataframe(df, width="stretch")
+        if cost:
+            st.caption(cost)
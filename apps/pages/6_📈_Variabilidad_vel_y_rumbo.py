@@ -1,7 +1,7 @@
 import streamlit as st
-from lib.bq import run_query_df, distinct_values, get_default_dates
-from lib.queries import variabilidad_query
-from lib.ui import chart_bar
+from lib.bq import distinct_values, get_default_dates
+from lib.queries import PAGE_DEFAULTS, variabilidad_query
+from lib.ui import chart_bar, run_page_query
 
 st.header("Variabilidad de velocidad y rumbo por tipo")
 
@@ -10,10 +10,10 @@ default_start, default_end = get_default_dates()
 start = st.date_input("Desde", value=default_start)
 end = st.date_input("Hasta", value=default_end)
 vtypes = st.multiselect("Tipos de buque", options=distinct_values("VesselTypeName"))
-min_n = st.number_input("Mín. muestras por tipo", 10, 100000, 100)
+min_n = st.number_input("Mín. muestras por tipo", 10, 100000, PAGE_DEFAULTS["variabilidad"]["min_n"])
 
 sql = variabilidad_query(start, end, vtypes, min_n)
-df = run_query_df(sql)
+df = run_page_query(sql, "variabilidad")
 
 st.dataframe(df, width="stretch")
 if not df.empty:
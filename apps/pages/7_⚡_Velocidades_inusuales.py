@@ -1,20 +1,22 @@
 import streamlit as st
-from lib.bq import run_query_df, distinct_values, get_default_dates
-from lib.queries import velocidades_inusuales_query
-from lib.ui import chart_bar, DEFAULT_LIMIT
+from lib.bq import distinct_values, get_default_dates
+from lib.queries import PAGE_DEFAULTS, velocidades_inusuales_query
+from lib.ui import chart_bar, run_page_query
 
 st.header("Velocidades inusuales por tipo")
 
+defaults = PAGE_DEFAULTS["velocidades_inusuales"]
+
 default_start, default_end = get_default_dates()
 
 start = st.date_input("Desde", value=default_start)
 end = st.date_input("Hasta", value=default_end)
 vtypes = st.multiselect("Tipos de buque", options=distinct_values("VesselTypeName"))
-p = st.slider("Percentil p", 80, 99, 95)
-limit = st.number_input("Límite", 50, 5000, DEFAULT_LIMIT, step=50)
+p = st.slider("Percentil p", 80, 99, defaults["percentile"])
+limit = st.number_input("Límite", 50, 5000, defaults["limit"], step=50)
 
 sql = velocidades_inusuales_query(start, end, vtypes, p, limit)
-df = run_query_df(sql)
+df = run_page_query(sql, "velocidades_inusuales")
 
 st.dataframe(df, width="stretch")
 if not df.empty:
@@ -1,14 +1,17 @@
 import streamlit as st
-from lib.bq import run_query_df, distinct_values
+from lib.bq import distinct_values
 from lib.queries import velocidad_dia_semana_query
-import plotly.express as px
+from lib.ui import run_page_query
+from lib.lazy import lazy_import
+
+px = lazy_import("plotly.express")
 
 st.header("Velocidad promedio por día de la semana")
 
 vtypes = st.multiselect("Tipos de buque", options=distinct_values("VesselTypeName"))
 
 sql = velocidad_dia_semana_query(vtypes)
-df = run_query_df(sql)
+df = run_page_query(sql, "velocidad_dia_semana")
 
 st.dataframe(df, width="stretch")
 
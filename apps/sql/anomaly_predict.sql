@@ -0,0 +1,26 @@
+-- Detección de anomalías con un modelo ARIMA_PLUS entrenado (ML.DETECT_ANOMALIES)
+-- Parámetros: @start_date DATE, @end_date DATE, @vessel_types ARRAY<STRING>, @threshold FLOAT64
+SELECT
+  series_id,
+  ts_col,
+  value,
+  is_anomaly,
+  anomaly_probability,
+  lower_bound,
+  upper_bound
+FROM ML.DETECT_ANOMALIES(
+  MODEL `{{MODEL}}`,
+  STRUCT(@threshold AS anomaly_prob_threshold),
+  (
+    SELECT
+      {{ID_COL}} AS series_id,
+      {{TS_EXPR}} AS ts_col,
+      {{METRIC_EXPR}} AS value
+    FROM `{{TABLE}}`
+    WHERE {{TS_EXPR}} IS NOT NULL
+      AND DATE(BaseDateTime) BETWEEN @start_date AND @end_date
+      AND (ARRAY_LENGTH(@vessel_types) = 0 OR VesselTypeName IN UNNEST(@vessel_types))
+    GROUP BY series_id, ts_col
+  )
+)
+ORDER BY anomaly_probability DESC;
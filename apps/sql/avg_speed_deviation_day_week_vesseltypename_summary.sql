@@ -0,0 +1,23 @@
+-- Velocidad media y desviación por tipo y día de la semana desde la tabla resumen diaria
+-- Parámetros: @vessel_types ARRAY<STRING>
+WITH t AS (
+  SELECT
+    VesselTypeName,
+    FORMAT_DATE('%A', date) AS dow,
+    EXTRACT(DAYOFWEEK FROM date) AS dow_sun1, -- 1=Dom ... 7=Sáb
+    n_rows, n_sog, sum_sog, sumsq_sog
+  FROM `{{SUMMARY_TABLE}}`
+  WHERE VesselTypeName IS NOT NULL
+    AND (ARRAY_LENGTH(@vessel_types) = 0 OR VesselTypeName IN UNNEST(@vessel_types))
+)
+SELECT
+  VesselTypeName,
+  dow,
+  SAFE_DIVIDE(SUM(sum_sog), SUM(n_sog)) AS avg_sog,
+  SQRT(GREATEST(SAFE_DIVIDE(SUM(sumsq_sog) - SAFE_DIVIDE(SUM(sum_sog) * SUM(sum_sog), SUM(n_sog)), SUM(n_sog) - 1), 0)) AS sd_sog,
+  SUM(n_rows) AS n
+FROM t
+GROUP BY VesselTypeName, dow, dow_sun1
+ORDER BY
+  VesselTypeName,
+  (MOD(dow_sun1 + 5, 7) + 1);  -- rota para que L=1, M=2, …, D=7
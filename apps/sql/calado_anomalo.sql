@@ -1,35 +1,15 @@
--- Calado anómalo por buque (z-score sobre promedio por tipo)
--- Parámetros: @start_date DATE, @end_date DATE, @vessel_types ARRAY<STRING>, @z_min FLOAT64, @limit INT64
-WITH per_vessel AS (
+-- Calado por buque y día: parciales combinables (lib.partial_aggregates calcula medias, desviación y z-score)
+-- Parámetros: @start_date DATE, @end_date DATE, @vessel_types ARRAY<STRING>
 SELECT
-VesselTypeName AS vt,
-MMSI,
-AVG(CAST(Draft AS FLOAT64)) AS avg_draft
+  DATE(BaseDateTime) AS day,
+  VesselTypeName,
+  MMSI,
+  COUNT(*) AS n_draft,
+  SUM(CAST(Draft AS FLOAT64)) AS sum_draft,
+  MIN(CAST(Draft AS FLOAT64)) AS min_draft,
+  MAX(CAST(Draft AS FLOAT64)) AS max_draft
 FROM `{{TABLE}}`
 WHERE Draft IS NOT NULL
-AND (@start_date IS NULL OR DATE(BaseDateTime) >= @start_date)
-AND (@end_date IS NULL OR DATE(BaseDateTime) <= @end_date)
-AND (ARRAY_LENGTH(@vessel_types) = 0 OR VesselTypeName IN UNNEST(@vessel_types))
-GROUP BY vt, MMSI
-),
-stats AS (
-SELECT
-vt,
-AVG(avg_draft) AS mu,
-STDDEV_SAMP(avg_draft) AS sd
-FROM per_vessel
-GROUP BY vt
-)
-SELECT
-p.vt AS VesselTypeName,
-p.MMSI,
-p.avg_draft,
-s.mu,
-s.sd,
-ABS(p.avg_draft - s.mu) / NULLIF(s.sd, 0) AS z
-FROM per_vessel p
-JOIN stats s USING (vt)
-WHERE s.sd > 0
-AND ABS(p.avg_draft - s.mu) / s.sd >= @z_min
-ORDER BY z DESC
-LIMIT @limit;
\ No newline at end of file
+  AND DATE(BaseDateTime) BETWEEN @start_date AND @end_date
+  AND (ARRAY_LENGTH(@vessel_types) = 0 OR VesselTypeName IN UNNEST(@vessel_types))
+GROUP BY day, VesselTypeName, MMSI;
@@ -1,14 +1,27 @@
--- Correlación de SOG vs Draft por tipo de buque
--- Parámetros: @start_date DATE, @end_date DATE, @vessel_types ARRAY<STRING>, @min_n INT64
+-- Correlación entre dos métricas por tipo de buque (SOG vs Draft por defecto): parciales por día
+-- Parámetros: @start_date DATE, @end_date DATE, @vessel_types ARRAY<STRING>
+-- {{COL1}}, {{COL2}}: columnas numéricas a correlacionar.
+-- Conteo, sumas y momentos centrados del día (m2_*, c_xy) se combinan entre días; lib.partial_aggregates calcula CORR.
+WITH data AS (
+  SELECT
+    DATE(BaseDateTime) AS day,
+    VesselTypeName,
+    CAST({{COL1}} AS FLOAT64) AS x,
+    CAST({{COL2}} AS FLOAT64) AS y
+  FROM `{{TABLE}}`
+  WHERE {{COL1}} IS NOT NULL
+    AND {{COL2}} IS NOT NULL
+    AND DATE(BaseDateTime) BETWEEN @start_date AND @end_date
+    AND (ARRAY_LENGTH(@vessel_types) = 0 OR VesselTypeName IN UNNEST(@vessel_types))
+)
 SELECT
-VesselTypeName,
-CORR(SOG, Draft) AS corr_pearson,
-COUNT(*) AS n
-FROM `{{TABLE}}`
-WHERE SOG IS NOT NULL AND Draft IS NOT NULL
-AND (@start_date IS NULL OR DATE(BaseDateTime) >= @start_date)
-AND (@end_date IS NULL OR DATE(BaseDateTime) <= @end_date)
-AND (ARRAY_LENGTH(@vessel_types) = 0 OR VesselTypeName IN UNNEST(@vessel_types))
-GROUP BY VesselTypeName
-HAVING n >= @min_n
-ORDER BY corr_pearson;
\ No newline at end of file
+  day,
+  VesselTypeName,
+  COUNT(*) AS n,
+  SUM(x) AS sum_x,
+  SUM(y) AS sum_y,
+  VAR_POP(x) * COUNT(*) AS m2_x,
+  VAR_POP(y) * COUNT(*) AS m2_y,
+  COVAR_POP(x, y) * COUNT(*) AS c_xy
+FROM data
+GROUP BY day, VesselTypeName;
@@ -0,0 +1,16 @@
+-- Catálogo de valores de los filtros desde la tabla diaria "ais_dim_catalog_daily"
+-- (acción "summaries" del table manager); una fila por (dimension, value).
+-- Los atributos (VesselName, CallSign...) sólo vienen en las filas de MMSI:
+-- el último valor no nulo visto.
+SELECT
+  dimension,
+  value,
+  SUM(n_rows) AS n,
+  MIN(date) AS first_seen,
+  MAX(date) AS last_seen,
+  MAX_BY(VesselName, IF(VesselName IS NULL, NULL, date)) AS VesselName,
+  MAX_BY(CallSign, IF(CallSign IS NULL, NULL, date)) AS CallSign,
+  MAX_BY(IMO, IF(IMO IS NULL, NULL, date)) AS IMO,
+  MAX_BY(VesselTypeName, IF(VesselTypeName IS NULL, NULL, date)) AS VesselTypeName
+FROM `{{CATALOG_TABLE}}`
+GROUP BY dimension, value;
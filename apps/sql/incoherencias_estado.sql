@@ -1,14 +1,15 @@
--- Resumen por estado en un día (o rango)
--- Parámetros: @start_date DATE, @end_date DATE, @nav_status ARRAY<STRING>
+-- Incoherencias: Moored / At Anchor con SOG > umbral
+-- Parámetros: @start_date DATE, @end_date DATE, @sog_thr FLOAT64, @limit INT64
 SELECT
-DATE(BaseDateTime) AS d,
-NavStatusName,
-AVG(Draft) AS avg_draft,
-MAX(SOG) AS max_sog,
-COUNT(*) AS msgs
+  MMSI,
+  ANY_VALUE(VesselName) AS VesselName,
+  BaseDateTime,
+  NavStatusName,
+  SOG
 FROM `{{TABLE}}`
-WHERE (@start_date IS NULL OR DATE(BaseDateTime) >= @start_date)
-AND (@end_date IS NULL OR DATE(BaseDateTime) <= @end_date)
-AND (ARRAY_LENGTH(@nav_status) = 0 OR NavStatusName IN UNNEST(@nav_status))
-GROUP BY d, NavStatusName
-ORDER BY d, NavStatusName;
\ No newline at end of file
+WHERE NavStatusName IN ('Moored', 'At Anchor')
+  AND SOG > @sog_thr
+  AND DATE(BaseDateTime) BETWEEN @start_date AND @end_date
+GROUP BY MMSI, BaseDateTime, NavStatusName, SOG
+ORDER BY SOG DESC
+LIMIT @limit;
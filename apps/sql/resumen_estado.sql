@@ -1,12 +1,17 @@
--- Incoherencias: Moored / At Anchor con SOG > umbral
--- Parámetros: @start_date DATE, @end_date DATE, @sog_thr FLOAT64, @limit INT64
+-- Resumen por estado de navegación: parciales por día (lib.partial_aggregates los combina)
+-- Parámetros: @start_date DATE, @end_date DATE, @nav_status ARRAY<STRING>
+-- Los MMSI distintos de cada día se unen entre días (COUNT DISTINCT exacto)
 SELECT
-MMSI, ANY_VALUE(VesselName) AS VesselName,
-BaseDateTime, NavStatusName, SOG
+  DATE(BaseDateTime) AS day,
+  NavStatusName,
+  COUNT(*) AS total_messages,
+  ARRAY_AGG(DISTINCT MMSI IGNORE NULLS) AS mmsis,
+  COUNT(SOG) AS n_sog,
+  SUM(CAST(SOG AS FLOAT64)) AS sum_sog,
+  COUNT(Draft) AS n_draft,
+  SUM(CAST(Draft AS FLOAT64)) AS sum_draft
 FROM `{{TABLE}}`
-WHERE NavStatusName IN ('Moored','At Anchor')
-AND SOG > @sog_thr
-AND (@start_date IS NULL OR DATE(BaseDateTime) >= @start_date)
-AND (@end_date IS NULL OR DATE(BaseDateTime) <= @end_date)
-ORDER BY SOG DESC
-LIMIT @limit;
\ No newline at end of file
+WHERE NavStatusName IS NOT NULL
+  AND DATE(BaseDateTime) BETWEEN @start_date AND @end_date
+  AND (ARRAY_LENGTH(@nav_status) = 0 OR NavStatusName IN UNNEST(@nav_status))
+GROUP BY day, NavStatusName;
@@ -0,0 +1,15 @@
+-- Resumen por estado desde la tabla resumen diaria (acción "summaries" del table manager)
+-- Parámetros: @start_date DATE, @end_date DATE, @nav_status ARRAY<STRING>
+-- unique_vessels: HLL (aprox. ±1%) sobre los sketches diarios
+SELECT
+  NavStatusName,
+  SUM(n_rows) AS total_messages,
+  HLL_COUNT.MERGE(mmsi_sketch) AS unique_vessels,
+  SAFE_DIVIDE(SUM(sum_sog), SUM(n_sog)) AS avg_sog,
+  SAFE_DIVIDE(SUM(sum_draft), SUM(n_draft)) AS avg_draft
+FROM `{{SUMMARY_TABLE}}`
+WHERE NavStatusName IS NOT NULL
+  AND date BETWEEN @start_date AND @end_date
+  AND (ARRAY_LENGTH(@nav_status) = 0 OR NavStatusName IN UNNEST(@nav_status))
+GROUP BY NavStatusName
+ORDER BY total_messages DESC;
@@ -0,0 +1,17 @@
+-- Posiciones recientes (consulta genérica de ubicación)
+-- Parámetros: @start_date DATE, @end_date DATE, @vessel_types ARRAY<STRING>, @mmsi ARRAY<STRING>, @limit INT64
+-- {{ADDITIONAL_COLUMNS}}: ", col1, col2" opcional; {{BBOX_FILTER}}: ver cambios_direccion.sql.
+SELECT
+  MMSI,
+  BaseDateTime,
+  geohash9,
+  VesselTypeName
+  {{ADDITIONAL_COLUMNS}}
+FROM `{{TABLE}}`
+WHERE geohash9 IS NOT NULL
+  AND DATE(BaseDateTime) BETWEEN @start_date AND @end_date
+  AND (ARRAY_LENGTH(@vessel_types) = 0 OR VesselTypeName IN UNNEST(@vessel_types))
+  AND (ARRAY_LENGTH(@mmsi) = 0 OR MMSI IN UNNEST(@mmsi))
+  {{BBOX_FILTER}}
+ORDER BY BaseDateTime DESC
+LIMIT @limit;
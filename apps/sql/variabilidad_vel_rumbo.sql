@@ -1,14 +1,17 @@
--- Variabilidad (desviación estándar) de SOG y Heading por tipo
--- Parámetros: @start_date DATE, @end_date DATE, @vessel_types ARRAY<STRING>, @min_n INT64
+-- Variabilidad de SOG y COG por tipo: parciales por día con momentos centrados
+-- del día (m2_*), combinables entre días; lib.partial_aggregates calcula media y desviación
+-- Parámetros: @start_date DATE, @end_date DATE, @vessel_types ARRAY<STRING>
 SELECT
-VesselTypeName,
-STDDEV_SAMP(SOG) AS sd_sog,
-STDDEV_SAMP(Heading) AS sd_heading,
-COUNT(*) AS n
+  DATE(BaseDateTime) AS day,
+  VesselTypeName,
+  COUNT(*) AS n,
+  SUM(CAST(SOG AS FLOAT64)) AS sum_sog,
+  VAR_POP(CAST(SOG AS FLOAT64)) * COUNT(*) AS m2_sog,
+  SUM(CAST(COG AS FLOAT64)) AS sum_cog,
+  VAR_POP(CAST(COG AS FLOAT64)) * COUNT(*) AS m2_cog
 FROM `{{TABLE}}`
-WHERE (@start_date IS NULL OR DATE(BaseDateTime) >= @start_date)
-AND (@end_date IS NULL OR DATE(BaseDateTime) <= @end_date)
-AND (ARRAY_LENGTH(@vessel_types) = 0 OR VesselTypeName IN UNNEST(@vessel_types))
-GROUP BY VesselTypeName
-HAVING n >= @min_n
-ORDER BY sd_sog DESC;
\ No newline at end of file
+WHERE SOG IS NOT NULL
+  AND COG IS NOT NULL
+  AND DATE(BaseDateTime) BETWEEN @start_date AND @end_date
+  AND (ARRAY_LENGTH(@vessel_types) = 0 OR VesselTypeName IN UNNEST(@vessel_types))
+GROUP BY day, VesselTypeName;
@@ -0,0 +1,16 @@
+-- Variabilidad de SOG y COG desde la tabla resumen diaria
+-- Parámetros: @start_date DATE, @end_date DATE, @vessel_types ARRAY<STRING>, @min_n INT64
+-- Momentos por métrica: SOG y COG se agregan sobre sus no nulos por separado
+SELECT
+  VesselTypeName,
+  SUM(n_sog) AS n,
+  SQRT(GREATEST(SAFE_DIVIDE(SUM(sumsq_sog) - SAFE_DIVIDE(SUM(sum_sog) * SUM(sum_sog), SUM(n_sog)), SUM(n_sog) - 1), 0)) AS sd_sog,
+  SQRT(GREATEST(SAFE_DIVIDE(SUM(sumsq_cog) - SAFE_DIVIDE(SUM(sum_cog) * SUM(sum_cog), SUM(n_cog)), SUM(n_cog) - 1), 0)) AS sd_cog,
+  SAFE_DIVIDE(SUM(sum_sog), SUM(n_sog)) AS avg_sog,
+  SAFE_DIVIDE(SUM(sum_cog), SUM(n_cog)) AS avg_cog
+FROM `{{SUMMARY_TABLE}}`
+WHERE date BETWEEN @start_date AND @end_date
+  AND (ARRAY_LENGTH(@vessel_types) = 0 OR VesselTypeName IN UNNEST(@vessel_types))
+GROUP BY VesselTypeName
+HAVING SUM(n_sog) >= @min_n
+ORDER BY sd_sog DESC;
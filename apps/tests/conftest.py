@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Pages and lib modules import ``lib.*`` with apps/ as the working directory.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
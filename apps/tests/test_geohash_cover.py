@@ -0,0 +1,81 @@
+import geohash
+import numpy as np
+import pytest
+
+from lib.geohash_cover import (
+    BASE32,
+    bbox_geohash_cover,
+    cell_size,
+    geohash_range_predicate,
+    prefix_ranges,
+    prefix_successor,
+)
+
+BOXES = [
+    (19.0, 19.5, -96.5, -95.8),  # Veracruz port
+    (25.0, 30.0, -98.0, -80.0),  # Gulf of Mexico
+    (-0.2, 0.2, -0.3, 0.3),  # equator / prime meridian corners
+    (50.0, 52.0, 170.0, -170.0),  # crosses the antimeridian
+    (85.0, 90.0, -180.0, 180.0),  # polar cap, whole longitude range
+    (10.0, 10.0001, 20.0, 20.0001),  # tiny box at maximum precision
+]
+
+
+def _random_points(box, n, rng):
+    lat_min, lat_max, lon_min, lon_max = box
+    lat = rng.uniform(lat_min, lat_max, n)
+    if lon_min > lon_max:
+        lon = (rng.uniform(lon_min, lon_max + 360.0, n) + 180.0) % 360.0 - 180.0
+    else:
+        lon = rng.uniform(lon_min, lon_max, n)
+    corners = [(lat_min, lon_min), (lat_min, lon_max), (lat_max, lon_min), (lat_max, lon_max)]
+    return list(zip(lat, lon)) + corners
+
+
+@pytest.mark.parametrize("box", BOXES)
+@pytest.mark.parametrize("max_cells", [4, 32])
+def test_random_points_inside_the_box_are_covered(box, max_cells):
+    rng = np.random.default_rng(30)
+    cover = bbox_geohash_cover(*box, max_cells=max_cells)
+    ranges = prefix_ranges(cover)
+    for lat, lon in _random_points(box, 500, rng):
+        # geohash cells are half-open: the north/east edges belong to the cell below
+        cell = geohash.encode(min(lat, 90.0 - 1e-9), min(lon, 180.0 - 1e-9), 9)
+        assert any(cell.startswith(p) for p in cover), (lat, lon, cell)
+        assert any(lo <= cell and (hi is None or cell < hi) for lo, hi in ranges), (lat, lon, cell)
+
+
+@pytest.mark.parametrize("box", BOXES)
+def test_cover_stays_within_budget_and_precision(box):
+    cover = bbox_geohash_cover(*box, max_cells=16)
+    assert cover == sorted(set(cover))
+    assert 1 <= len(cover) <= 16
+    assert all(1 <= len(p) <= 9 and set(p) <= set(BASE32) for p in cover)
+    # No prefix is redundant with another one
+    assert not any(a != b and b.startswith(a) for a in cover for b in cover)
+
+
+def test_complete_sibling_groups_collapse_to_the_parent():
+    b = geohash.bbox("9q")
+    eps = 1e-9
+    assert bbox_geohash_cover(b["s"] + eps, b["n"] - eps, b["w"] + eps, b["e"] - eps, max_cells=32) == ["9q"]
+
+
+def test_cell_size():
+    assert cell_size(1) == (45.0, 45.0)
+    assert cell_size(2) == (5.625, 11.25)
+    lat, lon = cell_size(9)
+    assert lat == pytest.approx(4.29e-5, rel=1e-2) and lon == pytest.approx(4.29e-5, rel=1e-2)
+
+
+def test_prefix_successor_and_ranges():
+    assert prefix_successor("9q") == "9r"
+    assert prefix_successor("9z") == "b"
+    assert prefix_successor("zz") is None
+    assert prefix_ranges(["9q", "9r", "9t", "zz"]) == [("9q", "9s"), ("9t", "9u"), ("zz", None)]
+    assert prefix_ranges(["9q", "9qb"]) == [("9q", "9r")]
+
+
+def test_geohash_range_predicate():
+    assert geohash_range_predicate([]) == "FALSE"
+    assert geohash_range_predicate(["9q", "9r", "zz"], column="g") == "((g >= '9q' AND g < '9s') OR g >= 'zz')"
@@ -0,0 +1,79 @@
+import geohash
+import numpy as np
+import pandas as pd
+import pytest
+
+from lib.geohash_decode import MAX_PRECISION, decode_geohashes
+
+
+def _expected(cells):
+    lat, lon = [], []
+    for c in cells:
+        try:
+            la, lo, _, _ = geohash.decode_exactly(c.lower())
+        except (AttributeError, KeyError, ValueError, TypeError):
+            la = lo = np.nan
+        lat.append(la)
+        lon.append(lo)
+    return np.array(lat, dtype="float64"), np.array(lon, dtype="float64")
+
+
+@pytest.fixture
+def cells():
+    rng = np.random.default_rng(44)
+    lat = rng.uniform(-90, 90, 400)
+    lon = rng.uniform(-180, 180, 400)
+    precision = rng.integers(1, MAX_PRECISION + 1, 400)
+    return [geohash.encode(la, lo, int(p)) for la, lo, p in zip(lat, lon, precision)]
+
+
+def test_matches_decode_exactly(cells):
+    lat, lon = decode_geohashes(pd.Series(cells))
+    exp_lat, exp_lon = _expected(cells)
+    np.testing.assert_allclose(lat, exp_lat, rtol=0, atol=1e-12)
+    np.testing.assert_allclose(lon, exp_lon, rtol=0, atol=1e-12)
+
+
+def test_repeated_and_categorical_cells(cells):
+    repeated = pd.Series(cells[:20] * 5)
+    lat, lon = decode_geohashes(repeated)
+    exp_lat, exp_lon = _expected(repeated)
+    np.testing.assert_allclose(lat, exp_lat, rtol=0, atol=1e-12)
+    cat_lat, cat_lon = decode_geohashes(repeated.astype("category"))
+    np.testing.assert_array_equal(cat_lat, lat)
+    np.testing.assert_array_equal(cat_lon, lon)
+
+
+def test_uppercase_decodes_like_lowercase(cells):
+    upper = [c.upper() for c in cells]
+    np.testing.assert_array_equal(decode_geohashes(upper)[0], decode_geohashes(cells)[0])
+    np.testing.assert_array_equal(decode_geohashes(upper)[1], decode_geohashes(cells)[1])
+    mixed = decode_geohashes(["9Q8yYk"])
+    assert mixed[0][0] == pytest.approx(geohash.decode_exactly("9q8yyk")[0], abs=1e-12)
+
+
+@pytest.mark.parametrize("bad", [None, np.nan, "", "a", "9qi", "9ql", "9qo", "9q ", "9q-", "ñ", "9q8yyk€"])
+def test_null_empty_and_invalid_decode_to_nan(bad):
+    lat, lon = decode_geohashes(pd.Series(["9q8yyk", bad, "dr5r"], dtype=object))
+    assert np.isnan(lat[1]) and np.isnan(lon[1])
+    exp_lat, exp_lon = _expected(["9q8yyk", "dr5r"])
+    np.testing.assert_allclose(lat[[0, 2]], exp_lat, atol=1e-12)
+    np.testing.assert_allclose(lon[[0, 2]], exp_lon, atol=1e-12)
+
+
+def test_longer_geohashes_use_the_first_max_precision_characters():
+    long = geohash.encode(19.1738, -96.1342, MAX_PRECISION + 3)
+    lat, lon = decode_geohashes([long])
+    exp_lat, exp_lon, _, _ = geohash.decode_exactly(long[:MAX_PRECISION])
+    assert (lat[0], lon[0]) == pytest.approx((exp_lat, exp_lon), abs=1e-12)
+
+
+def test_empty_input_and_input_not_modified():
+    lat, lon = decode_geohashes(pd.Series([], dtype=object))
+    assert lat.shape == lon.shape == (0,)
+    series = pd.Series(["9q8yyk", None, "DR5R"], index=[10, 20, 30])
+    before = series.copy()
+    lat, lon = decode_geohashes(series)
+    pd.testing.assert_series_equal(series, before)
+    assert lat.dtype == lon.dtype == np.float64 and len(lat) == 3
+    assert np.isnan(decode_geohashes([None, None])[0]).all()
@@ -0,0 +1,148 @@
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from lib.partial_aggregates import (
+    CORRELATION,
+    DRAFT_ZSCORE,
+    VARIABILITY,
+    IncrementalQuery,
+    date_runs,
+    merge_partials,
+    split_days,
+)
+
+START = date(2024, 1, 1)
+DAYS = [START + timedelta(days=i) for i in range(4)]
+
+
+@pytest.fixture
+def messages():
+    """Messages over four days: a large-offset type over three days, a type with one message on
+    two days (n = 1 per day), a single-message type and an empty last day."""
+    rng = np.random.default_rng(7)
+    frames = []
+    for i, n in enumerate([40, 25, 60]):
+        x = 1e6 + rng.normal(i, 1.0, n)  # raw sums of squares would cancel catastrophically
+        frames.append(pd.DataFrame({
+            "day": DAYS[i], "VesselTypeName": "Cargo", "MMSI": rng.integers(1, 6, n),
+            "SOG": x, "Draft": 0.5 * x + rng.normal(0, 0.3, n), "COG": rng.uniform(0, 360, n),
+        }))
+    frames.append(pd.DataFrame({
+        "day": [DAYS[0], DAYS[2]], "VesselTypeName": "Tanker", "MMSI": [10, 11],
+        "SOG": [3.0, 5.0], "Draft": [9.0, 12.0], "COG": [10.0, 30.0],
+    }))
+    frames.append(pd.DataFrame({
+        "day": [DAYS[1]], "VesselTypeName": "Fishing", "MMSI": [20], "SOG": [1.0], "Draft": [2.0], "COG": [5.0],
+    }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def _moment_partials(df, x, y, names):
+    """Per-day partials as the SQL templates build them (``VAR_POP * COUNT`` is the centred moment)."""
+    n, sx, sy, m2x, m2y, cxy = names
+    rows = []
+    for (day, vtype), g in df.groupby(["day", "VesselTypeName"]):
+        dx, dy = g[x] - g[x].mean(), g[y] - g[y].mean()
+        rows.append({"day": day, "VesselTypeName": vtype, n: len(g), sx: g[x].sum(), sy: g[y].sum(),
+                     m2x: (dx * dx).sum(), m2y: (dy * dy).sum(), cxy: (dx * dy).sum()})
+    return pd.DataFrame(rows)
+
+
+def _correlation_partials(df):
+    return _moment_partials(df, "SOG", "Draft", ["n", "sum_x", "sum_y", "m2_x", "m2_y", "c_xy"])
+
+
+def _variability_partials(df):
+    p = _moment_partials(df, "SOG", "COG", ["n", "sum_sog", "sum_cog", "m2_sog", "m2_cog", "_c"])
+    return p.drop(columns="_c")
+
+
+def _draft_partials(df):
+    g = df.groupby(["day", "VesselTypeName", "MMSI"])["Draft"]
+    return g.agg(n_draft="count", sum_draft="sum", min_draft="min", max_draft="max").reset_index()
+
+
+def _finalize(aggregate, partials, **options):
+    query = IncrementalQuery(aggregate, None, DAYS[0], DAYS[-1], options)
+    return query.finalize(list(split_days(partials, query.days()).values()))
+
+
+def test_date_runs_and_split_days(messages):
+    assert date_runs([DAYS[3], DAYS[0], DAYS[1], DAYS[1]]) == [(DAYS[0], DAYS[1]), (DAYS[3], DAYS[3])]
+    parts = split_days(_correlation_partials(messages), DAYS)
+    assert list(parts) == DAYS
+    assert [len(p) for p in parts.values()] == [2, 2, 2, 0]
+
+
+def test_chan_merge_matches_full_range_moments(messages):
+    merged = merge_partials(list(split_days(_correlation_partials(messages), DAYS).values()), CORRELATION)
+    merged = merged.set_index("VesselTypeName")
+    for vtype, g in messages.groupby("VesselTypeName"):
+        dx, dy = g["SOG"] - g["SOG"].mean(), g["Draft"] - g["Draft"].mean()
+        row = merged.loc[vtype]
+        assert row["n"] == len(g)
+        assert row["m2_x"] == pytest.approx((dx * dx).sum(), rel=1e-9, abs=1e-9)
+        assert row["m2_y"] == pytest.approx((dy * dy).sum(), rel=1e-9, abs=1e-9)
+        assert row["c_xy"] == pytest.approx((dx * dy).sum(), rel=1e-9, abs=1e-9)
+
+
+def test_correlation_matches_pandas_corr(messages):
+    out = _finalize(CORRELATION, _correlation_partials(messages), min_n=0).set_index("VesselTypeName")
+    for vtype in ("Cargo", "Tanker"):  # Tanker: two n = 1 days, so +-1
+        g = messages[messages["VesselTypeName"] == vtype]
+        assert out.loc[vtype, "corr_pearson"] == pytest.approx(g["SOG"].corr(g["Draft"]), rel=1e-9)
+    assert np.isnan(out.loc["Fishing", "corr_pearson"])  # a single message has no correlation
+    assert out["n"].to_dict() == messages.groupby("VesselTypeName").size().to_dict()
+    assert list(_finalize(CORRELATION, _correlation_partials(messages), min_n=3)["VesselTypeName"]) == ["Cargo"]
+
+
+def test_variability_matches_pandas_std(messages):
+    out = _finalize(VARIABILITY, _variability_partials(messages), min_n=0).set_index("VesselTypeName")
+    grouped = messages.groupby("VesselTypeName")
+    for column in ("sog", "cog"):
+        expected_sd = grouped[column.upper()].std()  # sample SD (ddof=1); NaN for a single message
+        expected_avg = grouped[column.upper()].mean()
+        pd.testing.assert_series_equal(out[f"sd_{column}"].sort_index(), expected_sd, check_names=False, rtol=1e-9)
+        pd.testing.assert_series_equal(out[f"avg_{column}"].sort_index(), expected_avg, check_names=False)
+    assert out.index[-1] == "Fishing"  # by sd_sog descending, NaN last
+
+
+def test_zero_count_partials_do_not_change_the_result(messages):
+    partials = _correlation_partials(messages)
+    empty_rows = pd.DataFrame({
+        "day": [DAYS[3], DAYS[1]], "VesselTypeName": ["Cargo", "Tanker"],
+        "n": [0, 0], "sum_x": [0.0, 0.0], "sum_y": [0.0, 0.0], "m2_x": [0.0, 0.0], "m2_y": [0.0, 0.0],
+        "c_xy": [0.0, 0.0],
+    })
+    with_empty = _finalize(CORRELATION, pd.concat([partials, empty_rows], ignore_index=True), min_n=0)
+    pd.testing.assert_frame_equal(with_empty, _finalize(CORRELATION, partials, min_n=0))
+
+
+def test_draft_zscore_matches_full_frame(messages):
+    out = _finalize(DRAFT_ZSCORE, _draft_partials(messages), z_min=0.0)
+    per_vessel = messages.groupby(["VesselTypeName", "MMSI"])["Draft"].agg(
+        avg_draft="mean", min_draft="min", max_draft="max"
+    ).reset_index()
+    stats = per_vessel.groupby("VesselTypeName")["avg_draft"].agg(mu="mean", sd="std")
+    expected = per_vessel.join(stats, on="VesselTypeName")
+    expected["z"] = (expected["avg_draft"] - expected["mu"]).abs() / expected["sd"]
+    expected = expected[expected["sd"] > 0].set_index("MMSI")  # one-vessel types have no SD
+    out = out.set_index("MMSI")
+    assert sorted(out.index) == sorted(expected.index)
+    assert set(out["VesselTypeName"]) == {"Cargo", "Tanker"}
+    for column in ("avg_draft", "min_draft", "max_draft", "mu", "sd", "z"):
+        np.testing.assert_allclose(out.loc[expected.index, column], expected[column], rtol=1e-9)
+    assert list(out["z"]) == sorted(out["z"], reverse=True)
+
+    top = _finalize(DRAFT_ZSCORE, _draft_partials(messages), z_min=0.5, limit=2)
+    assert len(top) <= 2 and (top["z"] >= 0.5).all()
+    assert list(top["MMSI"]) == list(expected[expected["z"] >= 0.5].sort_values("z", ascending=False).index[:2])
+
+
+def test_no_partials_finalize_to_empty_frames():
+    for aggregate in (CORRELATION, VARIABILITY, DRAFT_ZSCORE):
+        out = IncrementalQuery(aggregate, None, DAYS[0], DAYS[0], {}).finalize([pd.DataFrame()])
+        assert out.empty
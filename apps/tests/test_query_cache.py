@@ -0,0 +1,40 @@
+import pandas as pd
+import pytest
+
+from lib.query_cache import QueryCache, cache_key
+
+SQL = "SELECT series_id, n FROM t"
+
+
+@pytest.fixture(params=["memory", "disk"])
+def cache(request, tmp_path):
+    return QueryCache(str(tmp_path) if request.param == "disk" else None)
+
+
+def _frame():
+    return pd.DataFrame({"series_id": ["a", "b"], "n": [1, 2]})
+
+
+def test_miss_and_hit_return_frames_independent_of_the_entry(cache):
+    first = cache.get_or_run(SQL, _frame)
+    first["series_id"] = first["series_id"].str.upper()  # what the anomaly page does
+    first["Estado"] = "Normal"
+
+    second = cache.get_or_run(SQL, lambda: pytest.fail("debería salir de la caché"))
+    assert second["series_id"].tolist() == ["a", "b"]
+    assert "Estado" not in second.columns
+    second["n"] = 0
+    assert cache.get_or_run(SQL, _frame)["n"].tolist() == [1, 2]
+
+
+def test_stale_watermark_misses_without_reading_arrow(tmp_path):
+    cache = QueryCache(str(tmp_path))
+    cache.get_or_run(SQL, _frame)
+    key = cache_key(SQL)
+    QueryCache(str(tmp_path)).set_watermark("v2")  # another process sees new data
+    cache._mem.clear()
+    cache._mem_bytes = 0
+
+    assert cache.get(key) is None
+    assert cache.stats.expired == 1
+    assert not (tmp_path / f"{key}.arrow").exists()
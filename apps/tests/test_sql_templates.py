@@ -0,0 +1,130 @@
+import glob
+import os
+from datetime import date, datetime
+
+import pandas as pd
+import pytest
+
+from lib import sql_templates
+from lib.sql_templates import bind, load_template
+
+
+@pytest.fixture
+def sql_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(sql_templates, "SQL_DIR", str(tmp_path))
+
+    def write(name, text):
+        (tmp_path / f"{name}.sql").write_text(text, encoding="utf-8")
+        return name
+
+    return write
+
+
+def _params(bound):
+    return {p.name: p for p in bound.params}
+
+
+def test_comments_are_stripped_outside_string_literals(sql_dir):
+    name = sql_dir("t", (
+        "-- Prueba\n"
+        "-- Parámetros: @tag STRING\n"
+        "SELECT 'a -- b' AS s, \"c--d\" AS t  -- comentario\n"
+        "  -- línea entera\n"
+        "FROM `p.d.t` WHERE tag = @tag -- fin;\n"
+    ))
+    assert load_template(name).text == (
+        "SELECT 'a -- b' AS s, \"c--d\" AS t\n"
+        "FROM `p.d.t` WHERE tag = @tag"
+    )
+
+
+def test_escaped_quote_does_not_end_the_literal(sql_dir):
+    name = sql_dir("t", "SELECT 'it\\'s -- not a comment' AS s -- comment\n")
+    assert load_template(name).text == "SELECT 'it\\'s -- not a comment' AS s"
+
+
+def test_bind_types_and_coerces_declared_parameters(sql_dir):
+    name = sql_dir("t", (
+        "-- Parámetros: @start_date DATE, @ts TIMESTAMP, @n INT64, @x FLOAT64, @ids ARRAY<INT64>\n"
+        "SELECT * FROM `{{TABLE}}` WHERE d >= @start_date AND t < @ts AND n = @n AND x > @x\n"
+        "  AND id IN UNNEST(@ids) {{EXTRA}}\n"
+    ))
+    bound = bind(name, identifiers={"TABLE": "p.d.t"}, fragments={"EXTRA": "AND 1 = 1"},
+                 start_date=datetime(2024, 1, 2, 5), ts="2024-01-03T00:00:00", n="7", x=1, ids=["1", 2])
+    params = _params(bound)
+    assert "`p.d.t`" in bound.sql and "AND 1 = 1" in bound.sql
+    assert (params["start_date"].type_, params["start_date"].value) == ("DATE", date(2024, 1, 2))
+    assert params["ts"].value == datetime(2024, 1, 3)
+    assert (params["n"].value, params["x"].value) == (7, 1.0)
+    assert (params["ids"].array_type, params["ids"].values) == ("INT64", [1, 2])
+
+
+def test_sql_text_does_not_depend_on_values(sql_dir):
+    name = sql_dir("t", "-- Parámetros: @ids ARRAY<STRING>, @n INT64\nSELECT @n FROM t WHERE id IN UNNEST(@ids)\n")
+    assert bind(name, ids=["a"], n=1).sql == bind(name, ids=["a", "b", "c"], n=2).sql
+
+
+def test_missing_values_bind_as_null_and_empty_array(sql_dir):
+    name = sql_dir("t", "-- Parámetros: @ids ARRAY<STRING>, @n INT64\nSELECT @n FROM t WHERE id IN UNNEST(@ids)\n")
+    params = _params(bind(name))
+    assert params["n"].type_ == "INT64" and params["n"].value is None
+    assert params["ids"].values == []
+
+
+def test_none_inside_an_array_is_rejected(sql_dir):
+    name = sql_dir("t", "-- Parámetros: @ids ARRAY<STRING>\nSELECT 1 FROM t WHERE id IN UNNEST(@ids)\n")
+    with pytest.raises(ValueError, match="@ids"):
+        bind(name, ids=["a", None])
+
+
+def test_undeclared_unknown_and_unsupported_parameters_raise(sql_dir):
+    with pytest.raises(ValueError, match="no declarados"):
+        load_template(sql_dir("undeclared", "SELECT @n\n"))
+    with pytest.raises(ValueError, match="no soportado"):
+        load_template(sql_dir("bad_type", "-- Parámetros: @g GEOGRAPHY\nSELECT @g\n"))
+    name = sql_dir("t", "-- Parámetros: @n INT64\nSELECT @n\n")
+    with pytest.raises(ValueError, match="no declara"):
+        bind(name, n=1, m=2)
+
+
+def test_identifiers_are_validated_and_placeholders_required(sql_dir):
+    name = sql_dir("t", "SELECT {{COL}} FROM `{{TABLE}}`\n")
+    with pytest.raises(ValueError, match="Identificador"):
+        bind(name, identifiers={"TABLE": "t`; DROP TABLE x; --", "COL": "c"})
+    with pytest.raises(ValueError, match="requiere"):
+        bind(name, identifiers={"TABLE": "p.d.t"})
+
+
+def test_shipped_templates_parse():
+    paths = glob.glob(os.path.join(sql_templates.SQL_DIR, "*.sql"))
+    names = [os.path.splitext(os.path.basename(p))[0] for p in paths]
+    assert names
+    for name in names:
+        load_template(name)
+
+
+def test_cambios_direccion_wraps_angles_and_limits_gap(tmp_path):
+    pytest.importorskip("duckdb")
+    from lib.backends import make_backend
+
+    ts = pd.to_datetime(["2024-01-02 00:00", "2024-01-02 00:05", "2024-01-02 00:10", "2024-01-02 00:40"])
+    pd.DataFrame({
+        "MMSI": ["1"] * 4,
+        "BaseDateTime": ts,
+        "geohash9": ["9q8yyk8yt"] * 4,
+        "COG": [350.0, 10.0, 100.0, 280.0],
+    }).to_parquet(tmp_path / "part.parquet")
+    backend = make_backend("duckdb", tables={"ais": str(tmp_path / "part.parquet")})
+
+    def run(max_dt, min_delta):
+        bound = bind("cambios_direccion", identifiers={"TABLE": "p.d.ais"}, fragments={"BBOX_FILTER": ""},
+                     start_date=date(2024, 1, 2), end_date=date(2024, 1, 2), mmsi=[], max_dt_min=max_dt,
+                     min_delta=min_delta, limit=10)
+        return backend.run_query_df(bound.sql, list(bound.params))
+
+    df = run(10, 15.0)
+    # 350 -> 10 son 20°, 10 -> 100 son 90°; 100 -> 280 (180°) queda fuera por los 30 min de separación
+    assert df["delta_cog"].tolist() == [90.0, 20.0]
+    assert df["dt_min"].tolist() == [5.0, 5.0]
+    assert run(10, 45.0)["delta_cog"].tolist() == [90.0]
+    assert run(30, 45.0)["delta_cog"].tolist() == [180.0, 90.0]
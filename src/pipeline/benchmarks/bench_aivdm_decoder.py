@@ -0,0 +1,204 @@
+"""Throughput of the NMEA ``!AIVDM`` decoder on a synthetic receiver feed.
+
+Generates ``--sentences`` sentences the way a shore receiver emits them (tag
+block timestamp, ``!AIVDM`` with checksum): class A positions (types
+1/2/3), two-part type 5 static reports, class B positions (types 18/19) and
+type 24 parts A/B, in ``--mix`` proportions, plus a ``--corrupt`` share of
+lines with a flipped payload character or a non-ASCII byte (which the file
+and socket readers turn into U+FFFD).  The feed is decoded in batches of
+``--batch-size`` lines with ``AIVDMDecoder`` and reported as sentences/s
+per core (the decoder is single-threaded), with the time of each stage
+(``_split``, checksums, de-armouring and fields, Arrow batch) from
+``cProfile`` when ``--profile`` is given.
+
+The decoded positions are checked against the generated ones (MMSI,
+LAT/LON, SOG, static data joined by MMSI) and corrupt lines must be dropped
+without failing the batch.
+
+Usage::
+
+    python bench_aivdm_decoder.py --sentences 1000000 --batch-size 50000
+    python bench_aivdm_decoder.py --sentences 200000 --profile
+"""
+
+import argparse
+import cProfile
+import os
+import pstats
+import sys
+import time
+from functools import reduce
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(HERE, "..", "nmea"))
+
+from aivdm_decoder import AIVDMDecoder  # noqa: E402
+
+_ARMOR_CHARS = [chr(v + 48 if v < 40 else v + 56) for v in range(64)]
+_SIXBIT = "@ABCDEFGHIJKLMNOPQRSTUVWXYZ[\\]^_ !\"#$%&'()*+,-./0123456789:;<=>?"
+
+
+class _Bits:
+    """Bit string builder for AIS payloads."""
+
+    def __init__(self):
+        self.bits: List[str] = []
+
+    def uint(self, value: int, width: int) -> "_Bits":
+        self.bits.append(format(value & ((1 << width) - 1), f"0{width}b"))
+        return self
+
+    def text(self, value: str, nchars: int) -> "_Bits":
+        for ch in value.upper().ljust(nchars, "@")[:nchars]:
+            self.uint(_SIXBIT.index(ch), 6)
+        return self
+
+    def armour(self) -> Tuple[str, int]:
+        s = "".join(self.bits)
+        fill = (-len(s)) % 6
+        s += "0" * fill
+        return "".join(_ARMOR_CHARS[int(s[i : i + 6], 2)] for i in range(0, len(s), 6)), fill
+
+
+def _sentence(payload: str, fill: int, ts: int, total: int = 1, num: int = 1, seq: str = "",
+              chan: str = "A") -> str:
+    body = f"AIVDM,{total},{num},{seq},{chan},{payload},{fill}"
+    checksum = reduce(lambda a, c: a ^ ord(c), body, 0)
+    tag = f"c:{ts}"
+    tag_sum = reduce(lambda a, c: a ^ ord(c), tag, 0)
+    return f"\\{tag}*{tag_sum:02X}\\!{body}*{checksum:02X}"
+
+
+def make_feed(n: int, mix: Dict[str, float], corrupt: float, vessels: int = 5000, seed: int = 3):
+    """``(lines, expected)``: sentences and the position reports they carry, in order."""
+    rng = np.random.default_rng(seed)
+    kinds = list(mix)
+    probs = np.array([mix[k] for k in kinds], dtype=float)
+    probs /= probs.sum()
+    mmsis = rng.integers(200_000_000, 775_999_999, vessels)
+    lines, expected = [], []
+    ts0 = 1_704_067_200  # 2024-01-01
+    seq = 0
+    while len(lines) < n:
+        kind = kinds[rng.choice(len(kinds), p=probs)]
+        v = int(rng.integers(vessels))
+        mmsi = int(mmsis[v])
+        ts = ts0 + len(lines)
+        if kind in ("A", "B", "B19"):
+            lat = round(float(rng.uniform(-60, 70)), 5)
+            lon = round(float(rng.uniform(-179, 179)), 5)
+            sog = int(rng.integers(0, 300))
+            cog = int(rng.integers(0, 3600))
+            heading = int(rng.integers(0, 360))
+            b = _Bits()
+            if kind == "A":
+                b.uint(int(rng.choice([1, 2, 3])), 6).uint(0, 2).uint(mmsi, 30).uint(int(rng.integers(0, 9)), 4)
+                b.uint(0, 8).uint(sog, 10).uint(1, 1).uint(round(lon * 600_000), 28).uint(round(lat * 600_000), 27)
+                b.uint(cog, 12).uint(heading, 9).uint(ts % 60, 6).uint(0, 4).uint(0, 1).uint(0, 1).uint(0, 19)
+            else:
+                b.uint(18 if kind == "B" else 19, 6).uint(0, 2).uint(mmsi, 30).uint(0, 8).uint(sog, 10).uint(1, 1)
+                b.uint(round(lon * 600_000), 28).uint(round(lat * 600_000), 27).uint(cog, 12).uint(heading, 9)
+                b.uint(ts % 60, 6)
+                if kind == "B":
+                    b.uint(0, 2).uint(0, 1).uint(1, 1).uint(0, 1).uint(1, 1).uint(1, 1).uint(0, 1).uint(0, 1).uint(0, 20)
+                else:
+                    b.uint(0, 4).text(f"SHIP{v}", 20).uint(37, 8).uint(10, 9).uint(5, 9).uint(2, 6).uint(2, 6)
+                    b.uint(1, 4).uint(0, 1).uint(1, 1).uint(0, 1).uint(0, 4)
+            payload, fill = b.armour()
+            lines.append(_sentence(payload, fill, ts))
+            expected.append((ts, mmsi, lat, lon, sog / 10.0))
+        elif kind == "5":
+            b = _Bits()
+            b.uint(5, 6).uint(0, 2).uint(mmsi, 30).uint(0, 2).uint(9_000_000 + v, 30).text(f"CS{v}", 7)
+            b.text(f"VESSEL {v}", 20).uint(70, 8).uint(100, 9).uint(50, 9).uint(10, 6).uint(12, 6).uint(1, 4)
+            b.uint(1, 4).uint(1, 5).uint(12, 5).uint(0, 6).uint(95, 8).text("PORT", 20).uint(0, 1).uint(0, 1)
+            payload, fill = b.armour()
+            seq = seq % 9 + 1
+            lines.append(_sentence(payload[:60], 0, ts, 2, 1, str(seq)))
+            lines.append(_sentence(payload[60:], fill, ts, 2, 2, str(seq)))
+        else:  # type 24, parts A and B
+            a = _Bits().uint(24, 6).uint(0, 2).uint(mmsi, 30).uint(0, 2).text(f"YACHT {v}", 20)
+            payload, fill = a.armour()
+            lines.append(_sentence(payload, fill, ts))
+            b = _Bits().uint(24, 6).uint(0, 2).uint(mmsi, 30).uint(1, 2).uint(37, 8).text("ABC", 3).uint(0, 4)
+            b.uint(0, 20).text(f"CB{v}", 7).uint(8, 9).uint(4, 9).uint(2, 6).uint(2, 6).uint(0, 6)
+            payload, fill = b.armour()
+            lines.append(_sentence(payload, fill, ts))
+    lines = lines[:n]
+    n_bad = int(corrupt * n)
+    bad = rng.choice(n, n_bad, replace=False)
+    for k, i in enumerate(bad):
+        line = lines[i]
+        j = line.rfind(",") - 3  # inside the payload
+        lines[i] = line[:j] + ("�" if k % 2 else chr(ord(line[j]) ^ 1)) + line[j + 1:]
+    return lines, expected, set(bad.tolist())
+
+
+def decode_all(lines: List[str], batch_size: int):
+    decoder = AIVDMDecoder()
+    out = []
+    t0 = time.perf_counter()
+    for i in range(0, len(lines), batch_size):
+        rb = decoder.decode_batch(lines[i : i + batch_size], received_at=0.0)
+        if rb.num_rows:
+            out.append(rb)
+    return time.perf_counter() - t0, out, decoder
+
+
+def check(batches, expected, bad) -> None:
+    """Every decoded row is a generated position; only corrupt lines may be missing."""
+    import pyarrow as pa
+
+    t = pa.Table.from_batches(batches)
+    # Each line has its own tag block second: BaseDateTime identifies the position
+    want = {time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(ts)): (m, lat, lon, sog) for ts, m, lat, lon, sog in expected}
+    rows = zip(t["BaseDateTime"].to_pylist(), t["MMSI"].to_pylist(), t["LAT"].to_pylist(),
+               t["LON"].to_pylist(), t["SOG"].to_pylist())
+    for stamp, m, lat, lon, sog in rows:
+        assert stamp in want, f"posición inesperada: {stamp}"
+        wm, wlat, wlon, wsog = want[stamp]
+        assert m == wm and abs(lat - wlat) < 1e-5 and abs(lon - wlon) < 1e-5 and abs(sog - wsog) < 1e-9, stamp
+    assert t.num_rows >= len(want) - len(bad), (t.num_rows, len(want), len(bad))
+    assert t["VesselName"].null_count < t.num_rows, "sin datos estáticos unidos"
+
+
+def main():
+    p = argparse.ArgumentParser(description="Rendimiento del decodificador NMEA !AIVDM sobre un feed sintético.")
+    p.add_argument("--sentences", type=int, default=1_000_000)
+    p.add_argument("--batch-size", type=int, default=50_000)
+    p.add_argument("--mix", default="A=0.78,B=0.08,B19=0.02,5=0.07,24=0.05",
+                   help="Proporción de cada tipo: A (1/2/3), B (18), B19, 5 (dos partes), 24 (A y B).")
+    p.add_argument("--corrupt", type=float, default=0.001, help="Fracción de líneas dañadas.")
+    p.add_argument("--repeat", type=int, default=3, help="Pasadas (se da la mejor).")
+    p.add_argument("--profile", action="store_true", help="Tiempo por etapa (cProfile).")
+    a = p.parse_args()
+    mix = {k: float(v) for k, v in (kv.split("=") for kv in a.mix.split(","))}
+
+    t0 = time.perf_counter()
+    lines, expected, bad = make_feed(a.sentences, mix, a.corrupt)
+    print(f"[aivdm] feed de {len(lines):,} sentencias generado en {time.perf_counter() - t0:0.1f}s")
+
+    best = None
+    for _ in range(a.repeat):
+        wall, batches, decoder = decode_all(lines, a.batch_size)
+        best = wall if best is None else min(best, wall)
+    check(batches, expected, bad)
+    rows = sum(b.num_rows for b in batches)
+    print(f"[aivdm] {len(lines):,} sentencias -> {rows:,} posiciones en {best:0.2f}s: "
+          f"{len(lines) / best:,.0f} sentencias/s por núcleo (lotes de {a.batch_size:,})")
+    print(f"[aivdm] {dict(decoder.stats)}")
+
+    if a.profile:
+        prof = cProfile.Profile()
+        prof.enable()
+        decode_all(lines, a.batch_size)
+        prof.disable()
+        stats = pstats.Stats(prof)
+        stats.sort_stats("cumulative").print_stats("aivdm_decoder", 15)
+
+
+if __name__ == "__main__":
+    main()
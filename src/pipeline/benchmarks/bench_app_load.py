@@ -0,0 +1,530 @@
+"""Load test of the Streamlit app: concurrent analyst sessions on a fake backend.
+
+How many analysts can one app instance serve?  For each ``--users`` level a
+fresh process plays that many simulated users at once, each one a thread
+driving the real pages with Streamlit's ``AppTest`` (the same script runs,
+session state, caches and query executor as the server):
+
+- A user visits ``--iterations`` pages chosen at random among 1–10.  On each
+  page it reruns the script for every interaction a page offers: open it,
+  move the date range (``Desde``/``Hasta``, or the range of page 10), pick
+  vessel types in the first multiselect, move the first slider and, on the
+  anomaly page, click "Detectar anomalías".  ``--think-ms`` (exponential)
+  separates the interactions.  Sessions are kept for the whole run, so
+  session state (e.g. the anomaly cursor) stays in memory as on a server.
+- Queries go to ``FakeBackend`` (registered as ``QUERY_BACKEND = "fake"``):
+  the real SQL runs on DuckDB over a synthetic curated table of ``--rows``
+  messages over 2024 (one thread, so its CPU is measured apart), after a
+  latency drawn from a log-normal with median ``--latency-ms`` and
+  ``--latency-sigma``, fixed per query text and parameters.  BigQuery ML
+  training only waits; ``ML.DETECT_ANOMALIES`` returns ``--anomaly-rows``
+  synthetic rows.  Result sizes follow ``--rows`` (event pages) and
+  ``--anomaly-rows``.
+
+Reported per level: rerun latency percentiles (overall and per page and
+interaction with ``--detail``), reruns/s, errors (exceptions in the page),
+peak RSS growth per user, app CPU per user and per rerun (process CPU minus
+the fake backend's DuckDB time) and the share of queries served from the
+app's result cache (from the query telemetry).  A warm-up pass over every
+page runs first; the result cache is emptied before the measured run.
+
+Results are appended to ``<workdir>/loadtest_results.jsonl``.  With
+``--baseline`` the run is compared against a previous results file and the
+script exits non-zero when a page's p95 or the memory per user grows by more
+than ``--max-regression``::
+
+    python bench_app_load.py --users 1,5,10,20 --iterations 8 --latency-ms 800
+    python bench_app_load.py --users 10 --baseline ci/loadtest_baseline.jsonl --max-regression 0.3
+"""
+
+import argparse
+import contextlib
+import gc
+import glob
+import json
+import math
+import os
+import random
+import shutil
+import subprocess
+import sys
+import threading
+import time
+import zlib
+from datetime import timedelta
+from typing import Dict, List, Optional
+
+import geohash
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APPS = os.path.abspath(os.path.join(HERE, "..", "..", "..", "apps"))
+sys.path.append(APPS)
+
+from lib import backends  # noqa: E402
+
+TABLE = "loadtest.ais.curated"
+VESSEL_TYPES = {
+    "Cargo": "Cargo", "Tanker": "Tanker", "Passenger": "Passenger", "Fishing": "Fishing", "Tug": "Service/Special",
+    "Pilot Vessel": "Service/Special", "Pleasure Craft": "Small/Leisure", "Sailing": "Small/Leisure",
+    "Military": "Other", "Other": "Other",
+}
+NAV_STATUS = ["Under way using engine", "At anchor", "Moored", "Engaged in fishing", "Under way sailing",
+              "Restricted manoeuvrability", "Not under command", "Undefined"]
+PAGES = sorted(
+    (p for p in glob.glob(os.path.join(APPS, "pages", "*.py")) if 1 <= int(os.path.basename(p).split("_")[0]) <= 10),
+    key=lambda p: int(os.path.basename(p).split("_")[0]),
+)
+
+
+# -- synthetic data and fake backend ---------------------------------------------------
+
+
+def build_fixture(root: str, rows: int, seed: int, vessels: int = 2_000, cells: int = 20_000) -> None:
+    """Curated-shaped messages over 2024, partitioned by ``ym=`` like the curated table."""
+    rng = np.random.default_rng(seed)
+    v_kind = rng.integers(0, len(VESSEL_TYPES), vessels)
+    v_type = np.array(list(VESSEL_TYPES))[v_kind]
+    v_class = np.array(list(VESSEL_TYPES.values()))[v_kind]
+    v_home = np.column_stack([rng.uniform(25, 47, vessels), rng.uniform(-124, -70, vessels)])
+    v_size = rng.uniform(10, 300, vessels)
+    cell_pool = np.column_stack([rng.uniform(-1, 1, cells), rng.uniform(-1, 1, cells)])
+    ts = np.sort(np.datetime64("2024-01-01T00:00:00", "us") + rng.integers(0, 366 * 86_400, rows) * 1_000_000)
+    ym = ts.astype("datetime64[M]").astype(str)
+    v = rng.integers(0, vessels, rows)
+    offset = cell_pool[rng.integers(0, cells, rows)]
+    lat, lon = v_home[v, 0] + offset[:, 0], v_home[v, 1] + offset[:, 1]
+    gh = np.array([geohash.encode(a, b, 9) for a, b in zip(lat, lon)])
+    table = pa.table({
+        "MMSI": np.char.zfill((366_000_000 + v).astype(str), 9),
+        "BaseDateTime": pa.array(ts, pa.timestamp("us")),
+        "SOG": np.round(rng.gamma(2.0, 4.0, rows), 1),
+        "COG": np.round(rng.uniform(0, 360, rows), 1),
+        "Draft": np.round(v_size[v] / 30 + rng.normal(0, 0.3, rows), 1),
+        "Length": np.round(v_size[v], 0),
+        "Width": np.round(v_size[v] / 6, 0),
+        "VesselName": np.char.add("VESSEL ", v.astype(str)),
+        "VesselTypeName": v_type[v],
+        "VesselTypeClass": v_class[v],
+        "NavStatusName": np.array(NAV_STATUS)[rng.integers(0, len(NAV_STATUS), rows)],
+        "geohash9": gh,
+        "LAT": lat,
+        "LON": lon,
+    })
+    shutil.rmtree(root, ignore_errors=True)
+    for month in np.unique(ym):
+        os.makedirs(os.path.join(root, f"ym={month}"))
+        mask = ym == month
+        pq.write_table(table.filter(pa.array(mask)), os.path.join(root, f"ym={month}", "part-0.parquet"))
+
+
+class FakeBackend(backends.DuckDBBackend):
+    """DuckDB over the fixture plus a deterministic per-query latency (see module docstring)."""
+
+    name = "fake"
+
+    def __init__(self, tables: Dict[str, str], latency_ms: float, latency_sigma: float, anomaly_rows: int,
+                 max_results: int):
+        super().__init__(tables, threads=1, max_results=max_results)
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.anomaly_rows = anomaly_rows
+        self.cpu_s = 0.0
+        self._cpu_lock = threading.Lock()
+
+    def _wait(self, sql: str, params) -> None:
+        key = sql + repr([p.to_api_repr() for p in params])
+        rng = random.Random(zlib.crc32(key.encode("utf-8")))
+        time.sleep(self.latency_ms / 1000.0 * math.exp(self.latency_sigma * rng.gauss(0.0, 1.0)))
+
+    def _fake_ml(self, sql: str) -> Optional[str]:
+        """SQL standing in for BigQuery ML (``None`` for statements that return nothing)."""
+        if not backends._ML_RE.search(sql):
+            return sql
+        if "DETECT_ANOMALIES" not in sql.upper():
+            return None
+        return f"""
+            SELECT 'S' || lpad(CAST(i % 200 AS VARCHAR), 3, '0') AS series_id,
+                   TIMESTAMP '2024-01-01' + INTERVAL (i // 200) HOUR AS ts_col,
+                   (hash(i) % 1000) / 10.0 AS value,
+                   hash(i * 7) % 100 < 3 AS is_anomaly,
+                   (hash(i * 7) % 100) / 100.0 AS anomaly_probability
+            FROM range({int(self.anomaly_rows)}) t(i)
+            ORDER BY anomaly_probability DESC
+        """
+
+    def _timed(self, fn, *args, **kwargs):
+        started = time.thread_time()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._cpu_lock:
+                self.cpu_s += time.thread_time() - started
+
+    def run_query_df(self, sql, params=(), job_stats=None):
+        self._wait(sql, params)
+        sql = self._fake_ml(sql)
+        if sql is None:
+            return backends.to_frame(pa.table({}))
+        return self._timed(super().run_query_df, sql, params, job_stats)
+
+    def open_cursor(self, sql, params=(), job_stats=None):
+        self._wait(sql, params)
+        return self._timed(super().open_cursor, self._fake_ml(sql) or "SELECT 1 AS x LIMIT 0", params, job_stats)
+
+
+# -- simulated users -------------------------------------------------------------------
+
+
+def interactions(at, rng: random.Random):
+    """Set the widgets of each interaction and yield its name; the caller reruns the page."""
+    yield "abrir"
+    dates = [d for d in at.date_input if not d.disabled]
+    if dates:
+        value = dates[0].value
+        first = value[0] if isinstance(value, (tuple, list)) else value
+        start = first + timedelta(days=rng.randint(-20, 20))
+        end = start + timedelta(days=rng.randint(0, 6))
+        if dates[0].is_range:
+            dates[0].set_value((start, end))
+        else:
+            dates[0].set_value(start)
+            if len(dates) > 1:
+                dates[1].set_value(end)
+        yield "fechas"
+    if at.multiselect and at.multiselect[0].options:
+        options = list(at.multiselect[0].options)
+        at.multiselect[0].set_value(rng.sample(options, min(len(options), rng.randint(1, 2))))
+        yield "tipos"
+    if at.slider:
+        s = at.slider[0]
+        steps = int(round((float(s.max) - float(s.min)) / float(s.step or 1)))
+        value = float(s.min) + rng.randint(0, max(steps, 0)) * float(s.step or 1)
+        s.set_value(type(s.value)(round(value, 6)))
+        yield "umbral"
+    for button in at.button:
+        if button.label == "Detectar anomalías":
+            button.click()
+            yield "detectar"
+            break
+
+
+# AppTest runs every session as "test session id"; the query executor keys its
+# tasks by session, so each simulated user gets its own id (set per thread)
+_SESSION = threading.local()
+
+
+def _patch_app_test(secrets: Dict) -> None:
+    """Process-wide secrets, runtime and one session id per user thread for ``AppTest``."""
+    import streamlit as st
+    from streamlit import config
+    from streamlit.runtime.runtime import Runtime
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.runtime.secrets import Secrets
+    from streamlit.testing.v1 import app_test
+    from streamlit.testing.v1.local_script_runner import LocalScriptRunner
+    from streamlit.testing.v1.util import build_mock_config_get_option
+
+    # AppTest swaps the global st.secrets during each run when given secrets, which races
+    # between threads: set them once for the process instead
+    st.secrets = Secrets()
+    st.secrets._secrets = secrets
+    init = LocalScriptRunner.__init__
+
+    def init_with_user_session(self, *args, **kwargs):
+        init(self, *args, **kwargs)
+        self._session_id = getattr(_SESSION, "id", self._session_id)
+
+    LocalScriptRunner.__init__ = init_with_user_session
+
+    # Each AppTest run installs a mock Runtime and clears it when it ends, under the feet of
+    # the runs still going in other threads: keep answering with the last one installed
+    last = {}
+    instance = Runtime.instance.__func__
+
+    def shared_instance(cls):
+        if cls._instance is not None:
+            last["runtime"] = cls._instance
+        return last["runtime"] if "runtime" in last else instance(cls)
+
+    Runtime.instance = classmethod(shared_instance)
+
+    # Concurrent ast.parse of the page scripts can trip CPython 3.11's recursion check
+    compile_lock = threading.Lock()
+    get_bytecode = ScriptCache.get_bytecode
+
+    def locked_get_bytecode(self, script_path):
+        with compile_lock:
+            return get_bytecode(self, script_path)
+
+    ScriptCache.get_bytecode = locked_get_bytecode
+
+    # Same for the "global.appTest" option, patched in and out around each run (widgets only
+    # keep what AppTest reads back while it is on): leave it on for the whole process
+    config.get_option = build_mock_config_get_option({"global.appTest": True})
+    app_test.patch_config_options = lambda overrides: contextlib.nullcontext()
+
+
+class User(threading.Thread):
+    def __init__(self, uid: int, args, sink: List[Dict], pages: List[str]):
+        super().__init__(name=f"user-{uid}", daemon=True)
+        self.uid, self.args, self.sink, self.pages = uid, args, sink, pages
+        self.sessions: Dict[str, object] = {}  # kept alive: one session per page, as on the server
+
+    def _session(self, path: str):
+        from streamlit.testing.v1 import AppTest
+
+        at = self.sessions.get(path)
+        if at is None:
+            at = AppTest.from_file(path, default_timeout=self.args.timeout_s)
+            self.sessions[path] = at
+        return at
+
+    def run(self):
+        _SESSION.id = f"loadtest-user-{self.uid}"
+        rng = random.Random(self.args.seed * 1_000 + self.uid)
+        for _ in range(self.args.iterations):
+            path = rng.choice(self.pages)
+            at = self._session(path)
+            page = os.path.basename(path).split("_")[0]
+            for action in interactions(at, rng):
+                t0 = time.perf_counter()
+                error = None
+                try:
+                    at.run()
+                    if at.exception:
+                        error = str(at.exception[0].value)[:200]
+                except Exception as e:  # noqa: BLE001 - p. ej. timeout del rerun
+                    error = f"{type(e).__name__}: {e}"[:200]
+                self.sink.append({"user": self.uid, "page": page, "action": action,
+                                  "ms": (time.perf_counter() - t0) * 1000.0, "error": error})
+                if self.args.think_ms > 0:
+                    time.sleep(rng.expovariate(1000.0 / self.args.think_ms))
+
+
+def _rss() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def _cpu() -> float:
+    t = os.times()
+    return t.user + t.system
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"p50_ms": round(float(p50), 1), "p95_ms": round(float(p95), 1), "p99_ms": round(float(p99), 1)}
+
+
+def child(args) -> Dict:
+    """One load level (``args.users`` users) in this process."""
+    fixture = os.path.join(args.workdir, "curated")
+    level_dir = os.path.join(args.workdir, f"users_{args.users}")
+    shutil.rmtree(level_dir, ignore_errors=True)
+    os.makedirs(level_dir)
+    backends.BACKENDS["fake"] = lambda **_: FakeBackend(
+        {TABLE: fixture}, args.latency_ms, args.latency_sigma, args.anomaly_rows,
+        max_results=16 + 4 * args.users,
+    )
+    secrets = {
+        "QUERY_BACKEND": "fake",
+        "BQ_TABLE": TABLE,
+        "QUERY_CACHE_DIR": os.path.join(level_dir, "cache"),
+        "QUERY_TELEMETRY_PATH": os.path.join(level_dir, "telemetry.jsonl"),
+        "DIM_CATALOG_PATH": os.path.join(level_dir, "dim_catalog.arrow"),
+        "QUERY_MAX_WORKERS": args.max_workers,
+    }
+
+    _patch_app_test(secrets)
+
+    # Warm-up: imports, module state and one pass over every page (not measured)
+    warm = User(-1, args, [], PAGES)
+    for path in PAGES:
+        at = warm._session(path)
+        for _ in interactions(at, random.Random(0)):
+            at.run()
+    del warm
+    from lib import bq
+
+    bq.QUERY_CACHE.invalidate()
+    gc.collect()
+
+    samples: List[Dict] = []
+    users = [User(i, args, samples, PAGES) for i in range(args.users)]
+    rss0, cpu0, backend0 = _rss(), _cpu(), bq.BACKEND.cpu_s
+    peak = [rss0]
+    done = threading.Event()
+
+    def sample_rss():
+        while not done.wait(0.1):
+            peak[0] = max(peak[0], _rss())
+
+    sampler = threading.Thread(target=sample_rss, daemon=True)
+    sampler.start()
+    t0, since = time.perf_counter(), time.time()
+    for u in users:
+        u.start()
+    for u in users:
+        u.join()
+    wall = time.perf_counter() - t0
+    done.set()
+    sampler.join()
+    peak[0] = max(peak[0], _rss())
+    cpu = _cpu() - cpu0
+    backend_cpu = bq.BACKEND.cpu_s - backend0
+
+    events = bq.query_telemetry(since=since)
+    ms = [s["ms"] for s in samples]
+    by_page = {}
+    for key in sorted({(s["page"], s["action"]) for s in samples}, key=lambda k: (int(k[0]), k[1])):
+        group = [s for s in samples if (s["page"], s["action"]) == key]
+        by_page[f"{key[0]}/{key[1]}"] = {"reruns": len(group), **_percentiles([s["ms"] for s in group]),
+                                         "errors": sum(s["error"] is not None for s in group)}
+    pages = {}
+    for page in sorted({s["page"] for s in samples}, key=int):
+        group = [s["ms"] for s in samples if s["page"] == page]
+        pages[page] = {"reruns": len(group), **_percentiles(group)}
+    return {
+        "users": args.users,
+        "iterations": args.iterations,
+        "latency_ms": args.latency_ms,
+        "rows": args.rows,
+        "reruns": len(samples),
+        "wall_s": round(wall, 2),
+        "reruns_per_s": round(len(samples) / wall, 2) if wall else None,
+        **_percentiles(ms),
+        "errors": sum(s["error"] is not None for s in samples),
+        "first_errors": sorted({s["error"] for s in samples if s["error"]})[:5],
+        "rss_base_mb": round(rss0 / 2**20, 1),
+        "rss_peak_mb": round(peak[0] / 2**20, 1),
+        "rss_mb_per_user": round((peak[0] - rss0) / 2**20 / args.users, 1),
+        "app_cpu_s_per_user": round((cpu - backend_cpu) / args.users, 2),
+        "app_cpu_ms_per_rerun": round((cpu - backend_cpu) * 1000.0 / max(len(samples), 1), 1),
+        "backend_cpu_s": round(backend_cpu, 2),
+        "queries": int(len(events)),
+        "app_cache_ratio": round(float((events["source"] == "app_cache").mean()), 3) if len(events) else None,
+        "pages": pages,
+        "detail": by_page,
+    }
+
+
+# -- driver ----------------------------------------------------------------------------
+
+
+def _git_rev() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True, text=True
+        ).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def compare_with_baseline(results: List[Dict], baseline_path: str, max_regression: float) -> List[str]:
+    """Return a message for every (users, page) p95 or memory per user that regressed vs the baseline."""
+    baseline: Dict = {}
+    with open(baseline_path) as f:
+        for line in f:
+            if line.strip():
+                r = json.loads(line)
+                baseline[r["users"]] = r  # last one wins
+    problems = []
+    for r in results:
+        b = baseline.get(r["users"])
+        if b is None:
+            continue
+        for page, stats in r["pages"].items():
+            ref = b.get("pages", {}).get(page)
+            if ref and ref.get("p95_ms") and stats["p95_ms"] > ref["p95_ms"] * (1 + max_regression):
+                problems.append(f"{r['users']} usuarios, página {page}: p95 {stats['p95_ms']:.0f} ms "
+                                f"vs baseline {ref['p95_ms']:.0f} ms")
+        if b.get("rss_mb_per_user") and r["rss_mb_per_user"] > b["rss_mb_per_user"] * (1 + max_regression):
+            problems.append(f"{r['users']} usuarios: {r['rss_mb_per_user']} MB/usuario "
+                            f"vs baseline {b['rss_mb_per_user']} MB")
+    return problems
+
+
+def main():
+    p = argparse.ArgumentParser(description="Prueba de carga de la app Streamlit con un backend simulado.")
+    p.add_argument("--users", default="1,5,10", help="Niveles de usuarios concurrentes, p. ej. 1,5,10,20")
+    p.add_argument("--iterations", type=int, default=6, help="Páginas que visita cada usuario.")
+    p.add_argument("--think-ms", type=float, default=500.0)
+    p.add_argument("--latency-ms", type=float, default=500.0, help="Mediana de la latencia simulada por consulta.")
+    p.add_argument("--latency-sigma", type=float, default=0.5)
+    p.add_argument("--rows", type=int, default=500_000, help="Mensajes de la tabla sintética (2024).")
+    p.add_argument("--anomaly-rows", type=int, default=200_000)
+    p.add_argument("--max-workers", type=int, default=8, help="QUERY_MAX_WORKERS de la app.")
+    p.add_argument("--timeout-s", type=float, default=120.0)
+    p.add_argument("--workdir", default="/tmp/app_loadtest")
+    p.add_argument("--seed", type=int, default=7)
+    p.add_argument("--detail", action="store_true", help="Percentiles por página e interacción.")
+    p.add_argument("--baseline", default=None, help="loadtest_results.jsonl de referencia.")
+    p.add_argument("--max-regression", type=float, default=0.25)
+    p.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    a = p.parse_args()
+
+    if a.child is not None:
+        a.users = a.child
+        print(json.dumps(child(a)))
+        return
+
+    os.makedirs(a.workdir, exist_ok=True)
+    fixture = os.path.join(a.workdir, "curated")
+    marker = os.path.join(fixture, f"_rows_{a.rows}_{a.seed}")
+    if not os.path.exists(marker):
+        print(f"[load] generando {a.rows:,} mensajes -> {fixture}")
+        build_fixture(fixture, a.rows, a.seed)
+        open(marker, "w").close()
+
+    results = []
+    for users in [int(u) for u in a.users.split(",")]:
+        # A fresh process per level: RSS and caches are not shared between levels
+        argv = [sys.executable, __file__, "--child", str(users)] + [
+            x for k, v in vars(a).items()
+            if k not in ("users", "child", "detail", "baseline", "max_regression")
+            for x in (f"--{k.replace('_', '-')}", str(v))
+        ]
+        print(f"[load] {users} usuario(s)…", flush=True)
+        out = subprocess.run(argv, check=True, capture_output=True, text=True).stdout
+        results.append(json.loads(out.strip().splitlines()[-1]))
+
+    rev, ts = _git_rev(), int(time.time())
+    out_path = os.path.join(a.workdir, "loadtest_results.jsonl")
+    with open(out_path, "a") as f:
+        for r in results:
+            f.write(json.dumps({**r, "git_rev": rev, "ts": ts}) + "\n")
+
+    print(f"\n{'users':>6}{'reruns':>8}{'rerun/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}"
+          f"{'MB/user':>9}{'CPU s/user':>11}{'CPU ms/rerun':>13}{'queries':>9}{'app cache':>10}")
+    for r in results:
+        print(f"{r['users']:>6}{r['reruns']:>8}{r['reruns_per_s']:>9.2f}{r['p50_ms']:>9.0f}{r['p95_ms']:>9.0f}"
+              f"{r['p99_ms']:>9.0f}{r['errors']:>8}{r['rss_mb_per_user']:>9.1f}{r['app_cpu_s_per_user']:>11.2f}"
+              f"{r['app_cpu_ms_per_rerun']:>13.1f}{r['queries']:>9}{(r['app_cache_ratio'] or 0):>10.0%}")
+        for msg in r["first_errors"]:
+            print(f"{'':>6}error: {msg}")
+    if a.detail:
+        for r in results:
+            print(f"\n{r['users']} usuario(s)\n{'página/interacción':<22}{'reruns':>8}{'p50 ms':>9}{'p95 ms':>9}"
+                  f"{'p99 ms':>9}{'errors':>8}")
+            for key, s in r["detail"].items():
+                print(f"{key:<22}{s['reruns']:>8}{s['p50_ms']:>9.0f}{s['p95_ms']:>9.0f}{s['p99_ms']:>9.0f}"
+                      f"{s['errors']:>8}")
+    print(f"Resultados: {out_path}")
+
+    if a.baseline:
+        problems = compare_with_baseline(results, a.baseline, a.max_regression)
+        if problems:
+            print("\nREGRESIONES:")
+            for msg in problems:
+                print(f"  - {msg}")
+            sys.exit(1)
+        print("Sin regresiones contra la línea base.")
+
+
+if __name__ == "__main__":
+    main()
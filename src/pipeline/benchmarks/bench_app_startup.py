@@ -0,0 +1,261 @@
+"""Startup profile of the Streamlit app: cold-process imports and first render per page.
+
+A new container (autoscaling, deploy) starts with nothing imported: the first
+session to open a page pays for every module the page and ``apps/lib``
+import before the script draws anything.  For each page (``app.py`` and
+``pages/*.py``), ``--repeat`` times, a fresh ``python -X importtime``
+process imports Streamlit and ``AppTest`` (what the server has loaded before
+any session) and runs the page once on DuckDB over a synthetic curated
+table, with an empty result cache.  Reported per page (medians):
+
+- ``first render``: from the start of the run to the first element sent to
+  the browser (the page header), i.e. the blank-page time of a cold start.
+- ``run``: the whole first run, queries included.
+- ``imports``: time spent importing modules during the run, by package
+  (``-X importtime`` self times of the modules the run loaded), so a heavy
+  dependency imported before the first render shows up by name.
+- With ``--detail``, the deferred loads of ``lib.lazy`` during the run
+  (modules and process-wide objects such as the backend or the result cache).
+
+``--apps`` profiles another checkout of ``apps/`` (e.g. a ``git worktree``
+of the previous release) to compare before/after.  Results are appended to
+``<workdir>/startup_results.jsonl``; with ``--baseline`` the script exits
+non-zero when a page's first render grows by more than ``--max-regression``
+(and at least ``--min-delta-ms``)::
+
+    python bench_app_startup.py --repeat 5 --detail
+    python bench_app_startup.py --baseline ci/startup_baseline.jsonl --max-regression 0.5
+"""
+
+import time
+
+T0 = time.perf_counter()
+
+import argparse  # noqa: E402
+import glob  # noqa: E402
+import json  # noqa: E402
+import os  # noqa: E402
+import re  # noqa: E402
+import shutil  # noqa: E402
+import statistics  # noqa: E402
+import subprocess  # noqa: E402
+import sys  # noqa: E402
+import tempfile  # noqa: E402
+from collections import defaultdict  # noqa: E402
+from typing import Dict, List  # noqa: E402
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APPS = os.path.abspath(os.path.join(HERE, "..", "..", "..", "apps"))
+_IMPORT_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)\s*$")
+# Packages reported per subpackage (``google.cloud.bigquery`` vs ``google.auth``, ``lib.bq`` vs ``lib.ui``)
+PACKAGE_DEPTH = {"google": 3, "lib": 2}
+
+
+def _package(module: str) -> str:
+    parts = module.split(".")
+    return ".".join(parts[:PACKAGE_DEPTH.get(parts[0], 1)])
+
+
+def _pages(apps: str) -> List[str]:
+    pages = glob.glob(os.path.join(apps, "pages", "*.py"))
+    pages.sort(key=lambda p: int(re.match(r"\d+", os.path.basename(p)).group(0)))
+    return [os.path.join(apps, "app.py")] + pages
+
+
+# -- child: one cold process, one page ---------------------------------------------------
+
+
+def child(args) -> Dict:
+    """Run ``args.child`` once in this (fresh) process; times relative to ``T0``."""
+    from streamlit.runtime.forward_msg_queue import ForwardMsgQueue
+    from streamlit.testing.v1 import AppTest
+
+    server_ready = time.perf_counter()
+    sys.path.insert(0, args.apps)
+    first_delta = {}
+    enqueue = ForwardMsgQueue.enqueue
+
+    def timed_enqueue(self, msg):
+        if "t" not in first_delta and msg.WhichOneof("type") == "delta":
+            first_delta["t"] = time.perf_counter()
+        return enqueue(self, msg)
+
+    ForwardMsgQueue.enqueue = timed_enqueue
+
+    cache_dir = tempfile.mkdtemp(prefix="startup_cache_", dir=args.workdir)
+    at = AppTest.from_file(args.child, default_timeout=args.timeout_s)
+    for key, value in {
+        "QUERY_BACKEND": "duckdb",
+        "DUCKDB_TABLES": {"curated": os.path.join(args.workdir, "curated")},
+        "BQ_TABLE": "loadtest.ais.curated",
+        "QUERY_CACHE_DIR": cache_dir,
+        "QUERY_TELEMETRY_PATH": os.path.join(cache_dir, "query_telemetry.jsonl"),
+        "DIM_CATALOG_PATH": os.path.join(cache_dir, "dim_catalog.arrow"),
+    }.items():
+        at.secrets[key] = value
+    modules_before = set(sys.modules)
+    wall_before = time.time()
+    started = time.perf_counter()
+    at.run()
+    finished = time.perf_counter()
+    try:
+        from lib.lazy import load_times
+        deferred = load_times(since=wall_before)
+    except ImportError:  # checkout without lib.lazy
+        deferred = []
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    return {
+        "server_ms": (server_ready - T0) * 1000,
+        "first_render_ms": (first_delta["t"] - started) * 1000 if "t" in first_delta else None,
+        "run_ms": (finished - started) * 1000,
+        "errors": [str(e.value)[:200] for e in at.exception],
+        "new_modules": sorted(set(sys.modules) - modules_before),
+        "deferred": [{"name": d["name"], "kind": d["kind"], "ms": round(d["seconds"] * 1000, 1)} for d in deferred],
+    }
+
+
+def _import_times(stderr: str) -> Dict[str, int]:
+    """Self import time (µs) per module from ``-X importtime`` output."""
+    times = {}
+    for line in stderr.splitlines():
+        m = _IMPORT_RE.match(line)
+        if m:
+            times[m.group(4)] = int(m.group(1))
+    return times
+
+
+def profile_page(page: str, args) -> Dict:
+    argv = [sys.executable, "-X", "importtime", __file__, "--child", page, "--apps", args.apps,
+            "--workdir", args.workdir, "--timeout-s", str(args.timeout_s)]
+    out = subprocess.run(argv, check=True, capture_output=True, text=True)
+    r = json.loads(out.stdout.strip().splitlines()[-1])
+    self_us = _import_times(out.stderr)
+    by_package = defaultdict(float)
+    for module in r.pop("new_modules"):
+        by_package[_package(module)] += self_us.get(module, 0) / 1000
+    r["imports_ms"] = sum(by_package.values())
+    r["imports_by_package_ms"] = dict(sorted(by_package.items(), key=lambda kv: -kv[1]))
+    return r
+
+
+def _median_run(runs: List[Dict]) -> Dict:
+    def med(key):
+        values = [r[key] for r in runs if r[key] is not None]
+        return statistics.median(values) if values else None
+
+    packages = {p for r in runs for p in r["imports_by_package_ms"]}
+    by_package = {p: statistics.median(r["imports_by_package_ms"].get(p, 0.0) for r in runs) for p in packages}
+    return {
+        "server_ms": med("server_ms"),
+        "first_render_ms": med("first_render_ms"),
+        "run_ms": med("run_ms"),
+        "imports_ms": med("imports_ms"),
+        "imports_by_package_ms": dict(sorted(by_package.items(), key=lambda kv: -kv[1])),
+        "errors": sorted({e for r in runs for e in r["errors"]}),
+        "deferred": runs[-1]["deferred"],
+        "repeat": len(runs),
+    }
+
+
+def compare_with_baseline(results: List[Dict], baseline_path: str, max_regression: float,
+                          min_delta_ms: float) -> List[str]:
+    """Return a message for every page whose median first render regressed vs the baseline."""
+    baseline: Dict = {}
+    with open(baseline_path) as f:
+        for line in f:
+            if line.strip():
+                r = json.loads(line)
+                baseline[r["page"]] = r  # last one wins
+    problems = []
+    for r in results:
+        ref = baseline.get(r["page"])
+        if not ref or ref.get("first_render_ms") is None or r["first_render_ms"] is None:
+            continue
+        delta = r["first_render_ms"] - ref["first_render_ms"]
+        if delta > max(min_delta_ms, max_regression * ref["first_render_ms"]):
+            problems.append(f"{r['page']}: primer render {r['first_render_ms']:.0f} ms "
+                            f"vs baseline {ref['first_render_ms']:.0f} ms")
+    return problems
+
+
+def main():
+    p = argparse.ArgumentParser(description="Perfil de arranque de la app: imports y primer render por página.")
+    p.add_argument("--apps", default=APPS, help="Directorio apps/ a perfilar (otro checkout para comparar).")
+    p.add_argument("--pages", default=None, help="Prefijos de página, p. ej. app,1,10 (por defecto todas).")
+    p.add_argument("--repeat", type=int, default=3, help="Procesos en frío por página (se da la mediana).")
+    p.add_argument("--rows", type=int, default=200_000, help="Mensajes de la tabla sintética (2024).")
+    p.add_argument("--timeout-s", type=float, default=120.0)
+    p.add_argument("--workdir", default="/tmp/app_startup")
+    p.add_argument("--seed", type=int, default=7)
+    p.add_argument("--top", type=int, default=3, help="Paquetes mostrados por página.")
+    p.add_argument("--detail", action="store_true", help="Imports por paquete y cargas diferidas por página.")
+    p.add_argument("--baseline", default=None, help="startup_results.jsonl de referencia.")
+    p.add_argument("--max-regression", type=float, default=0.5)
+    p.add_argument("--min-delta-ms", type=float, default=100.0, help="Diferencia mínima para contar como regresión.")
+    p.add_argument("--child", help=argparse.SUPPRESS)
+    a = p.parse_args()
+    a.apps = os.path.abspath(a.apps)
+
+    if a.child is not None:
+        print(json.dumps(child(a)))
+        return
+
+    # Only the parent imports the load test (and through it lib): the children start cold
+    from bench_app_load import _git_rev, build_fixture
+
+    os.makedirs(a.workdir, exist_ok=True)
+    fixture = os.path.join(a.workdir, "curated")
+    marker = os.path.join(fixture, f"_rows_{a.rows}_{a.seed}")
+    if not os.path.exists(marker):
+        print(f"[startup] generando {a.rows:,} mensajes -> {fixture}")
+        build_fixture(fixture, a.rows, a.seed)
+        open(marker, "w").close()
+
+    pages = _pages(a.apps)
+    if a.pages:
+        wanted = a.pages.split(",")
+        pages = [pg for pg in pages if any(os.path.basename(pg).startswith(f"{w}_") or
+                                           os.path.basename(pg) == f"{w}.py" for w in wanted)]
+    results = []
+    for page in pages:
+        name = os.path.basename(page)
+        print(f"[startup] {name}…", flush=True)
+        runs = [profile_page(page, a) for _ in range(a.repeat)]
+        results.append({"page": name, **_median_run(runs)})
+
+    rev, ts = _git_rev(), int(time.time())
+    out_path = os.path.join(a.workdir, "startup_results.jsonl")
+    with open(out_path, "a") as f:
+        for r in results:
+            f.write(json.dumps({**r, "apps": a.apps, "git_rev": rev, "ts": ts}, ensure_ascii=False) + "\n")
+
+    print(f"\nImportar streamlit + AppTest (servidor): {statistics.median(r['server_ms'] for r in results):.0f} ms")
+    print(f"\n{'página':<34}{'1er render':>11}{'run ms':>9}{'imports':>9}  paquetes (ms)")
+    for r in results:
+        top = ", ".join(f"{pkg} {ms:.0f}" for pkg, ms in list(r["imports_by_package_ms"].items())[:a.top])
+        first = f"{r['first_render_ms']:.0f}" if r["first_render_ms"] is not None else "—"
+        print(f"{r['page'][:33]:<34}{first:>11}{r['run_ms']:>9.0f}{r['imports_ms']:>9.0f}  {top}")
+        for msg in r["errors"]:
+            print(f"{'':>6}error: {msg}")
+    if a.detail:
+        for r in results:
+            print(f"\n{r['page']}")
+            for pkg, ms in r["imports_by_package_ms"].items():
+                if ms >= 1:
+                    print(f"  import {pkg:<28}{ms:>8.1f} ms")
+            for d in r["deferred"]:
+                print(f"  diferido {d['kind']:<7} {d['name']:<22}{d['ms']:>8.1f} ms")
+    print(f"Resultados: {out_path}")
+
+    if a.baseline:
+        problems = compare_with_baseline(results, a.baseline, a.max_regression, a.min_delta_ms)
+        if problems:
+            print("\nREGRESIONES:")
+            for msg in problems:
+                print(f"  - {msg}")
+            sys.exit(1)
+        print("Sin regresiones contra la línea base.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""Time-to-DataFrame of query results: REST pages vs Storage Read API vs cursor.
+
+Uses a local fake of both transports serving an anomaly-detection shaped
+result (the output of ``ML.DETECT_ANOMALIES`` on the anomaly page):
+
+- REST: the library's own ``RowIterator`` over ``tabledata.list``-style JSON
+  pages (~10 MB each, decoded with ``json.loads``), fetched one after the
+  other as the client does.
+- Storage: ``create_read_session``/``read_rows`` returning serialized Arrow
+  record batches split across ``--streams`` streams, read through
+  ``apps/lib/bq_client.read_table_arrow``.
+- Cursor: time to the first page (``--page-rows``) of the result through
+  ``apps/lib/result_cursor.BigQueryResultCursor.page`` (one
+  ``tabledata.list`` call with ``startIndex``/``maxResults`` and the columns
+  the anomaly page shows), i.e. time-to-first-row without downloading it all.
+
+Network is modelled with ``--latency-ms`` per request and ``--mbps`` per
+connection over the bytes each transport actually sends (JSON text vs Arrow
+IPC); ``--latency-ms 0 --mbps 0`` measures decoding only.
+
+Usage::
+
+    python bench_bq_result_download.py --sizes 10000,1000000,5000000 --streams 1,4 --page-rows 5000
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pyarrow as pa
+from google.cloud import bigquery
+from google.cloud.bigquery.table import RowIterator
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(HERE, "..", "..", "..", "apps"))
+
+from lib import bq_client  # noqa: E402
+from lib.result_cursor import BigQueryResultCursor  # noqa: E402
+
+SCHEMA = [
+    bigquery.SchemaField("BaseDateTime", "TIMESTAMP"),
+    bigquery.SchemaField("geohash9", "STRING"),
+    bigquery.SchemaField("metric_value", "FLOAT"),
+    bigquery.SchemaField("is_anomaly", "BOOLEAN"),
+    bigquery.SchemaField("lower_bound", "FLOAT"),
+    bigquery.SchemaField("upper_bound", "FLOAT"),
+    bigquery.SchemaField("anomaly_probability", "FLOAT"),
+]
+REST_PAGE_BYTES = 10 * 2**20
+ARROW_BATCH_ROWS = 65_536
+PAGE_COLUMNS = ["geohash9", "BaseDateTime", "metric_value", "is_anomaly", "anomaly_probability"]
+
+
+class _Network:
+    def __init__(self, latency_ms: float, mbps: float):
+        self.latency_s = latency_ms / 1000.0
+        self.bytes_per_s = mbps * 1e6 / 8 if mbps else 0.0
+
+    def transfer(self, nbytes: int) -> None:
+        delay = self.latency_s + (nbytes / self.bytes_per_s if self.bytes_per_s else 0.0)
+        if delay:
+            time.sleep(delay)
+
+
+def make_result(rows: int, seed: int = 3) -> pa.Table:
+    rng = np.random.default_rng(seed)
+    value = rng.gamma(2.0, 5.0, rows)
+    cells = np.array([f"9vk{i:06x}"[:9] for i in range(4096)])
+    return pa.table(
+        {
+            "BaseDateTime": pa.array(
+                np.datetime64("2024-01-01T00:00:00", "us") + rng.integers(0, 366 * 86_400, rows) * 1_000_000,
+                pa.timestamp("us", tz="UTC"),
+            ),
+            "geohash9": cells[rng.integers(0, len(cells), rows)],
+            "metric_value": value,
+            "is_anomaly": rng.random(rows) > 0.97,
+            "lower_bound": value * 0.5,
+            "upper_bound": value * 1.5,
+            "anomaly_probability": rng.random(rows),
+        }
+    )
+
+
+# -- REST -------------------------------------------------------------------------
+
+
+def _json_cell(v) -> dict:
+    if hasattr(v, "timestamp"):
+        return {"v": str(int(v.timestamp() * 1_000_000))}
+    return {"v": ("true" if v else "false") if isinstance(v, bool) else str(v)}
+
+
+def _json_row(row, idx=None) -> dict:
+    return {"f": [_json_cell(row[i]) for i in (idx if idx is not None else range(len(row)))]}
+
+
+def rest_fake(table: pa.Table, net: _Network):
+    """``api_request`` for ``RowIterator``: JSON pages cycled from a few templates.
+
+    Honours ``startIndex``/``maxResults`` and ``selectedFields`` like ``tabledata.list``.
+    """
+    sample = table.slice(0, min(table.num_rows, 2000)).to_pylist()
+    names = [f.name for f in SCHEMA]
+    templates = {}
+
+    def page_text(n: int, fields) -> str:
+        if (n, fields) not in templates:
+            idx = [names.index(f) for f in fields]
+            row_json = [_json_row(tuple(r.values()), idx) for r in sample]
+            row_bytes = len(json.dumps(row_json)) / len(row_json)
+            page_rows = max(1, int(REST_PAGE_BYTES / row_bytes))
+            rows = [row_json[i % len(row_json)] for i in range(min(n, page_rows))]
+            templates[(n, fields)] = json.dumps({"rows": rows, "totalRows": str(table.num_rows)})
+        return templates[(n, fields)]
+
+    def api_request(method="GET", path=None, query_params=None, **kwargs):
+        params = query_params or {}
+        start = int(params.get("pageToken") or params.get("startIndex") or 0)
+        fields = tuple(params["selectedFields"].split(",")) if params.get("selectedFields") else tuple(names)
+        n = min(int(params.get("maxResults") or table.num_rows), table.num_rows - start)
+        text = page_text(n, fields)
+        net.transfer(len(text))
+        resp = json.loads(text)
+        sent = len(resp["rows"])
+        if start + sent < table.num_rows and sent < n:
+            resp["pageToken"] = str(start + sent)
+        return resp
+
+    return api_request
+
+
+def rest_rows(table: pa.Table, net: _Network, fields=None, start_index=None, max_results=None) -> RowIterator:
+    extra = {"startIndex": start_index} if start_index is not None else None
+    if fields is not None:
+        extra = {**(extra or {}), "selectedFields": ",".join(f.name for f in fields)}
+    return RowIterator(
+        client=None,
+        api_request=rest_fake(table, net),
+        path="/projects/p/datasets/d/tables/anon/data",
+        schema=fields or SCHEMA,
+        total_rows=table.num_rows,
+        max_results=max_results,
+        extra_params=extra,
+    )
+
+
+class FakeClient:
+    """``list_rows`` of ``bigquery.Client`` over the REST fake."""
+
+    def __init__(self, table: pa.Table, net: _Network):
+        self.table = table
+        self.net = net
+
+    def list_rows(self, table, selected_fields=None, start_index=None, max_results=None, page_size=None):
+        return rest_rows(self.table, self.net, selected_fields, start_index, max_results)
+
+
+# -- Storage ----------------------------------------------------------------------
+
+
+class FakeReadClient:
+    """``create_read_session``/``read_rows`` over pre-serialized Arrow batches."""
+
+    def __init__(self, table: pa.Table, net: _Network):
+        self.net = net
+        self.schema_bytes = table.schema.serialize().to_pybytes()
+        self.batches = [b.serialize().to_pybytes() for b in table.to_batches(max_chunksize=ARROW_BATCH_ROWS)]
+        self.streams = {}
+
+    def create_read_session(self, parent, read_session, max_stream_count=1):
+        self.net.transfer(len(self.schema_bytes))
+        n = max(1, min(max_stream_count or 1, len(self.batches)))
+        self.streams = {f"s{i}": self.batches[i::n] for i in range(n)}
+        return SimpleNamespace(
+            arrow_schema=SimpleNamespace(serialized_schema=self.schema_bytes),
+            streams=[SimpleNamespace(name=name) for name in self.streams],
+        )
+
+    def read_rows(self, name):
+        for payload in self.streams[name]:
+            self.net.transfer(len(payload))
+            yield SimpleNamespace(arrow_record_batch=SimpleNamespace(serialized_record_batch=payload))
+
+
+def main():
+    p = argparse.ArgumentParser(description="Tiempo hasta DataFrame: REST vs Storage Read API (fake local).")
+    p.add_argument("--sizes", default="10000,1000000,5000000")
+    p.add_argument("--streams", default="1,4")
+    p.add_argument("--latency-ms", type=float, default=20.0)
+    p.add_argument("--mbps", type=float, default=400.0, help="Ancho de banda por conexión (0 = sin límite).")
+    p.add_argument("--page-rows", type=int, default=5000, help="Filas de la primera página del cursor.")
+    p.add_argument("--skip-rest-above", type=int, default=0, help="Omite REST para tamaños mayores (0 = nunca).")
+    a = p.parse_args()
+
+    net = _Network(a.latency_ms, a.mbps)
+    destination = bigquery.TableReference.from_string("p.d.anon")
+    streams = [int(s) for s in a.streams.split(",")]
+    print(f"{'rows':>10}{'path':>14}{'seconds':>10}{'rows/s':>14}")
+    for size in [int(s) for s in a.sizes.split(",")]:
+        table = make_result(size)
+        timings = []
+        if not a.skip_rest_above or size <= a.skip_rest_above:
+            t0 = time.perf_counter()
+            df = bq_client.rows_to_dataframe(rest_rows(table, net), None)
+            timings.append(("rest", time.perf_counter() - t0, len(df)))
+        read_client = FakeReadClient(table, net)
+        for n in streams:
+            bq_client.configure(max_streams=n, storage_threshold_rows=0)
+            t0 = time.perf_counter()
+            df = bq_client.rows_to_dataframe(rest_rows(table, net), destination, read_client=read_client)
+            timings.append((f"storage x{n}", time.perf_counter() - t0, len(df)))
+        cursor = BigQueryResultCursor(None, destination, SCHEMA, size, "job", client=FakeClient(table, net))
+        t0 = time.perf_counter()
+        df = cursor.page(0, a.page_rows, PAGE_COLUMNS)
+        assert list(df.columns) == [f.name for f in SCHEMA if f.name in PAGE_COLUMNS]
+        timings.append(("cursor page", time.perf_counter() - t0, size if len(df) == min(size, a.page_rows) else -1))
+        for path, seconds, n_rows in timings:
+            assert n_rows == size
+            rate = "—" if path == "cursor page" else f"{size / seconds:,.0f}"
+            print(f"{size:>10,}{path:>14}{seconds:>10.2f}{rate:>14}")
+
+
+if __name__ == "__main__":
+    main()
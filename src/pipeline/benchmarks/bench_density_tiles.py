@@ -0,0 +1,127 @@
+"""Density map of a month of traffic: message scan vs tile pyramid.
+
+Writes ``--rows`` synthetic curated positions for one month (traffic around
+US ports and coastal lanes, ``VesselTypeClass`` mix), builds the density
+pyramid with ``src/pipeline/tiles/density_tiles.py`` and, for a few
+viewports, times:
+
+- ``scan``: what a live map would need, i.e. DuckDB counting the messages of
+  the month per cell of the same level over the curated Parquet.
+- ``tiles``: ``apps/lib/density_tiles.DensityTiles.load_cells`` over the
+  pyramid (only the row groups of the viewport's tiles are read).
+
+Both give the same cells and counts (checked).  Also reports the build time
+and the pyramid size.
+
+Usage::
+
+    python bench_density_tiles.py --rows 20000000 --workdir /tmp/density_bench
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import time
+
+import duckdb
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(HERE, "..", "tiles"))
+sys.path.append(os.path.join(HERE, "..", "..", "..", "apps"))
+
+import density_tiles as pipeline  # noqa: E402
+from lib.density_tiles import DensityTiles, tile_ranges  # noqa: E402
+
+MONTH = "2024-01"
+# Port areas the synthetic traffic concentrates around (lat, lon) and their weight
+HOTSPOTS = [(29.7, -95.0, 4), (33.7, -118.2, 4), (40.6, -74.0, 4), (25.8, -80.1, 2), (47.6, -122.4, 2),
+            (37.8, -122.4, 2), (30.0, -90.0, 3), (41.8, -87.6, 1), (61.2, -149.9, 1), (21.3, -157.9, 1)]
+CLASSES = ["Cargo", "Tanker", "Passenger", "Small/Leisure", "Service/Special", "Unspecified"]
+
+VIEWPORTS = {
+    "us_coasts": (-171.0, 17.0, -64.0, 62.0),
+    "gulf_of_mexico": (-98.0, 18.0, -80.0, 31.0),
+    "east_coast": (-82.0, 24.0, -66.0, 45.5),
+    "houston_port": (-95.4, 29.3, -94.6, 29.9),
+}
+
+
+def build_source(path: str, rows: int, seed: int, chunk: int = 2_000_000) -> None:
+    rng = np.random.default_rng(seed)
+    hot = np.array([h[:2] for h in HOTSPOTS])
+    weights = np.array([h[2] for h in HOTSPOTS], dtype=float)
+    start = np.datetime64(f"{MONTH}-01T00:00:00", "us")
+    with pq.ParquetWriter(path, pa.schema([("BaseDateTime", pa.timestamp("us")), ("LAT", pa.float64()),
+                                           ("LON", pa.float64()), ("VesselTypeClass", pa.string())])) as w:
+        for lo in range(0, rows, chunk):
+            n = min(chunk, rows - lo)
+            centers = hot[rng.choice(len(hot), n, p=weights / weights.sum())]
+            # Heavy tails: dense port cores plus traffic spread along the coast
+            spread = rng.choice([0.05, 0.4, 2.0], n, p=[0.5, 0.35, 0.15])
+            w.write_table(pa.table({
+                "BaseDateTime": start + rng.integers(0, 31 * 86_400, n) * 1_000_000,
+                "LAT": np.clip(centers[:, 0] + rng.normal(0, 1, n) * spread, -89.9, 89.9),
+                "LON": np.clip(centers[:, 1] + rng.normal(0, 1, n) * spread, -179.9, 179.9),
+                "VesselTypeClass": np.array(CLASSES)[rng.integers(0, len(CLASSES), n)],
+            }))
+
+
+def scan_cells(con, path: str, bbox, zoom: int, bins: int):
+    """Per-cell counts of the viewport's tiles straight from the messages."""
+    base = pipeline.base_level_sql(path, MONTH, zoom, bins, "month")
+    tiles = " OR ".join(
+        f"(gx // {bins} BETWEEN {x0} AND {x1} AND gy // {bins} BETWEEN {y0} AND {y1})"
+        for x0, x1, y0, y1 in tile_ranges(bbox, zoom)
+    )
+    return con.execute(f"WITH base AS ({base}) SELECT gx, gy, SUM(n) AS n FROM base WHERE {tiles} GROUP BY ALL"
+                       ).fetch_arrow_table()
+
+
+def main():
+    p = argparse.ArgumentParser(description="Mapa de densidad: escaneo de mensajes vs pirámide de teselas.")
+    p.add_argument("--rows", type=int, default=20_000_000)
+    p.add_argument("--max-zoom", type=int, default=pipeline.DEFAULT_MAX_ZOOM)
+    p.add_argument("--bins", type=int, default=pipeline.DEFAULT_BINS)
+    p.add_argument("--workdir", default="/tmp/density_bench")
+    p.add_argument("--seed", type=int, default=3)
+    a = p.parse_args()
+
+    os.makedirs(a.workdir, exist_ok=True)
+    src = os.path.join(a.workdir, f"positions_{a.rows}.parquet")
+    if not os.path.exists(src):
+        print(f"[density] generando {a.rows:,} posiciones -> {src}")
+        build_source(src, a.rows, a.seed)
+    out = os.path.join(a.workdir, "tiles")
+    shutil.rmtree(out, ignore_errors=True)
+
+    con = duckdb.connect()
+    con.execute(pipeline._MACROS)
+    t0 = time.perf_counter()
+    stats = pipeline.build_month(con, src, out, MONTH, 0, a.max_zoom, a.bins, "day")
+    pipeline.write_manifest(con, out, 0, a.max_zoom, a.bins, "day")
+    build_s = time.perf_counter() - t0
+    size = sum(s["bytes"] for s in stats.values())
+    print(f"[density] pirámide z0-{a.max_zoom}: {sum(s['rows'] for s in stats.values()):,} filas, "
+          f"{size / 2**20:.1f} MB, {build_s:.1f} s (origen {os.path.getsize(src) / 2**20:.0f} MB)")
+
+    tiles = DensityTiles(out)
+    print(f"\n{'viewport':<16}{'zoom':>5}{'tiles':>7}{'cells':>9}{'scan s':>9}{'tiles s':>9}{'ok':>4}")
+    for name, bbox in VIEWPORTS.items():
+        zoom = tiles.zoom_for_bbox(bbox)
+        t0 = time.perf_counter()
+        raw = scan_cells(con, src, bbox, zoom, a.bins)
+        t1 = time.perf_counter()
+        cells = tiles.load_cells(bbox, zoom=zoom)
+        t2 = time.perf_counter()
+        same = len(cells) == raw.num_rows and int(cells["n"].sum()) == int(pc.sum(raw["n"]).as_py() or 0)
+        print(f"{name:<16}{zoom:>5}{cells.attrs['tiles']:>7}{len(cells):>9,}{t1 - t0:>9.3f}{t2 - t1:>9.3f}"
+              f"{'y' if same else 'N':>4}")
+
+
+if __name__ == "__main__":
+    main()
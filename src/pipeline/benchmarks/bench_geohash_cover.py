@@ -0,0 +1,124 @@
+"""Bytes scanned by a bounding-box filter: LAT/LON ranges vs geohash cover.
+
+Builds a local stand-in for the clustered BigQuery table: synthetic points
+written to Parquet sorted by ``geohash9`` with small row groups, so each row
+group plays the role of a clustered storage block.  For each bounding box the
+script reports:
+
+- ``bytes_scanned``: BigQuery-style billing, i.e. the uncompressed size of the
+  referenced columns over the row groups that survive pruning.  As in
+  BigQuery, only the clustering column (``geohash9``) prunes blocks, using its
+  min/max statistics; ``LAT``/``LON`` ranges never do.
+- rows returned by the same query run on DuckDB with each filter, to check
+  that both return identical results.
+
+Usage::
+
+    python bench_geohash_cover.py --rows 2000000 --workdir /tmp/gh_bench
+"""
+
+import argparse
+import math
+import os
+import sys
+
+import duckdb
+import geohash
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(HERE, "..", "..", "..", "apps"))
+
+from lib.geohash_cover import bbox_geohash_cover, prefix_ranges, geohash_range_predicate  # noqa: E402
+
+# Port areas the synthetic traffic concentrates around (lat, lon).
+HOTSPOTS = [(29.7, -95.0), (33.7, -118.2), (40.6, -74.0), (25.8, -80.1), (47.6, -122.4), (37.8, -122.4)]
+
+BOXES = {
+    "houston_ship_channel": (29.5, 29.9, -95.3, -94.7),
+    "ny_harbor": (40.55, 40.75, -74.15, -73.9),
+    "la_long_beach": (33.6, 33.8, -118.35, -118.1),
+    "gulf_of_mexico": (24.0, 30.5, -97.5, -82.0),
+}
+
+COLUMNS = ["MMSI", "LAT", "LON", "SOG", "geohash9"]
+
+
+def build_table(path: str, rows: int, row_group_rows: int, seed: int) -> None:
+    rng = np.random.default_rng(seed)
+    centers = np.array(HOTSPOTS)[rng.integers(0, len(HOTSPOTS), rows)]
+    lat = np.clip(centers[:, 0] + rng.normal(0, 1.5, rows), -89.9, 89.9)
+    lon = np.clip(centers[:, 1] + rng.normal(0, 1.5, rows), -179.9, 179.9)
+    gh = np.array([geohash.encode(a, b, 9) for a, b in zip(lat.tolist(), lon.tolist())])
+    order = np.argsort(gh, kind="stable")
+    table = pa.table(
+        {
+            "MMSI": rng.integers(200_000_000, 780_000_000, rows)[order],
+            "LAT": lat[order],
+            "LON": lon[order],
+            "SOG": rng.gamma(2.0, 5.0, rows)[order],
+            "geohash9": gh[order],
+        }
+    )
+    pq.write_table(table, path, row_group_size=row_group_rows, compression="snappy")
+
+
+def bytes_scanned(meta: pq.FileMetaData, ranges=None) -> int:
+    """Uncompressed bytes of ``COLUMNS`` over row groups not pruned by ``ranges``."""
+    names = [meta.schema.column(i).name for i in range(meta.num_columns)]
+    gh_idx = names.index("geohash9")
+    total = 0
+    for g in range(meta.num_row_groups):
+        rg = meta.row_group(g)
+        if ranges is not None:
+            stats = rg.column(gh_idx).statistics
+            lo, hi = stats.min, stats.max
+            if not any(hi >= r_lo and (r_hi is None or lo < r_hi) for r_lo, r_hi in ranges):
+                continue
+        total += sum(rg.column(i).total_uncompressed_size for i, n in enumerate(names) if n in COLUMNS)
+    return total
+
+
+def run_query(con, path: str, where: str):
+    sql = f"SELECT MMSI, LAT, LON, SOG FROM read_parquet('{path}') WHERE TRUE {where}"
+    return con.execute(f"SELECT COUNT(*), COALESCE(SUM(SOG), 0) FROM ({sql})").fetchone()
+
+
+def main():
+    p = argparse.ArgumentParser(description="Compara bytes escaneados: BETWEEN vs cobertura geohash.")
+    p.add_argument("--rows", type=int, default=2_000_000)
+    p.add_argument("--row-group-rows", type=int, default=20_000)
+    p.add_argument("--max-cells", type=int, default=32)
+    p.add_argument("--workdir", default="/tmp/gh_bench")
+    p.add_argument("--seed", type=int, default=7)
+    a = p.parse_args()
+
+    os.makedirs(a.workdir, exist_ok=True)
+    path = os.path.join(a.workdir, f"clustered_{a.rows}.parquet")
+    if not os.path.exists(path):
+        print(f"[gh] generando {a.rows:,} filas -> {path}")
+        build_table(path, a.rows, a.row_group_rows, a.seed)
+    meta = pq.ParquetFile(path).metadata
+    full = bytes_scanned(meta)
+    con = duckdb.connect()
+
+    print(f"\n{'box':<24}{'cells':>6}{'ranges':>8}{'MB bbox':>10}{'MB cover':>10}{'ratio':>8}{'rows':>10}{'ok':>4}")
+    for name, (lat_min, lat_max, lon_min, lon_max) in BOXES.items():
+        cover = bbox_geohash_cover(lat_min, lat_max, lon_min, lon_max, max_cells=a.max_cells)
+        ranges = prefix_ranges(cover)
+        bbox = f"AND LAT BETWEEN {lat_min} AND {lat_max} AND LON BETWEEN {lon_min} AND {lon_max}"
+        covered = f"AND {geohash_range_predicate(cover)} {bbox}"
+        n1, s1 = run_query(con, path, bbox)
+        n2, s2 = run_query(con, path, covered)
+        pruned = bytes_scanned(meta, ranges)
+        same = n1 == n2 and math.isclose(s1, s2)
+        print(
+            f"{name:<24}{len(cover):>6}{len(ranges):>8}{full / 1e6:>10.1f}{pruned / 1e6:>10.1f}"
+            f"{pruned / full:>8.1%}{n2:>10,}{'y' if same else 'N':>4}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Geohash decoding for the event map: per-row ``geohash.decode`` vs vectorized.
+
+Compares what ``show_geohash_map`` did before (``Series.apply`` of
+``python-geohash``'s ``decode`` and two Python lists) with
+``apps/lib/geohash_decode.decode_geohashes`` on event columns of
+``--rows`` rows drawn from ``--cells`` distinct ``geohash9`` cells, and
+checks that both give the same cell centres.
+
+Usage::
+
+    python bench_geohash_decode.py --rows 100000,1000000 --cells 1000,100000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import geohash
+import numpy as np
+import pandas as pd
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(HERE, "..", "..", "..", "apps"))
+
+from lib.geohash_decode import decode_geohashes  # noqa: E402
+
+
+def per_row(cells: pd.Series):
+    coords = cells.apply(geohash.decode)
+    return np.array([c[0] for c in coords]), np.array([c[1] for c in coords])
+
+
+def make_events(rows: int, cells: int, seed: int = 11) -> pd.Series:
+    rng = np.random.default_rng(seed)
+    lat, lon = rng.uniform(25, 49, cells), rng.uniform(-125, -67, cells)
+    pool = np.array([geohash.encode(a, b, 9) for a, b in zip(lat, lon)], dtype=object)
+    return pd.Series(pool[rng.integers(0, cells, rows)])
+
+
+def main():
+    p = argparse.ArgumentParser(description="Decodificación de geohash: por fila vs vectorizada.")
+    p.add_argument("--rows", default="100000,1000000")
+    p.add_argument("--cells", default="1000,100000")
+    a = p.parse_args()
+    print(f"{'rows':>10}{'cells':>9}{'per-row s':>11}{'vector s':>10}{'category s':>12}")
+    for rows in [int(r) for r in a.rows.split(",")]:
+        for cells in [int(c) for c in a.cells.split(",")]:
+            events = make_events(rows, min(cells, rows))
+            t0 = time.perf_counter()
+            ref_lat, ref_lon = per_row(events)
+            t1 = time.perf_counter()
+            lat, lon = decode_geohashes(events)
+            t2 = time.perf_counter()
+            categorical = events.astype("category")  # as results arrive from lib.frames
+            t3 = time.perf_counter()
+            decode_geohashes(categorical)
+            t4 = time.perf_counter()
+            assert np.array_equal(lat, ref_lat) and np.array_equal(lon, ref_lon)
+            print(f"{rows:>10,}{cells:>9,}{t1 - t0:>11.3f}{t2 - t1:>10.3f}{t4 - t3:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+"""End-to-end local benchmark for the raw ingest and curated transform.
+
+For each size (default 1M, 10M and 100M rows) the harness:
+
+1. Generates synthetic NOAA-style ZIPs with ``synthetic/ais_synth.py``
+   (cached under ``<workdir>/synth_<rows>`` and reused across runs).
+2. Runs the raw ingest steps against local paths: unzip, CSV read with
+   ``raw_schema.schema`` + ingest columns, Parquet write partitioned by ``ym``.
+3. Runs ``apply_curated_transformations`` over that Parquet and writes the
+   curated output partitioned by ``ym``.
+
+Each step is timed with ``RunReport`` (rows, bytes, shuffle and spill come
+from the Spark REST API), and the harness adds throughput (rows/s) and peak
+memory: the JVM's peak RSS (``VmHWM``, reset before each size) and the Python
+driver's peak RSS.  Results are appended to ``<workdir>/bench_results.jsonl``.
+
+With ``--baseline`` the run is compared against a previous results file and
+the process exits with status 1 when throughput drops or JVM peak memory
+grows by more than ``--max-regression``, so it can gate CI::
+
+    python bench_pipeline.py --sizes 1M --workdir /tmp/ais_bench \
+        --baseline ci/bench_baseline.jsonl --max-regression 0.25
+
+Requires a local ``pyspark`` (plus ``pyarrow`` and ``pygeohash`` for the
+geohash pandas UDF).
+"""
+
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import time
+import zipfile
+from typing import Dict, List, Optional
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PIPELINE_DIR = os.path.dirname(HERE)
+for sub in ("common", "raw", "curated", "synthetic"):
+    sys.path.append(os.path.join(PIPELINE_DIR, sub))
+
+from pyspark.sql import SparkSession
+
+import ais_synth
+import curated_transforms
+from curated_transforms import apply_curated_transformations
+from raw_schema import schema, with_ingest_columns
+from run_metrics import RunReport
+
+DEFAULT_SIZES = "1M,10M,100M"
+
+
+def parse_size(token: str) -> int:
+    token = token.strip().upper()
+    mult = {"K": 1_000, "M": 1_000_000, "B": 1_000_000_000}.get(token[-1:], 1)
+    return int(float(token.rstrip("KMB")) * mult)
+
+
+def _git_rev() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=HERE,
+            capture_output=True,
+            text=True,
+        ).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def _jvm_pid(spark: SparkSession) -> Optional[int]:
+    try:
+        return int(spark._jvm.java.lang.ProcessHandle.current().pid())
+    except Exception:
+        return None
+
+
+def _reset_peak_rss(pid: Optional[int]) -> None:
+    # Writing "5" to clear_refs resets VmHWM (Linux >= 4.0).
+    if pid is None:
+        return
+    try:
+        with open(f"/proc/{pid}/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def _peak_rss_mb(pid: Optional[int]) -> Optional[float]:
+    if pid is None:
+        return None
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def _py_peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS.
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def ensure_synthetic(workdir: str, rows: int, fleet: int, seed: int) -> Dict:
+    out = os.path.join(workdir, f"synth_{rows}")
+    manifest_path = os.path.join(out, "_manifest.json")
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest.get("seed") == seed and manifest.get("fleet") == fleet:
+            return {**manifest, "dir": out}
+    shutil.rmtree(out, ignore_errors=True)
+    manifest = ais_synth.generate(out, rows, fleet_size=fleet, seed=seed)
+    return {**manifest, "dir": out}
+
+
+def unzip_local(zip_dir: str, out_dir: str) -> List[str]:
+    """Local counterpart of ``unzip_one`` in the raw job."""
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.makedirs(out_dir)
+    paths = []
+    for name in sorted(os.listdir(zip_dir)):
+        if not name.lower().endswith(".zip"):
+            continue
+        with zipfile.ZipFile(os.path.join(zip_dir, name)) as zf:
+            for info in zf.infolist():
+                if info.is_dir() or not info.filename.lower().endswith(".csv"):
+                    continue
+                zf.extract(info, out_dir)
+                paths.append(os.path.join(out_dir, info.filename))
+    return paths
+
+
+def run_size(spark: SparkSession, args, rows: int) -> List[Dict]:
+    workdir = os.path.abspath(args.workdir)
+    manifest = ensure_synthetic(workdir, rows, args.fleet, args.seed)
+    raw_out = os.path.join(workdir, f"raw_{rows}")
+    curated_out = os.path.join(workdir, f"curated_{rows}")
+    unzipped = os.path.join(workdir, f"unzipped_{rows}")
+
+    report = RunReport(
+        "bench",
+        spark=spark,
+        report_dir=os.path.join(workdir, "reports"),
+        prom_dir=args.prom_dir,
+        labels={"rows": rows},
+    )
+    pid = _jvm_pid(spark)
+    results = []
+
+    def record(stage: str, rows_processed: int, jvm_peak: Optional[float]):
+        rec = report.stages[-1]
+        wall = rec["wall_s"] or 1e-9
+        results.append(
+            {
+                "rows": rows,
+                "stage": stage,
+                "rows_processed": rows_processed,
+                "wall_s": wall,
+                "rows_per_s": round(rows_processed / wall, 1),
+                "jvm_peak_rss_mb": jvm_peak,
+                "py_peak_rss_mb": _py_peak_rss_mb(),
+                **{k: rec.get(k) for k in ("bytes_read", "bytes_written", "shuffle_write_bytes", "disk_spilled_bytes")},
+            }
+        )
+
+    _reset_peak_rss(pid)
+    with report.stage("unzip") as rec:
+        csv_paths = unzip_local(manifest["dir"], unzipped)
+        rec["rows_out"] = len(csv_paths)
+    record("unzip", manifest["rows"], None)
+
+    _reset_peak_rss(pid)
+    with report.stage("raw_csv_to_parquet"):
+        df = with_ingest_columns(
+            spark.read.options(header="true").csv(csv_paths, schema=schema)
+        )
+        df.write.mode("overwrite").partitionBy("ym").parquet(raw_out)
+    record("raw_csv_to_parquet", manifest["rows"], _peak_rss_mb(pid))
+
+    _reset_peak_rss(pid)
+    with report.stage("curated"):
+        df_t = apply_curated_transformations(spark.read.parquet(raw_out))
+        df_t.write.mode("overwrite").partitionBy("ym").parquet(curated_out)
+    record("curated", manifest["rows"], _peak_rss_mb(pid))
+
+    report.finish()
+    if not args.keep_outputs:
+        for path in (unzipped, raw_out, curated_out):
+            shutil.rmtree(path, ignore_errors=True)
+    return results
+
+
+def compare_with_baseline(results: List[Dict], baseline_path: str, max_regression: float) -> List[str]:
+    """Return a message for every (rows, stage) that regressed vs the baseline."""
+    baseline: Dict = {}
+    with open(baseline_path) as f:
+        for line in f:
+            if line.strip():
+                r = json.loads(line)
+                baseline[(r["rows"], r["stage"])] = r  # last one wins
+    problems = []
+    for r in results:
+        b = baseline.get((r["rows"], r["stage"]))
+        if not b:
+            continue
+        if r["rows_per_s"] < b["rows_per_s"] * (1 - max_regression):
+            problems.append(
+                f"{r['stage']}@{r['rows']:,}: throughput {r['rows_per_s']:,.0f} rows/s "
+                f"vs baseline {b['rows_per_s']:,.0f}"
+            )
+        if r.get("jvm_peak_rss_mb") and b.get("jvm_peak_rss_mb"):
+            if r["jvm_peak_rss_mb"] > b["jvm_peak_rss_mb"] * (1 + max_regression):
+                problems.append(
+                    f"{r['stage']}@{r['rows']:,}: JVM peak RSS {r['jvm_peak_rss_mb']} MB "
+                    f"vs baseline {b['jvm_peak_rss_mb']} MB"
+                )
+    return problems
+
+
+def main():
+    p = argparse.ArgumentParser(description="Benchmark raw ingest + curated on synthetic AIS data.")
+    p.add_argument("--sizes", default=DEFAULT_SIZES, help="Ej. 1M,10M,100M")
+    p.add_argument("--workdir", default="/tmp/ais_bench")
+    p.add_argument("--fleet", type=int, default=5_000)
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--master", default="local[*]")
+    p.add_argument("--driver-memory", default="4g")
+    p.add_argument("--shuffle-partitions", type=int, default=48)
+    p.add_argument("--prom-dir", default=None)
+    p.add_argument("--keep-outputs", action="store_true")
+    p.add_argument("--baseline", default=None, help="bench_results.jsonl de referencia.")
+    p.add_argument("--max-regression", type=float, default=0.25)
+    args = p.parse_args()
+
+    os.makedirs(args.workdir, exist_ok=True)
+    spark = (
+        SparkSession.builder.appName("ais-pipeline-bench")
+        .master(args.master)
+        .config("spark.driver.memory", args.driver_memory)
+        .config("spark.sql.shuffle.partitions", str(args.shuffle_partitions))
+        .config("spark.sql.adaptive.enabled", "true")
+        .config("spark.sql.session.timeZone", "UTC")
+        .getOrCreate()
+    )
+    spark.sparkContext.addPyFile(curated_transforms.__file__)
+
+    all_results = []
+    try:
+        for token in args.sizes.split(","):
+            rows = parse_size(token)
+            print(f"\n=== {rows:,} filas ===")
+            all_results += run_size(spark, args, rows)
+    finally:
+        spark.stop()
+
+    problems = []
+    if args.baseline:
+        problems = compare_with_baseline(all_results, args.baseline, args.max_regression)
+
+    rev, ts = _git_rev(), int(time.time())
+    out_path = os.path.join(args.workdir, "bench_results.jsonl")
+    with open(out_path, "a") as f:
+        for r in all_results:
+            f.write(json.dumps({**r, "git_rev": rev, "ts": ts}) + "\n")
+
+    print(f"\n{'stage':<20}{'rows':>14}{'wall_s':>10}{'rows/s':>14}{'jvm MB':>10}")
+    for r in all_results:
+        print(
+            f"{r['stage']:<20}{r['rows']:>14,}{r['wall_s']:>10.1f}"
+            f"{r['rows_per_s']:>14,.0f}{(r['jvm_peak_rss_mb'] or 0):>10.0f}"
+        )
+    print(f"Resultados: {out_path}")
+
+    if args.baseline:
+        if problems:
+            print("\nREGRESIONES:")
+            for msg in problems:
+                print(f"  - {msg}")
+            sys.exit(1)
+        print("Sin regresiones contra la línea base.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""Per-session memory of dashboard results: default vs compact frames.
+
+Builds AIS message-shaped results with the columns the pages show (MMSI,
+VesselName, VesselTypeName, NavStatusName, geohash9, dow, SOG, COG, Draft,
+LAT, LON, BaseDateTime) and converts them two ways:
+
+- ``default``: what ``RowIterator.to_dataframe`` returned so far with
+  pandas 2: one Python ``str`` per string cell, float64 metrics.
+- ``compact``: ``apps/lib/frames.to_frame`` (categories, Arrow-backed
+  strings, float32 metrics).
+
+For each one it reports the frame bytes (what the result cache and a
+session hold), the Arrow bytes ``st.dataframe`` sends to the browser, the
+conversion time and the RSS growth of a child process that keeps
+``--sessions`` sessions' worth of distinct results (one result per session,
+as analysts use different filters), i.e. the per-session memory.
+
+Usage::
+
+    python bench_session_memory.py --rows 100000 --sessions 30
+"""
+
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pyarrow as pa
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(HERE, "..", "..", "..", "apps"))
+
+from lib.frames import memory_bytes, to_frame  # noqa: E402
+
+VESSEL_TYPES = [f"Type {i:02d}" for i in range(20)]
+NAV_STATUS = ["Under way using engine", "At anchor", "Moored", "Not under command", "Restricted manoeuvrability",
+              "Constrained by her draught", "Aground", "Engaged in fishing", "Under way sailing", "Undefined"]
+DOW = ["Lunes", "Martes", "Miércoles", "Jueves", "Viernes", "Sábado", "Domingo"]
+
+
+def make_result(rows: int, seed: int = 0) -> pa.Table:
+    rng = np.random.default_rng(seed)
+    vessels = max(1, rows // 50)
+    mmsi = rng.integers(0, vessels, rows)
+    cells = rng.integers(0, max(1, rows // 3), rows)
+    return pa.table(
+        {
+            "MMSI": np.char.add("3670", np.char.zfill(mmsi.astype(str), 5)),
+            "VesselName": np.char.add("VESSEL ", mmsi.astype(str)),
+            "VesselTypeName": np.array(VESSEL_TYPES)[mmsi % len(VESSEL_TYPES)],
+            "NavStatusName": np.array(NAV_STATUS)[rng.integers(0, len(NAV_STATUS), rows)],
+            "geohash9": np.char.add("9q8", np.char.zfill(cells.astype(str), 6)),
+            "dow": np.array(DOW)[rng.integers(0, 7, rows)],
+            "SOG": rng.gamma(2.0, 4.0, rows),
+            "COG": rng.uniform(0, 360, rows),
+            "Draft": rng.uniform(2, 15, rows),
+            "LAT": rng.uniform(25, 49, rows),
+            "LON": rng.uniform(-125, -67, rows),
+            "BaseDateTime": pa.array(
+                np.datetime64("2024-01-01T00:00:00", "us") + rng.integers(0, 366 * 86_400, rows) * 1_000_000,
+                pa.timestamp("us", tz="UTC"),
+            ),
+        }
+    )
+
+
+def default_frame(table: pa.Table):
+    df = table.to_pandas()
+    for name in df.columns:
+        if pa.types.is_string(table.schema.field(name).type):
+            df[name] = df[name].astype(object)
+    return df
+
+
+CONVERTERS = {"default": default_frame, "compact": to_frame}
+
+
+def _rss() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def _arrow_bytes(df) -> int:
+    from streamlit.dataframe_util import convert_pandas_df_to_arrow_bytes
+
+    return len(convert_pandas_df_to_arrow_bytes(df))
+
+
+def child(mode: str, rows: int, sessions: int) -> dict:
+    """Keep ``sessions`` converted results alive and report the RSS growth."""
+    convert = CONVERTERS[mode]
+    # System allocator: freed Arrow buffers go back to malloc, so RSS only counts what is kept
+    pa.set_memory_pool(pa.system_memory_pool())
+    default_frame(make_result(rows, seed=sessions))  # warm up imports and allocator arenas
+    gc.collect()
+    before = _rss()
+    kept, seconds = [], 0.0
+    for i in range(sessions):
+        table = make_result(rows, seed=i)
+        t0 = time.perf_counter()
+        df = convert(table)
+        seconds += time.perf_counter() - t0
+        del table
+        kept.append(df)
+    gc.collect()
+    return {
+        "mode": mode,
+        "frame_bytes": memory_bytes(kept[0]),
+        "arrow_bytes": _arrow_bytes(kept[0]),
+        "convert_s": seconds / sessions,
+        "rss_per_session": (_rss() - before) / sessions,
+    }
+
+
+def main():
+    p = argparse.ArgumentParser(description="Memoria por sesión: DataFrames por defecto vs compactos.")
+    p.add_argument("--rows", type=int, default=100_000)
+    p.add_argument("--sessions", type=int, default=30)
+    p.add_argument("--child", choices=sorted(CONVERTERS), help=argparse.SUPPRESS)
+    a = p.parse_args()
+    if a.child:
+        print(json.dumps(child(a.child, a.rows, a.sessions)))
+        return
+
+    print(f"{'mode':>9}{'frame MB':>10}{'arrow MB':>10}{'convert s':>11}{'RSS MB/session':>16}")
+    for mode in CONVERTERS:
+        # A fresh process per mode: RSS is not shared between the two runs
+        out = subprocess.run(
+            [sys.executable, __file__, "--child", mode, "--rows", str(a.rows), "--sessions", str(a.sessions)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        r = json.loads(out.strip().splitlines()[-1])
+        print(f"{mode:>9}{r['frame_bytes'] / 2**20:>10.1f}{r['arrow_bytes'] / 2**20:>10.1f}"
+              f"{r['convert_s']:>11.3f}{r['rss_per_session'] / 2**20:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
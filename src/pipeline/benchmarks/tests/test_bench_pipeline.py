@@ -0,0 +1,53 @@
+import json
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("pyspark")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_pipeline import compare_with_baseline, parse_size  # noqa: E402
+
+
+def _result(stage, rows, rows_per_s, jvm_mb=None):
+    return {"stage": stage, "rows": rows, "rows_per_s": rows_per_s, "jvm_peak_rss_mb": jvm_mb}
+
+
+@pytest.fixture
+def baseline(tmp_path):
+    path = tmp_path / "bench_baseline.jsonl"
+    lines = [
+        _result("raw_ingest", 1_000_000, 50_000.0, 900),  # superseded by the next run
+        _result("raw_ingest", 1_000_000, 100_000.0, 1_000),
+        _result("curated", 1_000_000, 40_000.0, None),
+    ]
+    path.write_text("\n".join(json.dumps(r) for r in lines) + "\n\n")
+    return str(path)
+
+
+def test_no_regression_within_tolerance(baseline):
+    results = [_result("raw_ingest", 1_000_000, 80_000.0, 1_200), _result("curated", 1_000_000, 31_000.0, 5_000)]
+    assert compare_with_baseline(results, baseline, 0.25) == []
+
+
+def test_throughput_and_memory_regressions(baseline):
+    results = [_result("raw_ingest", 1_000_000, 70_000.0, 1_300), _result("curated", 1_000_000, 20_000.0, 900)]
+    problems = compare_with_baseline(results, baseline, 0.25)
+    assert problems == [
+        "raw_ingest@1,000,000: throughput 70,000 rows/s vs baseline 100,000",
+        "raw_ingest@1,000,000: JVM peak RSS 1300 MB vs baseline 1000 MB",
+        "curated@1,000,000: throughput 20,000 rows/s vs baseline 40,000",
+    ]
+
+
+def test_sizes_and_stages_without_baseline_are_skipped(baseline):
+    results = [_result("raw_ingest", 10_000_000, 1.0, 99_999), _result("unzip", 1_000_000, 1.0)]
+    assert compare_with_baseline(results, baseline, 0.25) == []
+
+
+def test_parse_size():
+    assert [parse_size(t) for t in ("1M", " 10m", "2.5K", "1B", "500")] == [
+        1_000_000, 10_000_000, 2_500, 1_000_000_000, 500,
+    ]
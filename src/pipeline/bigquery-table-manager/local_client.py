@@ -0,0 +1,431 @@
+"""DuckDB-backed stand-in for ``google.cloud.bigquery.Client``.
+
+Implements the subset of the client the table manager uses (``get_table``,
+``create_table``, ``update_table``, ``delete_table``, ``load_table_from_uri``
+with partition decorators, ``query``, ``get_job`` and ``list_jobs``) so the HTTP handler can run locally without GCP:
+
+    BQ_LOCAL_DB=/tmp/bq_local.duckdb functions-framework --target check_or_create_table
+
+Tables live in DuckDB under their fully-qualified id; table metadata
+(partitioning, clustering, ...) is kept as real ``bigquery.Table`` objects and
+every job is recorded in ``client.jobs`` with its API representation, so
+generated DDL and job configs can be inspected.  BigQuery-only DDL clauses
+(``PARTITION BY``, ``CLUSTER BY``, ``OPTIONS``) are parsed into that metadata
+and stripped before the statement reaches DuckDB; materialized views become
+plain views and ``FLOAT64``/``SAFE_DIVIDE``/``HLL_COUNT.*`` are rewritten.
+``gs://bucket/path`` URIs are read from ``$BQ_LOCAL_GCS_ROOT/bucket/path``.
+"""
+
+import glob
+import itertools
+import json
+import os
+import re
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import duckdb
+from google.api_core.exceptions import BadRequest, Conflict, NotFound
+from google.cloud import bigquery
+
+from schema_inference import DEFAULT_LOCAL_GCS_ROOT
+
+_DUCK_TO_BQ = {
+    "BIGINT": "INTEGER",
+    "INTEGER": "INTEGER",
+    "SMALLINT": "INTEGER",
+    "TINYINT": "INTEGER",
+    "HUGEINT": "INTEGER",
+    "UBIGINT": "INTEGER",
+    "UINTEGER": "INTEGER",
+    "DOUBLE": "FLOAT",
+    "FLOAT": "FLOAT",
+    "VARCHAR": "STRING",
+    "BOOLEAN": "BOOLEAN",
+    "DATE": "DATE",
+    "TIMESTAMP": "TIMESTAMP",
+    "TIMESTAMP WITH TIME ZONE": "TIMESTAMP",
+    "TIMESTAMP_NS": "TIMESTAMP",
+    "TIMESTAMP_MS": "TIMESTAMP",
+    "BLOB": "BYTES",
+}
+_BQ_TO_DUCK = {
+    "INTEGER": "BIGINT",
+    "INT64": "BIGINT",
+    "FLOAT": "DOUBLE",
+    "FLOAT64": "DOUBLE",
+    "NUMERIC": "DECIMAL(38, 9)",
+    "STRING": "VARCHAR",
+    "BOOLEAN": "BOOLEAN",
+    "BOOL": "BOOLEAN",
+    "DATE": "DATE",
+    "DATETIME": "TIMESTAMP",
+    "TIMESTAMP": "TIMESTAMPTZ",
+    "BYTES": "BLOB",
+}
+
+_CTAS_RE = re.compile(
+    r"^\s*CREATE\s+(?P<replace>OR\s+REPLACE\s+)?TABLE\s+(?P<ifne>IF\s+NOT\s+EXISTS\s+)?"
+    r"`(?P<name>[^`]+)`\s*(?P<clauses>.*?)\bAS\s+(?P<select>(SELECT|WITH)\b.*)$",
+    re.IGNORECASE | re.DOTALL,
+)
+_PARTITION_RE = re.compile(r"PARTITION\s+BY\s+(?P<expr>.+?)(?=\s+CLUSTER\s+BY|\s+OPTIONS\s*\(|$)", re.I | re.S)
+_CLUSTER_RE = re.compile(r"CLUSTER\s+BY\s+(?P<cols>.+?)(?=\s+OPTIONS\s*\(|$)", re.I | re.S)
+_OPTIONS_RE = re.compile(r"OPTIONS\s*\((?P<opts>.*)\)\s*$", re.I | re.S)
+_RENAME_RE = re.compile(r"^\s*ALTER\s+TABLE\s+`(?P<name>[^`]+)`\s+RENAME\s+TO\s+`?(?P<new>[^`\s;]+)`?\s*;?\s*$", re.I)
+_MVIEW_RE = re.compile(
+    r"^\s*CREATE\s+(?P<replace>OR\s+REPLACE\s+)?MATERIALIZED\s+VIEW\s+(?P<ifne>IF\s+NOT\s+EXISTS\s+)?"
+    r"`(?P<name>[^`]+)`\s*(?P<clauses>.*?)\bAS\s+(?P<select>(SELECT|WITH)\b.*)$",
+    re.IGNORECASE | re.DOTALL,
+)
+_REFRESH_MV_RE = re.compile(r"^\s*CALL\s+BQ\.REFRESH_MATERIALIZED_VIEW\s*\(", re.I)
+# BigQuery-only functions/types rewritten to DuckDB equivalents.  HLL sketches
+# become exact lists of distinct values, which merge and count the same way.
+_DIALECT_REWRITES = [
+    (re.compile(r"\bFLOAT64\b", re.I), "DOUBLE"),
+    (re.compile(r"\bHLL_COUNT\.INIT\s*\(", re.I), "list(DISTINCT "),
+    (re.compile(r"\bHLL_COUNT\.MERGE\s*\(([^()]+)\)", re.I), r"len(list_distinct(flatten(list(\1))))"),
+    (re.compile(r"\bHLL_COUNT\.MERGE_PARTIAL\s*\(([^()]+)\)", re.I), r"list_distinct(flatten(list(\1)))"),
+    (re.compile(r"\bHLL_COUNT\.EXTRACT\s*\(", re.I), "len("),
+]
+_PART_EXPR_RE = re.compile(
+    r"^(?:(?:DATE|TIMESTAMP_TRUNC|DATETIME_TRUNC|DATE_TRUNC)\s*\(\s*)?(?P<field>\w+)\s*(?:,\s*(?P<unit>\w+)\s*)?\)?$",
+    re.I,
+)
+
+
+class LocalJob:
+    """Finished job with the attributes callers read from BigQuery jobs."""
+
+    def __init__(self, job_type: str, configuration: Dict[str, Any], rows=None, schema=None,
+                 destination: Optional[str] = None, bytes_processed: int = 0):
+        self.job_id = f"local_{job_type}_{next(LocalBigQueryClient._job_ids)}"
+        self.job_type = job_type
+        self.configuration = configuration
+        self.destination = destination
+        self.state = "DONE"
+        self.errors = None
+        self.error_result = None
+        self.total_bytes_processed = bytes_processed
+        self.total_bytes_billed = bytes_processed
+        self.output_rows = len(rows) if rows is not None else None
+        self.output_bytes = None
+        self.input_files = None
+        self.input_file_bytes = None
+        self.created = self.started = self.ended = datetime.now(timezone.utc)
+        self._rows = rows or []
+        self._schema = schema or []
+
+    def result(self, *args, **kwargs):
+        return self
+
+    def done(self, *args, **kwargs) -> bool:
+        return True
+
+    def reload(self, *args, **kwargs) -> None:
+        return None
+
+    def __iter__(self):
+        return iter(self._rows)
+
+    def to_dataframe(self, *args, **kwargs):
+        import pandas as pd
+
+        return pd.DataFrame(self._rows, columns=[f.name for f in self._schema])
+
+    def to_arrow(self, *args, **kwargs):
+        import pyarrow as pa
+
+        return pa.Table.from_pylist(self._rows)
+
+
+class LocalBigQueryClient:
+    """Subset of ``bigquery.Client`` over a DuckDB database."""
+
+    _job_ids = itertools.count(1)
+
+    def __init__(self, project: str = "local-project", database: Optional[str] = None,
+                 gcs_root: Optional[str] = None):
+        self.project = project
+        self.con = duckdb.connect(database or os.getenv("BQ_LOCAL_DB", ":memory:"))
+        self.gcs_root = gcs_root or os.getenv("BQ_LOCAL_GCS_ROOT", DEFAULT_LOCAL_GCS_ROOT)
+        self.tables: Dict[str, bigquery.Table] = {}
+        self.jobs: List[LocalJob] = []
+        self.con.execute("CREATE MACRO IF NOT EXISTS safe_divide(a, b) AS CASE WHEN b = 0 THEN NULL ELSE a / b END")
+        self.con.execute(
+            "CREATE TABLE IF NOT EXISTS __table_meta (table_id VARCHAR PRIMARY KEY, api_repr JSON)"
+        )
+        for fqid, repr_json in self.con.execute("SELECT table_id, api_repr FROM __table_meta").fetchall():
+            self.tables[fqid] = bigquery.Table.from_api_repr(json.loads(repr_json))
+
+    # -- helpers ---------------------------------------------------------------------
+
+    def _fqid(self, ref) -> str:
+        if isinstance(ref, bigquery.Table):
+            return f"{ref.project}.{ref.dataset_id}.{ref.table_id}"
+        ref = str(ref).replace(":", ".")
+        return ref if ref.count(".") == 2 else f"{self.project}.{ref}"
+
+    def _local_path(self, uri: str) -> str:
+        if uri.startswith("gs://"):
+            return os.path.join(self.gcs_root, uri[len("gs://"):])
+        return uri
+
+    def _schema_of(self, fqid: str) -> List[bigquery.SchemaField]:
+        rows = self.con.execute(f'DESCRIBE "{fqid}"').fetchall()
+        return [
+            bigquery.SchemaField(name, _DUCK_TO_BQ.get(dtype.upper(), "STRING"), mode="NULLABLE")
+            for name, dtype, *_ in rows
+        ]
+
+    def _register(self, fqid: str, template: Optional[bigquery.Table] = None) -> bigquery.Table:
+        project, dataset, table = fqid.split(".")
+        base = template.to_api_repr() if template is not None else {}
+        base.update(
+            {
+                "id": f"{project}:{dataset}.{table}",
+                "tableReference": {"projectId": project, "datasetId": dataset, "tableId": table},
+                "schema": {"fields": [f.to_api_repr() for f in self._schema_of(fqid)]},
+                "numRows": str(self.con.execute(f'SELECT COUNT(*) FROM "{fqid}"').fetchone()[0]),
+                "type": "TABLE",
+            }
+        )
+        tbl = bigquery.Table.from_api_repr(base)
+        self.tables[fqid] = tbl
+        self.con.execute("INSERT OR REPLACE INTO __table_meta VALUES (?, ?)", [fqid, json.dumps(base)])
+        return tbl
+
+    def _forget(self, fqid: str) -> None:
+        self.tables.pop(fqid, None)
+        self.con.execute("DELETE FROM __table_meta WHERE table_id = ?", [fqid])
+
+    def _exec(self, sql: str):
+        try:
+            return self.con.execute(sql)
+        except duckdb.Error as e:
+            raise BadRequest(str(e))
+
+    @staticmethod
+    def _to_duck_sql(sql: str) -> str:
+        sql = re.sub(r"`([^`]+)`", r'"\1"', sql)
+        for pattern, repl in _DIALECT_REWRITES:
+            sql = pattern.sub(repl, sql)
+        return sql
+
+    # -- tables --------------------------------------------------------------------------
+
+    def get_table(self, table) -> bigquery.Table:
+        fqid = self._fqid(table)
+        if fqid not in self.tables:
+            raise NotFound(f"Not found: Table {fqid}")
+        return self._register(fqid, self.tables[fqid])
+
+    def create_table(self, table: bigquery.Table, exists_ok: bool = False) -> bigquery.Table:
+        fqid = self._fqid(table)
+        if fqid in self.tables:
+            if exists_ok:
+                return self.tables[fqid]
+            raise Conflict(f"Already Exists: Table {fqid}")
+        if not table.schema:
+            raise BadRequest("Local stand-in requires a schema to create a table.")
+        cols = ", ".join(
+            f'"{f.name}" {_BQ_TO_DUCK.get(f.field_type.upper(), "VARCHAR")}' for f in table.schema
+        )
+        self._exec(f'CREATE TABLE "{fqid}" ({cols})')
+        self.jobs.append(LocalJob("create_table", {"table": table.to_api_repr()}, destination=fqid))
+        return self._register(fqid, table)
+
+    def update_table(self, table: bigquery.Table, fields: List[str]) -> bigquery.Table:
+        fqid = self._fqid(table)
+        current = self.get_table(fqid)
+        for f in fields:
+            setattr(current, f, getattr(table, f))
+        self.jobs.append(LocalJob("update_table", {"table": table.to_api_repr(), "fields": fields}, destination=fqid))
+        return self._register(fqid, current)
+
+    def delete_table(self, table, not_found_ok: bool = False) -> None:
+        fqid = self._fqid(table)
+        if fqid not in self.tables:
+            if not_found_ok:
+                return
+            raise NotFound(f"Not found: Table {fqid}")
+        self._exec(f'DROP TABLE "{fqid}"')
+        self._forget(fqid)
+
+    # -- jobs ------------------------------------------------------------------------------
+
+    def load_table_from_uri(self, source_uris, destination, job_config=None, **kwargs) -> LocalJob:
+        job_config = job_config or bigquery.LoadJobConfig()
+        fqid = self._fqid(destination)
+        uris = [source_uris] if isinstance(source_uris, str) else list(source_uris)
+        paths = [self._local_path(u) for u in uris]
+        fmt = (job_config.source_format or bigquery.SourceFormat.CSV).upper()
+        if fmt == bigquery.SourceFormat.PARQUET:
+            reader = f"read_parquet({paths!r}, hive_partitioning = false)"
+        elif fmt == bigquery.SourceFormat.NEWLINE_DELIMITED_JSON:
+            reader = f"read_json_auto({paths!r})"
+        else:
+            reader = f"read_csv_auto({paths!r}, header = true)"
+        files = sorted({f for p in paths for f in glob.glob(p)})
+        if not files:
+            raise NotFound(f"Not found: URI {uris[0]}")
+        disposition = job_config.write_disposition or bigquery.WriteDisposition.WRITE_APPEND
+
+        # Partition decorator: ``table$YYYY[MM[DD[HH]]]`` targets a single partition.
+        partition = None
+        if "$" in fqid:
+            fqid, partition = fqid.split("$", 1)
+        exists = fqid in self.tables
+
+        if exists and disposition == bigquery.WriteDisposition.WRITE_EMPTY:
+            if self.con.execute(f'SELECT COUNT(*) FROM "{fqid}"').fetchone()[0]:
+                raise BadRequest(f"Table {fqid} is not empty (WRITE_EMPTY).")
+        before = 0
+        if not exists:
+            if partition:
+                raise NotFound(f"Not found: Table {fqid}")
+            self._exec(f'CREATE TABLE "{fqid}" AS SELECT * FROM {reader}')
+            template = bigquery.Table(fqid)
+            template.time_partitioning = job_config.time_partitioning
+            template.clustering_fields = job_config.clustering_fields
+        else:
+            template = self.tables[fqid]
+            if partition:
+                pred = self._partition_predicate(template, partition)
+                outside = self._exec(f"SELECT COUNT(*) FROM {reader} WHERE NOT ({pred})").fetchone()[0]
+                if outside:
+                    raise BadRequest(f"{outside} rows fall outside partition {partition} of {fqid}.")
+                if disposition == bigquery.WriteDisposition.WRITE_TRUNCATE:
+                    self._exec(f'DELETE FROM "{fqid}" WHERE {pred}')
+            elif disposition == bigquery.WriteDisposition.WRITE_TRUNCATE:
+                self._exec(f'DELETE FROM "{fqid}"')
+            before = self.con.execute(f'SELECT COUNT(*) FROM "{fqid}"').fetchone()[0]
+            self._exec(f'INSERT INTO "{fqid}" BY NAME SELECT * FROM {reader}')
+        tbl = self._register(fqid, template)
+        job = LocalJob("load", job_config.to_api_repr(), destination=fqid)
+        job.output_rows = tbl.num_rows - before
+        job.input_files = len(files)
+        job.input_file_bytes = sum(os.path.getsize(f) for f in files)
+        job.output_bytes = job.input_file_bytes
+        job.configuration["load"]["sourceUris"] = uris
+        self.jobs.append(job)
+        return job
+
+    @staticmethod
+    def _partition_predicate(template: bigquery.Table, partition: str) -> str:
+        tp = template.time_partitioning
+        if not tp or not tp.field:
+            raise BadRequest("The local stand-in only supports decorators on column-partitioned tables.")
+        units = {4: ("YEAR", "year"), 6: ("MONTH", "month"), 8: ("DAY", "day"), 10: ("HOUR", "hour")}
+        if len(partition) not in units or not partition.isdigit():
+            raise BadRequest(f"Invalid partition decorator ${partition}.")
+        ptype, unit = units[len(partition)]
+        if ptype != tp.type_:
+            raise BadRequest(f"Partition decorator ${partition} does not match {tp.type_} partitioning.")
+        padded = (partition + "0101")[:8]
+        start = f"{padded[:4]}-{padded[4:6]}-{padded[6:8]} {partition[8:10] or '00'}:00:00"
+        return f"date_trunc('{unit}', CAST(\"{tp.field}\" AS TIMESTAMP)) = TIMESTAMP '{start}'"
+
+    def get_job(self, job_id: str, **kwargs) -> "LocalJob":
+        for job in self.jobs:
+            if job.job_id == job_id:
+                return job
+        raise NotFound(f"Not found: Job {job_id}")
+
+    def list_jobs(self, min_creation_time=None, state_filter=None, max_results=None, **kwargs):
+        jobs = [j for j in self.jobs if min_creation_time is None or j.created >= min_creation_time]
+        if state_filter:
+            jobs = [j for j in jobs if j.state.lower() == state_filter.lower()]
+        return iter(jobs[:max_results] if max_results else jobs)
+
+    def query(self, sql: str, job_config=None, **kwargs) -> LocalJob:
+        job_config = job_config or bigquery.QueryJobConfig()
+        config = job_config.to_api_repr()
+        config.setdefault("query", {})["query"] = sql
+        if job_config.dry_run:
+            job = LocalJob("query", config)
+            self.jobs.append(job)
+            return job
+
+        m = _CTAS_RE.match(sql)
+        if m:
+            job = self._ctas(m, config)
+        elif _RENAME_RE.match(sql):
+            job = self._rename(_RENAME_RE.match(sql), config)
+        elif _MVIEW_RE.match(sql):
+            job = self._materialized_view(_MVIEW_RE.match(sql), config)
+        elif _REFRESH_MV_RE.match(sql):
+            job = LocalJob("query", config)  # plain DuckDB views are always fresh
+        else:
+            cur = self._exec(self._to_duck_sql(sql))
+            rows, schema = [], []
+            if cur.description:
+                names = [d[0] for d in cur.description]
+                schema = [bigquery.SchemaField(n, "STRING") for n in names]
+                rows = [dict(zip(names, r)) for r in cur.fetchall()]
+            job = LocalJob("query", config, rows=rows, schema=schema)
+        self.jobs.append(job)
+        return job
+
+    def _ctas(self, m, config) -> LocalJob:
+        fqid = self._fqid(m.group("name"))
+        clauses = m.group("clauses").strip()
+        if fqid in self.tables:
+            if m.group("ifne"):
+                return LocalJob("query", config, destination=fqid)
+            if not m.group("replace"):
+                raise Conflict(f"Already Exists: Table {fqid}")
+
+        template = bigquery.Table(fqid)
+        pm = _PARTITION_RE.search(clauses)
+        if pm:
+            em = _PART_EXPR_RE.match(pm.group("expr").strip())
+            if not em:
+                raise BadRequest(f"Unsupported PARTITION BY expression: {pm.group('expr')}")
+            template.time_partitioning = bigquery.TimePartitioning(
+                type_=(em.group("unit") or "DAY").upper(), field=em.group("field")
+            )
+        cm = _CLUSTER_RE.search(clauses)
+        if cm:
+            template.clustering_fields = [c.strip() for c in cm.group("cols").split(",")]
+        om = _OPTIONS_RE.search(clauses)
+        if om:
+            for key, value in re.findall(r"(\w+)\s*=\s*([^,]+)", om.group("opts")):
+                key, value = key.lower(), value.strip()
+                if key == "require_partition_filter":
+                    template.require_partition_filter = value.upper() == "TRUE"
+                elif key == "partition_expiration_days" and template.time_partitioning:
+                    template.time_partitioning.expiration_ms = int(float(value) * 86_400_000)
+                elif key == "description":
+                    template.description = value.strip("'\"")
+
+        if template.time_partitioning and template.time_partitioning.field:
+            field = template.time_partitioning.field
+            cols = [d[0] for d in self._exec(f"DESCRIBE {self._to_duck_sql(m.group('select'))}").fetchall()]
+            if field not in cols:
+                raise BadRequest(f"PARTITION BY field {field} is not in the query result.")
+        self._exec(f'CREATE OR REPLACE TABLE "{fqid}" AS {self._to_duck_sql(m.group("select"))}')
+        tbl = self._register(fqid, template)
+        return LocalJob("query", {**config, "ddl": {"target": tbl.to_api_repr()}}, destination=fqid)
+
+    def _materialized_view(self, m, config) -> LocalJob:
+        """``CREATE MATERIALIZED VIEW`` as a plain DuckDB view (clauses dropped)."""
+        fqid = self._fqid(m.group("name"))
+        verb = "CREATE OR REPLACE VIEW" if m.group("replace") else "CREATE VIEW"
+        ifne = " IF NOT EXISTS" if m.group("ifne") else ""
+        self._exec(f'{verb}{ifne} "{fqid}" AS {self._to_duck_sql(m.group("select"))}')
+        return LocalJob("query", config, destination=fqid)
+
+    def _rename(self, m, config) -> LocalJob:
+        fqid = self._fqid(m.group("name"))
+        if fqid not in self.tables:
+            raise NotFound(f"Not found: Table {fqid}")
+        project, dataset, _ = fqid.split(".")
+        new_fqid = f"{project}.{dataset}.{m.group('new').split('.')[-1]}"
+        if new_fqid in self.tables:
+            raise Conflict(f"Already Exists: Table {new_fqid}")
+        self._exec(f'ALTER TABLE "{fqid}" RENAME TO "{new_fqid}"')
+        template = self.tables[fqid]
+        self._forget(fqid)
+        self._register(new_fqid, template)
+        return LocalJob("query", config, destination=new_fqid)
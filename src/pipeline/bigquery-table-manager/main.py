@@ -1,12 +1,28 @@
 import json
 import os
-from typing import List, Dict, Any
+import time
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Optional
 
 from google.cloud import bigquery
 from google.api_core.exceptions import NotFound, Conflict, BadRequest
 
+from partition_loader import DEFAULT_MAX_CONCURRENT, discover_partitions, load_partitions, summarize
+from schema_inference import SchemaInferenceError, infer_schema
+from summaries import DEFAULT_LOOKBACK_DAYS, SUMMARIES, refresh_summary
+
 DEFAULT_SCHEMA: List[bigquery.SchemaField] = []
 
+_PARTITION_TYPES = {
+    "HOUR": bigquery.TimePartitioningType.HOUR,
+    "DAY": bigquery.TimePartitioningType.DAY,
+    "MONTH": bigquery.TimePartitioningType.MONTH,
+    "YEAR": bigquery.TimePartitioningType.YEAR,
+}
+_MAX_CLUSTER_FIELDS = 4
+_ACTIONS = ("ensure", "migrate", "load", "summaries")
+_JSON = {"Content-Type": "application/json"}
+
 _DEF_EXT_TO_SRCFMT = {
     ".parquet": bigquery.SourceFormat.PARQUET,
     ".json": bigquery.SourceFormat.NEWLINE_DELIMITED_JSON,
@@ -33,11 +49,16 @@ def _autodetect_schema_via_load(
     table_fqid: str,
     gcs_uri: str,
     source_format: str | None = None,
+    layout: Optional[Dict[str, Any]] = None,
 ):
     job_config = bigquery.LoadJobConfig(
         autodetect=True,
         write_disposition=bigquery.WriteDisposition.WRITE_EMPTY,
     )
+    if layout and layout["partitioning"]:
+        job_config.time_partitioning = _time_partitioning(layout["partitioning"])
+    if layout and layout["clustering"]:
+        job_config.clustering_fields = layout["clustering"]
 
     if source_format:
         sf = source_format.upper()
@@ -82,6 +103,142 @@ def _schema_from_json(schema_json: List[Dict[str, Any]]) -> List[bigquery.Schema
     return [to_field(col) for col in schema_json]
 
 
+def _make_client(project_id: str):
+    """BigQuery client, or the DuckDB stand-in when ``BQ_LOCAL_DB`` is set."""
+    if os.getenv("BQ_LOCAL_DB"):
+        from local_client import LocalBigQueryClient
+
+        return LocalBigQueryClient(project=project_id)
+    return bigquery.Client(project=project_id)
+
+
+def _parse_layout(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Partitioning/clustering spec from the body, with env fallbacks.
+
+    Body::
+
+        "partitioning": {"field": "BaseDateTime", "type": "DAY",
+                         "expiration_days": 730, "require_partition_filter": true},
+        "clustering": ["MMSI", "geohash9"]
+
+    Raises ``ValueError`` on an invalid spec.
+    """
+    part = dict(data.get("partitioning") or {})
+    if not part and os.getenv("PARTITION_FIELD"):
+        part = {
+            "field": os.getenv("PARTITION_FIELD"),
+            "type": os.getenv("PARTITION_TYPE", "DAY"),
+            "expiration_days": os.getenv("PARTITION_EXPIRATION_DAYS"),
+            "require_partition_filter": os.getenv("REQUIRE_PARTITION_FILTER", "").lower() in ("1", "true", "yes"),
+        }
+    clustering = data.get("clustering")
+    if clustering is None and os.getenv("CLUSTER_FIELDS"):
+        clustering = os.getenv("CLUSTER_FIELDS")
+    if isinstance(clustering, str):
+        clustering = [c.strip() for c in clustering.split(",") if c.strip()]
+    clustering = list(clustering or [])
+
+    if part:
+        ptype = str(part.get("type") or "DAY").upper()
+        if ptype not in _PARTITION_TYPES:
+            raise ValueError(f"partitioning.type inválido '{ptype}'. Usa {sorted(_PARTITION_TYPES)}.")
+        part["type"] = ptype
+        exp = part.get("expiration_days")
+        part["expiration_days"] = float(exp) if exp not in (None, "") else None
+        part["require_partition_filter"] = bool(part.get("require_partition_filter", False))
+    if len(clustering) > _MAX_CLUSTER_FIELDS:
+        raise ValueError(f"clustering admite como máximo {_MAX_CLUSTER_FIELDS} columnas.")
+    return {"partitioning": part or None, "clustering": clustering}
+
+
+def _time_partitioning(part: Optional[Dict[str, Any]]) -> Optional[bigquery.TimePartitioning]:
+    if not part:
+        return None
+    exp = part.get("expiration_days")
+    return bigquery.TimePartitioning(
+        type_=_PARTITION_TYPES[part["type"]],
+        field=part.get("field") or None,
+        expiration_ms=int(exp * 86_400_000) if exp else None,
+    )
+
+
+def _apply_layout(table: bigquery.Table, layout: Dict[str, Any]) -> bigquery.Table:
+    part = layout["partitioning"]
+    if part:
+        table.time_partitioning = _time_partitioning(part)
+        table.require_partition_filter = part["require_partition_filter"]
+    if layout["clustering"]:
+        table.clustering_fields = layout["clustering"]
+    return table
+
+
+def _describe_layout(table: bigquery.Table) -> Dict[str, Any]:
+    tp = table.time_partitioning
+    return {
+        "partitioning": {
+            "field": tp.field,
+            "type": tp.type_,
+            "expiration_days": tp.expiration_ms / 86_400_000 if tp.expiration_ms else None,
+            "require_partition_filter": bool(table.require_partition_filter),
+        }
+        if tp
+        else None,
+        "clustering": list(table.clustering_fields or []),
+    }
+
+
+def _layout_matches(table: bigquery.Table, layout: Dict[str, Any]) -> bool:
+    current = _describe_layout(table)
+    want = layout["partitioning"]
+    have = current["partitioning"]
+    if want and (not have or want.get("field") != have["field"] or want["type"] != have["type"]):
+        return False
+    return not layout["clustering"] or layout["clustering"] == current["clustering"]
+
+
+def _partition_expression(field: str, field_type: str, ptype: str) -> str:
+    """``PARTITION BY`` expression for a column of ``field_type``."""
+    ft = field_type.upper()
+    if ft == "DATE":
+        if ptype == "HOUR":
+            raise ValueError(f"La columna DATE '{field}' no admite partición por HOUR.")
+        return field if ptype == "DAY" else f"DATE_TRUNC({field}, {ptype})"
+    if ft in ("TIMESTAMP", "DATETIME"):
+        if ptype == "DAY":
+            return f"DATE({field})"
+        trunc = "TIMESTAMP_TRUNC" if ft == "TIMESTAMP" else "DATETIME_TRUNC"
+        return f"{trunc}({field}, {ptype})"
+    raise ValueError(
+        f"La columna '{field}' es {field_type}; la partición requiere DATE, DATETIME o TIMESTAMP."
+    )
+
+
+def build_layout_ddl(
+    target_fqid: str,
+    source_fqid: str,
+    layout: Dict[str, Any],
+    field_type: Optional[str],
+) -> str:
+    """``CREATE TABLE ... PARTITION BY ... CLUSTER BY ... AS SELECT *`` DDL."""
+    part = layout["partitioning"]
+    lines = [f"CREATE TABLE `{target_fqid}`"]
+    options = []
+    if part:
+        if not part.get("field"):
+            raise ValueError("La migración requiere partitioning.field (CTAS no admite partición por ingesta).")
+        lines.append(f"PARTITION BY {_partition_expression(part['field'], field_type or '', part['type'])}")
+        if part.get("expiration_days"):
+            options.append(f"partition_expiration_days = {part['expiration_days']:g}")
+        if part.get("require_partition_filter"):
+            options.append("require_partition_filter = TRUE")
+    if layout["clustering"]:
+        lines.append("CLUSTER BY " + ", ".join(layout["clustering"]))
+    if options:
+        lines.append("OPTIONS (" + ", ".join(options) + ")")
+    lines.append(f"AS SELECT * FROM `{source_fqid}`")
+    return "\n".join(lines)
+
+
 def _parse_request(request) -> Dict[str, Any]:
     try:
         data = request.get_json(silent=True) or {}
@@ -101,6 +258,10 @@ def _parse_request(request) -> Dict[str, Any]:
     else:
         schema = DEFAULT_SCHEMA
 
+    action = (data.get("action") or os.getenv("TABLE_ACTION") or "ensure").lower()
+    if action not in _ACTIONS:
+        raise ValueError(f"action inválida '{action}'. Usa una de {list(_ACTIONS)}.")
+
     return {
         "project_id": project_id,
         "dataset_id": dataset_id,
@@ -108,11 +269,227 @@ def _parse_request(request) -> Dict[str, Any]:
         "schema": schema,
         "gcs_uri": gcs_uri,
         "source_format": source_format,
+        "action": action,
+        "layout": _parse_layout(data),
+        "target_table_id": data.get("target_table_id"),
+        # "footer" reads file metadata only; "load" runs the old autodetect load job.
+        "schema_inference": (data.get("schema_inference") or os.getenv("SCHEMA_INFERENCE") or "footer").lower(),
+        "swap": bool(data.get("swap", False)),
+        # action=load
+        "partitions": data.get("partitions") or [],
+        "source_base": data.get("source_base"),
+        "partition_from": data.get("from"),
+        "partition_to": data.get("to"),
+        "max_concurrent": int(data.get("max_concurrent") or DEFAULT_MAX_CONCURRENT),
+        # action=summaries
+        "summaries": data.get("summaries") or [],
+        "summary_definitions": data.get("summary_definitions") or {},
+        "summary_dataset_id": data.get("summary_dataset_id") or os.getenv("SUMMARY_DATASET_ID"),
+        "full_refresh": bool(data.get("full_refresh", False)),
+        "lookback_days": int(data.get("lookback_days") or DEFAULT_LOOKBACK_DAYS),
     }
 
 
+def _migrate_table(client, params: Dict[str, Any]):
+    """Rebuild an existing table into the requested partitioned/clustered layout.
+
+    Runs ``CREATE TABLE <target> PARTITION BY ... CLUSTER BY ... AS SELECT *``
+    into ``target_table_id`` (default ``<table>_optimized``).  With
+    ``"swap": true`` the original is renamed to ``<table>_unoptimized_<ts>`` and
+    the new table takes its name.
+    """
+    project_id, dataset_id, table_id = params["project_id"], params["dataset_id"], params["table_id"]
+    source_fqid = f"{project_id}.{dataset_id}.{table_id}"
+    layout = params["layout"]
+    if not layout["partitioning"] and not layout["clustering"]:
+        return (
+            json.dumps({"ok": False, "action": "skipped", "error": "La migración requiere 'partitioning' y/o 'clustering'."}),
+            400,
+            _JSON,
+        )
+    try:
+        source = client.get_table(source_fqid)
+    except NotFound:
+        return (
+            json.dumps({"ok": False, "exists": False, "action": "skipped", "error": f"No existe {source_fqid}."}),
+            404,
+            _JSON,
+        )
+    if _layout_matches(source, layout):
+        return (
+            json.dumps(
+                {"ok": True, "exists": True, "action": "none (already optimized)", "table": source_fqid,
+                 "layout": _describe_layout(source)}
+            ),
+            200,
+            _JSON,
+        )
+
+    columns = {f.name: f.field_type for f in source.schema}
+    part = layout["partitioning"]
+    missing = [c for c in layout["clustering"] + ([part["field"]] if part and part.get("field") else []) if c not in columns]
+    if missing:
+        return (
+            json.dumps({"ok": False, "exists": True, "action": "failed", "error": f"Columnas inexistentes en {source_fqid}: {missing}"}),
+            400,
+            _JSON,
+        )
+
+    target_id = params.get("target_table_id") or f"{table_id}_optimized"
+    target_fqid = f"{project_id}.{dataset_id}.{target_id}"
+    try:
+        ddl = build_layout_ddl(target_fqid, source_fqid, layout, columns.get(part["field"]) if part else None)
+    except ValueError as e:
+        return json.dumps({"ok": False, "exists": True, "action": "failed", "error": str(e)}), 400, _JSON
+
+    try:
+        job = client.query(ddl)
+        job.result()
+        renamed = None
+        if params.get("swap"):
+            stamp = datetime.now(timezone.utc).strftime("%Y%m%d%H%M%S")
+            renamed = f"{table_id}_unoptimized_{stamp}"
+            client.query(f"ALTER TABLE `{source_fqid}` RENAME TO `{renamed}`").result()
+            client.query(f"ALTER TABLE `{target_fqid}` RENAME TO `{table_id}`").result()
+            target_fqid = source_fqid
+        migrated = client.get_table(target_fqid)
+    except Conflict:
+        return (
+            json.dumps({"ok": False, "exists": True, "action": "failed", "error": f"{target_fqid} ya existe; usa otro 'target_table_id'."}),
+            409,
+            _JSON,
+        )
+    except BadRequest as e:
+        return (
+            json.dumps({"ok": False, "exists": True, "action": "failed", "ddl": ddl,
+                        "error": f"BadRequest en la migración: {e.message if hasattr(e, 'message') else str(e)}"}),
+            400,
+            _JSON,
+        )
+
+    return (
+        json.dumps(
+            {
+                "ok": True,
+                "exists": True,
+                "action": "migrated",
+                "table": target_fqid,
+                "source": source_fqid,
+                "backup": f"{project_id}.{dataset_id}.{renamed}" if renamed else None,
+                "ddl": ddl,
+                "job_id": job.job_id,
+                "bytes_processed": getattr(job, "total_bytes_processed", None),
+                "num_rows": migrated.num_rows,
+                "layout": _describe_layout(migrated),
+            }
+        ),
+        200,
+        _JSON,
+    )
+
+
+def _load_table_partitions(client, params: Dict[str, Any]):
+    """Load curated partitions (``ym=``/``date=`` prefixes) with WRITE_TRUNCATE decorators."""
+    table_fqid = f"{params['project_id']}.{params['dataset_id']}.{params['table_id']}"
+    base = params.get("source_base")
+    prefixes = [
+        p if "://" in p or p.startswith("/") or not base else f"{base.rstrip('/')}/{p}"
+        for p in params["partitions"]
+    ]
+    t0 = time.perf_counter()
+    try:
+        if base and not params["partitions"]:
+            prefixes = discover_partitions(base, params.get("partition_from"), params.get("partition_to"))
+        if not prefixes:
+            return (
+                json.dumps({"ok": False, "action": "skipped", "error": "Proporciona 'partitions' o 'source_base'."}),
+                400,
+                _JSON,
+            )
+        results = load_partitions(client, table_fqid, prefixes, max_concurrent=params["max_concurrent"])
+    except NotFound:
+        return (
+            json.dumps({"ok": False, "exists": False, "action": "skipped",
+                        "error": f"No existe {table_fqid}; créala antes con 'partitioning'."}),
+            404,
+            _JSON,
+        )
+    except ValueError as e:
+        return json.dumps({"ok": False, "exists": True, "action": "failed", "error": str(e)}), 400, _JSON
+
+    summary = {**summarize(results), "wall_s": round(time.perf_counter() - t0, 1)}
+    return (
+        json.dumps(
+            {
+                "ok": summary["failed"] == 0,
+                "exists": True,
+                "action": "loaded",
+                "table": table_fqid,
+                "summary": summary,
+                "partitions": results,
+            }
+        ),
+        200 if summary["failed"] == 0 else 207,
+        _JSON,
+    )
+
+
+def _refresh_summaries(client, params: Dict[str, Any]):
+    """Create/refresh the declared summary tables or materialized views over the table."""
+    source_fqid = f"{params['project_id']}.{params['dataset_id']}.{params['table_id']}"
+    definitions = {**SUMMARIES, **params["summary_definitions"]}
+    names = params["summaries"] or list(definitions)
+    unknown = [n for n in names if n not in definitions]
+    if unknown:
+        return (
+            json.dumps({"ok": False, "action": "skipped", "error": f"Resúmenes no declarados: {unknown}"}),
+            400,
+            _JSON,
+        )
+    try:
+        client.get_table(source_fqid)
+    except NotFound:
+        return (
+            json.dumps({"ok": False, "exists": False, "action": "skipped", "error": f"No existe {source_fqid}."}),
+            404,
+            _JSON,
+        )
+
+    dataset = params["summary_dataset_id"] or params["dataset_id"]
+    results = []
+    for name in names:
+        target_fqid = f"{params['project_id']}.{dataset}.{name}"
+        t0 = time.perf_counter()
+        try:
+            result = refresh_summary(
+                client, name, definitions[name], source_fqid, target_fqid,
+                lookback_days=params["lookback_days"], full=params["full_refresh"],
+            )
+            result.update({"status": "refreshed", "seconds": round(time.perf_counter() - t0, 1)})
+        except (BadRequest, KeyError) as e:
+            result = {"summary": name, "table": target_fqid, "status": "failed",
+                      "error": getattr(e, "message", None) or str(e)}
+        results.append(result)
+
+    failed = sum(r["status"] == "failed" for r in results)
+    return (
+        json.dumps(
+            {"ok": failed == 0, "exists": True, "action": "summaries", "table": source_fqid, "summaries": results},
+            default=str,
+        ),
+        200 if failed == 0 else 207,
+        _JSON,
+    )
+
+
 def check_or_create_table(request):
-    params = _parse_request(request)
+    """Ensure a table exists (``action`` = ``ensure``), migrate its layout
+    (``migrate``), bulk-load partitions into it (``load``) or refresh its
+    summary tables (``summaries``)."""
+    try:
+        params = _parse_request(request)
+    except ValueError as e:
+        return json.dumps({"ok": False, "action": "skipped", "error": str(e)}), 400, _JSON
     project_id = params["project_id"]
     dataset_id = params["dataset_id"]
     table_id = params["table_id"]
@@ -132,14 +509,29 @@ def check_or_create_table(request):
             {"Content-Type": "application/json"},
         )
 
-    client = bigquery.Client(project=project_id)
+    client = _make_client(project_id)
     table_fqid = f"{project_id}.{dataset_id}.{table_id}"
+    layout = params["layout"]
+
+    if params["action"] == "migrate":
+        return _migrate_table(client, params)
+    if params["action"] == "load":
+        return _load_table_partitions(client, params)
+    if params["action"] == "summaries":
+        return _refresh_summaries(client, params)
 
     try:
-        _ = client.get_table(table_fqid)
+        existing = client.get_table(table_fqid)
         return (
             json.dumps(
-                {"ok": True, "exists": True, "action": "none", "table": table_fqid}
+                {
+                    "ok": True,
+                    "exists": True,
+                    "action": "none",
+                    "table": table_fqid,
+                    "layout": _describe_layout(existing),
+                    "layout_matches": _layout_matches(existing, layout),
+                }
             ),
             200,
             {"Content-Type": "application/json"},
@@ -147,10 +539,30 @@ def check_or_create_table(request):
     except NotFound:
         pass
 
+    inferred = None
+    if (not schema or len(schema) == 0) and gcs_uri and params["schema_inference"] != "load":
+        t0 = time.perf_counter()
+        try:
+            inferred = infer_schema(gcs_uri, source_format)
+        except SchemaInferenceError as e:
+            return (
+                json.dumps({"ok": False, "exists": False, "action": "failed", "error": f"Inferencia de esquema falló para {gcs_uri}: {e}"}),
+                400,
+                _JSON,
+            )
+        except Exception as e:
+            return (
+                json.dumps({"ok": False, "exists": False, "action": "failed", "error": f"Error leyendo {gcs_uri}: {str(e)}"}),
+                500,
+                _JSON,
+            )
+        schema = inferred["schema"]
+        inferred["ms"] = round((time.perf_counter() - t0) * 1000, 1)
+
     if not schema or len(schema) == 0:
         if gcs_uri:
             try:
-                _autodetect_schema_via_load(client, table_fqid, gcs_uri, source_format)
+                _autodetect_schema_via_load(client, table_fqid, gcs_uri, source_format, layout)
                 return (
                     json.dumps(
                         {
@@ -196,7 +608,7 @@ def check_or_create_table(request):
                     "ok": False,
                     "exists": False,
                     "action": "skipped",
-                    "error": "La tabla no existe. Proporciona 'schema' o 'gcs_uri' para autodetectar (opcionalmente 'source_format').",
+                    "error": "La tabla no existe. Proporciona 'schema' o 'gcs_uri' para inferir el esquema (opcionalmente 'source_format').",
                 }
             ),
             400,
@@ -204,15 +616,27 @@ def check_or_create_table(request):
         )
 
     try:
-        table = bigquery.Table(table_fqid, schema=schema)
+        table = _apply_layout(bigquery.Table(table_fqid, schema=schema), layout)
         created = client.create_table(table)
         return (
             json.dumps(
                 {
                     "ok": True,
                     "exists": False,
-                    "action": "created",
+                    "action": "created (footer schema)" if inferred else "created",
                     "table": created.full_table_id,
+                    "layout": _describe_layout(created),
+                    **(
+                        {
+                            "inferred_from": inferred["file"],
+                            "format": inferred["format"],
+                            "bytes_read": inferred["bytes_read"],
+                            "inference_ms": inferred["ms"],
+                            "num_fields": len(schema),
+                        }
+                        if inferred
+                        else {}
+                    ),
                 }
             ),
             200,
@@ -0,0 +1,261 @@
+"""Bulk, idempotent loader of curated Parquet partitions into BigQuery.
+
+Each partition prefix (``.../ym=2024-01`` or ``.../date=2024-01-05``) becomes
+one load job into the matching partition decorator (``table$202401``,
+``table$20240105``) with ``WRITE_TRUNCATE``, so a rerun replaces the
+partition instead of duplicating it.  Jobs run in parallel up to
+``max_concurrent``; running jobs are polled in one ``list_jobs`` call per
+cycle instead of one request per job.
+
+The decorator granularity must match the table's time partitioning: ``ym=``
+prefixes need a ``MONTH``-partitioned table, ``date=`` prefixes a ``DAY`` one.
+
+CLI::
+
+    python partition_loader.py --table proj.ais.curated \\
+        --source-base gs://bucket/AIS_2024_curated --discover --from ym=2024-01 --to ym=2024-12
+
+Set ``BQ_LOCAL_DB`` to run against the DuckDB stand-in (``local_client.py``);
+``gs://`` sources are then read from ``$BQ_LOCAL_GCS_ROOT``.
+"""
+
+import argparse
+import json
+import os
+import re
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Iterable, List, Optional
+
+from google.api_core.exceptions import Forbidden, GoogleAPICallError, TooManyRequests
+from google.cloud import bigquery
+from pyarrow import fs as pa_fs
+
+from schema_inference import filesystem_from_uri
+
+DEFAULT_MAX_CONCURRENT = 32
+DEFAULT_POLL_INTERVAL_S = 2.0
+SUBMIT_RETRIES = 5
+
+_VALUE_PATTERNS = [
+    (re.compile(r"^(\d{4})$"), "YEAR"),
+    (re.compile(r"^(\d{4})-(\d{2})$"), "MONTH"),
+    (re.compile(r"^(\d{4})-(\d{2})-(\d{2})$"), "DAY"),
+    (re.compile(r"^(\d{4})-(\d{2})-(\d{2})[T -](\d{2})$"), "HOUR"),
+]
+
+
+def partition_decorator(prefix: str, partition_type: str) -> str:
+    """Decorator suffix (``YYYYMM``...) for the ``key=value`` prefix.
+
+    Raises ``ValueError`` when the value cannot be parsed or its granularity
+    does not match ``partition_type``.
+    """
+    segment = prefix.rstrip("/").rsplit("/", 1)[-1]
+    if "=" not in segment:
+        raise ValueError(f"El prefijo no termina en key=value: {prefix}")
+    value = segment.split("=", 1)[1]
+    for pattern, granularity in _VALUE_PATTERNS:
+        m = pattern.match(value)
+        if m:
+            if granularity != partition_type:
+                raise ValueError(
+                    f"{segment} es de granularidad {granularity} pero la tabla está particionada por {partition_type}."
+                )
+            return "".join(m.groups())
+    raise ValueError(f"Valor de partición no reconocido: {segment}")
+
+
+def discover_partitions(
+    source_base: str,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    filesystem: Optional[pa_fs.FileSystem] = None,
+) -> List[str]:
+    """List ``key=value`` partition prefixes directly under ``source_base``.
+
+    ``start``/``end`` (inclusive, e.g. ``ym=2024-01``) bound the list; the
+    comparison is lexical, which is chronological for ISO values.
+    """
+    scheme = source_base.split("://", 1)[0] + "://" if "://" in source_base else ""
+    if filesystem is None:
+        filesystem, base = filesystem_from_uri(source_base)
+    else:
+        base = source_base
+    names = sorted(
+        info.base_name
+        for info in filesystem.get_file_info(pa_fs.FileSelector(base.rstrip("/")))
+        if info.type == pa_fs.FileType.Directory and "=" in info.base_name
+    )
+    names = [n for n in names if (not start or n >= start) and (not end or n <= end)]
+    root = source_base.rstrip("/") if scheme else base.rstrip("/")
+    return [f"{root}/{n}" for n in names]
+
+
+def _load_config(table: bigquery.Table, source_format: str) -> bigquery.LoadJobConfig:
+    return bigquery.LoadJobConfig(
+        source_format=source_format,
+        write_disposition=bigquery.WriteDisposition.WRITE_TRUNCATE,
+        time_partitioning=table.time_partitioning,
+        clustering_fields=table.clustering_fields,
+    )
+
+
+def _is_rate_limited(exc: Exception) -> bool:
+    if isinstance(exc, TooManyRequests):
+        return True
+    return isinstance(exc, Forbidden) and "rateLimitExceeded" in str(exc)
+
+
+def _poll(client, running: Dict[str, Dict], since: datetime) -> List[str]:
+    """Return the ids of running jobs that finished, refreshing their objects."""
+    try:
+        done = {
+            j.job_id: j
+            for j in client.list_jobs(min_creation_time=since, state_filter="done")
+            if j.job_id in running
+        }
+    except (GoogleAPICallError, AttributeError, TypeError):
+        done = {}
+        for job_id, entry in running.items():
+            entry["job"].reload()
+            if entry["job"].state == "DONE":
+                done[job_id] = entry["job"]
+    for job_id, job in done.items():
+        running[job_id]["job"] = job
+    return list(done)
+
+
+def load_partitions(
+    client,
+    table_fqid: str,
+    prefixes: Iterable[str],
+    max_concurrent: int = DEFAULT_MAX_CONCURRENT,
+    poll_interval_s: float = DEFAULT_POLL_INTERVAL_S,
+    source_format: str = bigquery.SourceFormat.PARQUET,
+    file_glob: str = "*.parquet",
+    log: Callable[[str], None] = print,
+) -> List[Dict]:
+    """Load every prefix into its partition of ``table_fqid``.
+
+    Returns one dict per prefix with ``partition``, ``decorator``, ``job_id``,
+    ``status`` (``loaded``/``failed``), ``output_rows``, ``output_bytes``,
+    ``input_files``, ``seconds`` and ``error``.
+    """
+    table = client.get_table(table_fqid)
+    tp = table.time_partitioning
+    if tp is None or not tp.field:
+        raise ValueError(f"{table_fqid} no está particionada por columna; crea la tabla con 'partitioning'.")
+    config = _load_config(table, source_format)
+    prefixes = list(prefixes)
+
+    results: Dict[str, Dict] = {}
+    queue = deque()
+    for prefix in prefixes:
+        try:
+            queue.append((prefix, partition_decorator(prefix, tp.type_)))
+        except ValueError as e:
+            results[prefix] = {"partition": prefix, "status": "failed", "error": str(e)}
+
+    since = datetime.now(timezone.utc) - timedelta(minutes=1)
+    running: Dict[str, Dict] = {}
+    backoff = 1.0
+    while queue or running:
+        while queue and len(running) < max_concurrent:
+            prefix, decorator = queue[0]
+            uri = f"{prefix.rstrip('/')}/{file_glob}"
+            try:
+                job = client.load_table_from_uri(uri, f"{table_fqid}${decorator}", job_config=config)
+            except Exception as e:  # noqa: BLE001 - reported per partition
+                if _is_rate_limited(e) and backoff <= 2 ** SUBMIT_RETRIES:
+                    log(f"[load] cuota alcanzada, reintentando en {backoff:.0f}s")
+                    time.sleep(backoff)
+                    backoff *= 2
+                    break
+                queue.popleft()
+                results[prefix] = {"partition": prefix, "decorator": decorator, "status": "failed",
+                                   "error": getattr(e, "message", None) or str(e)}
+                continue
+            queue.popleft()
+            backoff = 1.0
+            running[job.job_id] = {"prefix": prefix, "decorator": decorator, "job": job, "t0": time.monotonic()}
+
+        if not running:
+            continue
+        finished = _poll(client, running, since)
+        for job_id in finished:
+            entry = running.pop(job_id)
+            job = entry["job"]
+            error = job.error_result.get("message") if job.error_result else None
+            results[entry["prefix"]] = {
+                "partition": entry["prefix"],
+                "decorator": entry["decorator"],
+                "job_id": job_id,
+                "status": "failed" if error else "loaded",
+                "output_rows": getattr(job, "output_rows", None),
+                "output_bytes": getattr(job, "output_bytes", None),
+                "input_files": getattr(job, "input_files", None),
+                "seconds": round(time.monotonic() - entry["t0"], 1),
+                "error": error,
+            }
+            log(f"[load] {entry['prefix']} -> ${entry['decorator']}: {results[entry['prefix']]['status']}"
+                f" ({results[entry['prefix']]['output_rows']} filas)")
+        if running and not finished:
+            time.sleep(poll_interval_s)
+
+    order = {p: i for i, p in enumerate(prefixes)}
+    return sorted(results.values(), key=lambda r: order[r["partition"]])
+
+
+def summarize(results: List[Dict]) -> Dict:
+    loaded = [r for r in results if r["status"] == "loaded"]
+    return {
+        "partitions": len(results),
+        "loaded": len(loaded),
+        "failed": len(results) - len(loaded),
+        "rows": sum(r.get("output_rows") or 0 for r in loaded),
+        "bytes": sum(r.get("output_bytes") or 0 for r in loaded),
+    }
+
+
+def main():
+    p = argparse.ArgumentParser(description="Carga particiones curated (ym=/date=) a BigQuery en paralelo.")
+    p.add_argument("--table", required=True, help="project.dataset.table (particionada).")
+    p.add_argument("--partitions", default="", help="Prefijos separados por coma (o relativos a --source-base).")
+    p.add_argument("--source-base", default=None)
+    p.add_argument("--discover", action="store_true", help="Lista las particiones bajo --source-base.")
+    p.add_argument("--from", dest="start", default=None, help="Ej. ym=2024-01 (inclusive).")
+    p.add_argument("--to", dest="end", default=None, help="Ej. ym=2024-12 (inclusive).")
+    p.add_argument("--max-concurrent", type=int, default=DEFAULT_MAX_CONCURRENT)
+    p.add_argument("--poll-interval-s", type=float, default=DEFAULT_POLL_INTERVAL_S)
+    a = p.parse_args()
+
+    prefixes = [x.strip() for x in a.partitions.split(",") if x.strip()]
+    if a.source_base:
+        prefixes = [x if "://" in x or x.startswith("/") else f"{a.source_base.rstrip('/')}/{x}" for x in prefixes]
+        if a.discover:
+            prefixes += discover_partitions(a.source_base, a.start, a.end)
+    if not prefixes:
+        raise SystemExit("Sin particiones: usa --partitions o --source-base --discover.")
+
+    project = a.table.split(".")[0]
+    if os.getenv("BQ_LOCAL_DB"):
+        from local_client import LocalBigQueryClient
+
+        client = LocalBigQueryClient(project=project)
+    else:
+        client = bigquery.Client(project=project)
+
+    t0 = time.perf_counter()
+    results = load_partitions(client, a.table, prefixes, a.max_concurrent, a.poll_interval_s)
+    summary = {**summarize(results), "wall_s": round(time.perf_counter() - t0, 1)}
+    for r in results:
+        print(json.dumps(r))
+    print(json.dumps(summary))
+    if summary["failed"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+"""Schema inference from file metadata instead of autodetect load jobs.
+
+Reads only what is needed to learn the columns of ``uri``:
+
+- Parquet / ORC: the file footer (a few KB, via ranged reads).
+- Avro: the container header, where the writer schema is stored as JSON.
+- CSV / newline-delimited JSON: the first ``sample_bytes`` of the file,
+  parsed with Arrow.
+
+Files are opened through ``pyarrow.fs`` (``gs://``, ``s3://`` and local
+paths; with ``BQ_LOCAL_DB`` set, ``gs://`` is read from ``$BQ_LOCAL_GCS_ROOT``
+like ``local_client.py`` does).  When ``uri`` is a directory/prefix, the first data file under it is
+used.  The result is a list of ``bigquery.SchemaField``, nested fields and
+repeated fields included, so an empty table can be created without loading
+any rows.
+"""
+
+import io
+import json
+import os
+import posixpath
+from typing import Any, Dict, List, Optional, Tuple
+
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.json as pa_json
+import pyarrow.parquet as pq
+from pyarrow import fs as pa_fs
+from google.cloud import bigquery
+
+DEFAULT_SAMPLE_BYTES = 256 * 1024
+DEFAULT_LOCAL_GCS_ROOT = "/tmp/bq_local_gcs"
+
+_EXT_TO_FORMAT = {
+    ".parquet": "PARQUET",
+    ".orc": "ORC",
+    ".avro": "AVRO",
+    ".csv": "CSV",
+    ".json": "NEWLINE_DELIMITED_JSON",
+    ".jsonl": "NEWLINE_DELIMITED_JSON",
+    ".ndjson": "NEWLINE_DELIMITED_JSON",
+}
+_COMPRESSION_EXT = (".gz", ".bz2", ".zst")
+
+
+class SchemaInferenceError(ValueError):
+    """The schema of a URI could not be inferred from its metadata."""
+
+
+def format_from_path(path: str) -> Optional[str]:
+    low = path.lower()
+    for comp in _COMPRESSION_EXT:
+        if low.endswith(comp):
+            low = low[: -len(comp)]
+            break
+    for ext, fmt in _EXT_TO_FORMAT.items():
+        if low.endswith(ext):
+            return fmt
+    return None
+
+
+def filesystem_from_uri(uri: str) -> Tuple[pa_fs.FileSystem, str]:
+    """``pa_fs.FileSystem.from_uri``, with ``gs://`` mapped under ``$BQ_LOCAL_GCS_ROOT`` in local mode."""
+    if os.getenv("BQ_LOCAL_DB") and uri.startswith("gs://"):
+        root = os.getenv("BQ_LOCAL_GCS_ROOT", DEFAULT_LOCAL_GCS_ROOT)
+        return pa_fs.LocalFileSystem(), os.path.join(os.path.abspath(root), uri[len("gs://"):])
+    return pa_fs.FileSystem.from_uri(uri)
+
+
+def resolve_data_file(uri: str, filesystem: Optional[pa_fs.FileSystem] = None) -> Tuple[pa_fs.FileSystem, str]:
+    """Return ``(filesystem, path)`` of ``uri`` or of the first data file under it."""
+    if filesystem is None:
+        filesystem, path = filesystem_from_uri(uri)
+    else:
+        path = uri
+    info = filesystem.get_file_info(path)
+    if info.type == pa_fs.FileType.File:
+        return filesystem, path
+    if info.type == pa_fs.FileType.NotFound and "*" not in path:
+        raise SchemaInferenceError(f"No existe: {uri}")
+    base = path.split("*", 1)[0].rstrip("/")
+    candidates = sorted(
+        f.path
+        for f in filesystem.get_file_info(pa_fs.FileSelector(base, recursive=True))
+        if f.type == pa_fs.FileType.File
+        and not any(part.startswith(("_", ".")) for part in f.path[len(base):].split("/"))
+        and format_from_path(f.path)
+    )
+    if not candidates:
+        raise SchemaInferenceError(f"No hay archivos de datos bajo {uri}")
+    return filesystem, candidates[0]
+
+
+# -- Arrow -> BigQuery --------------------------------------------------------------------
+
+
+def _arrow_type_to_bq(t: pa.DataType, int96: bool = False) -> Tuple[str, Optional[List[bigquery.SchemaField]]]:
+    if pa.types.is_dictionary(t):
+        return _arrow_type_to_bq(t.value_type)
+    if pa.types.is_boolean(t):
+        return "BOOLEAN", None
+    if pa.types.is_integer(t):
+        return "INTEGER", None
+    if pa.types.is_floating(t):
+        return "FLOAT", None
+    if pa.types.is_decimal(t):
+        return ("NUMERIC" if t.precision <= 38 and t.scale <= 9 else "BIGNUMERIC"), None
+    if pa.types.is_string(t) or pa.types.is_large_string(t) or pa.types.is_null(t):
+        return "STRING", None
+    if pa.types.is_binary(t) or pa.types.is_large_binary(t) or pa.types.is_fixed_size_binary(t):
+        return "BYTES", None
+    if pa.types.is_date(t):
+        return "DATE", None
+    if pa.types.is_timestamp(t):
+        # Parquet INT96 (Spark's default) and UTC-adjusted timestamps load as
+        # TIMESTAMP; naive timestamps load as DATETIME.
+        return ("TIMESTAMP" if t.tz or int96 else "DATETIME"), None
+    if pa.types.is_time(t):
+        return "TIME", None
+    if pa.types.is_struct(t):
+        return "RECORD", [arrow_field_to_bq(t.field(i)) for i in range(t.num_fields)]
+    if pa.types.is_map(t):
+        return "RECORD", [
+            arrow_field_to_bq(pa.field("key", t.key_type, nullable=False)),
+            arrow_field_to_bq(pa.field("value", t.item_type)),
+        ]
+    raise SchemaInferenceError(f"Tipo Arrow sin equivalente en BigQuery: {t}")
+
+
+def arrow_field_to_bq(field: pa.Field, int96: bool = False) -> bigquery.SchemaField:
+    t = field.type
+    mode = "NULLABLE" if field.nullable else "REQUIRED"
+    if pa.types.is_list(t) or pa.types.is_large_list(t) or pa.types.is_fixed_size_list(t) or pa.types.is_map(t):
+        item = t if pa.types.is_map(t) else t.value_type
+        if not pa.types.is_map(t) and (pa.types.is_list(item) or pa.types.is_large_list(item)):
+            raise SchemaInferenceError(f"BigQuery no admite listas anidadas ({field.name}: {t}).")
+        ftype, sub = _arrow_type_to_bq(item, int96)
+        return bigquery.SchemaField(field.name, ftype, mode="REPEATED", fields=sub or ())
+    ftype, sub = _arrow_type_to_bq(t, int96)
+    return bigquery.SchemaField(field.name, ftype, mode=mode, fields=sub or ())
+
+
+def arrow_schema_to_bq(schema: pa.Schema, int96_columns=()) -> List[bigquery.SchemaField]:
+    int96_columns = set(int96_columns)
+    return [arrow_field_to_bq(f, f.name in int96_columns) for f in schema]
+
+
+# -- Avro header ---------------------------------------------------------------------------
+
+_AVRO_PRIMITIVES = {
+    "null": "STRING",
+    "boolean": "BOOLEAN",
+    "int": "INTEGER",
+    "long": "INTEGER",
+    "float": "FLOAT",
+    "double": "FLOAT",
+    "bytes": "BYTES",
+    "string": "STRING",
+}
+_AVRO_LOGICAL = {
+    "date": "DATE",
+    "time-millis": "TIME",
+    "time-micros": "TIME",
+    "timestamp-millis": "TIMESTAMP",
+    "timestamp-micros": "TIMESTAMP",
+    "local-timestamp-millis": "DATETIME",
+    "local-timestamp-micros": "DATETIME",
+    "decimal": "NUMERIC",
+    "uuid": "STRING",
+}
+
+
+def _read_long(buf: io.BytesIO) -> int:
+    shift, result = 0, 0
+    while True:
+        b = buf.read(1)
+        if not b:
+            raise SchemaInferenceError("Cabecera Avro truncada.")
+        byte = b[0]
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            break
+        shift += 7
+    return (result >> 1) ^ -(result & 1)
+
+
+def avro_header_schema(header: bytes) -> Dict[str, Any]:
+    """Writer schema (parsed JSON) from the first bytes of an Avro container."""
+    if header[:4] != b"Obj\x01":
+        raise SchemaInferenceError("No es un contenedor Avro.")
+    buf = io.BytesIO(header[4:])
+    while True:
+        count = _read_long(buf)
+        if count == 0:
+            break
+        if count < 0:
+            _read_long(buf)  # block size in bytes
+            count = -count
+        for _ in range(count):
+            key = buf.read(_read_long(buf)).decode("utf-8")
+            value = buf.read(_read_long(buf))
+            if key == "avro.schema":
+                return json.loads(value.decode("utf-8"))
+    raise SchemaInferenceError("La cabecera Avro no incluye avro.schema.")
+
+
+def _avro_to_bq(name: str, avro_type: Any, mode: str = "REQUIRED") -> bigquery.SchemaField:
+    if isinstance(avro_type, list):  # union
+        non_null = [t for t in avro_type if t != "null"]
+        mode = "NULLABLE" if len(non_null) < len(avro_type) else "REQUIRED"
+        if len(non_null) != 1:
+            raise SchemaInferenceError(f"Unión Avro no soportada en {name}: {avro_type}")
+        return _avro_to_bq(name, non_null[0], mode)
+    if isinstance(avro_type, str):
+        if avro_type not in _AVRO_PRIMITIVES:
+            raise SchemaInferenceError(f"Tipo Avro con nombre no soportado en {name}: {avro_type}")
+        return bigquery.SchemaField(name, _AVRO_PRIMITIVES[avro_type], mode=mode)
+    kind = avro_type.get("type")
+    logical = avro_type.get("logicalType")
+    if logical in _AVRO_LOGICAL:
+        return bigquery.SchemaField(name, _AVRO_LOGICAL[logical], mode=mode)
+    if kind == "record":
+        return bigquery.SchemaField(
+            name, "RECORD", mode=mode, fields=[_avro_to_bq(f["name"], f["type"]) for f in avro_type["fields"]]
+        )
+    if kind == "array":
+        inner = _avro_to_bq(name, avro_type["items"])
+        return bigquery.SchemaField(name, inner.field_type, mode="REPEATED", fields=inner.fields)
+    if kind == "map":
+        return bigquery.SchemaField(
+            name,
+            "RECORD",
+            mode="REPEATED",
+            fields=[bigquery.SchemaField("key", "STRING", mode="REQUIRED"), _avro_to_bq("value", avro_type["values"])],
+        )
+    if kind == "enum":
+        return bigquery.SchemaField(name, "STRING", mode=mode)
+    if kind == "fixed":
+        return bigquery.SchemaField(name, "BYTES", mode=mode)
+    return _avro_to_bq(name, kind, mode)
+
+
+# -- entry point --------------------------------------------------------------------------------
+
+
+def infer_schema(
+    uri: str,
+    source_format: Optional[str] = None,
+    sample_bytes: int = DEFAULT_SAMPLE_BYTES,
+    filesystem: Optional[pa_fs.FileSystem] = None,
+) -> Dict[str, Any]:
+    """Infer the BigQuery schema of ``uri`` from metadata or a small sample.
+
+    Returns
+    -------
+    dict
+        ``{"schema": [SchemaField, ...], "file": <path read>,
+        "format": <format>, "bytes_read": <approximate bytes read>}``
+    """
+    filesystem, path = resolve_data_file(uri, filesystem)
+    fmt = (source_format or format_from_path(path) or "").upper()
+    if fmt == "JSON":
+        fmt = "NEWLINE_DELIMITED_JSON"
+
+    if fmt == "PARQUET":
+        with filesystem.open_input_file(path) as f:
+            pf = pq.ParquetFile(f)
+            int96 = [
+                pf.schema.column(i).path.split(".")[0]
+                for i in range(len(pf.schema))
+                if pf.schema.column(i).physical_type == "INT96"
+            ]
+            schema = arrow_schema_to_bq(pf.schema_arrow, int96)
+            bytes_read = pf.metadata.serialized_size + 8
+    elif fmt == "ORC":
+        import pyarrow.orc as pa_orc
+
+        with filesystem.open_input_file(path) as f:
+            schema = arrow_schema_to_bq(pa_orc.ORCFile(f).schema)
+            bytes_read = None
+    elif fmt == "AVRO":
+        with filesystem.open_input_stream(path) as f:
+            header = f.read(sample_bytes)
+        writer = avro_header_schema(header)
+        if writer.get("type") != "record":
+            raise SchemaInferenceError("El esquema Avro de nivel superior debe ser un record.")
+        schema = [_avro_to_bq(fd["name"], fd["type"]) for fd in writer["fields"]]
+        bytes_read = len(header)
+    elif fmt in ("CSV", "NEWLINE_DELIMITED_JSON"):
+        with filesystem.open_input_stream(path, compression="detect") as f:
+            sample = f.read(sample_bytes)
+        bytes_read = len(sample)
+        cut = sample.rfind(b"\n")
+        if cut > 0 and len(sample) == sample_bytes:
+            sample = sample[: cut + 1]
+        reader = pa_csv.read_csv if fmt == "CSV" else pa_json.read_json
+        table = reader(pa.BufferReader(sample))
+        # A sample cannot prove a column is never null.
+        schema = [
+            bigquery.SchemaField(f.name, f.field_type, mode="NULLABLE" if f.mode == "REQUIRED" else f.mode, fields=f.fields)
+            for f in arrow_schema_to_bq(table.schema)
+        ]
+    else:
+        raise SchemaInferenceError(
+            f"Formato no soportado para inferencia ({fmt or 'desconocido'}): {posixpath.basename(path)}"
+        )
+    return {"schema": schema, "file": path, "format": fmt, "bytes_read": bytes_read}
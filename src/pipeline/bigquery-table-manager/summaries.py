@@ -0,0 +1,289 @@
+"""Managed daily summary tables / materialized views over the AIS table.
+
+Each declared summary groups the source table by ``DATE(<timestamp>)`` plus a
+set of dimensions and stores, per group, the row count, and for every metric
+its non-null count, sum and sum of squares, plus an ``HLL_COUNT.INIT``
+sketch of distinct vessels.  Those columns are additive, so dashboards can
+re-aggregate any date range or dimension subset exactly (means, sample
+standard deviations) and merge the sketches for distinct counts.
+
+Kinds:
+
+- ``table``: a ``date``-partitioned, clustered table refreshed incrementally.
+  Only the source partitions modified since the last refresh are recomputed
+  (``INFORMATION_SCHEMA.PARTITIONS``); if that view is not available the last
+  ``lookback_days`` before the watermark plus everything after it are
+  recomputed.  Each refresh is a ``DELETE`` + ``INSERT`` transaction on the
+  affected dates.
+- ``materialized_view``: ``CREATE MATERIALIZED VIEW``; BigQuery maintains it
+  incrementally, and a refresh calls ``BQ.REFRESH_MATERIALIZED_VIEW``.
+
+Every refresh appends a row to ``<dataset>._summary_watermarks``.
+
+Specs with ``"shape": "catalog"`` store distinct dimension values per day
+instead (the dashboard's filter catalog), refreshed the same way.
+"""
+
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from google.api_core.exceptions import BadRequest, Forbidden, NotFound
+
+DEFAULT_LOOKBACK_DAYS = 2
+WATERMARK_TABLE = "_summary_watermarks"
+
+# Declared summaries.  ``ais_daily_status`` backs resumen_estado,
+# variabilidad, velocidad por día de la semana and estado más frecuente.
+SUMMARIES: Dict[str, Dict[str, Any]] = {
+    "ais_daily_status": {
+        "kind": "table",
+        "timestamp_column": "BaseDateTime",
+        "dimensions": ["VesselTypeName", "NavStatusName"],
+        "metrics": ["SOG", "Draft", "COG"],
+        "distinct": "MMSI",
+    },
+    # Dimension catalog for the dashboard filters: one row per (date,
+    # dimension, value) with its message count; MMSI rows also carry the
+    # latest non-null vessel attributes.  Folded to (dimension, value) by
+    # apps/sql/dim_catalog.sql.
+    "ais_dim_catalog_daily": {
+        "kind": "table",
+        "shape": "catalog",
+        "timestamp_column": "BaseDateTime",
+        "dimensions": ["MMSI", "VesselName", "CallSign", "IMO", "VesselTypeName", "VesselTypeClass", "NavStatusName"],
+        "entity": "MMSI",
+        "entity_attributes": ["VesselName", "CallSign", "IMO", "VesselTypeName"],
+    },
+}
+
+
+def summary_columns(spec: Dict[str, Any]) -> List[str]:
+    if spec.get("shape") == "catalog":
+        return ["date", "dimension", "value", "n_rows"] + list(spec.get("entity_attributes", []))
+    cols = ["date"] + list(spec["dimensions"]) + ["n_rows"]
+    for m in spec["metrics"]:
+        m = m.lower()
+        cols += [f"n_{m}", f"sum_{m}", f"sumsq_{m}"]
+    if spec.get("distinct"):
+        cols.append(f"{spec['distinct'].lower()}_sketch")
+    return cols
+
+
+def summary_select_sql(source_fqid: str, spec: Dict[str, Any], where: str = "TRUE") -> str:
+    """``SELECT`` producing the summary rows for the source rows matching ``where``."""
+    if spec.get("shape") == "catalog":
+        return catalog_select_sql(source_fqid, spec, where)
+    ts = spec["timestamp_column"]
+    exprs = [f"DATE({ts}) AS date"] + list(spec["dimensions"]) + ["COUNT(*) AS n_rows"]
+    for m in spec["metrics"]:
+        v = f"CAST({m} AS FLOAT64)"
+        low = m.lower()
+        exprs += [
+            f"COUNT({m}) AS n_{low}",
+            f"SUM({v}) AS sum_{low}",
+            f"SUM({v} * {v}) AS sumsq_{low}",
+        ]
+    if spec.get("distinct"):
+        exprs.append(f"HLL_COUNT.INIT({spec['distinct']}) AS {spec['distinct'].lower()}_sketch")
+    # By expression: the curated table has its own ``date`` column.
+    group = ", ".join([f"DATE({ts})"] + list(spec["dimensions"]))
+    select = ",\n  ".join(exprs)
+    return f"SELECT\n  {select}\nFROM `{source_fqid}`\nWHERE {ts} IS NOT NULL AND ({where})\nGROUP BY {group}"
+
+
+def catalog_select_sql(source_fqid: str, spec: Dict[str, Any], where: str = "TRUE") -> str:
+    """Per-day distinct values of every dimension (``UNION ALL`` of one branch per dimension)."""
+    ts = spec["timestamp_column"]
+    attrs = list(spec.get("entity_attributes", []))
+    branches = []
+    for dim in spec["dimensions"]:
+        if dim == spec.get("entity"):
+            attr_exprs = [f"MAX_BY(CAST({a} AS STRING), IF({a} IS NULL, NULL, {ts})) AS {a}" for a in attrs]
+        else:
+            attr_exprs = [f"CAST(NULL AS STRING) AS {a}" for a in attrs]
+        select = ",\n  ".join(
+            [f"DATE({ts}) AS date", f"'{dim}' AS dimension", f"CAST({dim} AS STRING) AS value", "COUNT(*) AS n_rows"]
+            + attr_exprs
+        )
+        branches.append(
+            f"SELECT\n  {select}\nFROM `{source_fqid}`\n"
+            f"WHERE {ts} IS NOT NULL AND {dim} IS NOT NULL AND ({where})\nGROUP BY DATE({ts}), CAST({dim} AS STRING)"
+        )
+    return "\nUNION ALL\n".join(branches)
+
+
+def _cluster_columns(spec: Dict[str, Any]) -> List[str]:
+    if spec.get("shape") == "catalog":
+        return ["dimension", "value"]
+    return list(spec["dimensions"][:4])
+
+
+def create_summary_ddl(target_fqid: str, source_fqid: str, spec: Dict[str, Any]) -> str:
+    cluster = ", ".join(_cluster_columns(spec))
+    cluster_clause = f"\nCLUSTER BY {cluster}" if cluster else ""
+    if spec.get("kind") == "materialized_view":
+        return (
+            f"CREATE MATERIALIZED VIEW IF NOT EXISTS `{target_fqid}`\n"
+            f"PARTITION BY date{cluster_clause}\n"
+            f"OPTIONS (enable_refresh = TRUE, refresh_interval_minutes = 60)\n"
+            f"AS {summary_select_sql(source_fqid, spec)}"
+        )
+    return (
+        f"CREATE TABLE IF NOT EXISTS `{target_fqid}`\n"
+        f"PARTITION BY date{cluster_clause}\n"
+        f"AS {summary_select_sql(source_fqid, spec, where='FALSE')}"
+    )
+
+
+def _date_ranges(dates: List[date]) -> List[Tuple[date, date]]:
+    ranges: List[Tuple[date, date]] = []
+    for d in sorted(set(dates)):
+        if ranges and d - ranges[-1][1] == timedelta(days=1):
+            ranges[-1] = (ranges[-1][0], d)
+        else:
+            ranges.append((d, d))
+    return ranges
+
+
+def date_predicate(expr: str, dates: List[date]) -> str:
+    """``(expr BETWEEN a AND b OR ...)`` over contiguous runs of ``dates``."""
+    terms = [f"{expr} BETWEEN DATE '{a}' AND DATE '{b}'" for a, b in _date_ranges(dates)]
+    return "(" + " OR ".join(terms) + ")" if terms else "FALSE"
+
+
+def _rows(client, sql: str) -> List[Any]:
+    return list(client.query(sql).result())
+
+
+def _as_date(v) -> Optional[date]:
+    if v is None:
+        return None
+    if isinstance(v, datetime):
+        return v.date()
+    if isinstance(v, date):
+        return v
+    return date.fromisoformat(str(v)[:10])
+
+
+def _ensure_watermarks(client, wm_fqid: str) -> None:
+    client.query(
+        f"CREATE TABLE IF NOT EXISTS `{wm_fqid}` (\n"
+        "  summary STRING, source_table STRING, target_table STRING, kind STRING, mode STRING,\n"
+        "  first_date DATE, last_date DATE, partitions INT64, rows_written INT64, refreshed_at TIMESTAMP\n"
+        ")"
+    ).result()
+
+
+def last_watermark(client, wm_fqid: str, name: str) -> Optional[Dict[str, Any]]:
+    rows = _rows(
+        client,
+        f"SELECT last_date, refreshed_at FROM `{wm_fqid}` "
+        f"WHERE summary = '{name}' ORDER BY refreshed_at DESC LIMIT 1",
+    )
+    if not rows:
+        return None
+    return {"last_date": _as_date(rows[0]["last_date"]), "refreshed_at": rows[0]["refreshed_at"]}
+
+
+def _changed_partition_dates(client, source_fqid: str, since) -> Optional[List[date]]:
+    """Dates of source partitions modified after ``since`` (None if unknown)."""
+    project, dataset, table = source_fqid.split(".")
+    try:
+        rows = _rows(
+            client,
+            f"SELECT partition_id FROM `{project}.{dataset}.INFORMATION_SCHEMA.PARTITIONS` "
+            f"WHERE table_name = '{table}' AND last_modified_time > TIMESTAMP '{since}' "
+            "AND partition_id NOT IN ('__NULL__', '__UNPARTITIONED__')",
+        )
+    except (BadRequest, Forbidden, NotFound):
+        return None
+    dates: List[date] = []
+    for r in rows:
+        pid = r["partition_id"]
+        if len(pid) >= 8:
+            dates.append(date(int(pid[:4]), int(pid[4:6]), int(pid[6:8])))
+        elif len(pid) == 6:
+            d = date(int(pid[:4]), int(pid[4:6]), 1)
+            while d.month == int(pid[4:6]):
+                dates.append(d)
+                d += timedelta(days=1)
+    return dates
+
+
+def _dates_to_refresh(client, source_fqid: str, spec: Dict[str, Any], wm, lookback_days: int, full: bool):
+    ts = spec["timestamp_column"]
+    if wm and not full:
+        changed = _changed_partition_dates(client, source_fqid, wm["refreshed_at"])
+        if changed is not None:
+            return changed, "partitions"
+        start = wm["last_date"] - timedelta(days=lookback_days)
+        where = f"DATE({ts}) >= DATE '{start}'"
+    else:
+        where = "TRUE"
+    row = _rows(client, f"SELECT MIN(DATE({ts})) AS lo, MAX(DATE({ts})) AS hi FROM `{source_fqid}` WHERE {where}")[0]
+    lo, hi = _as_date(row["lo"]), _as_date(row["hi"])
+    if lo is None:
+        return [], "lookback" if wm and not full else "full"
+    return [lo + timedelta(days=i) for i in range((hi - lo).days + 1)], "lookback" if wm and not full else "full"
+
+
+def refresh_summary(
+    client,
+    name: str,
+    spec: Dict[str, Any],
+    source_fqid: str,
+    target_fqid: str,
+    lookback_days: int = DEFAULT_LOOKBACK_DAYS,
+    full: bool = False,
+) -> Dict[str, Any]:
+    """Create ``target_fqid`` if needed and bring it up to date with the source."""
+    project, dataset, _ = target_fqid.split(".")
+    wm_fqid = f"{project}.{dataset}.{WATERMARK_TABLE}"
+    _ensure_watermarks(client, wm_fqid)
+    ddl = create_summary_ddl(target_fqid, source_fqid, spec)
+    client.query(ddl).result()
+    kind = spec.get("kind", "table")
+    wm = last_watermark(client, wm_fqid, name)
+
+    if kind == "materialized_view":
+        client.query(f"CALL BQ.REFRESH_MATERIALIZED_VIEW('{target_fqid}')").result()
+        dates, mode, rows_written = [], "materialized_view", None
+    else:
+        dates, mode = _dates_to_refresh(client, source_fqid, spec, wm, lookback_days, full)
+        rows_written = 0
+        if dates:
+            cols = ", ".join(summary_columns(spec))
+            select = summary_select_sql(
+                source_fqid, spec, where=date_predicate(f"DATE({spec['timestamp_column']})", dates)
+            )
+            client.query(
+                "BEGIN TRANSACTION;\n"
+                f"DELETE FROM `{target_fqid}` WHERE {date_predicate('date', dates)};\n"
+                f"INSERT INTO `{target_fqid}` ({cols})\n{select};\n"
+                "COMMIT TRANSACTION;"
+            ).result()
+            rows_written = _rows(
+                client, f"SELECT COUNT(*) AS n FROM `{target_fqid}` WHERE {date_predicate('date', dates)}"
+            )[0]["n"]
+
+    now = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S.%f")
+    first = f"DATE '{min(dates)}'" if dates else "NULL"
+    last_date = max(dates) if dates else (wm["last_date"] if wm else None)
+    last = f"DATE '{last_date}'" if last_date else "NULL"
+    client.query(
+        f"INSERT INTO `{wm_fqid}` (summary, source_table, target_table, kind, mode, first_date, last_date, "
+        f"partitions, rows_written, refreshed_at) VALUES ('{name}', '{source_fqid}', '{target_fqid}', "
+        f"'{kind}', '{mode}', {first}, {last}, {len(dates)}, {rows_written if rows_written is not None else 'NULL'}, "
+        f"TIMESTAMP '{now}')"
+    ).result()
+    return {
+        "summary": name,
+        "kind": kind,
+        "table": target_fqid,
+        "mode": mode,
+        "dates_refreshed": len(dates),
+        "first_date": str(min(dates)) if dates else None,
+        "last_date": str(last_date) if last_date else None,
+        "rows_written": rows_written,
+        "previous_refresh": str(wm["refreshed_at"]) if wm else None,
+    }
@@ -0,0 +1,42 @@
+import os
+import sys
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+# The table manager is deployed as a flat directory of modules.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def local_gcs(tmp_path, monkeypatch):
+    """Local mode: DuckDB stand-in, with ``gs://`` read from ``tmp_path/gcs``."""
+    root = tmp_path / "gcs"
+    root.mkdir()
+    monkeypatch.setenv("BQ_LOCAL_DB", ":memory:")
+    monkeypatch.setenv("BQ_LOCAL_GCS_ROOT", str(root))
+    return root
+
+
+@pytest.fixture
+def client(local_gcs):
+    from local_client import LocalBigQueryClient
+
+    return LocalBigQueryClient(project="p", database=":memory:")
+
+
+def write_month(root, bucket_path: str, ym: str, n: int, mmsi0: int = 1) -> None:
+    """Curated-shaped Parquet for month ``ym`` under ``root/bucket_path/ym=<ym>/``."""
+    d = root / bucket_path / f"ym={ym}"
+    d.mkdir(parents=True, exist_ok=True)
+    pq.write_table(
+        pa.table(
+            {
+                "MMSI": pa.array(range(mmsi0, mmsi0 + n), type=pa.int64()),
+                "BaseDateTime": pa.array([f"{ym}-0{1 + i % 9} 12:00:00" for i in range(n)]).cast(pa.timestamp("us")),
+                "SOG": pa.array([float(i) for i in range(n)]),
+            }
+        ),
+        d / "part-0000.parquet",
+    )
@@ -0,0 +1,102 @@
+import json
+
+import pytest
+from google.cloud import bigquery
+
+import main
+from conftest import write_month
+
+
+class _Request:
+    def __init__(self, body):
+        self.body = body
+
+    def get_json(self, silent=False):
+        return self.body
+
+
+@pytest.fixture
+def call(client, monkeypatch):
+    """POST ``body`` to the handler on the shared local client; ``(status, payload)``."""
+    monkeypatch.setattr(main, "_make_client", lambda project_id: client)
+
+    def _call(**body):
+        payload, status, _ = main.check_or_create_table(
+            _Request({"project_id": "p", "dataset_id": "ais", "table_id": "curated", **body})
+        )
+        return status, json.loads(payload)
+
+    return _call
+
+
+LAYOUT = {
+    "partitioning": {"field": "BaseDateTime", "type": "MONTH", "expiration_days": 730, "require_partition_filter": True},
+    "clustering": ["MMSI"],
+}
+
+
+def test_unknown_action_is_rejected(call, client):
+    status, out = call(action="esnure", schema=[{"name": "MMSI", "type": "INTEGER"}])
+    assert status == 400
+    assert out["ok"] is False
+    for action in main._ACTIONS:
+        assert action in out["error"]
+    assert "p.ais.curated" not in client.tables
+
+
+def test_layout_ddl():
+    layout = main._parse_layout(LAYOUT)
+    assert main.build_layout_ddl("p.ais.t2", "p.ais.t", layout, "TIMESTAMP") == (
+        "CREATE TABLE `p.ais.t2`\n"
+        "PARTITION BY TIMESTAMP_TRUNC(BaseDateTime, MONTH)\n"
+        "CLUSTER BY MMSI\n"
+        "OPTIONS (partition_expiration_days = 730, require_partition_filter = TRUE)\n"
+        "AS SELECT * FROM `p.ais.t`"
+    )
+    day = main._parse_layout({"partitioning": {"field": "date", "type": "DAY"}, "clustering": "MMSI, geohash9"})
+    assert main.build_layout_ddl("p.ais.t2", "p.ais.t", day, "DATE").splitlines()[1:3] == [
+        "PARTITION BY date",
+        "CLUSTER BY MMSI, geohash9",
+    ]
+    with pytest.raises(ValueError):
+        main.build_layout_ddl("p.ais.t2", "p.ais.t", day, "STRING")
+
+
+def test_ensure_creates_table_with_layout(call, client):
+    status, out = call(schema=[{"name": "MMSI", "type": "INTEGER"}, {"name": "BaseDateTime", "type": "TIMESTAMP"}], **LAYOUT)
+    assert (status, out["action"]) == (200, "created")
+    table = client.get_table("p.ais.curated")
+    assert (table.time_partitioning.type_, table.time_partitioning.field) == ("MONTH", "BaseDateTime")
+    assert table.time_partitioning.expiration_ms == 730 * 86_400_000
+    assert table.require_partition_filter is True
+    assert table.clustering_fields == ["MMSI"]
+
+    status, out = call(**LAYOUT)
+    assert (status, out["action"], out["layout_matches"]) == (200, "none", True)
+
+
+def test_autodetect_load_job_config(call, client, local_gcs):
+    write_month(local_gcs, "bucket/curated", "2024-01", 3)
+    status, out = call(gcs_uri="gs://bucket/curated/ym=2024-01/part-0000.parquet", schema_inference="load", **LAYOUT)
+    assert (status, out["action"]) == (200, "created (autodetect)")
+    load = [j for j in client.jobs if j.job_type == "load"][-1].configuration["load"]
+    assert load["autodetect"] is True
+    assert load["writeDisposition"] == "WRITE_EMPTY"
+    assert load["sourceFormat"] == "PARQUET"
+    assert load["timePartitioning"] == {"type": "MONTH", "field": "BaseDateTime", "expirationMs": str(730 * 86_400_000)}
+    assert load["clustering"] == {"fields": ["MMSI"]}
+
+
+def test_migrate_runs_ctas_with_layout(call, client):
+    client.create_table(
+        bigquery.Table(
+            "p.ais.curated",
+            schema=[bigquery.SchemaField("MMSI", "INTEGER"), bigquery.SchemaField("BaseDateTime", "TIMESTAMP")],
+        )
+    )
+    status, out = call(action="migrate", **LAYOUT)
+    assert (status, out["action"], out["table"]) == (200, "migrated", "p.ais.curated_optimized")
+    assert out["ddl"].startswith("CREATE TABLE `p.ais.curated_optimized`\nPARTITION BY TIMESTAMP_TRUNC(BaseDateTime, MONTH)")
+    migrated = client.get_table("p.ais.curated_optimized")
+    assert migrated.time_partitioning.type_ == "MONTH"
+    assert migrated.clustering_fields == ["MMSI"]
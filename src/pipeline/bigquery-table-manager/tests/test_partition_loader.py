@@ -0,0 +1,65 @@
+from google.cloud import bigquery
+
+from conftest import write_month
+from partition_loader import discover_partitions, load_partitions
+
+
+def _monthly_table(client, fqid="p.ais.curated"):
+    table = bigquery.Table(
+        fqid,
+        schema=[
+            bigquery.SchemaField("MMSI", "INTEGER"),
+            bigquery.SchemaField("BaseDateTime", "TIMESTAMP"),
+            bigquery.SchemaField("SOG", "FLOAT"),
+        ],
+    )
+    table.time_partitioning = bigquery.TimePartitioning(type_="MONTH", field="BaseDateTime")
+    client.create_table(table)
+    return client.get_table(fqid)
+
+
+def test_discover_reads_gs_from_local_root(local_gcs):
+    for ym in ("2024-01", "2024-02", "2024-03"):
+        write_month(local_gcs, "bucket/curated", ym, 3)
+    (local_gcs / "bucket/curated/_markers").mkdir()
+
+    assert discover_partitions("gs://bucket/curated") == [
+        "gs://bucket/curated/ym=2024-01",
+        "gs://bucket/curated/ym=2024-02",
+        "gs://bucket/curated/ym=2024-03",
+    ]
+    assert discover_partitions("gs://bucket/curated", start="ym=2024-02", end="ym=2024-02") == [
+        "gs://bucket/curated/ym=2024-02"
+    ]
+
+
+def test_load_uses_decorators_and_rerun_replaces(local_gcs, client):
+    write_month(local_gcs, "bucket/curated", "2024-01", 5)
+    write_month(local_gcs, "bucket/curated", "2024-02", 4)
+    _monthly_table(client)
+    prefixes = discover_partitions("gs://bucket/curated")
+
+    first = load_partitions(client, "p.ais.curated", prefixes, poll_interval_s=0, log=lambda _: None)
+    assert [(r["decorator"], r["status"], r["output_rows"]) for r in first] == [
+        ("202401", "loaded", 5),
+        ("202402", "loaded", 4),
+    ]
+    loads = [j for j in client.jobs if j.job_type == "load"]
+    assert {j.configuration["load"]["writeDisposition"] for j in loads} == {"WRITE_TRUNCATE"}
+
+    # January is rewritten with fewer rows; the rerun must not duplicate February.
+    write_month(local_gcs, "bucket/curated", "2024-01", 2, mmsi0=100)
+    load_partitions(client, "p.ais.curated", prefixes, poll_interval_s=0, log=lambda _: None)
+    rows = client.query(
+        "SELECT strftime(BaseDateTime, '%Y-%m') AS ym, COUNT(*) AS n FROM `p.ais.curated` GROUP BY ym ORDER BY ym"
+    ).result()
+    assert [(r["ym"], r["n"]) for r in rows] == [("2024-01", 2), ("2024-02", 4)]
+
+
+def test_prefix_of_wrong_granularity_fails_without_loading(local_gcs, client):
+    _monthly_table(client)
+    results = load_partitions(
+        client, "p.ais.curated", ["gs://bucket/curated/date=2024-01-05"], poll_interval_s=0, log=lambda _: None
+    )
+    assert results[0]["status"] == "failed"
+    assert not [j for j in client.jobs if j.job_type == "load"]
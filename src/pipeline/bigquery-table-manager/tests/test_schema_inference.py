@@ -0,0 +1,66 @@
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from conftest import write_month
+from schema_inference import SchemaInferenceError, infer_schema, resolve_data_file
+
+
+def test_prefix_resolves_to_first_data_file_under_local_root(local_gcs):
+    write_month(local_gcs, "bucket/curated", "2024-02", 2)
+    write_month(local_gcs, "bucket/curated", "2024-01", 2)
+    (local_gcs / "bucket/curated/_SUCCESS").write_text("")
+
+    _, path = resolve_data_file("gs://bucket/curated")
+    assert path == str(local_gcs / "bucket/curated/ym=2024-01/part-0000.parquet")
+
+
+def test_parquet_footer_schema(local_gcs):
+    d = local_gcs / "bucket/nested"
+    d.mkdir(parents=True)
+    pq.write_table(
+        pa.table(
+            {
+                "MMSI": pa.array([1, 2], type=pa.int64()),
+                "BaseDateTime": pa.array([0, 1], type=pa.timestamp("us", tz="UTC")),
+                "local": pa.array([0, 1], type=pa.timestamp("us")),
+                "date": pa.array([0, 1], type=pa.date32()),
+                "LAT": pa.array([1.5, None]),
+                "tags": pa.array([["a"], []], type=pa.list_(pa.string())),
+                "dims": pa.array([{"length": 10.0, "width": 2.0}, None]),
+            }
+        ),
+        d / "x.parquet",
+    )
+
+    out = infer_schema("gs://bucket/nested/x.parquet")
+    fields = {f.name: f for f in out["schema"]}
+    assert out["format"] == "PARQUET"
+    assert [(n, fields[n].field_type) for n in ("MMSI", "BaseDateTime", "local", "date", "LAT")] == [
+        ("MMSI", "INTEGER"),
+        ("BaseDateTime", "TIMESTAMP"),
+        ("local", "DATETIME"),
+        ("date", "DATE"),
+        ("LAT", "FLOAT"),
+    ]
+    assert (fields["tags"].field_type, fields["tags"].mode) == ("STRING", "REPEATED")
+    assert fields["dims"].field_type == "RECORD"
+    assert [f.name for f in fields["dims"].fields] == ["length", "width"]
+
+
+def test_csv_sample_columns_are_nullable(local_gcs):
+    d = local_gcs / "bucket/raw"
+    d.mkdir(parents=True)
+    (d / "a.csv").write_text("MMSI,VesselName,SOG\n1,ALPHA,1.5\n2,BETA,0.0\n")
+
+    out = infer_schema("gs://bucket/raw/a.csv")
+    assert [(f.name, f.field_type, f.mode) for f in out["schema"]] == [
+        ("MMSI", "INTEGER", "NULLABLE"),
+        ("VesselName", "STRING", "NULLABLE"),
+        ("SOG", "FLOAT", "NULLABLE"),
+    ]
+
+
+def test_missing_uri(local_gcs):
+    with pytest.raises(SchemaInferenceError):
+        resolve_data_file("gs://bucket/missing/x.parquet")
@@ -0,0 +1,230 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+from google.api_core.exceptions import BadRequest, Forbidden, NotFound
+
+import summaries
+from local_client import LocalBigQueryClient, LocalJob
+from summaries import SUMMARIES
+
+STATUS = SUMMARIES["ais_daily_status"]
+CATALOG = SUMMARIES["ais_dim_catalog_daily"]
+SOURCE = "p.d.ais"
+TARGET = "p.d.ais_daily_status"
+WATERMARKS = f"p.d.{summaries.WATERMARK_TABLE}"
+
+
+def _create_source(client, rows):
+    values = ",\n".join(
+        f"({mmsi}, TIMESTAMP '{ts}', '{vtype}', 'Underway', {sog}, {draft}, 90.0)"
+        for mmsi, ts, vtype, sog, draft in rows
+    )
+    client.query(
+        f"CREATE OR REPLACE TABLE `{SOURCE}` AS SELECT * FROM (VALUES\n{values}\n) "
+        "t(MMSI, BaseDateTime, VesselTypeName, NavStatusName, SOG, Draft, COG)"
+    ).result()
+
+
+def _insert_source(client, mmsi, ts, vtype="Cargo", sog=1.0, draft=1.0):
+    client.query(
+        f"INSERT INTO `{SOURCE}` VALUES ({mmsi}, TIMESTAMP '{ts}', '{vtype}', 'Underway', {sog}, {draft}, 90.0)"
+    ).result()
+
+
+def _rows(client, sql):
+    return list(client.query(sql).result())
+
+
+def _queries(client):
+    return [j.configuration["query"]["query"] for j in client.jobs if j.job_type == "query"]
+
+
+@pytest.fixture
+def source(client):
+    _create_source(client, [
+        (1, "2024-01-01 10:00:00", "Cargo", 10.0, 5.0),
+        (2, "2024-01-01 11:00:00", "Cargo", 12.0, "NULL"),
+        (1, "2024-01-02 10:00:00", "Tanker", 0.0, 7.0),
+    ])
+    return client
+
+
+class PartitionsClient(LocalBigQueryClient):
+    """Local client that answers ``INFORMATION_SCHEMA.PARTITIONS`` with canned partition ids."""
+
+    def __init__(self, partition_ids, **kwargs):
+        super().__init__(**kwargs)
+        self.partition_ids = partition_ids
+        self.partition_queries = []
+
+    def query(self, sql, job_config=None, **kwargs):
+        if "INFORMATION_SCHEMA.PARTITIONS" not in sql:
+            return super().query(sql, job_config, **kwargs)
+        self.partition_queries.append(sql)
+        if isinstance(self.partition_ids, Exception):
+            raise self.partition_ids
+        return LocalJob("query", {"query": {"query": sql}}, rows=[{"partition_id": p} for p in self.partition_ids])
+
+
+# -- SQL builders ---------------------------------------------------------------------
+
+
+def test_summary_columns():
+    assert summaries.summary_columns(STATUS) == [
+        "date", "VesselTypeName", "NavStatusName", "n_rows",
+        "n_sog", "sum_sog", "sumsq_sog", "n_draft", "sum_draft", "sumsq_draft", "n_cog", "sum_cog", "sumsq_cog",
+        "mmsi_sketch",
+    ]
+    assert summaries.summary_columns(CATALOG) == ["date", "dimension", "value", "n_rows", *CATALOG["entity_attributes"]]
+
+
+def test_summary_select_sql_groups_by_day_and_dimensions():
+    sql = summaries.summary_select_sql(SOURCE, STATUS, where="x = 1")
+    assert f"FROM `{SOURCE}`" in sql
+    assert "WHERE BaseDateTime IS NOT NULL AND (x = 1)" in sql
+    assert sql.endswith("GROUP BY DATE(BaseDateTime), VesselTypeName, NavStatusName")
+    assert "SUM(CAST(SOG AS FLOAT64) * CAST(SOG AS FLOAT64)) AS sumsq_sog" in sql
+    assert "HLL_COUNT.INIT(MMSI) AS mmsi_sketch" in sql
+
+
+def test_catalog_select_sql_has_one_branch_per_dimension():
+    sql = summaries.summary_select_sql(SOURCE, CATALOG)
+    branches = sql.split("\nUNION ALL\n")
+    assert len(branches) == len(CATALOG["dimensions"])
+    mmsi, vessel_type = branches[0], branches[CATALOG["dimensions"].index("VesselTypeName")]
+    assert "'MMSI' AS dimension" in mmsi
+    assert "MAX_BY(CAST(VesselName AS STRING), IF(VesselName IS NULL, NULL, BaseDateTime)) AS VesselName" in mmsi
+    assert "CAST(NULL AS STRING) AS VesselName" in vessel_type
+    assert "VesselTypeName IS NOT NULL" in vessel_type
+
+
+def test_create_summary_ddl():
+    ddl = summaries.create_summary_ddl(TARGET, SOURCE, STATUS)
+    assert ddl.startswith(f"CREATE TABLE IF NOT EXISTS `{TARGET}`\nPARTITION BY date\n"
+                          "CLUSTER BY VesselTypeName, NavStatusName\nAS SELECT")
+    assert "AND (FALSE)" in ddl  # empty table with the summary schema
+    mv = summaries.create_summary_ddl(TARGET, SOURCE, {**STATUS, "kind": "materialized_view"})
+    assert mv.startswith(f"CREATE MATERIALIZED VIEW IF NOT EXISTS `{TARGET}`")
+    assert "enable_refresh = TRUE" in mv and "AND (TRUE)" in mv
+    assert "CLUSTER BY dimension, value" in summaries.create_summary_ddl(TARGET, SOURCE, CATALOG)
+
+
+def test_date_predicate_merges_contiguous_runs():
+    dates = [date(2024, 1, 3), date(2024, 1, 1), date(2024, 1, 2), date(2024, 1, 5), date(2024, 1, 2)]
+    assert summaries.date_predicate("date", dates) == (
+        "(date BETWEEN DATE '2024-01-01' AND DATE '2024-01-03' OR date BETWEEN DATE '2024-01-05' AND DATE '2024-01-05')"
+    )
+    assert summaries.date_predicate("date", []) == "FALSE"
+
+
+@pytest.mark.parametrize("value, expected", [
+    (None, None),
+    (date(2024, 1, 2), date(2024, 1, 2)),
+    (datetime(2024, 1, 2, 23, 59), date(2024, 1, 2)),
+    ("2024-01-02T05:00:00", date(2024, 1, 2)),
+])
+def test_as_date(value, expected):
+    assert summaries._as_date(value) == expected
+
+
+# -- changed partitions ---------------------------------------------------------------
+
+
+def test_changed_partition_dates_reads_information_schema(local_gcs):
+    client = PartitionsClient(["20240102", "2024020100", "202402"], project="p", database=":memory:")
+    since = datetime(2024, 3, 1, 12)
+    dates = summaries._changed_partition_dates(client, SOURCE, since)
+    feb = [date(2024, 2, 1) + timedelta(days=i) for i in range(29)]
+    assert dates == [date(2024, 1, 2), date(2024, 2, 1)] + feb
+    [sql] = client.partition_queries
+    assert "`p.d.INFORMATION_SCHEMA.PARTITIONS`" in sql
+    assert "table_name = 'ais'" in sql and "TIMESTAMP '2024-03-01 12:00:00'" in sql
+
+
+@pytest.mark.parametrize("error", [BadRequest("no view"), Forbidden("denied"), NotFound("no dataset")])
+def test_changed_partition_dates_unknown(local_gcs, error):
+    client = PartitionsClient(error, project="p", database=":memory:")
+    assert summaries._changed_partition_dates(client, SOURCE, datetime(2024, 1, 1)) is None
+
+
+# -- refresh --------------------------------------------------------------------------
+
+
+def test_first_refresh_is_full(source):
+    result = summaries.refresh_summary(source, "ais_daily_status", STATUS, SOURCE, TARGET)
+    assert (result["mode"], result["dates_refreshed"], result["rows_written"]) == ("full", 2, 2)
+    assert (result["first_date"], result["last_date"], result["previous_refresh"]) == ("2024-01-01", "2024-01-02", None)
+    day1 = _rows(source, f"SELECT * FROM `{TARGET}` WHERE date = DATE '2024-01-01'")[0]
+    assert (day1["n_rows"], day1["n_sog"], day1["sum_sog"], day1["sumsq_sog"]) == (2, 2, 22.0, 244.0)
+    assert (day1["n_draft"], day1["sum_draft"]) == (1, 5.0)
+    table = source.get_table(TARGET)
+    assert table.time_partitioning.field == "date"
+    assert table.clustering_fields == ["VesselTypeName", "NavStatusName"]
+
+
+def test_refresh_replaces_dates_in_one_transaction(source):
+    summaries.refresh_summary(source, "ais_daily_status", STATUS, SOURCE, TARGET)
+    _insert_source(source, 3, "2024-01-02 12:00:00", vtype="Tanker", sog=4.0)
+    result = summaries.refresh_summary(source, "ais_daily_status", STATUS, SOURCE, TARGET)
+    assert result["mode"] == "lookback"  # no INFORMATION_SCHEMA locally: lookback from the watermark
+    txn = [q for q in _queries(source) if q.startswith("BEGIN TRANSACTION;")][-1]
+    predicate = "date BETWEEN DATE '2024-01-01' AND DATE '2024-01-02'"
+    assert f"DELETE FROM `{TARGET}` WHERE ({predicate});" in txn
+    assert f"INSERT INTO `{TARGET}` (date, VesselTypeName" in txn
+    assert txn.rstrip().endswith("COMMIT TRANSACTION;")
+    tanker = _rows(source, f"SELECT n_rows, sum_sog FROM `{TARGET}` WHERE date = DATE '2024-01-02'")
+    assert [(r["n_rows"], r["sum_sog"]) for r in tanker] == [(2, 4.0)]  # replaced, not appended
+    assert _rows(source, f"SELECT COUNT(*) AS n FROM `{TARGET}`")[0]["n"] == 2
+
+
+def test_lookback_skips_dates_before_the_window(source):
+    summaries.refresh_summary(source, "ais_daily_status", STATUS, SOURCE, TARGET)
+    _insert_source(source, 4, "2023-12-20 00:00:00")  # late data outside the lookback window
+    _insert_source(source, 5, "2024-01-04 00:00:00")
+    result = summaries.refresh_summary(source, "ais_daily_status", STATUS, SOURCE, TARGET, lookback_days=1)
+    assert (result["mode"], result["first_date"], result["last_date"]) == ("lookback", "2024-01-01", "2024-01-04")
+    assert result["dates_refreshed"] == 4
+    dates = [r["date"] for r in _rows(source, f"SELECT DISTINCT date FROM `{TARGET}` ORDER BY date")]
+    assert dates == [date(2024, 1, 1), date(2024, 1, 2), date(2024, 1, 4)]
+    full = summaries.refresh_summary(source, "ais_daily_status", STATUS, SOURCE, TARGET, full=True)
+    assert (full["mode"], full["first_date"]) == ("full", "2023-12-20")
+
+
+def test_refresh_uses_changed_partitions(local_gcs):
+    client = PartitionsClient([], project="p", database=":memory:")
+    _create_source(client, [
+        (1, "2024-01-01 10:00:00", "Cargo", 1.0, 1.0),
+        (1, "2024-01-05 10:00:00", "Cargo", 1.0, 1.0),
+    ])
+    summaries.refresh_summary(client, "ais_daily_status", STATUS, SOURCE, TARGET)
+    assert client.partition_queries == []  # first refresh: no watermark yet
+    [wm] = _rows(client, f"SELECT refreshed_at FROM `{WATERMARKS}`")
+
+    _insert_source(client, 2, "2024-01-05 11:00:00")
+    client.partition_ids = ["20240105"]
+    result = summaries.refresh_summary(client, "ais_daily_status", STATUS, SOURCE, TARGET)
+    assert (result["mode"], result["dates_refreshed"], result["first_date"]) == ("partitions", 1, "2024-01-05")
+    assert f"TIMESTAMP '{wm['refreshed_at']}'" in client.partition_queries[-1]
+    rows = _rows(client, f"SELECT date, n_rows FROM `{TARGET}` ORDER BY date")
+    assert [(r["date"], r["n_rows"]) for r in rows] == [(date(2024, 1, 1), 1), (date(2024, 1, 5), 2)]
+
+    client.partition_ids = []
+    nothing = summaries.refresh_summary(client, "ais_daily_status", STATUS, SOURCE, TARGET)
+    assert (nothing["mode"], nothing["dates_refreshed"], nothing["rows_written"]) == ("partitions", 0, 0)
+    assert nothing["last_date"] == "2024-01-05"  # carried over from the previous watermark
+
+
+def test_watermark_rows(source):
+    summaries.refresh_summary(source, "ais_daily_status", STATUS, SOURCE, TARGET)
+    summaries.refresh_summary(source, "ais_daily_status", STATUS, SOURCE, TARGET)
+    rows = _rows(source, f"SELECT * FROM `{WATERMARKS}` ORDER BY refreshed_at")
+    assert [r["mode"] for r in rows] == ["full", "lookback"]
+    assert {(r["summary"], r["source_table"], r["target_table"], r["kind"]) for r in rows} == {
+        ("ais_daily_status", SOURCE, TARGET, "table")
+    }
+    assert [(r["first_date"], r["last_date"], r["partitions"], r["rows_written"]) for r in rows] == [
+        (date(2024, 1, 1), date(2024, 1, 2), 2, 2)
+    ] * 2
+    wm = summaries.last_watermark(source, WATERMARKS, "ais_daily_status")
+    assert wm == {"last_date": date(2024, 1, 2), "refreshed_at": rows[-1]["refreshed_at"]}
+    assert summaries.last_watermark(source, WATERMARKS, "other") is None
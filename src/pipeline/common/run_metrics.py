@@ -0,0 +1,345 @@
+"""Stage-level timing and row-flow instrumentation shared by the pipeline jobs.
+
+Every job (scraper, raw ingest, curated writer) opens a ``RunReport`` and
+wraps its steps in ``report.stage(name)``.  For Spark jobs each stage runs
+under its own job group, so when the step finishes the report can attribute
+rows/bytes read and written, shuffle bytes and spill to exactly the Spark
+jobs that step triggered.  Metrics come from the driver's monitoring REST
+API (the same data the Spark UI shows, fed by the listener bus); when the UI
+is disabled the status tracker is used and only job/stage/task counts are
+recorded.
+
+Output:
+
+- JSON lines: one record per stage plus a final ``run`` record, appended to
+  ``<RUN_REPORT_DIR>/<job>.jsonl`` (or one object per run under a ``gs://``
+  prefix).
+- Prometheus textfile: ``<PROM_TEXTFILE_DIR>/ais_pipeline_<job>.prom``,
+  rewritten atomically at the end of the run for node_exporter's textfile
+  collector.
+"""
+
+import contextlib
+import datetime
+import json
+import logging
+import os
+import socket
+import tempfile
+import time
+import urllib.request
+import uuid
+from typing import Any, Dict, Iterator, List, Optional
+
+log = logging.getLogger("run-metrics")
+
+DEFAULT_RUN_REPORT_DIR = os.getenv("RUN_REPORT_DIR", "run_reports")
+DEFAULT_PROM_TEXTFILE_DIR = os.getenv("PROM_TEXTFILE_DIR")
+
+# Spark REST stage fields -> report keys.
+_REST_STAGE_FIELDS = {
+    "inputRecords": "rows_in",
+    "inputBytes": "bytes_read",
+    "outputRecords": "rows_out",
+    "outputBytes": "bytes_written",
+    "shuffleReadBytes": "shuffle_read_bytes",
+    "shuffleWriteBytes": "shuffle_write_bytes",
+    "memoryBytesSpilled": "memory_spilled_bytes",
+    "diskBytesSpilled": "disk_spilled_bytes",
+}
+
+FLOW_KEYS = list(_REST_STAGE_FIELDS.values())
+
+# Report keys exported as Prometheus gauges (name suffix, help text).
+_PROM_STAGE_METRICS = [
+    ("wall_s", "stage_wall_seconds", "Wall-clock time per pipeline stage."),
+    ("rows_in", "stage_rows_in", "Rows read by the stage."),
+    ("rows_out", "stage_rows_out", "Rows written or emitted by the stage."),
+    ("bytes_read", "stage_bytes_read", "Input bytes read by the stage."),
+    ("bytes_written", "stage_bytes_written", "Output bytes written by the stage."),
+    ("shuffle_read_bytes", "stage_shuffle_read_bytes", "Shuffle bytes read."),
+    ("shuffle_write_bytes", "stage_shuffle_write_bytes", "Shuffle bytes written."),
+    ("memory_spilled_bytes", "stage_memory_spilled_bytes", "Bytes spilled from memory."),
+    ("disk_spilled_bytes", "stage_disk_spilled_bytes", "Bytes spilled to disk."),
+]
+
+
+def _utc_now() -> str:
+    return datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds")
+
+
+def _get_json(url: str, timeout: float = 10.0):
+    with urllib.request.urlopen(url, timeout=timeout) as resp:
+        return json.loads(resp.read().decode("utf-8"))
+
+
+def _prom_escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _prom_labels(labels: Dict[str, Any]) -> str:
+    inner = ",".join(f'{k}="{_prom_escape(v)}"' for k, v in sorted(labels.items()))
+    return "{" + inner + "}"
+
+
+class SparkStageCollector:
+    """Attributes Spark task metrics to a report stage through job groups."""
+
+    def __init__(self, spark, settle_timeout_s: float = 10.0):
+        self.sc = spark.sparkContext
+        self.settle_timeout_s = settle_timeout_s
+
+    def begin(self, group: str, description: str) -> Optional[str]:
+        previous = self.sc.getLocalProperty("spark.jobGroup.id")
+        self.sc.setJobGroup(group, description)
+        return previous
+
+    def end(self, previous: Optional[str]) -> None:
+        if previous:
+            self.sc.setJobGroup(previous, "")
+        else:
+            self.sc.setLocalProperty("spark.jobGroup.id", None)
+            self.sc.setLocalProperty("spark.job.description", None)
+
+    def collect(self, group: str) -> Dict[str, Any]:
+        try:
+            return self._collect_rest(group)
+        except Exception as e:
+            log.debug(f"Spark REST API unavailable ({e}); using status tracker.")
+        return self._collect_tracker(group)
+
+    def _collect_rest(self, group: str) -> Dict[str, Any]:
+        base = self.sc.uiWebUrl
+        if not base:
+            raise RuntimeError("spark.ui disabled")
+        api = f"{base.rstrip('/')}/api/v1/applications/{self.sc.applicationId}"
+
+        # The listener bus is asynchronous: wait until the REST view has
+        # caught up with the jobs the tracker says belong to this group.
+        expected = set(self.sc.statusTracker().getJobIdsForGroup(group))
+        deadline = time.time() + self.settle_timeout_s
+        while True:
+            jobs = [j for j in _get_json(f"{api}/jobs") if j.get("jobGroup") == group]
+            seen = {j["jobId"] for j in jobs}
+            running = [j for j in jobs if j.get("status") == "RUNNING"]
+            if (expected <= seen and not running) or time.time() > deadline:
+                break
+            time.sleep(0.5)
+
+        stage_ids = {sid for j in jobs for sid in j.get("stageIds", [])}
+        out: Dict[str, Any] = {k: 0 for k in FLOW_KEYS}
+        completed = failed = tasks = 0
+        for s in _get_json(f"{api}/stages"):
+            if s.get("stageId") not in stage_ids:
+                continue
+            status = s.get("status")
+            if status == "FAILED":
+                failed += 1
+                continue
+            if status != "COMPLETE":
+                continue
+            completed += 1
+            tasks += int(s.get("numCompleteTasks", 0))
+            for field, key in _REST_STAGE_FIELDS.items():
+                out[key] += int(s.get(field, 0) or 0)
+        out.update(
+            {
+                "spark_jobs": len(jobs),
+                "spark_stages": completed,
+                "spark_failed_stage_attempts": failed,
+                "spark_tasks": tasks,
+            }
+        )
+        return out
+
+    def _collect_tracker(self, group: str) -> Dict[str, Any]:
+        tracker = self.sc.statusTracker()
+        job_ids = tracker.getJobIdsForGroup(group)
+        stages, tasks, failed_tasks = set(), 0, 0
+        for jid in job_ids:
+            info = tracker.getJobInfo(jid)
+            if info is None:
+                continue
+            for sid in info.stageIds:
+                if sid in stages:
+                    continue
+                stages.add(sid)
+                sinfo = tracker.getStageInfo(sid)
+                if sinfo is not None:
+                    tasks += sinfo.numCompletedTasks
+                    failed_tasks += sinfo.numFailedTasks
+        return {
+            "spark_jobs": len(job_ids),
+            "spark_stages": len(stages),
+            "spark_tasks": tasks,
+            "spark_failed_tasks": failed_tasks,
+        }
+
+
+class RunReport:
+    """Collects per-stage records for one pipeline run.
+
+    Parameters
+    ----------
+    job : str
+        Job name used in file names and as the ``job`` label
+        (e.g. ``"raw_ingest"``).
+    spark : SparkSession, optional
+        When given, Spark metrics are attributed to each stage.
+    report_dir : str, optional
+        Local directory or ``gs://`` prefix for the JSON-lines report.
+    prom_dir : str, optional
+        Directory for the Prometheus textfile.  Disabled when empty.
+    labels : dict, optional
+        Labels attached to every record (e.g. ``{"ym": "2024-08"}``).
+    """
+
+    def __init__(
+        self,
+        job: str,
+        spark=None,
+        report_dir: Optional[str] = DEFAULT_RUN_REPORT_DIR,
+        prom_dir: Optional[str] = DEFAULT_PROM_TEXTFILE_DIR,
+        labels: Optional[Dict[str, Any]] = None,
+    ):
+        self.job = job
+        now = datetime.datetime.now(datetime.timezone.utc)
+        self.run_id = f"{now:%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+        self.report_dir = report_dir
+        self.prom_dir = prom_dir
+        self.labels = dict(labels or {})
+        self.stages: List[Dict[str, Any]] = []
+        self.started_at = _utc_now()
+        self._t0 = time.perf_counter()
+        self._collector = SparkStageCollector(spark) if spark is not None else None
+        if spark is not None:
+            self.labels.setdefault("app_id", spark.sparkContext.applicationId)
+
+    @contextlib.contextmanager
+    def stage(self, name: str, **labels) -> Iterator[Dict[str, Any]]:
+        """Time a step; the yielded dict accepts caller-provided counters.
+
+        Values set by the caller (e.g. ``rec["rows_out"] = n``) take
+        precedence over the ones derived from Spark metrics.
+        """
+        rec: Dict[str, Any] = {}
+        group = f"{self.job}:{self.run_id}:{len(self.stages)}:{name}"
+        previous = self._collector.begin(group, name) if self._collector else None
+        started_at = _utc_now()
+        t0 = time.perf_counter()
+        status, error = "ok", None
+        try:
+            yield rec
+        except BaseException as e:
+            status, error = "failed", f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            wall = time.perf_counter() - t0
+            spark_metrics: Dict[str, Any] = {}
+            if self._collector:
+                self._collector.end(previous)
+                try:
+                    spark_metrics = self._collector.collect(group)
+                except Exception as e:
+                    log.warning(f"No se pudieron leer métricas Spark de {name}: {e}")
+            record = {
+                "type": "stage",
+                "job": self.job,
+                "run_id": self.run_id,
+                "stage": name,
+                "labels": {**self.labels, **labels},
+                "started_at": started_at,
+                "wall_s": round(wall, 3),
+                "status": status,
+            }
+            record.update(spark_metrics)
+            record.update(rec)
+            if error:
+                record["error"] = error
+            self.stages.append(record)
+            log.info(
+                f"[metrics] {self.job}/{name} {status} wall={wall:0.2f}s "
+                + " ".join(f"{k}={record[k]}" for k in FLOW_KEYS if record.get(k))
+            )
+
+    def finish(self, status: str = "ok") -> Dict[str, Any]:
+        """Write the JSON-lines report and the Prometheus textfile."""
+        summary = {
+            "type": "run",
+            "job": self.job,
+            "run_id": self.run_id,
+            "labels": self.labels,
+            "host": socket.gethostname(),
+            "started_at": self.started_at,
+            "finished_at": _utc_now(),
+            "wall_s": round(time.perf_counter() - self._t0, 3),
+            "status": status,
+            "stages": len(self.stages),
+        }
+        for key in FLOW_KEYS:
+            summary[key] = sum(int(s.get(key) or 0) for s in self.stages)
+        try:
+            self._write_jsonl(self.stages + [summary])
+        except Exception as e:
+            log.warning(f"No se pudo escribir el reporte de ejecución: {e}")
+        try:
+            self._write_prom(summary)
+        except Exception as e:
+            log.warning(f"No se pudo escribir el textfile de Prometheus: {e}")
+        return summary
+
+    def _write_jsonl(self, records: List[Dict[str, Any]]) -> None:
+        if not self.report_dir:
+            return
+        payload = "".join(json.dumps(r, default=str) + "\n" for r in records)
+        if self.report_dir.startswith("gs://"):
+            from google.cloud import storage
+
+            bucket, _, prefix = self.report_dir[len("gs://") :].partition("/")
+            name = f"{prefix.rstrip('/')}/{self.job}/{self.run_id}.jsonl".lstrip("/")
+            storage.Client().bucket(bucket).blob(name).upload_from_string(
+                payload, content_type="application/x-ndjson"
+            )
+            return
+        os.makedirs(self.report_dir, exist_ok=True)
+        with open(os.path.join(self.report_dir, f"{self.job}.jsonl"), "a") as f:
+            f.write(payload)
+
+    def _write_prom(self, summary: Dict[str, Any]) -> None:
+        if not self.prom_dir:
+            return
+        lines: List[str] = []
+        base = {"job": self.job}
+        for key, metric, help_text in _PROM_STAGE_METRICS:
+            # One sample per label set; a repeated stage keeps its last value.
+            samples: Dict[str, Any] = {}
+            for s in self.stages:
+                if s.get(key) is None:
+                    continue
+                labels = {**base, **s["labels"], "stage": s["stage"]}
+                labels.pop("app_id", None)
+                samples[_prom_labels(labels)] = s[key]
+            if not samples:
+                continue
+            lines.append(f"# HELP ais_pipeline_{metric} {help_text}")
+            lines.append(f"# TYPE ais_pipeline_{metric} gauge")
+            for label_str, value in samples.items():
+                lines.append(f"ais_pipeline_{metric}{label_str} {value}")
+        run_labels = _prom_labels(base)
+        lines += [
+            "# HELP ais_pipeline_run_wall_seconds Wall-clock time of the last run.",
+            "# TYPE ais_pipeline_run_wall_seconds gauge",
+            f"ais_pipeline_run_wall_seconds{run_labels} {summary['wall_s']}",
+            "# HELP ais_pipeline_run_success Whether the last run finished ok (1) or failed (0).",
+            "# TYPE ais_pipeline_run_success gauge",
+            f"ais_pipeline_run_success{run_labels} {1 if summary['status'] == 'ok' else 0}",
+            "# HELP ais_pipeline_run_finished_timestamp_seconds Unix time the last run finished.",
+            "# TYPE ais_pipeline_run_finished_timestamp_seconds gauge",
+            f"ais_pipeline_run_finished_timestamp_seconds{run_labels} {int(time.time())}",
+        ]
+        os.makedirs(self.prom_dir, exist_ok=True)
+        target = os.path.join(self.prom_dir, f"ais_pipeline_{self.job}.prom")
+        fd, tmp = tempfile.mkstemp(dir=self.prom_dir, suffix=".prom.tmp")
+        with os.fdopen(fd, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp, target)
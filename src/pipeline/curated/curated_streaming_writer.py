@@ -0,0 +1,180 @@
+"""Structured Streaming variant of the curated writer.
+
+Watches a landing directory as a file source and applies the same
+``apply_curated_transformations`` as the batch job:
+
+- ``--source parquet``: the raw Parquet layout written by the raw ingest
+  (``ym=YYYY-MM/part-*.parquet``).
+- ``--source csv``: NOAA CSV files dropped in a landing directory; the raw
+  ingest columns (``_source_file``, ``_ingest_ts``, ``ym``, ``ymd``) are added
+  on the fly with ``raw_schema.with_ingest_columns``.
+
+Deduplication on ``(MMSI, BaseDateTime)`` runs in ``foreachBatch``: each
+micro-batch is deduplicated and then anti-joined against the rows already
+in the output for the same ``date`` partitions.  There is no event-time
+watermark, because raw part files are not ordered by time: a file with
+older ``BaseDateTime`` values arriving late is still written, not dropped.
+The anti-join also makes a batch replayed after a failure idempotent.
+Output goes to ``date``-partitioned Parquet and the checkpoint records the
+files already read, so restarts resume where they stopped.
+
+The output is written with batch writes (no ``_spark_metadata`` log): point
+``--output`` at a new directory rather than one written by a file sink.
+
+Local run with the drip simulator::
+
+    python file_drip.py --src /tmp/ais_synth --dest /tmp/landing --split-rows 50000
+    spark-submit curated_streaming_writer.py --source csv --master "local[*]" \\
+        --input /tmp/landing --output /tmp/curated_stream --checkpoint /tmp/ckpt
+
+``--once`` processes whatever is available and stops (``availableNow``).
+"""
+
+import argparse
+import json
+import os
+import sys
+
+from pyspark.sql import DataFrame, SparkSession
+from pyspark.sql import functions as F
+from pyspark.sql.utils import AnalysisException
+from pyspark.sql.types import StructType, StructField, StringType, TimestampType
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(HERE)
+sys.path.append(os.path.join(HERE, "..", "raw"))
+
+import curated_transforms
+from curated_transforms import apply_curated_transformations
+from raw_schema import schema as raw_csv_schema, with_ingest_columns
+
+INPUT_BASE = "gs://bucket20250825maestria/AIS_2024_raw"
+OUTPUT_BASE = "gs://bucket20250825maestria/AIS_2024_curated_stream"
+CHECKPOINT_BASE = "gs://bucket20250825maestria/checkpoints/curated_stream"
+
+TRIGGER_INTERVAL = "1 minute"
+MAX_FILES_PER_TRIGGER = 8
+SHUFFLE_PARTITIONS = 16
+DEDUP_KEY = ["MMSI", "BaseDateTime"]
+
+# Raw Parquet = CSV columns + ingest metadata + ``ym`` partition column.
+raw_parquet_schema = StructType(
+    list(raw_csv_schema.fields)
+    + [
+        StructField("_source_file", StringType(), True),
+        StructField("_ingest_ts", TimestampType(), True),
+        StructField("ymd", StringType(), True),
+        StructField("ym", StringType(), True),
+    ]
+)
+
+
+def build_stream(spark: SparkSession, source: str, input_path: str, max_files: int):
+    reader = spark.readStream.option("maxFilesPerTrigger", max_files)
+    if source == "csv":
+        df = reader.option("header", "true").schema(raw_csv_schema).csv(input_path)
+        return with_ingest_columns(df)
+    return reader.schema(raw_parquet_schema).parquet(input_path)
+
+
+def curated_stream(df):
+    return apply_curated_transformations(df, dedup=False)
+
+
+def new_rows(batch_df: DataFrame, output: str) -> DataFrame:
+    """Rows of ``batch_df`` not yet in ``output``, deduplicated on ``DEDUP_KEY``.
+
+    Only the ``date`` partitions present in the batch are read from the
+    output (partition pruning).
+    """
+    spark = batch_df.sparkSession
+    fresh = batch_df.dropDuplicates(DEDUP_KEY)
+    dates = [r["date"] for r in fresh.select("date").distinct().collect()]
+    if not dates:
+        return fresh
+    try:
+        existing = spark.read.parquet(output).where(F.col("date").isin(dates)).select(*DEDUP_KEY)
+    except AnalysisException:  # no output yet
+        return fresh
+    return fresh.join(existing, DEDUP_KEY, "left_anti")
+
+
+def write_batch(output: str):
+    """``foreachBatch`` function appending the new rows of each micro-batch to ``output``."""
+
+    def _write(batch_df: DataFrame, batch_id: int) -> None:
+        batch_df = batch_df.persist()
+        try:
+            (
+                new_rows(batch_df, output)
+                .write.mode("append")
+                .option("compression", "snappy")
+                .partitionBy("date")
+                .parquet(output)
+            )
+        finally:
+            batch_df.unpersist()
+
+    return _write
+
+
+def start_query(out: DataFrame, output: str, checkpoint: str, once: bool = False,
+                trigger: str = TRIGGER_INTERVAL):
+    writer = (
+        out.writeStream.foreachBatch(write_batch(output))
+        .option("checkpointLocation", checkpoint)
+        .queryName("curated_stream")
+    )
+    writer = writer.trigger(availableNow=True) if once else writer.trigger(processingTime=trigger)
+    return writer.start()
+
+
+def main():
+    p = argparse.ArgumentParser(description="Curated AIS en modo Structured Streaming.")
+    p.add_argument("--source", choices=["parquet", "csv"], default="parquet")
+    p.add_argument("--input", default=INPUT_BASE)
+    p.add_argument("--output", default=OUTPUT_BASE)
+    p.add_argument("--checkpoint", default=CHECKPOINT_BASE)
+    p.add_argument("--trigger", default=TRIGGER_INTERVAL)
+    p.add_argument("--max-files-per-trigger", type=int, default=MAX_FILES_PER_TRIGGER)
+    p.add_argument("--master", default=None, help='Ej. "local[*]" para pruebas locales.')
+    p.add_argument("--once", action="store_true", help="Procesa lo disponible y termina.")
+    a = p.parse_args()
+
+    builder = (
+        SparkSession.builder.appName("curated-writer-streaming")
+        .config("spark.sql.shuffle.partitions", str(SHUFFLE_PARTITIONS))
+        .config("spark.sql.session.timeZone", "UTC")
+    )
+    if a.master:
+        builder = builder.master(a.master)
+    spark = builder.getOrCreate()
+    spark.sparkContext.addPyFile(curated_transforms.__file__)
+
+    out = curated_stream(build_stream(spark, a.source, a.input, a.max_files_per_trigger))
+    query = start_query(out, a.output, a.checkpoint, once=a.once, trigger=a.trigger)
+    print(f"[stream] {a.source}:{a.input} -> {a.output} (checkpoint={a.checkpoint})")
+
+    last_batch = None
+    while query.isActive:
+        query.awaitTermination(30)
+        progress = query.lastProgress
+        if progress and progress.get("batchId") != last_batch:
+            last_batch = progress.get("batchId")
+            print(
+                "[stream] "
+                + json.dumps(
+                    {
+                        "batch": last_batch,
+                        "rows_in": progress.get("numInputRows"),
+                        "rows_per_s": progress.get("processedRowsPerSecond"),
+                    }
+                )
+            )
+    if query.exception():
+        raise SystemExit(f"[stream] query falló: {query.exception()}")
+    spark.stop()
+
+
+if __name__ == "__main__":
+    main()
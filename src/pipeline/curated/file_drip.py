@@ -0,0 +1,98 @@
+"""File-drip simulator for the streaming curated writer.
+
+Feeds a landing directory a few files at a time, the way a live feed would,
+so ``curated_streaming_writer.py`` can be exercised locally.  Sources can be
+NOAA ZIPs, CSVs or Parquet part files.  CSVs (including the ones inside
+ZIPs) can be split into chunks of ``--split-rows`` rows, each with its own
+header, in file order.
+
+Files are written under a dot-prefixed temporary name and renamed into
+place, because Spark's file source must never see a half-written file.
+
+Usage::
+
+    python file_drip.py --src /tmp/ais_synth --dest /tmp/landing \\
+        --split-rows 50000 --files-per-tick 2 --interval-s 5
+"""
+
+import argparse
+import io
+import os
+import shutil
+import time
+import zipfile
+from typing import Iterator, Tuple
+
+
+def _csv_chunks(fh, stem: str, split_rows: int) -> Iterator[Tuple[str, bytes]]:
+    header = fh.readline()
+    buf, n, part = [], 0, 0
+    for line in fh:
+        buf.append(line)
+        n += 1
+        if split_rows and n >= split_rows:
+            yield f"{stem}_{part:05d}.csv", header + b"".join(buf)
+            buf, n, part = [], 0, part + 1
+    if buf:
+        yield f"{stem}_{part:05d}.csv", header + b"".join(buf)
+
+
+def iter_payloads(src: str, split_rows: int) -> Iterator[Tuple[str, bytes]]:
+    """Yield ``(file_name, content)`` for every drip unit under ``src``."""
+    for name in sorted(os.listdir(src)):
+        path = os.path.join(src, name)
+        low = name.lower()
+        if low.endswith(".zip"):
+            with zipfile.ZipFile(path) as zf:
+                for info in zf.infolist():
+                    if info.filename.lower().endswith(".csv"):
+                        stem = os.path.splitext(os.path.basename(info.filename))[0]
+                        with zf.open(info) as raw:
+                            yield from _csv_chunks(io.BufferedReader(raw), stem, split_rows)
+        elif low.endswith(".csv"):
+            with open(path, "rb") as fh:
+                yield from _csv_chunks(fh, os.path.splitext(name)[0], split_rows)
+        elif low.endswith(".parquet"):
+            with open(path, "rb") as fh:
+                yield name, fh.read()
+        elif os.path.isdir(path):
+            # Parquet partition directories (ym=YYYY-MM/...): keep the layout.
+            for sub_name, content in iter_payloads(path, split_rows):
+                yield os.path.join(name, sub_name), content
+
+
+def drip(src: str, dest: str, files_per_tick: int, interval_s: float, split_rows: int) -> int:
+    written = 0
+    for rel, content in iter_payloads(src, split_rows):
+        target = os.path.join(dest, rel)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp = os.path.join(os.path.dirname(target), f".{os.path.basename(target)}.tmp")
+        with open(tmp, "wb") as f:
+            f.write(content)
+        os.replace(tmp, target)
+        written += 1
+        print(f"[drip] {target} ({len(content):,} bytes)")
+        if written % files_per_tick == 0:
+            time.sleep(interval_s)
+    return written
+
+
+def main():
+    p = argparse.ArgumentParser(description="Deposita archivos gradualmente en un directorio de aterrizaje.")
+    p.add_argument("--src", required=True)
+    p.add_argument("--dest", required=True)
+    p.add_argument("--files-per-tick", type=int, default=1)
+    p.add_argument("--interval-s", type=float, default=10.0)
+    p.add_argument("--split-rows", type=int, default=0, help="Filas por archivo CSV (0 = sin dividir).")
+    p.add_argument("--clean", action="store_true", help="Vacía el destino antes de empezar.")
+    a = p.parse_args()
+
+    if a.clean:
+        shutil.rmtree(a.dest, ignore_errors=True)
+    os.makedirs(a.dest, exist_ok=True)
+    n = drip(a.src, a.dest, max(1, a.files_per_tick), a.interval_s, a.split_rows)
+    print(f"[drip] {n} archivos depositados en {a.dest}")
+
+
+if __name__ == "__main__":
+    main()
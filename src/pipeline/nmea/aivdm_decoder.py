@@ -0,0 +1,513 @@
+"""Vectorised NMEA 0183 ``!AIVDM`` decoder producing the raw AIS schema.
+
+Decodes message types 1/2/3 (class A position), 5 (class A static/voyage),
+18 (class B position), 19 (class B extended position) and 24 (class B static,
+parts A and B).  Sentences are processed in batches:
+
+1. A light Python pass splits each sentence into its NMEA fields and reads the
+   optional tag block timestamp (``\\c:<unix>*hh\\``).
+2. Checksums are verified for the whole batch at once: a running XOR over
+   the flat byte buffer of the batch gives each sentence's checksum as the
+   XOR of two prefix values (between ``!`` and ``*``).
+3. Multi-part messages are reassembled by ``(sequence id, channel)``.
+4. Payloads of the same type are de-armoured through a 256-entry lookup
+   table into a ``(n, bits)`` bit matrix, and every field is a matrix-vector
+   product over a bit slice (text fields: 6-bit groups through an ASCII
+   lookup table).
+5. Static data (types 5, 19 and 24) is kept per MMSI and joined onto the
+   position reports, so each output row looks like a NOAA CSV row.
+
+Output is a ``pyarrow.RecordBatch`` with the columns of
+``raw_schema.schema``; ``BaseDateTime`` comes from the tag block when present
+and from the receive time otherwise.  Parquet files written by the CLI can be
+picked up by ``curated_streaming_writer.py --source parquet``.
+
+Usage::
+
+    python aivdm_decoder.py --file feed.nmea --out /tmp/nmea_raw
+    python aivdm_decoder.py --tcp 127.0.0.1:10110 --out /tmp/nmea_raw
+"""
+
+import argparse
+import gzip
+import os
+import socket
+import time
+import uuid
+from collections import Counter
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Column set of raw_schema.schema (NOAA CSV layout).
+RAW_ARROW_SCHEMA = pa.schema(
+    [
+        ("MMSI", pa.int64()),
+        ("BaseDateTime", pa.string()),
+        ("LAT", pa.float64()),
+        ("LON", pa.float64()),
+        ("SOG", pa.float64()),
+        ("COG", pa.float64()),
+        ("Heading", pa.float64()),
+        ("VesselName", pa.string()),
+        ("IMO", pa.string()),
+        ("CallSign", pa.string()),
+        ("VesselType", pa.string()),
+        ("Status", pa.string()),
+        ("Length", pa.float64()),
+        ("Width", pa.float64()),
+        ("Draft", pa.float64()),
+        ("Cargo", pa.string()),
+        ("TransceiverClass", pa.string()),
+    ]
+)
+
+# ASCII code of an armoured payload char -> 6-bit value.
+_ARMOR = np.zeros(256, dtype=np.uint8)
+for _c in range(48, 120):
+    _v = _c - 48
+    _ARMOR[_c] = (_v - 8 if _v > 40 else _v) & 0x3F
+
+# 6-bit value -> ASCII for AIS text fields.
+_SIXBIT_ASCII = np.frombuffer(
+    b"@ABCDEFGHIJKLMNOPQRSTUVWXYZ[\\]^_ !\"#$%&'()*+,-./0123456789:;<=>?", dtype=np.uint8
+)
+_TEXT_WEIGHTS = np.array([32, 16, 8, 4, 2, 1], dtype=np.int64)
+
+POSITION_A = (1, 2, 3)
+
+# ASCII code of a hex digit -> value (-1 for anything else).
+_HEX = np.full(256, -1, dtype=np.int64)
+for _i, _c in enumerate("0123456789ABCDEF"):
+    _HEX[ord(_c)] = _HEX[ord(_c.lower())] = _i
+# Status (4 bits) and transceiver class columns by index; the last status is "unknown".
+_STATUS = pa.array([str(v) for v in range(16)] + [None], type=pa.string())
+_TCLASS = pa.array(["A", "B"], type=pa.string())
+# Digits read from a tag block time (milliseconds since 1970 have 13).
+_TAG_DIGITS = 16
+
+# Field layouts: name -> (start bit, width, signed)
+_POS_A = {
+    "mmsi": (8, 30, False),
+    "status": (38, 4, False),
+    "sog": (50, 10, False),
+    "lon": (61, 28, True),
+    "lat": (89, 27, True),
+    "cog": (116, 12, False),
+    "heading": (128, 9, False),
+}
+_POS_B = {
+    "mmsi": (8, 30, False),
+    "sog": (46, 10, False),
+    "lon": (57, 28, True),
+    "lat": (85, 27, True),
+    "cog": (112, 12, False),
+    "heading": (124, 9, False),
+}
+_MSG_BITS = {1: 168, 2: 168, 3: 168, 5: 424, 18: 168, 19: 312, 24: 168}
+
+
+def _payload_bits(buf: np.ndarray, starts: np.ndarray, ends: np.ndarray, nbits: int) -> np.ndarray:
+    """De-armour the payloads ``buf[starts[i]:ends[i]]`` into a ``(n, nbits)`` uint8 bit matrix."""
+    nchars = (nbits + 5) // 6
+    pos = starts[:, None] + np.arange(nchars)
+    # '0' de-armours to 0, so short payloads are zero-padded.
+    chars = np.where(pos < ends[:, None], buf[np.minimum(pos, len(buf) - 1)], ord("0"))
+    codes = _ARMOR[chars]
+    bits = np.unpackbits((codes << 2)[..., None], axis=-1)[..., :6]
+    return bits.reshape(len(starts), nchars * 6)[:, :nbits]
+
+
+def _uint(bits: np.ndarray, start: int, width: int) -> np.ndarray:
+    weights = np.left_shift(1, np.arange(width - 1, -1, -1, dtype=np.int64))
+    return bits[:, start : start + width] @ weights
+
+
+def _int(bits: np.ndarray, start: int, width: int) -> np.ndarray:
+    v = _uint(bits, start, width)
+    return np.where(v >= (1 << (width - 1)), v - (1 << width), v)
+
+
+def _text(bits: np.ndarray, start: int, nchars: int) -> List[Optional[str]]:
+    groups = bits[:, start : start + 6 * nchars].reshape(len(bits), nchars, 6) @ _TEXT_WEIGHTS
+    raw = np.ascontiguousarray(_SIXBIT_ASCII[groups]).view(f"S{nchars}").ravel()
+    out = []
+    for b in raw:
+        s = b.decode("ascii").split("@", 1)[0].strip()
+        out.append(s or None)
+    return out
+
+
+def _fields(bits: np.ndarray, layout: Dict) -> Dict[str, np.ndarray]:
+    return {
+        name: (_int if signed else _uint)(bits, start, width)
+        for name, (start, width, signed) in layout.items()
+    }
+
+
+def _first_at_or_after(positions: np.ndarray, at: np.ndarray) -> np.ndarray:
+    """Index into ``positions`` (sorted) of the first one ``>= at``; ``len(positions)`` if none."""
+    return np.searchsorted(positions, at)
+
+
+def _take(positions: np.ndarray, idx: np.ndarray, missing: int) -> np.ndarray:
+    """``positions[idx]``, or ``missing`` where ``idx`` is out of range."""
+    ok = (idx >= 0) & (idx < len(positions))
+    out = np.full(len(idx), missing, dtype=np.int64)
+    out[ok] = positions[idx[ok]]
+    return out
+
+
+def _tag_times(a: np.ndarray, line_start: np.ndarray, bang: np.ndarray) -> np.ndarray:
+    """Unix time of the ``c:<digits>`` tag block parameter before ``!`` (NaN without one)."""
+    c_pos = np.flatnonzero((a[:-1] == ord("c")) & (a[1:] == ord(":")))
+    c = _take(c_pos, _first_at_or_after(c_pos, line_start), len(a))
+    has = c < bang
+    out = np.full(len(bang), np.nan)
+    if not has.any():
+        return out
+    pos = c[has, None] + 2 + np.arange(_TAG_DIGITS)
+    win = a[np.minimum(pos, len(a) - 1)].astype(np.int64) - ord("0")
+    digit = (win >= 0) & (win <= 9) & (pos < bang[has, None])
+    leading = np.cumprod(digit, axis=1).astype(bool)
+    ndig = leading.sum(axis=1)
+    value = np.zeros(len(ndig), dtype=np.int64)
+    for j in range(_TAG_DIGITS):  # Horner over the leading digits
+        value = np.where(leading[:, j], value * 10 + win[:, j], value)
+    out[has] = np.where(ndig > 0, value, np.nan)
+    return out
+
+
+class AIVDMDecoder:
+    """Stateful batch decoder (keeps multi-part fragments and static data).
+
+    Parameters
+    ----------
+    check_checksum : bool
+        Drop sentences whose NMEA checksum does not match.
+    max_pending_fragments : int
+        Cap on incomplete multi-part messages kept between batches.
+    """
+
+    def __init__(self, check_checksum: bool = True, max_pending_fragments: int = 10_000):
+        self.check_checksum = check_checksum
+        self.max_pending_fragments = max_pending_fragments
+        self.static: Dict[int, Dict] = {}
+        self._fragments: Dict[tuple, Dict] = {}
+        self.stats: Counter = Counter()
+
+    # -- parsing -------------------------------------------------------------
+
+    def _split(self, lines: Sequence[str], received_at: float):
+        """Valid sentences of ``lines`` as payload offsets into one byte buffer.
+
+        The batch is joined and scanned as bytes: each line's first ``!``,
+        last ``*`` and the commas in between are found by binary search over
+        the positions of those characters, and checksums come from a prefix
+        XOR.  Returns ``(buf, starts, ends, ts)``, with the payloads of
+        reassembled multi-part messages appended to ``buf``.
+        """
+        # Readers decode with errors="replace": a U+FFFD becomes "?" and fails its checksum
+        a = np.frombuffer(("\n".join(lines) + "\n").encode("latin-1", "replace"), dtype=np.uint8)
+        line_end = np.flatnonzero(a == ord("\n"))
+        line_start = np.concatenate(([0], line_end[:-1] + 1))
+        bangs = np.flatnonzero(a == ord("!"))
+        stars = np.flatnonzero(a == ord("*"))
+        commas = np.flatnonzero(a == ord(","))
+        bang = _take(bangs, _first_at_or_after(bangs, line_start), len(a))
+        star = _take(stars, _first_at_or_after(stars, line_end) - 1, -1)
+        c0 = _first_at_or_after(commas, bang + 1)
+        comma = [_take(commas, c0 + k, len(a)) for k in range(6)]
+        f0_end = comma[0]
+        valid = (
+            (bang < line_end) & (star > bang) & (comma[5] < star)
+            & (f0_end - 3 > bang)
+            & (a[np.clip(f0_end - 3, 0, len(a) - 1)] == ord("V"))
+            & (a[np.clip(f0_end - 2, 0, len(a) - 1)] == ord("D"))
+            & np.isin(a[np.clip(f0_end - 1, 0, len(a) - 1)], (ord("M"), ord("O")))
+        )
+        self.stats["malformed"] += int((~valid).sum())
+        keep = np.flatnonzero(valid)
+        self.stats["sentences"] += len(keep)
+        empty = np.zeros(0, dtype=np.int64)
+        if not len(keep):
+            return a, empty, empty, np.zeros(0)
+        line_start, line_end, bang, star = line_start[keep], line_end[keep], bang[keep], star[keep]
+        comma = [c[keep] for c in comma]
+
+        stamps = _tag_times(a, line_start, bang)
+        stamps = np.where(np.isnan(stamps), received_at, stamps)
+        stamps = np.where(stamps > 1e11, stamps / 1000.0, stamps)  # milliseconds
+
+        if self.check_checksum:
+            prefix = np.bitwise_xor.accumulate(a)
+            got = prefix[star - 1] ^ prefix[bang]  # XOR of a[bang + 1:star]
+            hi = _HEX[a[np.minimum(star + 1, len(a) - 1)]]
+            lo = _HEX[a[np.minimum(star + 2, len(a) - 1)]]
+            want = np.where((star + 2 < line_end) & (hi >= 0) & (lo >= 0), hi * 16 + lo, -1)
+            ok = got == want
+            self.stats["bad_checksum"] += int((~ok).sum())
+        else:
+            ok = np.ones(len(keep), dtype=bool)
+
+        # Field k of the sentence lies between comma[k - 1] + 1 and comma[k]
+        total_len = comma[1] - comma[0] - 1
+        single = (total_len == 0) | ((total_len == 1) & (a[comma[0] + 1] == ord("1")))
+        idx = np.flatnonzero(ok & single)
+        starts, ends, msg_ts = comma[4][idx] + 1, comma[5][idx], stamps[idx]
+
+        extra, extra_ts = [], []
+        for r in np.flatnonzero(ok & ~single).tolist():
+            total, num, seq, chan, payload = a[comma[0][r] + 1 : comma[5][r]].tobytes().decode("latin-1").split(",")
+            key = (seq, chan, total)
+            entry = self._fragments.setdefault(key, {"parts": {}, "ts": stamps[r]})
+            entry["parts"][num] = payload
+            if not total.isdigit() or len(entry["parts"]) == int(total):
+                del self._fragments[key]
+                try:
+                    extra.append("".join(entry["parts"][str(n)] for n in range(1, int(total) + 1)))
+                    extra_ts.append(entry["ts"])
+                    self.stats["reassembled"] += 1
+                except (KeyError, ValueError):
+                    self.stats["bad_fragment"] += 1
+        if len(self._fragments) > self.max_pending_fragments:
+            # Drop the oldest half; their companions are not coming back.
+            for key in list(self._fragments)[: len(self._fragments) // 2]:
+                del self._fragments[key]
+                self.stats["dropped_fragment"] += 1
+        if extra:
+            lengths = np.fromiter(map(len, extra), dtype=np.int64, count=len(extra))
+            extra_ends = len(a) + np.cumsum(lengths)
+            starts = np.concatenate((starts, extra_ends - lengths))
+            ends = np.concatenate((ends, extra_ends))
+            msg_ts = np.concatenate((msg_ts, extra_ts))
+            a = np.concatenate((a, np.frombuffer("".join(extra).encode("latin-1", "replace"), dtype=np.uint8)))
+        return a, starts, ends, msg_ts
+
+    # -- static data ------------------------------------------------------------
+
+    def _update_static(self, mmsi: np.ndarray, values: Dict[str, Sequence], tclass: str) -> None:
+        cols = list(values.items())
+        for r, m in enumerate(mmsi.tolist()):
+            rec = self.static.setdefault(m, {})
+            rec["tclass"] = tclass
+            for name, col in cols:
+                v = col[r]
+                if v is not None:
+                    rec[name] = v
+
+    def _decode_type5(self, bits: np.ndarray) -> None:
+        imo = _uint(bits, 40, 30)
+        shiptype = _uint(bits, 232, 8)
+        bow, stern = _uint(bits, 240, 9), _uint(bits, 249, 9)
+        port, starboard = _uint(bits, 258, 6), _uint(bits, 264, 6)
+        draught = _uint(bits, 294, 8) / 10.0
+        self._update_static(
+            _uint(bits, 8, 30),
+            {
+                "imo": [f"IMO{v:07d}" if v else None for v in imo.tolist()],
+                "callsign": _text(bits, 70, 7),
+                "name": _text(bits, 112, 20),
+                "shiptype": [str(v) if v else None for v in shiptype.tolist()],
+                "length": [float(v) if v else None for v in (bow + stern).tolist()],
+                "width": [float(v) if v else None for v in (port + starboard).tolist()],
+                "draft": [v if v else None for v in draught.tolist()],
+            },
+            "A",
+        )
+
+    def _decode_type19_static(self, bits: np.ndarray) -> None:
+        shiptype = _uint(bits, 263, 8)
+        length = _uint(bits, 271, 9) + _uint(bits, 280, 9)
+        width = _uint(bits, 289, 6) + _uint(bits, 295, 6)
+        self._update_static(
+            _uint(bits, 8, 30),
+            {
+                "name": _text(bits, 143, 20),
+                "shiptype": [str(v) if v else None for v in shiptype.tolist()],
+                "length": [float(v) if v else None for v in length.tolist()],
+                "width": [float(v) if v else None for v in width.tolist()],
+            },
+            "B",
+        )
+
+    def _decode_type24(self, bits: np.ndarray) -> None:
+        part = _uint(bits, 38, 2)
+        a, b = bits[part == 0], bits[part == 1]
+        if len(a):
+            self._update_static(_uint(a, 8, 30), {"name": _text(a, 40, 20)}, "B")
+        if len(b):
+            shiptype = _uint(b, 40, 8)
+            length = _uint(b, 132, 9) + _uint(b, 141, 9)
+            width = _uint(b, 150, 6) + _uint(b, 156, 6)
+            self._update_static(
+                _uint(b, 8, 30),
+                {
+                    "shiptype": [str(v) if v else None for v in shiptype.tolist()],
+                    "callsign": _text(b, 90, 7),
+                    "length": [float(v) if v else None for v in length.tolist()],
+                    "width": [float(v) if v else None for v in width.tolist()],
+                },
+                "B",
+            )
+
+    # -- batches ----------------------------------------------------------------
+
+    def decode_batch(self, lines: Sequence[str], received_at: Optional[float] = None) -> pa.RecordBatch:
+        """Decode a batch of sentences into a RecordBatch of position reports."""
+        buf, starts, ends, ts = self._split(lines, time.time() if received_at is None else received_at)
+        if not len(starts):
+            return pa.RecordBatch.from_pylist([], schema=RAW_ARROW_SCHEMA)
+
+        first = buf[np.minimum(starts, len(buf) - 1)]
+        mtype = np.where(ends > starts, _ARMOR[first], 0)
+        self.stats.update({f"type_{t}": int(c) for t, c in zip(*np.unique(mtype, return_counts=True))})
+
+        # Static first, so positions in the same batch see the latest data.
+        for t, decode in ((5, self._decode_type5), (19, self._decode_type19_static), (24, self._decode_type24)):
+            idx = np.flatnonzero(mtype == t)
+            if len(idx):
+                decode(_payload_bits(buf, starts[idx], ends[idx], _MSG_BITS[t]))
+
+        parts = []
+        for types, layout, nbits in ((POSITION_A, _POS_A, 168), ((18,), _POS_B, 168), ((19,), _POS_B, 312)):
+            idx = np.flatnonzero(np.isin(mtype, types))
+            if not len(idx):
+                continue
+            bits = _payload_bits(buf, starts[idx], ends[idx], nbits)
+            f = _fields(bits, layout)
+            f["ts"] = ts[idx]
+            if "status" not in f:
+                f["status"] = np.full(len(idx), -1)
+            parts.append(f)
+        if not parts:
+            return pa.RecordBatch.from_pylist([], schema=RAW_ARROW_SCHEMA)
+
+        cols = {k: np.concatenate([p[k] for p in parts]) for k in parts[0]}
+        self.stats["positions"] += len(cols["mmsi"])
+        return self._to_record_batch(cols)
+
+    def _to_record_batch(self, f: Dict[str, np.ndarray]) -> pa.RecordBatch:
+        lat, lon = f["lat"] / 600_000.0, f["lon"] / 600_000.0
+        sog, cog = f["sog"] / 10.0, f["cog"] / 10.0
+        heading = f["heading"].astype(np.float64)
+        stamps = np.datetime_as_string(np.asarray(f["ts"] * 1e6, dtype="datetime64[us]").astype("datetime64[s]"), unit="s")
+        status = f["status"]
+
+        uniq, inv = np.unique(f["mmsi"], return_inverse=True)
+        known = [(i, self.static[m]) for i, m in enumerate(uniq.tolist()) if m in self.static]
+
+        def joined(key, type_):
+            values = [None] * len(uniq)
+            for i, rec in known:
+                values[i] = rec.get(key)
+            return pa.array(values, type=type_).take(inv)
+
+        shiptype = joined("shiptype", pa.string())
+        return pa.RecordBatch.from_arrays(
+            [
+                pa.array(f["mmsi"], type=pa.int64()),
+                pa.array(stamps, type=pa.string()),
+                pa.array(lat, mask=np.abs(lat) > 90),
+                pa.array(lon, mask=np.abs(lon) > 180),
+                pa.array(sog, mask=f["sog"] == 1023),
+                pa.array(cog, mask=f["cog"] >= 3600),
+                pa.array(heading),
+                joined("name", pa.string()),
+                joined("imo", pa.string()),
+                joined("callsign", pa.string()),
+                shiptype,
+                _STATUS.take(np.where(status >= 0, status, len(_STATUS) - 1)),
+                joined("length", pa.float64()),
+                joined("width", pa.float64()),
+                joined("draft", pa.float64()),
+                shiptype,
+                _TCLASS.take((status < 0).astype(np.int8)),
+            ],
+            schema=RAW_ARROW_SCHEMA,
+        )
+
+
+# -- sources ------------------------------------------------------------------------
+
+
+def iter_file_batches(path: str, batch_size: int = 50_000) -> Iterator[List[str]]:
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="ascii", errors="replace") as fh:
+        batch = []
+        for line in fh:
+            batch.append(line.rstrip("\r\n"))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+def iter_socket_batches(
+    host: str, port: int, batch_size: int = 20_000, max_wait_s: float = 1.0
+) -> Iterator[List[str]]:
+    """Read newline-delimited sentences from a TCP feed (e.g. an AIS receiver).
+
+    A batch is emitted when it reaches ``batch_size`` lines or when
+    ``max_wait_s`` passes without filling it.
+    """
+    with socket.create_connection((host, port)) as sock:
+        sock.settimeout(max_wait_s)
+        pending, batch, started = b"", [], time.monotonic()
+        while True:
+            try:
+                chunk = sock.recv(1 << 16)
+                if not chunk:
+                    break
+                pending += chunk
+                *complete, pending = pending.split(b"\n")
+                batch.extend(c.decode("ascii", "replace").rstrip("\r") for c in complete if c)
+            except socket.timeout:
+                pass
+            if len(batch) >= batch_size or (batch and time.monotonic() - started >= max_wait_s):
+                yield batch
+                batch, started = [], time.monotonic()
+        if batch:
+            yield batch
+
+
+def main():
+    p = argparse.ArgumentParser(description="Decodifica !AIVDM a lotes Arrow con el esquema raw.")
+    src = p.add_mutually_exclusive_group(required=True)
+    src.add_argument("--file", help="Archivo NMEA (.nmea/.txt, opcionalmente .gz).")
+    src.add_argument("--tcp", help="host:puerto de un feed NMEA por TCP.")
+    p.add_argument("--out", default=None, help="Directorio de salida Parquet (opcional).")
+    p.add_argument("--batch-size", type=int, default=50_000)
+    p.add_argument("--no-checksum", action="store_true")
+    a = p.parse_args()
+
+    decoder = AIVDMDecoder(check_checksum=not a.no_checksum)
+    if a.file:
+        batches = iter_file_batches(a.file, a.batch_size)
+    else:
+        host, _, port = a.tcp.rpartition(":")
+        batches = iter_socket_batches(host, int(port), a.batch_size)
+    if a.out:
+        os.makedirs(a.out, exist_ok=True)
+
+    t0, rows = time.perf_counter(), 0
+    for lines in batches:
+        rb = decoder.decode_batch(lines)
+        rows += rb.num_rows
+        if a.out and rb.num_rows:
+            name = f"nmea-{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}.parquet"
+            pq.write_table(pa.Table.from_batches([rb]), os.path.join(a.out, name))
+    wall = time.perf_counter() - t0
+    n = decoder.stats["sentences"]
+    print(
+        f"[nmea] {n:,} sentencias -> {rows:,} posiciones en {wall:0.2f}s "
+        f"({n / max(wall, 1e-9):,.0f} sentencias/s)"
+    )
+    print(f"[nmea] {dict(decoder.stats)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,27 +3,27 @@ import os
 import re
 import sys
 import json
-import datetime
 import logging
 from typing import List
 from zipfile import ZipFile
 
 from pyspark.sql import SparkSession
-from pyspark.sql.types import StructType, StructField, StringType, DoubleType, LongType
 from pyspark.sql.functions import (
-    input_file_name,
-    count,
-    current_timestamp,
     to_timestamp,
     date_format,
     coalesce,
     lit,
     col,
-    regexp_extract,
 )
 
 from google.cloud import storage
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from run_metrics import RunReport
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from raw_schema import schema, with_ingest_columns
+
 # %%
 DEFAULT_PROJECT_ID = os.getenv("GOOGLE_CLOUD_PROJECT")
 DEFAULT_BUCKET = "bucket20250825maestria"
@@ -78,6 +78,7 @@ spark = SparkSession.builder.appName("AIS-2024-10-to-parquet").getOrCreate()
 spark.conf.set("spark.sql.session.timeZone", "UTC")
 sc = spark.sparkContext
 log.info("Spark session initialized.")
+report = RunReport("raw_ingest", spark=spark, labels={"zip_regex": ZIP_NAME_REGEX})
 
 # %%
 sc._jsc.hadoopConfiguration().set(
@@ -90,15 +91,21 @@ bkt = gcs.bucket(BUCKET)
 
 # %%
 log.info(f"Listing ZIPs in gs://{BUCKET}/{ZIP_PREFIX} ...")
-all_zip_blob_names: List[str] = [
-    blob.name
-    for blob in gcs.list_blobs(BUCKET, prefix=ZIP_PREFIX)
-    if blob.name.lower().endswith(".zip")
-]
-zip_blob_names = [
-    n for n in all_zip_blob_names if zip_name_re.search(os.path.basename(n))
-]
+with report.stage("list_zips") as rec:
+    all_zip_blobs = [
+        blob
+        for blob in gcs.list_blobs(BUCKET, prefix=ZIP_PREFIX)
+        if blob.name.lower().endswith(".zip")
+    ]
+    selected = [
+        b for b in all_zip_blobs if zip_name_re.search(os.path.basename(b.name))
+    ]
+    zip_blob_names: List[str] = [b.name for b in selected]
+    rec["rows_in"] = len(all_zip_blobs)
+    rec["rows_out"] = len(selected)
+    rec["bytes_read"] = sum(b.size or 0 for b in selected)
 if not zip_blob_names:
+    report.finish(status="failed")
     raise SystemExit("No ZIP files matched regex")
 log.info(f"ZIPs seleccionados: {zip_blob_names}")
 
@@ -107,8 +114,6 @@ log.info(f"ZIPs seleccionados: {zip_blob_names}")
 def unzip_one(zip_name: str) -> tuple[str, int]:
     import tempfile, os
     from google.cloud import storage
-    from google.api_core import exceptions as gax_exceptions
-    import time
 
     client = storage.Client(project=PROJECT_ID)
     bkt = client.bucket(BUCKET)
@@ -144,37 +149,17 @@ def unzip_one(zip_name: str) -> tuple[str, int]:
 
 
 # %%
-stats = (
-    sc.parallelize(zip_blob_names, numSlices=min(4, len(zip_blob_names)))
-    .map(unzip_one)
-    .collect()
-)
-files_unzipped = int(sum(n for _, n in stats))
+with report.stage("unzip") as rec:
+    stats = (
+        sc.parallelize(zip_blob_names, numSlices=min(4, len(zip_blob_names)))
+        .map(unzip_one)
+        .collect()
+    )
+    files_unzipped = int(sum(n for _, n in stats))
+    rec["rows_in"] = len(zip_blob_names)
+    rec["rows_out"] = files_unzipped
 log.info(f"Extracted {files_unzipped} CSV(s).")
 
-# %%
-schema = StructType(
-    [
-        StructField("MMSI", LongType(), True),
-        StructField("BaseDateTime", StringType(), True),
-        StructField("LAT", DoubleType(), True),
-        StructField("LON", DoubleType(), True),
-        StructField("SOG", DoubleType(), True),
-        StructField("COG", DoubleType(), True),
-        StructField("Heading", DoubleType(), True),
-        StructField("VesselName", StringType(), True),
-        StructField("IMO", StringType(), True),
-        StructField("CallSign", StringType(), True),
-        StructField("VesselType", StringType(), True),
-        StructField("Status", StringType(), True),
-        StructField("Length", DoubleType(), True),
-        StructField("Width", DoubleType(), True),
-        StructField("Draft", DoubleType(), True),
-        StructField("Cargo", StringType(), True),
-        StructField("TransceiverClass", StringType(), True),
-    ]
-)
-
 # %%
 csv_gcs_paths = []
 for z in zip_blob_names:
@@ -184,6 +169,7 @@ for z in zip_blob_names:
             csv_gcs_paths.append(f"gs://{BUCKET}/{blob.name}")
 
 if not csv_gcs_paths:
+    report.finish(status="failed")
     raise SystemExit("No CSVs found after unzip")
 
 # %%
@@ -191,52 +177,55 @@ reader = spark.read.options(**CSV_OPTS_NORM)
 df = reader.csv(csv_gcs_paths, schema=schema)
 
 # %%
-df = df.withColumn("_source_file", input_file_name()).withColumn(
-    "_ingest_ts", current_timestamp()
-)
-df = df.withColumn("ym", regexp_extract("BaseDateTime", r"^(\d{4}-\d{2})", 1))
-df = df.withColumn("ymd", regexp_extract("BaseDateTime", r"^(\d{4}-\d{2}-\d{2})", 1))
+df = with_ingest_columns(df)
 
 # %%
-df = df.persist()
-csv_row_count = df.count()
+with report.stage("read_csv") as rec:
+    df = df.persist()
+    csv_row_count = df.count()
+    rec["rows_out"] = csv_row_count
 log.info(f"CSV row count total: {csv_row_count:,}")
 
 # %%
 out_parquet_uri = f"gs://{BUCKET}/{OUT_PARQUET_PREFIX}"
-(
-    df.write.mode("overwrite")
-    .option("partitionOverwriteMode", "dynamic")
-    .partitionBy("ym")
-    .parquet(out_parquet_uri)
-)
+with report.stage("write_parquet") as rec:
+    (
+        df.write.mode("overwrite")
+        .option("partitionOverwriteMode", "dynamic")
+        .partitionBy("ym")
+        .parquet(out_parquet_uri)
+    )
 log.info(f"Parquet written to {out_parquet_uri}")
 
 # %%
-yms = [r["ym"] for r in df.select("ym").distinct().collect()]
-ym_paths = [f"{out_parquet_uri}/ym={ym}" for ym in yms if ym]
-parq_df = (
-    spark.read.parquet(*ym_paths)
-    .withColumn("ymd", date_format(to_timestamp("BaseDateTime"), "yyyy-MM-dd"))
-    .persist()
-)
-parq_row_count = parq_df.count()
-log.info(f"Parquet row count total: {parq_row_count:,}")
+with report.stage("validate") as rec:
+    yms = [r["ym"] for r in df.select("ym").distinct().collect()]
+    ym_paths = [f"{out_parquet_uri}/ym={ym}" for ym in yms if ym]
+    parq_df = (
+        spark.read.parquet(*ym_paths)
+        .withColumn("ymd", date_format(to_timestamp("BaseDateTime"), "yyyy-MM-dd"))
+        .persist()
+    )
+    parq_row_count = parq_df.count()
+    log.info(f"Parquet row count total: {parq_row_count:,}")
 
-# %%
-csv_day_counts = df.groupBy("ymd").count().withColumnRenamed("count", "csv_rows")
-parq_day_counts = (
-    parq_df.groupBy("ymd").count().withColumnRenamed("count", "parquet_rows")
-)
-day_compare = (
-    csv_day_counts.join(parq_day_counts, on="ymd", how="full")
-    .withColumn("csv_rows", coalesce(col("csv_rows"), lit(0)))
-    .withColumn("parquet_rows", coalesce(col("parquet_rows"), lit(0)))
-    .withColumn("match", col("csv_rows") == col("parquet_rows"))
-    .orderBy("ymd")
-)
+    csv_day_counts = df.groupBy("ymd").count().withColumnRenamed("count", "csv_rows")
+    parq_day_counts = (
+        parq_df.groupBy("ymd").count().withColumnRenamed("count", "parquet_rows")
+    )
+    day_compare = (
+        csv_day_counts.join(parq_day_counts, on="ymd", how="full")
+        .withColumn("csv_rows", coalesce(col("csv_rows"), lit(0)))
+        .withColumn("parquet_rows", coalesce(col("parquet_rows"), lit(0)))
+        .withColumn("match", col("csv_rows") == col("parquet_rows"))
+        .orderBy("ymd")
+    )
+
+    rows = day_compare.collect()
+    rec["rows_in"] = csv_row_count
+    rec["rows_out"] = parq_row_count
+    rec["days_mismatched"] = sum(1 for r in rows if not r["match"])
 
-rows = day_compare.collect()
 log.info("===== Comparación de conteos por día =====")
 for r in rows:
     log.info(
@@ -250,6 +239,7 @@ if mismatches:
         log.error(
             f"  {r['ymd']}: CSV={int(r['csv_rows'])}, Parquet={int(r['parquet_rows'])}"
         )
+    report.finish(status="failed")
     raise SystemExit(2)
 else:
     log.info("Validación por día PASSED.")
@@ -262,10 +252,15 @@ if success_blob.exists():
 
 if CLEANUP_UNZIPPED and _is_safe_tmp_prefix(OUT_UNZIPPED_PREFIX):
     log.info(f"Cleaning tmp under gs://{BUCKET}/{OUT_UNZIPPED_PREFIX} ...")
-    for blob in gcs.list_blobs(BUCKET, prefix=OUT_UNZIPPED_PREFIX):
-        blob.delete()
+    with report.stage("cleanup") as rec:
+        deleted = 0
+        for blob in gcs.list_blobs(BUCKET, prefix=OUT_UNZIPPED_PREFIX):
+            blob.delete()
+            deleted += 1
+        rec["rows_out"] = deleted
 
 # %%
+report.finish()
 spark.stop()
 log.info("Job finished successfully.")
 
@@ -0,0 +1,47 @@
+"""NOAA AIS CSV layout and ingest metadata columns used by the raw job.
+
+Kept apart from ``raw_ingest_zip_monthly.py`` (a cell-style job that runs on
+import) so the synthetic data generator and the benchmarks can share the
+same column set.
+"""
+
+from pyspark.sql import DataFrame
+from pyspark.sql.functions import (
+    current_timestamp,
+    input_file_name,
+    regexp_extract,
+)
+from pyspark.sql.types import StructType, StructField, StringType, DoubleType, LongType
+
+schema = StructType(
+    [
+        StructField("MMSI", LongType(), True),
+        StructField("BaseDateTime", StringType(), True),
+        StructField("LAT", DoubleType(), True),
+        StructField("LON", DoubleType(), True),
+        StructField("SOG", DoubleType(), True),
+        StructField("COG", DoubleType(), True),
+        StructField("Heading", DoubleType(), True),
+        StructField("VesselName", StringType(), True),
+        StructField("IMO", StringType(), True),
+        StructField("CallSign", StringType(), True),
+        StructField("VesselType", StringType(), True),
+        StructField("Status", StringType(), True),
+        StructField("Length", DoubleType(), True),
+        StructField("Width", DoubleType(), True),
+        StructField("Draft", DoubleType(), True),
+        StructField("Cargo", StringType(), True),
+        StructField("TransceiverClass", StringType(), True),
+    ]
+)
+
+COLUMNS = [f.name for f in schema.fields]
+
+
+def with_ingest_columns(df: DataFrame) -> DataFrame:
+    df = df.withColumn("_source_file", input_file_name()).withColumn(
+        "_ingest_ts", current_timestamp()
+    )
+    df = df.withColumn("ym", regexp_extract("BaseDateTime", r"^(\d{4}-\d{2})", 1))
+    df = df.withColumn("ymd", regexp_extract("BaseDateTime", r"^(\d{4}-\d{2}-\d{2})", 1))
+    return df
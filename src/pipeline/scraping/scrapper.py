@@ -8,6 +8,9 @@ import requests
 from bs4 import BeautifulSoup
 from tqdm import tqdm
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from run_metrics import RunReport
+
 INDEX_URL = "https://coast.noaa.gov/htdata/CMSP/AISDataHandler/2024/index.html"
 OUTPUT_DIR = "ais_2024"
 MAX_WORKERS = 6
@@ -87,27 +90,38 @@ def download_one(url, out_dir, pbar=None):
 
 def main():
     os.makedirs(OUTPUT_DIR, exist_ok=True)
+    report = RunReport("scraper")
 
     print(f"Buscando .zip en: {INDEX_URL}")
-    urls = get_zip_links(INDEX_URL)
+    with report.stage("index") as rec:
+        urls = get_zip_links(INDEX_URL)
+        rec["rows_out"] = len(urls)
     if not urls:
         print("No .zip files found in the index. Check the URL.")
+        report.finish(status="failed")
         sys.exit(1)
 
     print(f"Found {len(urls)} .zip files")
     resultados = []
 
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool, tqdm(
-        total=len(urls), unit="file"
-    ) as pbar:
+    with report.stage("download") as rec, ThreadPoolExecutor(
+        max_workers=MAX_WORKERS
+    ) as pool, tqdm(total=len(urls), unit="file") as pbar:
         futures = [pool.submit(download_one, u, OUTPUT_DIR, pbar) for u in urls]
         for fut in as_completed(futures):
             resultados.append(fut.result())
             time.sleep(PAUSE_BETWEEN_TASKS)
+        downloaded = [n for n, st in resultados if st == "ok"]
+        rec["rows_in"] = len(urls)
+        rec["rows_out"] = len(downloaded)
+        rec["bytes_written"] = sum(
+            os.path.getsize(os.path.join(OUTPUT_DIR, n)) for n in downloaded
+        )
 
     ok = sum(1 for _, st in resultados if st == "ok")
     salt = sum(1 for _, st in resultados if st.startswith("skipped"))
-    fall = [(n, st) for n, st in resultados if st.startswith("falló")]
+    fall = [(n, st) for n, st in resultados if st.startswith("failed")]
+    report.finish(status="failed" if fall else "ok")
 
     print(
         f"\nSummary → ✓ Downloaded: {ok}  •  ⏭ Skipped: {salt}  •  ✗ Failed: {len(fall)}"
@@ -0,0 +1,366 @@
+"""Synthetic NOAA-style AIS data generator.
+
+Writes one ZIP per day (``AIS_YYYY_MM_DD.zip`` holding ``AIS_YYYY_MM_DD.csv``)
+with the same header as the NOAA 2024 files, i.e. the columns of
+``raw_schema.schema``.  Each MMSI follows a plausible track: position is
+integrated from SOG/COG with a small random walk on course and speed, static
+data (name, IMO, call sign, type, dimensions) stays fixed per vessel, and
+speeds/dimensions depend on the vessel type.
+
+Dirty data is injected on purpose so the curated rules have work to do:
+exact duplicates on ``(MMSI, BaseDateTime)`` and out-of-range values
+(LAT/LON outside the globe, SOG 102.3, Draft/Length/Width outside the
+curated ranges, placeholder IMOs).
+
+Usage::
+
+    python ais_synth.py --out /tmp/ais_synth --rows 1000000 --fleet 2000
+"""
+
+import argparse
+import datetime
+import io
+import json
+import math
+import os
+import zipfile
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+# Same order as the NOAA CSV header (and raw_schema.schema).
+NOAA_COLUMNS = [
+    "MMSI",
+    "BaseDateTime",
+    "LAT",
+    "LON",
+    "SOG",
+    "COG",
+    "Heading",
+    "VesselName",
+    "IMO",
+    "CallSign",
+    "VesselType",
+    "Status",
+    "Length",
+    "Width",
+    "Draft",
+    "Cargo",
+    "TransceiverClass",
+]
+
+# Rough share of vessel types seen in US coastal AIS traffic.
+DEFAULT_TYPE_MIX: Dict[int, float] = {
+    37: 0.28,  # Pleasure craft
+    30: 0.10,  # Fishing
+    31: 0.04,  # Towing
+    52: 0.09,  # Tug
+    60: 0.04,  # Passenger
+    70: 0.20,  # Cargo
+    80: 0.10,  # Tanker
+    90: 0.05,  # Other
+    0: 0.10,  # Not available
+}
+
+# Type code range -> (cruise SOG mean, SOG sd, length range m, beam ratio, draft range m)
+_TYPE_PROFILES = [
+    ((30, 39), 7.0, 3.0, (8, 40), 0.30, (1.0, 4.0)),
+    ((40, 49), 25.0, 6.0, (20, 60), 0.25, (1.0, 3.0)),
+    ((50, 59), 8.0, 3.0, (15, 45), 0.35, (2.0, 5.0)),
+    ((60, 69), 16.0, 4.0, (30, 300), 0.14, (3.0, 9.0)),
+    ((70, 79), 13.0, 3.0, (90, 400), 0.14, (6.0, 15.0)),
+    ((80, 89), 12.0, 3.0, (100, 330), 0.17, (7.0, 20.0)),
+]
+_DEFAULT_PROFILE = (6.0, 4.0, (5, 60), 0.30, (0.5, 5.0))
+
+# Coastal boxes (lat_min, lat_max, lon_min, lon_max) where tracks start.
+_REGIONS = [
+    (25.0, 30.5, -97.5, -82.0),  # Gulf of Mexico
+    (30.0, 44.5, -81.5, -66.5),  # East coast
+    (32.0, 48.5, -126.0, -120.5),  # West coast
+    (41.0, 48.0, -92.0, -76.0),  # Great Lakes
+]
+
+# MID prefixes used by US stations.
+_US_MIDS = np.array([338, 366, 367, 368, 369])
+
+_NAV_STATUS_UNDERWAY = 0
+_NAV_STATUS_ANCHOR = 1
+_NAV_STATUS_MOORED = 5
+_NAV_STATUS_FISHING = 7
+_NAV_STATUS_SAILING = 8
+_NAV_STATUS_UNDEFINED = 15
+
+
+def parse_type_mix(spec: Optional[str]) -> Dict[int, float]:
+    """Parse ``"37:0.3,70:0.2,..."`` into a normalised ``{code: weight}`` mix."""
+    if not spec:
+        return dict(DEFAULT_TYPE_MIX)
+    mix = {}
+    for part in spec.split(","):
+        code, _, weight = part.partition(":")
+        mix[int(code)] = float(weight)
+    return mix
+
+
+def _profile(code: int):
+    for (lo, hi), *prof in _TYPE_PROFILES:
+        if lo <= code <= hi:
+            return prof
+    return list(_DEFAULT_PROFILE)
+
+
+class Fleet:
+    """Static data and moving state for every simulated vessel."""
+
+    def __init__(self, size: int, type_mix: Dict[int, float], rng: np.random.Generator):
+        self.size = size
+        codes = np.array(list(type_mix.keys()))
+        weights = np.array(list(type_mix.values()), dtype=float)
+        self.vessel_type = rng.choice(codes, size=size, p=weights / weights.sum())
+
+        mids = rng.choice(_US_MIDS, size=size)
+        suffix = rng.choice(1_000_000, size=size, replace=False)
+        self.mmsi = mids * 1_000_000 + suffix
+
+        self.sog_mean = np.empty(size)
+        self.sog_sd = np.empty(size)
+        self.length = np.empty(size)
+        self.width = np.empty(size)
+        self.draft = np.empty(size)
+        for code in np.unique(self.vessel_type):
+            idx = self.vessel_type == code
+            n = int(idx.sum())
+            mean, sd, (lmin, lmax), beam, (dmin, dmax) = _profile(int(code))
+            self.sog_mean[idx] = np.clip(rng.normal(mean, sd / 2, n), 0.5, 45)
+            self.sog_sd[idx] = sd / 4
+            self.length[idx] = np.round(rng.uniform(lmin, lmax, n))
+            self.width[idx] = np.round(self.length[idx] * beam * rng.uniform(0.85, 1.15, n))
+            self.draft[idx] = np.round(rng.uniform(dmin, dmax, n), 1)
+
+        # Class B transceivers (mostly pleasure/fishing) rarely report draft.
+        self.transceiver = np.where(np.isin(self.vessel_type, [30, 36, 37, 0]), "B", "A")
+        self.draft[self.transceiver == "B"] = np.nan
+        self.imo = np.where(
+            self.transceiver == "A",
+            np.char.add("IMO", rng.integers(9_000_000, 9_999_999, size).astype(str)),
+            "",
+        )
+        self.name = np.char.add("SYN VESSEL ", np.arange(size).astype(str))
+        self.callsign = np.char.add(
+            rng.choice(np.array(list("KNW")), size),
+            rng.integers(100_000, 999_999, size).astype(str),
+        )
+        self.cargo = np.where(
+            self.vessel_type >= 70, self.vessel_type.astype(str), ""
+        )
+
+        region = rng.integers(0, len(_REGIONS), size)
+        bounds = np.array(_REGIONS)[region]
+        self.bounds = bounds
+        self.lat = rng.uniform(bounds[:, 0], bounds[:, 1])
+        self.lon = rng.uniform(bounds[:, 2], bounds[:, 3])
+        self.cog = rng.uniform(0, 360, size)
+        # A share of the fleet stays moored/anchored for the whole day.
+        self.stationary = rng.random(size) < 0.25
+
+
+def _simulate_day(
+    fleet: Fleet,
+    day: datetime.date,
+    per_vessel: int,
+    interval_s: float,
+    rng: np.random.Generator,
+) -> pd.DataFrame:
+    n = fleet.size
+    # Report times: one slot per interval with jitter, sorted per vessel.
+    offsets = np.arange(per_vessel) * interval_s + rng.uniform(0, interval_s, (n, per_vessel))
+    offsets = np.minimum(offsets, 86_399)
+    dt = np.diff(offsets, axis=1, prepend=0.0)
+
+    cog = (fleet.cog[:, None] + np.cumsum(rng.normal(0, 4.0, (n, per_vessel)), axis=1)) % 360
+    sog = np.clip(
+        fleet.sog_mean[:, None] + rng.normal(0, 1, (n, per_vessel)) * fleet.sog_sd[:, None],
+        0.0,
+        60.0,
+    )
+    sog[fleet.stationary] = np.abs(rng.normal(0, 0.05, (int(fleet.stationary.sum()), per_vessel)))
+
+    dist_nm = sog * dt / 3600.0
+    rad = np.deg2rad(cog)
+    lat = fleet.lat[:, None] + np.cumsum(dist_nm * np.cos(rad) / 60.0, axis=1)
+    coslat = np.maximum(np.cos(np.deg2rad(lat)), 0.2)
+    lon = fleet.lon[:, None] + np.cumsum(dist_nm * np.sin(rad) / (60.0 * coslat), axis=1)
+    # Keep tracks inside their coastal box (turn around at the edge).
+    lat = np.clip(lat, fleet.bounds[:, 0:1], fleet.bounds[:, 1:2])
+    lon = np.clip(lon, fleet.bounds[:, 2:3], fleet.bounds[:, 3:4])
+    at_edge = (
+        (lat[:, -1] <= fleet.bounds[:, 0])
+        | (lat[:, -1] >= fleet.bounds[:, 1])
+        | (lon[:, -1] <= fleet.bounds[:, 2])
+        | (lon[:, -1] >= fleet.bounds[:, 3])
+    )
+    fleet.lat, fleet.lon = lat[:, -1], lon[:, -1]
+    fleet.cog = np.where(at_edge, (cog[:, -1] + 180) % 360, cog[:, -1])
+
+    heading = np.round((cog + rng.normal(0, 2, cog.shape)) % 360)
+    # Class B units and stationary vessels often report Heading=511 (n/a).
+    no_heading = (fleet.transceiver == "B")[:, None] | (rng.random(cog.shape) < 0.05)
+    heading = np.where(no_heading, 511.0, heading)
+
+    status = np.full(n, _NAV_STATUS_UNDERWAY)
+    status[fleet.stationary] = np.where(
+        rng.random(int(fleet.stationary.sum())) < 0.7, _NAV_STATUS_MOORED, _NAV_STATUS_ANCHOR
+    )
+    status[(fleet.vessel_type == 30) & ~fleet.stationary] = _NAV_STATUS_FISHING
+    status[(fleet.vessel_type == 36) & ~fleet.stationary] = _NAV_STATUS_SAILING
+    status[fleet.transceiver == "B"] = _NAV_STATUS_UNDEFINED
+
+    day_start = np.datetime64(day.isoformat(), "s")
+    ts = day_start + offsets.astype("timedelta64[s]")
+
+    rep = lambda a: np.repeat(a, per_vessel)  # noqa: E731
+    return pd.DataFrame(
+        {
+            "MMSI": rep(fleet.mmsi),
+            "BaseDateTime": np.datetime_as_string(ts.ravel(), unit="s"),
+            "LAT": np.round(lat.ravel(), 5),
+            "LON": np.round(lon.ravel(), 5),
+            "SOG": np.round(sog.ravel(), 1),
+            "COG": np.round(cog.ravel(), 1),
+            "Heading": heading.ravel(),
+            "VesselName": rep(fleet.name),
+            "IMO": rep(fleet.imo),
+            "CallSign": rep(fleet.callsign),
+            "VesselType": rep(np.where(fleet.vessel_type > 0, fleet.vessel_type.astype(str), "")),
+            "Status": rep(status),
+            "Length": rep(fleet.length),
+            "Width": rep(fleet.width),
+            "Draft": rep(fleet.draft),
+            "Cargo": rep(fleet.cargo),
+            "TransceiverClass": rep(fleet.transceiver),
+        }
+    )
+
+
+def _inject_out_of_range(df: pd.DataFrame, rate: float, rng: np.random.Generator) -> int:
+    """Overwrite a random field in ``rate`` of the rows with an invalid value."""
+    n_bad = int(round(len(df) * rate))
+    if n_bad == 0:
+        return 0
+    rows = rng.choice(len(df), size=n_bad, replace=False)
+    kinds = rng.integers(0, 7, n_bad)
+    invalid = [
+        ("LAT", 91.0),
+        ("LON", 181.5),
+        ("SOG", 102.3),
+        ("Draft", 30.5),
+        ("Length", 0.0),
+        ("Width", 99.0),
+        ("IMO", "IMO0000000"),
+    ]
+    for k, (column, value) in enumerate(invalid):
+        sel = rows[kinds == k]
+        if len(sel):
+            df.iloc[sel, df.columns.get_loc(column)] = value
+    return n_bad
+
+
+def generate(
+    out_dir: str,
+    rows: int,
+    fleet_size: int = 2_000,
+    interval_s: float = 60.0,
+    duplicate_rate: float = 0.01,
+    out_of_range_rate: float = 0.002,
+    type_mix: Optional[Dict[int, float]] = None,
+    start: datetime.date = datetime.date(2024, 1, 1),
+    seed: int = 42,
+) -> Dict:
+    """Write ``rows`` synthetic messages (before duplicates) as daily ZIPs.
+
+    Returns the manifest that is also saved as ``<out_dir>/_manifest.json``.
+    """
+    rng = np.random.default_rng(seed)
+    fleet = Fleet(fleet_size, type_mix or DEFAULT_TYPE_MIX, rng)
+    per_vessel_day = max(1, int(86_400 // interval_s))
+    per_day = fleet_size * per_vessel_day
+    days = math.ceil(rows / per_day)
+
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = {
+        "rows": 0,
+        "unique_rows": 0,
+        "duplicates": 0,
+        "out_of_range": 0,
+        "fleet": fleet_size,
+        "interval_s": interval_s,
+        "seed": seed,
+        "files": [],
+    }
+    remaining = rows
+    for d in range(days):
+        day = start + datetime.timedelta(days=d)
+        per_vessel = per_vessel_day
+        if remaining < per_day:
+            per_vessel = max(1, math.ceil(remaining / fleet_size))
+        df = _simulate_day(fleet, day, per_vessel, 86_400 / per_vessel, rng)
+        if len(df) > remaining:
+            df = df.sample(n=remaining, random_state=seed + d).sort_index()
+        remaining -= len(df)
+
+        bad = _inject_out_of_range(df, out_of_range_rate, rng)
+        n_dup = int(round(len(df) * duplicate_rate))
+        if n_dup:
+            dups = df.iloc[rng.choice(len(df), size=n_dup, replace=False)]
+            df = pd.concat([df, dups], ignore_index=True)
+        df = df.sort_values("BaseDateTime", kind="stable")
+
+        stem = f"AIS_{day:%Y_%m_%d}"
+        zip_path = os.path.join(out_dir, f"{stem}.zip")
+        with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+            with zf.open(f"{stem}.csv", "w", force_zip64=True) as raw:
+                with io.TextIOWrapper(raw, encoding="utf-8", newline="") as fh:
+                    df.to_csv(fh, index=False, columns=NOAA_COLUMNS)
+
+        manifest["rows"] += len(df)
+        manifest["unique_rows"] += len(df) - n_dup
+        manifest["duplicates"] += n_dup
+        manifest["out_of_range"] += bad
+        manifest["files"].append({"zip": os.path.basename(zip_path), "rows": len(df)})
+        print(f"[synth] {zip_path}: {len(df):,} filas ({n_dup:,} duplicadas, {bad:,} fuera de rango)")
+
+    with open(os.path.join(out_dir, "_manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    p.add_argument("--out", required=True, help="Directorio de salida para los ZIPs.")
+    p.add_argument("--rows", type=int, default=1_000_000)
+    p.add_argument("--fleet", type=int, default=2_000, help="Número de MMSI distintos.")
+    p.add_argument("--interval-s", type=float, default=60.0, help="Segundos entre reportes por buque.")
+    p.add_argument("--duplicate-rate", type=float, default=0.01)
+    p.add_argument("--out-of-range-rate", type=float, default=0.002)
+    p.add_argument("--type-mix", default=None, help='Ej. "37:0.3,70:0.4,80:0.3".')
+    p.add_argument("--start", default="2024-01-01")
+    p.add_argument("--seed", type=int, default=42)
+    a = p.parse_args()
+    manifest = generate(
+        a.out,
+        a.rows,
+        fleet_size=a.fleet,
+        interval_s=a.interval_s,
+        duplicate_rate=a.duplicate_rate,
+        out_of_range_rate=a.out_of_range_rate,
+        type_mix=parse_type_mix(a.type_mix),
+        start=datetime.date.fromisoformat(a.start),
+        seed=a.seed,
+    )
+    print(json.dumps({k: v for k, v in manifest.items() if k != "files"}))
+
+
+if __name__ == "__main__":
+    main()
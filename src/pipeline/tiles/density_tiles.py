@@ -0,0 +1,264 @@
+"""Multi-resolution traffic density tiles from the curated positions.
+
+Map pages send raw events to ``st.map``, which stops scaling at a few tens
+of thousands of points and says nothing about how busy an area is.  This
+step precomputes message counts on a Web Mercator tile pyramid so the
+dashboard can draw a month of traffic without reading message-level data:
+
+- Zoom ``z`` uses the slippy-map tiles (``2**z`` per side); every tile is
+  split into ``--bins`` x ``--bins`` cells.  Cells are counted per time
+  bucket (``hour``, ``day`` or ``month``) and ``VesselTypeClass``.
+- The finest level (``--max-zoom``) is aggregated from the positions; each
+  coarser level sums four cells of the level below, so the source is read
+  once per month.
+- Output: ``<out>/z<z>/<YYYY-MM>.parquet`` with ``bucket``,
+  ``VesselTypeClass`` (dictionary), ``tile_x``/``tile_y`` (int32),
+  ``cell_x``/``cell_y`` (uint8) and ``n`` (uint32).  Rows are sorted by the
+  Morton (Z-order) key of the tile, in small row groups, so a viewport read
+  only touches the row groups of its tiles (min/max statistics of
+  ``tile_x``/``tile_y``).  ``_manifest.json`` records the levels, bins,
+  bucket, months, classes and bounds; ``apps/lib/density_tiles.py`` reads it.
+
+Months are independent files: ``--months`` rebuilds only those (e.g. the
+one still arriving) and leaves the rest of the pyramid as it is.  Files are
+written under a temporary name and renamed into place, so the dashboard
+never sees a half-written month.
+
+Runs on DuckDB over the curated Parquet (local paths or ``gs://`` through
+DuckDB's httpfs).
+
+Usage::
+
+    python density_tiles.py --src "/data/curated/**/*.parquet" --out /data/density_tiles \\
+        --max-zoom 12 --bins 64 --bucket day --months 2024-01
+"""
+
+import argparse
+import glob
+import json
+import math
+import os
+import time
+from typing import Dict, List, Optional
+
+import duckdb
+import pyarrow.parquet as pq
+
+BUCKETS = ("hour", "day", "month")
+DEFAULT_MAX_ZOOM = 12
+DEFAULT_BINS = 64
+DEFAULT_ROW_GROUP_ROWS = 16_384
+UNSPECIFIED_CLASS = "Unspecified"  # same label curated_transforms gives unknown types
+# Web Mercator latitude limit
+MAX_LAT = 85.0511287798066
+MANIFEST = "_manifest.json"
+
+# Spread the low 16 bits of an integer to the even bits (Morton / Z-order key)
+_MACROS = """
+CREATE OR REPLACE MACRO _spread8(v) AS ((v | (v << 8)) & 16711935);
+CREATE OR REPLACE MACRO _spread4(v) AS ((v | (v << 4)) & 252645135);
+CREATE OR REPLACE MACRO _spread2(v) AS ((v | (v << 2)) & 858993459);
+CREATE OR REPLACE MACRO _spread1(v) AS ((v | (v << 1)) & 1431655765);
+CREATE OR REPLACE MACRO spread16(v) AS _spread1(_spread2(_spread4(_spread8(v & 65535))));
+"""
+
+
+def _sql_str(s: str) -> str:
+    return "'" + s.replace("'", "''") + "'"
+
+
+def month_bounds(ym: str):
+    year, month = (int(p) for p in ym.split("-"))
+    nxt = f"{year + month // 12:04d}-{month % 12 + 1:02d}"
+    return f"{ym}-01", f"{nxt}-01"
+
+
+def source_months(con, src: str) -> List[str]:
+    rows = con.execute(
+        f"SELECT DISTINCT strftime(BaseDateTime, '%Y-%m') FROM read_parquet({_sql_str(src)}, union_by_name = true) "
+        "WHERE BaseDateTime IS NOT NULL ORDER BY 1"
+    ).fetchall()
+    return [r[0] for r in rows]
+
+
+def base_level_sql(src: str, ym: str, max_zoom: int, bins: int, bucket: str) -> str:
+    """Counts per (bucket, class, global cell) at ``max_zoom`` for the positions of month ``ym``."""
+    side = (2 ** max_zoom) * bins  # cells per side of the world at max_zoom
+    start, end = month_bounds(ym)
+    lat = f"LEAST(GREATEST(LAT, {-MAX_LAT}), {MAX_LAT})"
+    gx = f"CAST(floor((LON + 180.0) / 360.0 * {side}) AS BIGINT)"
+    gy = f"CAST(floor((1.0 - ln(tan(radians({lat})) + 1.0 / cos(radians({lat}))) / pi()) / 2.0 * {side}) AS BIGINT)"
+    return f"""
+        SELECT
+            date_trunc('{bucket}', BaseDateTime) AS bucket,
+            COALESCE(VesselTypeClass, '{UNSPECIFIED_CLASS}') AS VesselTypeClass,
+            LEAST(GREATEST({gx}, 0), {side - 1}) AS gx,
+            LEAST(GREATEST({gy}, 0), {side - 1}) AS gy,
+            COUNT(*) AS n
+        FROM read_parquet({_sql_str(src)}, union_by_name = true)
+        WHERE BaseDateTime >= TIMESTAMP '{start}' AND BaseDateTime < TIMESTAMP '{end}'
+          AND LAT BETWEEN -90 AND 90 AND LON BETWEEN -180 AND 180
+        GROUP BY ALL
+    """
+
+
+def _write_level(con, table: str, path: str, bins: int, row_group_rows: int) -> Dict:
+    shift = int(math.log2(bins))
+    tmp = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.tmp")
+    con.execute(f"""
+        COPY (
+            SELECT
+                CAST(bucket AS TIMESTAMP) AS bucket,
+                VesselTypeClass,
+                CAST(gx >> {shift} AS INTEGER) AS tile_x,
+                CAST(gy >> {shift} AS INTEGER) AS tile_y,
+                CAST(gx & {bins - 1} AS UTINYINT) AS cell_x,
+                CAST(gy & {bins - 1} AS UTINYINT) AS cell_y,
+                CAST(n AS UINTEGER) AS n
+            FROM {table}
+            ORDER BY spread16(gx >> {shift}) | (spread16(gy >> {shift}) << 1), bucket, VesselTypeClass
+        ) TO {_sql_str(tmp)} (FORMAT parquet, COMPRESSION zstd, ROW_GROUP_SIZE {row_group_rows})
+    """)
+    os.replace(tmp, path)
+    meta = pq.ParquetFile(path).metadata
+    return {"rows": meta.num_rows, "bytes": os.path.getsize(path)}
+
+
+def build_month(con, src: str, out: str, ym: str, min_zoom: int, max_zoom: int, bins: int, bucket: str,
+                row_group_rows: int = DEFAULT_ROW_GROUP_ROWS) -> Dict[int, Dict]:
+    """Write every level of month ``ym``; returns ``{zoom: {"rows", "bytes"}}``."""
+    con.execute(f"CREATE OR REPLACE TEMP TABLE lvl AS {base_level_sql(src, ym, max_zoom, bins, bucket)}")
+    stats = {}
+    for z in range(max_zoom, min_zoom - 1, -1):
+        if z < max_zoom:
+            # Four cells of the level below make one cell of this level
+            con.execute(
+                "CREATE OR REPLACE TEMP TABLE lvl AS SELECT bucket, VesselTypeClass, gx >> 1 AS gx, gy >> 1 AS gy, "
+                "SUM(n) AS n FROM lvl GROUP BY ALL"
+            )
+        os.makedirs(os.path.join(out, f"z{z}"), exist_ok=True)
+        stats[z] = _write_level(con, "lvl", os.path.join(out, f"z{z}", f"{ym}.parquet"), bins, row_group_rows)
+    con.execute("DROP TABLE IF EXISTS lvl")
+    return stats
+
+
+def _tile_lat(y: float, zoom: int) -> float:
+    return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / 2 ** zoom))))
+
+
+def _bounds(paths: List[str], zoom: int) -> Optional[List[float]]:
+    """``[lon_min, lat_min, lon_max, lat_max]`` of the tiles present (row-group statistics only)."""
+    xs, ys = [], []
+    for path in paths:
+        meta = pq.ParquetFile(path).metadata
+        names = meta.schema.names
+        for i in range(meta.num_row_groups):
+            rg = meta.row_group(i)
+            for name, acc in (("tile_x", xs), ("tile_y", ys)):
+                st = rg.column(names.index(name)).statistics
+                if st is not None and st.has_min_max:
+                    acc += [st.min, st.max]
+    if not xs or not ys:
+        return None
+    side = 2 ** zoom
+    return [min(xs) / side * 360 - 180, _tile_lat(max(ys) + 1, zoom),
+            (max(xs) + 1) / side * 360 - 180, _tile_lat(min(ys), zoom)]
+
+
+def write_manifest(con, out: str, min_zoom: int, max_zoom: int, bins: int, bucket: str) -> Dict:
+    """Describe every month present under ``out`` (also the ones built by earlier runs)."""
+    files = sorted(glob.glob(os.path.join(out, f"z{min_zoom}", "*.parquet")))
+    months = [os.path.splitext(os.path.basename(f))[0] for f in files]
+    levels = {}
+    for z in range(min_zoom, max_zoom + 1):
+        paths = glob.glob(os.path.join(out, f"z{z}", "*.parquet"))
+        levels[str(z)] = {
+            "rows": sum(pq.ParquetFile(p).metadata.num_rows for p in paths),
+            "bytes": sum(os.path.getsize(p) for p in paths),
+        }
+    summary = {"classes": [], "first_bucket": None, "last_bucket": None, "bounds": None}
+    if files:
+        row = con.execute(
+            "SELECT list(DISTINCT VesselTypeClass ORDER BY VesselTypeClass), min(bucket), max(bucket) "
+            f"FROM read_parquet({_sql_str(os.path.join(out, f'z{min_zoom}', '*.parquet'))})"
+        ).fetchone()
+        summary = {
+            "classes": list(row[0]),
+            "first_bucket": row[1].isoformat(),
+            "last_bucket": row[2].isoformat(),
+            "bounds": _bounds(glob.glob(os.path.join(out, f"z{max_zoom}", "*.parquet")), max_zoom),
+        }
+    manifest = {
+        "min_zoom": min_zoom,
+        "max_zoom": max_zoom,
+        "bins": bins,
+        "bucket": bucket,
+        "months": months,
+        "levels": levels,
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        **summary,
+    }
+    tmp = os.path.join(out, f".{MANIFEST}.tmp")
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, os.path.join(out, MANIFEST))
+    return manifest
+
+
+def _check_layout(out: str, min_zoom: int, max_zoom: int, bins: int, bucket: str) -> None:
+    """Refuse to mix months built with a different pyramid layout."""
+    path = os.path.join(out, MANIFEST)
+    if not os.path.exists(path):
+        return
+    with open(path) as f:
+        old = json.load(f)
+    layout = {"min_zoom": min_zoom, "max_zoom": max_zoom, "bins": bins, "bucket": bucket}
+    if old.get("months") and any(old.get(k) != v for k, v in layout.items()):
+        raise SystemExit(f"[tiles] {out} tiene otra estructura ({ {k: old.get(k) for k in layout} }); "
+                         "usa otro --out o bórralo antes")
+
+
+def main(argv: Optional[List[str]] = None):
+    p = argparse.ArgumentParser(description="Pirámide de teselas de densidad a partir del Parquet curado.")
+    p.add_argument("--src", required=True, help="Parquet curado (archivo, directorio con glob o gs://...).")
+    p.add_argument("--out", required=True)
+    p.add_argument("--min-zoom", type=int, default=0)
+    p.add_argument("--max-zoom", type=int, default=DEFAULT_MAX_ZOOM)
+    p.add_argument("--bins", type=int, default=DEFAULT_BINS, help="Celdas por lado de cada tesela (potencia de 2, ≤ 256).")
+    p.add_argument("--bucket", choices=BUCKETS, default="day")
+    p.add_argument("--months", default="", help="YYYY-MM separados por comas (por defecto, todos los del origen).")
+    p.add_argument("--row-group-rows", type=int, default=DEFAULT_ROW_GROUP_ROWS)
+    p.add_argument("--threads", type=int, default=None)
+    p.add_argument("--memory-limit", default=None, help="Límite de memoria de DuckDB, p. ej. 8GB.")
+    a = p.parse_args(argv)
+
+    if a.bins < 1 or a.bins > 256 or a.bins & (a.bins - 1):
+        p.error("--bins debe ser una potencia de 2 entre 1 y 256")
+    if not 0 <= a.min_zoom <= a.max_zoom <= 16:
+        p.error("se necesita 0 ≤ --min-zoom ≤ --max-zoom ≤ 16")
+    src = a.src
+    if os.path.isdir(src):
+        src = os.path.join(src, "**", "*.parquet")
+    os.makedirs(a.out, exist_ok=True)
+    _check_layout(a.out, a.min_zoom, a.max_zoom, a.bins, a.bucket)
+
+    con = duckdb.connect()
+    if a.threads:
+        con.execute(f"SET threads = {int(a.threads)}")
+    if a.memory_limit:
+        con.execute(f"SET memory_limit = {_sql_str(a.memory_limit)}")
+    con.execute(_MACROS)
+    months = [m.strip() for m in a.months.split(",") if m.strip()] or source_months(con, src)
+    for ym in months:
+        t0 = time.perf_counter()
+        stats = build_month(con, src, a.out, ym, a.min_zoom, a.max_zoom, a.bins, a.bucket, a.row_group_rows)
+        rows = sum(s["rows"] for s in stats.values())
+        size = sum(s["bytes"] for s in stats.values())
+        print(f"[tiles] {ym}: {len(stats)} niveles, {rows:,} celdas, {size / 2**20:.1f} MB "
+              f"en {time.perf_counter() - t0:.1f} s")
+    manifest = write_manifest(con, a.out, a.min_zoom, a.max_zoom, a.bins, a.bucket)
+    print(f"[tiles] {a.out}: {len(manifest['months'])} meses, clases {manifest['classes']}")
+
+
+if __name__ == "__main__":
+    main()